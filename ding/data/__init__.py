@@ -5,3 +5,4 @@ from .storage import *
 from .storage_loader import StorageLoader, FileStorageLoader
 from .shm_buffer import ShmBufferContainer, ShmBuffer
 from .model_loader import ModelLoader, FileModelLoader
+from .model_codec import ModelEncoder, ModelDecoder
@@ -1,3 +1,6 @@
 from .buffer import Buffer, apply_middleware, BufferedData
 from .deque_buffer import DequeBuffer
 from .deque_buffer_wrapper import DequeBufferWrapper
+from .columnar_buffer import ColumnarBuffer, ColumnarStorage
+from .memmap_buffer import MemmapBuffer, MemmapStorage
+from .sharded_buffer import ShardedBuffer
@@ -0,0 +1,505 @@
+"""
+Overview:
+    The standalone benchmark of the replay buffers, which measures push throughput, sample latency, priority update \
+    cost, group sampling latency and memory per transition of ``DequeBuffer`` (with each middleware), \
+    ``ColumnarBuffer``, ``ShardedBuffer`` and the buffers in ``ding.worker.replay_buffer``, across buffer sizes and \
+    payload shapes. The results are saved in a json file, and two json files can be compared to find regressions.
+Usage:
+    Run the benchmark and save the results:
+        python -m ding.data.buffer.benchmark --sizes 1000 10000 --output buffer_benchmark.json
+    Compare the results of two commits:
+        python -m ding.data.buffer.benchmark --compare old.json new.json --threshold 0.1
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from easydict import EasyDict
+from ditk import logging
+import numpy as np
+import torch
+
+from ding.data.buffer import DequeBuffer, ColumnarBuffer, ShardedBuffer
+from ding.data.buffer.middleware import clone_object, use_time_check, staleness_check, padding, \
+    PriorityExperienceReplay, FrameDeduplication, Compression
+
+# The observation shape and dtype of each payload, image payloads are stacked frames of rolling episodes.
+PAYLOADS = {
+    'vector': ((64, ), np.float32),
+    'image': ((4, 84, 84), np.uint8),
+}
+NUM_ENVS = 8
+EPISODE_LEN = 100
+_legacy_buffer_count = itertools.count()
+
+
+class _NewBuffer:
+    """
+    Overview:
+        Run the benchmark operations on the buffers in ``ding.data.buffer``.
+    """
+
+    def __init__(
+        self, buffer, priority: bool = False, meta: Optional[dict] = None, sample_kwargs: Optional[dict] = None
+    ):
+        self.buffer = buffer
+        self.priority = priority
+        self.meta = meta or {}
+        self.sample_kwargs = sample_kwargs or {}
+
+    def push(self, data: Dict, env_id: int) -> None:
+        self.buffer.push(data, meta={'env': env_id, **self.meta})
+
+    def sample(self, batch_size: int) -> List:
+        return self.buffer.sample(size=batch_size, **self.sample_kwargs)
+
+    def update_priority(self, sampled: List, priority: List[float]) -> Optional[bool]:
+        if not self.priority:
+            return None
+        meta = [dict(item.meta, priority=p) for item, p in zip(sampled, priority)]
+        self.buffer.update(index=[item.index for item in sampled], data=None, meta=meta)
+        return True
+
+    def group_sample(self, batch_size: int, unroll_len: int) -> Optional[List]:
+        if self.priority:
+            # Prioritized sampling is by records, not by groups.
+            return None
+        return self.buffer.sample(
+            size=batch_size, groupby='env', unroll_len=unroll_len, replace=True, **self.sample_kwargs
+        )
+
+    def count(self) -> int:
+        return self.buffer.count()
+
+    def close(self) -> None:
+        for m in self.buffer._middleware:
+            if isinstance(m, Compression):
+                m.close()
+
+
+class _LegacyBuffer:
+    """
+    Overview:
+        Run the benchmark operations on the buffers in ``ding.worker.replay_buffer``. Each element of \
+        ``EpisodeReplayBuffer`` is an episode, so the transitions are pushed when the episode is done, and a batch \
+        of episodes is sampled.
+    """
+
+    def __init__(self, buffer_type: str, size: int, exp_name: str):
+        from ding.worker.replay_buffer import NaiveReplayBuffer, AdvancedReplayBuffer, EpisodeReplayBuffer
+        from ding.utils import deep_merge_dicts
+        buffer_cls = {'naive': NaiveReplayBuffer, 'advanced': AdvancedReplayBuffer, 'episode': EpisodeReplayBuffer}
+        self.buffer_type = buffer_type
+        self.episodic = buffer_type == 'episode'
+        if self.episodic:
+            size = max(1, size // EPISODE_LEN)
+        buffer_cls = buffer_cls[buffer_type]
+        cfg = deep_merge_dicts(buffer_cls.default_config(), EasyDict(dict(replay_buffer_size=size)))
+        instance_name = 'benchmark_{}_{}'.format(buffer_type, next(_legacy_buffer_count))
+        self.buffer = buffer_cls(cfg, exp_name=exp_name, instance_name=instance_name)
+        # Mute the periodic prints of sampled data attributes.
+        logging.getLogger(instance_name + '_logger').disabled = True
+        self.episodes = [[] for _ in range(NUM_ENVS)]
+
+    def push(self, data: Dict, env_id: int) -> None:
+        if not self.episodic:
+            self.buffer.push(data, 0)
+            return
+        self.episodes[env_id].append(data)
+        if len(self.episodes[env_id]) == EPISODE_LEN:
+            self.buffer.push([self.episodes[env_id]], 0)
+            self.episodes[env_id] = []
+
+    def sample(self, batch_size: int) -> List:
+        return self.buffer.sample(batch_size, 0, replace=True) if self.episodic else self.buffer.sample(batch_size, 0)
+
+    def update_priority(self, sampled: List, priority: List[float]) -> Optional[bool]:
+        if self.buffer_type != 'advanced':
+            return None
+        self.buffer.update(
+            {
+                'replay_unique_id': [d['replay_unique_id'] for d in sampled],
+                'replay_buffer_idx': [d['replay_buffer_idx'] for d in sampled],
+                'priority': priority,
+            }
+        )
+        return True
+
+    def group_sample(self, batch_size: int, unroll_len: int) -> Optional[List]:
+        if not self.episodic:
+            return None
+        result = []
+        for episode in self.buffer.sample(batch_size, 0, replace=True):
+            start = np.random.randint(len(episode) - unroll_len + 1)
+            result.append(episode[start:start + unroll_len])
+        return result
+
+    def count(self) -> int:
+        return self.buffer.count() * EPISODE_LEN if self.episodic else self.buffer.count()
+
+    def close(self) -> None:
+        self.buffer.close()
+
+
+def _deque_with(*middleware_fns: Callable) -> Callable:
+
+    def _create(size: int) -> _NewBuffer:
+        buffer = DequeBuffer(size=size)
+        priority = False
+        for fn in middleware_fns:
+            m = fn(buffer)
+            buffer.use(m)
+            priority = priority or isinstance(m, PriorityExperienceReplay)
+        return _NewBuffer(buffer, priority=priority)
+
+    return _create
+
+
+def _create_staleness_check(size: int) -> _NewBuffer:
+    buffer = DequeBuffer(size=size)
+    buffer.use(staleness_check(buffer))
+    return _NewBuffer(buffer, meta={'train_iter_data_collected': 0}, sample_kwargs={'train_iter_sample_data': 0})
+
+
+def _create_sharded(size: int, priority: bool = False) -> _NewBuffer:
+    return _NewBuffer(ShardedBuffer(size=size, num_shards=4, shard_key='env', priority=priority), priority=priority)
+
+
+# Create the buffer to benchmark by the name, and the payloads it supports (all the payloads if None).
+BUFFERS = {
+    'deque': (_deque_with(), None),
+    'deque+clone_object': (_deque_with(lambda b: clone_object()), None),
+    'deque+use_time_check': (_deque_with(lambda b: use_time_check(b, max_use=float('inf'))), None),
+    'deque+staleness_check': (_create_staleness_check, None),
+    'deque+padding': (_deque_with(lambda b: padding()), None),
+    'deque+priority': (_deque_with(lambda b: PriorityExperienceReplay(b)), None),
+    'deque+frame_deduplication': (_deque_with(lambda b: FrameDeduplication(b)), ['image']),
+    'deque+compression': (_deque_with(lambda b: Compression(codec='lz4')), None),
+    'columnar': (lambda size: _NewBuffer(ColumnarBuffer(size=size)), None),
+    'sharded': (_create_sharded, None),
+    'sharded+priority': (lambda size: _create_sharded(size, priority=True), None),
+    'naive': (None, None),
+    'advanced': (None, None),
+    'episode': (None, None),
+}
+LEGACY_BUFFERS = ['naive', 'advanced', 'episode']
+
+
+def generate_transitions(payload: str, num: int) -> Iterator[Tuple[Dict, int]]:
+    """
+    Overview:
+        Generate the transitions and their env ids, the envs are stepped in turn. For image payloads, the \
+        observations are frame stacks which share frames with the neighbouring transitions in the same episode.
+    """
+    shape, dtype = PAYLOADS[payload]
+    stacks = [None] * NUM_ENVS
+    for i in range(num):
+        env_id = i % NUM_ENVS
+        step = (i // NUM_ENVS) % EPISODE_LEN
+
+        def new_frame():
+            if dtype == np.uint8:
+                return np.random.randint(0, 255, size=shape[1:], dtype=dtype)
+            return np.random.rand(*shape[1:]).astype(dtype)
+
+        if len(shape) > 1:
+            if step == 0:
+                stacks[env_id] = [new_frame()] * shape[0]
+            obs = np.stack(stacks[env_id])
+            stacks[env_id] = stacks[env_id][1:] + [new_frame()]
+            next_obs = np.stack(stacks[env_id])
+        else:
+            obs, next_obs = np.random.rand(*shape).astype(dtype), np.random.rand(*shape).astype(dtype)
+        yield {
+            'obs': obs,
+            'next_obs': next_obs,
+            'action': np.random.randint(0, 6, size=(1, )),
+            'reward': np.random.rand(1).astype(np.float32),
+            'done': step == EPISODE_LEN - 1,
+        }, env_id
+
+
+def _create_buffer(name: str, size: int, exp_name: str) -> Any:
+    if name in LEGACY_BUFFERS:
+        return _LegacyBuffer(name, size, exp_name)
+    return BUFFERS[name][0](size)
+
+
+def _percentiles(costs: List[float]) -> Dict[str, float]:
+    costs = np.array(costs) * 1000
+    return {
+        'mean': float(np.mean(costs)),
+        'p50': float(np.percentile(costs, 50)),
+        'p90': float(np.percentile(costs, 90)),
+        'p99': float(np.percentile(costs, 99)),
+    }
+
+
+def _timeit(fn: Callable, iterations: int) -> Optional[Dict[str, float]]:
+    costs = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        result = fn()
+        costs.append(time.perf_counter() - start)
+        if result is None:
+            return None
+    return _percentiles(costs)
+
+
+def benchmark_buffer(
+        name: str,
+        size: int,
+        payload: str,
+        batch_size: int = 64,
+        unroll_len: int = 16,
+        iterations: int = 100,
+        memory: bool = True,
+        exp_name: str = 'buffer_benchmark'
+) -> Dict[str, Any]:
+    """
+    Overview:
+        Benchmark a buffer with the given size and payload.
+    Arguments:
+        - name (:obj:`str`): The name of buffer in ``BUFFERS``.
+        - size (:obj:`int`): The buffer size in transitions.
+        - payload (:obj:`str`): The name of payload in ``PAYLOADS``.
+        - batch_size (:obj:`int`): The batch size of sampling and updating.
+        - unroll_len (:obj:`int`): The unroll length of group sampling.
+        - iterations (:obj:`int`): The number of sample and update calls to measure the latency percentiles.
+        - memory (:obj:`bool`): Whether to measure the memory per transition, which fills another buffer with \
+            ``tracemalloc`` on. Note that the memory allocated by torch is invisible to ``tracemalloc``.
+        - exp_name (:obj:`str`): The directory of the logs of the buffers in ``ding.worker.replay_buffer``, \
+            relative to the working directory.
+    Returns:
+        - result (:obj:`Dict[str, Any]`): The result, the metric is None if the buffer doesn't support it.
+    """
+    result = {'buffer': name, 'size': size, 'payload': payload}
+    buffer = _create_buffer(name, size, exp_name)
+    try:
+        transitions = list(generate_transitions(payload, size))
+        start = time.perf_counter()
+        for data, env_id in transitions:
+            buffer.push(data, env_id)
+        result['push_per_second'] = len(transitions) / (time.perf_counter() - start)
+        del transitions
+
+        result['sample_ms'] = _timeit(lambda: buffer.sample(batch_size), iterations)
+        sampled = [buffer.sample(batch_size) for _ in range(iterations)]
+        priority = np.random.rand(batch_size).tolist()
+        costs = []
+        for batch in sampled:
+            start = time.perf_counter()
+            updated = buffer.update_priority(batch, priority)
+            costs.append(time.perf_counter() - start)
+        result['priority_update_ms'] = _percentiles(costs) if updated else None
+        result['group_sample_ms'] = _timeit(lambda: buffer.group_sample(batch_size, unroll_len), iterations)
+    finally:
+        buffer.close()
+
+    result['memory_bytes_per_transition'] = None
+    if memory:
+        tracemalloc.start()
+        try:
+            buffer = _create_buffer(name, size, exp_name)
+            before = tracemalloc.get_traced_memory()[0]
+            for data, env_id in generate_transitions(payload, size):
+                buffer.push(data, env_id)
+            result['memory_bytes_per_transition'] = (tracemalloc.get_traced_memory()[0] - before) / size
+            buffer.close()
+            del buffer
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def run(
+        buffers: List[str],
+        sizes: List[int],
+        payloads: List[str],
+        batch_size: int = 64,
+        unroll_len: int = 16,
+        iterations: int = 100,
+        memory: bool = True,
+        seed: int = 0
+) -> Dict[str, Any]:
+    """
+    Overview:
+        Benchmark each combination of the buffers, sizes and payloads.
+    Returns:
+        - report (:obj:`Dict[str, Any]`): The environment and arguments in ``meta``, and the list of ``results``.
+    """
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+    results = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        # The buffers in ``ding.worker.replay_buffer`` write logs into ``./{exp_name}/log`` relative to the
+        # working directory, so run in the temporary directory to leave no files behind.
+        os.chdir(tmpdir)
+        try:
+            for name in buffers:
+                supported_payloads = BUFFERS[name][1]
+                for payload in payloads:
+                    if supported_payloads is not None and payload not in supported_payloads:
+                        continue
+                    for size in sizes:
+                        result = benchmark_buffer(
+                            name, size, payload, batch_size, unroll_len, iterations, memory=memory
+                        )
+                        print(_format_result(result))
+                        results.append(result)
+        finally:
+            os.chdir(cwd)
+    meta = {
+        'commit': _git_commit(),
+        'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'torch': torch.__version__,
+        'platform': platform.platform(),
+        'args': {
+            'buffers': buffers,
+            'sizes': sizes,
+            'payloads': payloads,
+            'batch_size': batch_size,
+            'unroll_len': unroll_len,
+            'iterations': iterations,
+            'seed': seed,
+        },
+    }
+    return {'meta': meta, 'results': results}
+
+
+def compare(old: Dict[str, Any], new: Dict[str, Any], threshold: float = 0.1) -> List[Dict[str, Any]]:
+    """
+    Overview:
+        Compare the results of two runs, the metrics are matched by buffer, size and payload.
+    Arguments:
+        - old (:obj:`Dict[str, Any]`): The baseline report of ``run``.
+        - new (:obj:`Dict[str, Any]`): The new report of ``run``.
+        - threshold (:obj:`float`): The relative change regarded as regression.
+    Returns:
+        - diffs (:obj:`List[Dict[str, Any]]`): The change of each metric, with ``regression`` flag.
+    """
+    old_results = {(r['buffer'], r['size'], r['payload']): _flatten(r) for r in old['results']}
+    diffs = []
+    for r in new['results']:
+        key = (r['buffer'], r['size'], r['payload'])
+        if key not in old_results:
+            continue
+        for metric, value in _flatten(r).items():
+            old_value = old_results[key].get(metric)
+            if value is None or old_value is None or old_value == 0:
+                continue
+            change = (value - old_value) / old_value
+            # Throughput is better when higher, latency and memory are better when lower.
+            worse = -change if metric.endswith('per_second') else change
+            diffs.append(
+                {
+                    'buffer': key[0],
+                    'size': key[1],
+                    'payload': key[2],
+                    'metric': metric,
+                    'old': old_value,
+                    'new': value,
+                    'change': change,
+                    'regression': worse > threshold,
+                }
+            )
+    return diffs
+
+
+def _flatten(result: Dict[str, Any]) -> Dict[str, Optional[float]]:
+    flat = {}
+    for k, v in result.items():
+        if k in ['buffer', 'size', 'payload']:
+            continue
+        if isinstance(v, dict):
+            flat.update({'{}.{}'.format(k, sub_k): sub_v for sub_k, sub_v in v.items()})
+        else:
+            flat[k] = v
+    return flat
+
+
+def _format_result(result: Dict[str, Any]) -> str:
+
+    def fmt(v):
+        return 'n/a' if v is None else '{:.3f}'.format(v)
+
+    sample, update, group = result['sample_ms'], result['priority_update_ms'], result['group_sample_ms']
+    return '{:<28} size {:<8} {:<7} push/s {:>10.0f}  sample p50/p99 {}/{} ms  update p50 {} ms  ' \
+        'group p50 {} ms  memory {} B'.format(
+            result['buffer'], result['size'], result['payload'], result['push_per_second'],
+            fmt(sample and sample['p50']), fmt(sample and sample['p99']), fmt(update and update['p50']),
+            fmt(group and group['p50']), fmt(result['memory_bytes_per_transition'])
+        )
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)), stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmark the replay buffers.')
+    parser.add_argument('--buffers', nargs='+', default=list(BUFFERS.keys()), choices=list(BUFFERS.keys()))
+    parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 10000])
+    parser.add_argument('--payloads', nargs='+', default=list(PAYLOADS.keys()), choices=list(PAYLOADS.keys()))
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--unroll-len', type=int, default=16)
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--no-memory', action='store_true', help='Skip measuring the memory per transition.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='buffer_benchmark.json')
+    parser.add_argument(
+        '--compare', nargs=2, metavar=('OLD', 'NEW'), help='Compare two json files instead of running benchmark.'
+    )
+    parser.add_argument('--threshold', type=float, default=0.1, help='The relative change regarded as regression.')
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            old = json.load(f)
+        with open(args.compare[1]) as f:
+            new = json.load(f)
+        diffs = compare(old, new, args.threshold)
+        for d in diffs:
+            print(
+                '{:<3} {:<28} size {:<8} {:<7} {:<32} {:>12.4f} -> {:>12.4f} ({:+.1%})'.format(
+                    '!!' if d['regression'] else '', d['buffer'], d['size'], d['payload'], d['metric'], d['old'],
+                    d['new'], d['change']
+                )
+            )
+        regressions = sum(d['regression'] for d in diffs)
+        print('{} regressions in {} metrics'.format(regressions, len(diffs)))
+        return 1 if regressions > 0 else 0
+
+    report = run(
+        args.buffers,
+        args.sizes,
+        args.payloads,
+        batch_size=args.batch_size,
+        unroll_len=args.unroll_len,
+        iterations=args.iterations,
+        memory=not args.no_memory,
+        seed=args.seed
+    )
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print('Saved to {}'.format(args.output))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
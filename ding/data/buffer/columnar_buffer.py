@@ -0,0 +1,623 @@
+import os
+import random
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from ditk import logging
+import hickle
+import numpy as np
+import torch
+from treevalue import TreeValue
+from ding.data.buffer import Buffer, apply_middleware, BufferedData
+from ding.utils import fastcopy
+
+
+@dataclass
+class ColumnSpec:
+    """
+    Overview:
+        The description of one leaf field of the transition schema.
+    Properties:
+        - kind (:obj:`str`): One of ``torch``, ``numpy``, ``scalar`` (python or numpy scalar) and ``object``.
+        - shape (:obj:`Tuple[int, ...]`): The shape of one item, the leading ``size`` dim is not included.
+        - dtype (:obj:`Any`): The torch or numpy dtype of the column, ``None`` for object columns.
+        - device (:obj:`Optional[torch.device]`): The device of torch columns.
+        - python (:obj:`bool`): Whether the scalar should be converted back to a python scalar on sampling. \
+            The dtype of python scalars is promoted when a wider value is written, e.g. a ``float`` reward is \
+            written after the ``int`` reward of the first data.
+    """
+    kind: str
+    shape: Tuple[int, ...] = ()
+    dtype: Any = None
+    device: Optional[torch.device] = None
+    python: bool = False
+
+
+def _flatten(data: Any, prefix: Tuple = ()) -> Iterator[Tuple[Tuple, Any]]:
+    if isinstance(data, (dict, TreeValue)):
+        for k in data.keys():
+            yield from _flatten(data[k], prefix + (k, ))
+    else:
+        yield prefix, data
+
+
+def _structure(data: Any) -> Optional[Tuple[type, Dict]]:
+    if isinstance(data, (dict, TreeValue)):
+        return type(data), {k: _structure(data[k]) for k in data.keys()}
+    return None
+
+
+def _unflatten(structure: Optional[Tuple[type, Dict]], values: Dict[Tuple, Any], prefix: Tuple = ()) -> Any:
+    if structure is None:
+        return values[prefix]
+    cls, children = structure
+    return cls({k: _unflatten(sub, values, prefix + (k, )) for k, sub in children.items()})
+
+
+def _unflatten_rows(structure: Optional[Tuple[type, Dict]], rows: Dict[Tuple, List], prefix: Tuple = ()) -> List:
+    # Build the whole batch node by node, rather than rebuilding the structure row by row.
+    if structure is None:
+        return rows[prefix]
+    cls, children = structure
+    keys = list(children.keys())
+    child_rows = [_unflatten_rows(children[k], rows, prefix + (k, )) for k in keys]
+    return [cls(dict(zip(keys, values))) for values in zip(*child_rows)]
+
+
+class ColumnarStorage:
+    """
+    Overview:
+        The storage of ``ColumnarBuffer``. The schema of the data is learned on the first push, then each leaf field \
+        is kept in a preallocated ring array with ``size`` rows, e.g. a ``(size, 4, 84, 84)`` uint8 tensor for \
+        the ``obs`` of atari. Meta information is kept in a parallel list.
+        Each pushed item gets an increasing integer id, its slot in the ring is ``id % size``, an id is valid only \
+        if the slot still holds it, so an overwritten or deleted item can be detected in O(1).
+        The storage is iterable and yields ``BufferedData`` from the oldest to the newest item, so the middleware \
+        which walks through ``buffer.storage`` can work with it as with a deque.
+    Interfaces:
+        ``__init__``, ``append``, ``write``, ``set_meta``, ``gather``, ``slot_of``, ``ordered_slots``, ``clear``, \
+        ``nbytes``
+    """
+
+    def __init__(self, size: int) -> None:
+        """
+        Arguments:
+            - size (:obj:`int`): The number of rows of every column.
+        """
+        self.size = size
+        self.learned = False
+        self.structure = None
+        self.specs: Dict[Tuple, ColumnSpec] = {}
+        self.columns: Dict[Tuple, Any] = {}
+        # Id of the item in each slot, -1 means empty or deleted.
+        self.ids = np.full(size, -1, dtype=np.int64)
+        self.meta: List[Optional[dict]] = [None] * size
+        self.next_id = 0
+        self.valid_count = 0
+
+    def _infer_spec(self, value: Any) -> ColumnSpec:
+        if isinstance(value, torch.Tensor):
+            return ColumnSpec(kind='torch', shape=tuple(value.shape), dtype=value.dtype, device=value.device)
+        elif isinstance(value, np.ndarray) and value.dtype != object:
+            return ColumnSpec(kind='numpy', shape=value.shape, dtype=value.dtype)
+        elif isinstance(value, np.generic):
+            return ColumnSpec(kind='scalar', dtype=value.dtype)
+        elif isinstance(value, (bool, int, float)):
+            return ColumnSpec(kind='scalar', dtype=np.asarray(value).dtype, python=True)
+        else:
+            return ColumnSpec(kind='object')
+
+    def _allocate(self, path: Tuple, spec: ColumnSpec) -> Any:
+        """
+        Overview:
+            Allocate a column with ``size`` rows, subclasses can override this method to change the backend.
+        """
+        if spec.kind == 'torch':
+            return torch.zeros((self.size, *spec.shape), dtype=spec.dtype, device=spec.device)
+        elif spec.kind in ['numpy', 'scalar']:
+            return np.zeros((self.size, *spec.shape), dtype=spec.dtype)
+        else:
+            return [None] * self.size
+
+    def _learn_schema(self, data: Any) -> None:
+        self.learned = True
+        self.structure = _structure(data)
+        for path, value in _flatten(data):
+            spec = self._infer_spec(value)
+            self.specs[path] = spec
+            self.columns[path] = self._allocate(path, spec)
+
+    def write(self, slot: int, data: Any) -> None:
+        """
+        Overview:
+            Write every leaf field of ``data`` into the given slot.
+        """
+        leaves = dict(_flatten(data))
+        if leaves.keys() != self.specs.keys():
+            raise ValueError(
+                "Data fields {} don't match the buffer schema {}".format(list(leaves.keys()), list(self.specs.keys()))
+            )
+        # Check all the fields before writing any of them, otherwise a rejected data corrupts the item in the slot.
+        promotions = {}
+        for path, value in leaves.items():
+            spec = self.specs[path]
+            if spec.kind in ['torch', 'numpy']:
+                if tuple(value.shape) != spec.shape:
+                    raise ValueError(
+                        "Shape of field {} should be {}, but got {}".format(path, spec.shape, tuple(value.shape))
+                    )
+                if not self._can_cast(spec, value):
+                    raise ValueError("Dtype of field {} should be {}, but got {}".format(path, spec.dtype, value.dtype))
+            if spec.python:
+                dtype = np.asarray(value).dtype
+                if dtype.kind in 'biuf' and not np.can_cast(dtype, spec.dtype):
+                    promotions[path] = np.result_type(spec.dtype, dtype)
+        for path, dtype in promotions.items():
+            self._promote(path, dtype)
+        for path, value in leaves.items():
+            self.columns[path][slot] = value
+
+    @staticmethod
+    def _can_cast(spec: ColumnSpec, value: Any) -> bool:
+        # The values of the same kind (e.g. float64 into float32 column) are cast, but not float into integer.
+        dtype = getattr(value, 'dtype', None)
+        if spec.kind == 'torch' and isinstance(dtype, torch.dtype):
+            return torch.can_cast(dtype, spec.dtype)
+        elif spec.kind == 'numpy' and isinstance(dtype, np.dtype):
+            return np.can_cast(dtype, spec.dtype, casting='same_kind')
+        return True
+
+    def _promote(self, path: Tuple, dtype: np.dtype) -> None:
+        """
+        Overview:
+            Change the dtype of a scalar column and keep its values, subclasses should override this method \
+            if the column can't be replaced by a new one.
+        """
+        self.specs[path].dtype = dtype
+        self.columns[path] = self.columns[path].astype(dtype)
+
+    def append(self, data: Any, meta: dict) -> int:
+        """
+        Overview:
+            Append data into the ring, the oldest item will be overwritten when the storage is full.
+        Returns:
+            - index (:obj:`int`): The id of the appended item.
+        """
+        if not self.learned:
+            self._learn_schema(data)
+        index = self.next_id
+        slot = index % self.size
+        self.write(slot, data)
+        if self.ids[slot] < 0:
+            self.valid_count += 1
+        self.ids[slot] = index
+        self.meta[slot] = meta
+        self.next_id += 1
+        return index
+
+    def set_meta(self, slot: int, meta: dict) -> None:
+        self.meta[slot] = meta
+
+    def slot_of(self, index: int) -> Optional[int]:
+        """
+        Overview:
+            Get the slot of an item id, return ``None`` if the item is overwritten or deleted.
+        """
+        if not isinstance(index, (int, np.integer)) or index < 0:
+            return None
+        slot = index % self.size
+        return slot if self.ids[slot] == index else None
+
+    def delete(self, slot: int) -> None:
+        """
+        Overview:
+            Mark the slot as deleted, the row is reclaimed when the ring comes back to it.
+        """
+        if self.ids[slot] >= 0:
+            self.ids[slot] = -1
+            self.meta[slot] = None
+            self.valid_count -= 1
+
+    def ordered_slots(self) -> np.ndarray:
+        """
+        Overview:
+            Return the slots of valid items from the oldest to the newest.
+        """
+        if self.next_id <= self.size:
+            slots = np.arange(self.next_id)
+        else:
+            head = self.next_id % self.size
+            slots = np.concatenate([np.arange(head, self.size), np.arange(head)])
+        if self.valid_count != len(slots):
+            slots = slots[self.ids[slots] >= 0]
+        return slots
+
+    def position_to_slot(self, positions: np.ndarray) -> np.ndarray:
+        """
+        Overview:
+            Map positions in ``[0, count)`` (from the oldest to the newest) to slots.
+        """
+        if self.valid_count != min(self.next_id, self.size):
+            return self.ordered_slots()[positions]
+        start = self.next_id % self.size if self.next_id > self.size else 0
+        return (positions + start) % self.size
+
+    def _take(self, path: Tuple, slots: np.ndarray) -> Any:
+        """
+        Overview:
+            Gather the rows of one column into a new batch, subclasses can override this method to change the backend.
+        """
+        spec, column = self.specs[path], self.columns[path]
+        if spec.kind == 'torch':
+            return column[torch.from_numpy(slots).to(column.device)]
+        elif spec.kind in ['numpy', 'scalar']:
+            return column[slots]
+        else:
+            return [column[slot] for slot in slots.tolist()]
+
+    def _gather_column(self, path: Tuple, slots: np.ndarray) -> List[Any]:
+        spec, batch = self.specs[path], self._take(path, slots)
+        if spec.kind == 'torch':
+            return batch.unbind(0)
+        elif spec.kind == 'object':
+            return batch
+        elif spec.python:
+            return batch.tolist()
+        else:
+            return list(batch)
+
+    def gather(self, slots: np.ndarray) -> List[Any]:
+        """
+        Overview:
+            Gather data in slots by one fancy-index per column, each returned item is made up of \
+            the views of the rows in the gathered batch, so they don't share memory with the storage.
+        """
+        slots = np.asarray(slots, dtype=np.int64)
+        rows = {path: self._gather_column(path, slots) for path in self.specs}
+        return _unflatten_rows(self.structure, rows)
+
+    def read(self, slot: int) -> Any:
+        """
+        Overview:
+            Read one item from the storage, which shares memory with the storage.
+        """
+        return _unflatten(self.structure, {path: self._read_value(path, slot) for path in self.specs})
+
+    def _read_value(self, path: Tuple, slot: int) -> Any:
+        value = self.columns[path][slot]
+        return value.item() if self.specs[path].python else value
+
+    def clear(self) -> None:
+        self.ids[:] = -1
+        self.meta = [None] * self.size
+        self.next_id = 0
+        self.valid_count = 0
+        for path, spec in self.specs.items():
+            if spec.kind == 'object':
+                self.columns[path] = [None] * self.size
+
+    def nbytes(self) -> int:
+        """
+        Overview:
+            The memory held by the preallocated columns, object columns only count their pointers.
+        """
+        total = self.ids.nbytes
+        for column in self.columns.values():
+            if isinstance(column, torch.Tensor):
+                total += column.element_size() * column.nelement()
+            elif isinstance(column, list):
+                total += 8 * len(column)
+            else:
+                total += column.nbytes
+        return total
+
+    def state_dict(self) -> Dict[str, Any]:
+        return {
+            'learned': self.learned,
+            'structure': self.structure,
+            'specs': self.specs,
+            'columns': self.columns,
+            'ids': self.ids,
+            'meta': self.meta,
+            'next_id': self.next_id,
+            'valid_count': self.valid_count,
+        }
+
+    def load_state_dict(self, state_dict: Dict[str, Any]) -> None:
+        for k, v in state_dict.items():
+            setattr(self, k, v)
+
+    def __len__(self) -> int:
+        return self.valid_count
+
+    def __iter__(self) -> Iterator[BufferedData]:
+        for slot in self.ordered_slots().tolist():
+            yield BufferedData(data=self.read(slot), index=int(self.ids[slot]), meta=self.meta[slot])
+
+    def __getitem__(self, idx: int) -> BufferedData:
+        if not -self.valid_count <= idx < self.valid_count:
+            raise IndexError("storage index out of range")
+        slot = int(self.position_to_slot(np.array([idx % self.valid_count]))[0])
+        return BufferedData(data=self.read(slot), index=int(self.ids[slot]), meta=self.meta[slot])
+
+
+class ColumnarBuffer(Buffer):
+    """
+    Overview:
+        A buffer implementation based on preallocated columns, which has the same interfaces as ``DequeBuffer``.
+        Instead of keeping millions of small python objects, each field of the data is kept in one ring array, \
+        and sampling is a fancy-index gather per field. It suits the data with a fixed schema, e.g. transitions.
+        The index of the data is an integer rather than a uuid string. Deleted data leave tombstones in the ring, \
+        so the capacity they occupied is reclaimed when the ring wraps around.
+    """
+
+    def __init__(self, size: int, sliced: bool = False) -> None:
+        """
+        Overview:
+            The initialization method of ColumnarBuffer.
+        Arguments:
+            - size (:obj:`int`): The maximum number of objects that the buffer can hold.
+            - sliced (:obj:`bool`): The flag whether slice data by unroll_len when sample by group
+        """
+        super().__init__(size=size)
+        self.storage = self._create_storage(size)
+        self.sliced = sliced
+
+    def _create_storage(self, size: int) -> ColumnarStorage:
+        return ColumnarStorage(size)
+
+    @apply_middleware("push")
+    def push(self, data: Any, meta: Optional[dict] = None) -> BufferedData:
+        """
+        Overview:
+            The method that input the objects and the related meta information into the buffer.
+        Arguments:
+            - data (:obj:`Any`): The input object, usually a dict (or treetensor) of tensors, arrays and scalars, \
+                the schema of the first pushed data will be used for all of the data.
+            - meta (:obj:`Optional[dict]`): A dict that helps describe data, such as\
+                category, label, priority, etc. Default to ``None``.
+        """
+        if meta is None:
+            meta = {}
+        index = self.storage.append(data, meta)
+        return BufferedData(data=data, index=index, meta=meta)
+
+    @apply_middleware("sample")
+    def sample(
+            self,
+            size: Optional[int] = None,
+            indices: Optional[List[int]] = None,
+            replace: bool = False,
+            sample_range: Optional[slice] = None,
+            ignore_insufficient: bool = False,
+            groupby: Optional[str] = None,
+            unroll_len: Optional[int] = None
+    ) -> Union[List[BufferedData], List[List[BufferedData]]]:
+        """
+        Overview:
+            The method that randomly sample data from the buffer or retrieve certain data by indices. \
+            The arguments are the same as ``DequeBuffer.sample``.
+        Returns:
+            - sampled_data (Union[List[BufferedData], List[List[BufferedData]]]): The sampling result, \
+                the data of each record are views of one gathered batch.
+        """
+        # Size and indices
+        assert size or indices, "One of size and indices must not be empty."
+        if (size and indices) and (size != len(indices)):
+            raise AssertionError("Size and indices length must be equal.")
+        if not size:
+            size = len(indices)
+        # Indices and groupby
+        assert not (indices and groupby), "Cannot use groupby and indicex at the same time."
+        # Groupby and unroll_len
+        assert not unroll_len or (
+            unroll_len and groupby
+        ), "Parameter unroll_len needs to be used in conjunction with groupby."
+
+        value_error = None
+        sampled_data = []
+        if indices:
+            slots = []
+            for index in indices:
+                slot = self.storage.slot_of(index)
+                if slot is None:
+                    raise KeyError(index)
+                slots.append(slot)
+            sampled_data = self._gather(np.array(slots, dtype=np.int64))
+        elif groupby:
+            slots = self._slots_in_range(sample_range)
+            sampled_data = self._sample_by_group(
+                size=size, groupby=groupby, replace=replace, unroll_len=unroll_len, slots=slots
+            )
+        else:
+            if sample_range:
+                candidates = self._slots_in_range(sample_range)
+                count = len(candidates)
+            else:
+                count = self.storage.valid_count
+            try:
+                if replace:
+                    positions = random.choices(range(count), k=size) if count > 0 else []
+                else:
+                    positions = random.sample(range(count), k=size)
+            except ValueError as e:
+                value_error = e
+            else:
+                positions = np.array(positions, dtype=np.int64)
+                if sample_range:
+                    slots = candidates[positions]
+                else:
+                    slots = self.storage.position_to_slot(positions)
+                sampled_data = self._gather(slots)
+
+        if value_error or len(sampled_data) != size:
+            if ignore_insufficient:
+                logging.warning(
+                    "Sample operation is ignored due to data insufficient, current buffer is {} while sample is {}".
+                    format(self.count(), size)
+                )
+            else:
+                raise ValueError("There are less than {} records/groups in buffer({})".format(size, self.count()))
+
+        return sampled_data
+
+    @apply_middleware("update")
+    def update(self, index: int, data: Optional[Any] = None, meta: Optional[dict] = None) -> bool:
+        """
+        Overview:
+            the method that update data and the related meta information with a certain index.
+        Arguments:
+            - data (:obj:`Any`): The data which is supposed to replace the old one. If you set it\
+                to ``None``, nothing will happen to the old record.
+            - meta (:obj:`Optional[dict]`): The new dict which is supposed to replace the old one.
+        """
+        slot = self.storage.slot_of(index)
+        if slot is None:
+            return False
+        if data is not None:
+            self.storage.write(slot, data)
+        if meta is not None:
+            self.storage.set_meta(slot, meta)
+        return True
+
+    @apply_middleware("delete")
+    def delete(self, indices: Union[int, Iterable[int]]) -> None:
+        """
+        Overview:
+            The method that delete the data and related meta information by specific indices.
+        Arguments:
+            - indices (Union[int, Iterable[int]]): Where the data to be cleared in the buffer.
+        """
+        if isinstance(indices, (int, np.integer)):
+            indices = [indices]
+        for index in indices:
+            slot = self.storage.slot_of(index)
+            if slot is not None:
+                self.storage.delete(slot)
+
+    def save_data(self, file_name: str):
+        if not os.path.exists(os.path.dirname(file_name)):
+            # If the folder for the specified file does not exist, it will be created.
+            if os.path.dirname(file_name) != "":
+                os.makedirs(os.path.dirname(file_name))
+        hickle.dump(py_obj=self.storage.state_dict(), file_obj=file_name)
+
+    def load_data(self, file_name: str):
+        self.storage.load_state_dict(hickle.load(file_name))
+
+    def count(self) -> int:
+        """
+        Overview:
+            The method that returns the current length of the buffer.
+        """
+        return self.storage.valid_count
+
+    def count_groups(self, groupby: str) -> int:
+        """
+        Overview:
+            The number of groups by the meta key ``groupby``.
+        """
+        meta = self.storage.meta
+        return len(set([meta[slot].get(groupby) for slot in self.storage.ordered_slots().tolist()]))
+
+    def get(self, idx: int) -> BufferedData:
+        """
+        Overview:
+            The method that returns the BufferedData object given a specific index.
+        """
+        return self.storage[idx]
+
+    @apply_middleware("clear")
+    def clear(self) -> None:
+        """
+        Overview:
+            The method that clear all data, indices, and the meta information in the buffer.
+        """
+        self.storage.clear()
+
+    def _slots_in_range(self, sample_range: Optional[slice] = None) -> np.ndarray:
+        slots = self.storage.ordered_slots()
+        if sample_range:
+            slots = slots[sample_range]
+        return slots
+
+    def _gather(self, slots: np.ndarray) -> List[BufferedData]:
+        data = self.storage.gather(slots)
+        storage_meta = self.storage.meta
+        slots, indices = slots.tolist(), self.storage.ids[slots].tolist()
+        meta = [storage_meta[slot] for slot in slots]
+        if len(set(slots)) != len(slots):
+            # Data are gathered into new memory, only the duplicated meta need to be copied.
+            occurred = set()
+            for i, slot in enumerate(slots):
+                if slot in occurred:
+                    meta[i] = fastcopy.copy(meta[i])
+                occurred.add(slot)
+        return [BufferedData(data=d, index=i, meta=m) for d, i, m in zip(data, indices, meta)]
+
+    def _sample_by_group(
+            self,
+            size: int,
+            groupby: str,
+            replace: bool = False,
+            unroll_len: Optional[int] = None,
+            slots: Optional[np.ndarray] = None
+    ) -> List[List[BufferedData]]:
+        """
+        Overview:
+            Sampling by `group` instead of records, the result will be a collection
+            of lists with a length of `size`, but the length of each list may be different from other lists.
+        """
+        if slots is None:
+            slots = self.storage.ordered_slots()
+        groups = defaultdict(list)
+        meta = self.storage.meta
+        for slot in slots.tolist():
+            groups[meta[slot].get(groupby)].append(slot)
+
+        if unroll_len and unroll_len > 1:
+            group_names = [key for key, group in groups.items() if len(group) >= unroll_len]
+            if len(group_names) == 0:
+                return []
+        else:
+            group_names = list(groups.keys())
+
+        if replace:
+            sampled_groups = random.choices(group_names, k=size)
+        else:
+            try:
+                sampled_groups = random.sample(group_names, k=size)
+            except ValueError:
+                raise ValueError("There are less than {} groups in buffer({} groups)".format(size, len(group_names)))
+
+        sampled_slots = []
+        for group in sampled_groups:
+            seq_slots = groups[group]
+            if unroll_len:
+                if self.sliced:
+                    start_indice = random.choice(range(max(1, len(seq_slots)))) // unroll_len
+                    if start_indice == (len(seq_slots) - 1) // unroll_len:
+                        seq_slots = seq_slots[-unroll_len:]
+                    else:
+                        seq_slots = seq_slots[start_indice * unroll_len:start_indice * unroll_len + unroll_len]
+                else:
+                    start_indice = random.choice(range(max(1, len(seq_slots) - unroll_len)))
+                    seq_slots = seq_slots[start_indice:start_indice + unroll_len]
+            sampled_slots.append(seq_slots)
+
+        # Gather all the groups at once, then split them back.
+        flat_data = self._gather(np.array(sum(sampled_slots, []), dtype=np.int64))
+        final_sampled_data, start = [], 0
+        for seq_slots in sampled_slots:
+            final_sampled_data.append(flat_data[start:start + len(seq_slots)])
+            start += len(seq_slots)
+        return final_sampled_data
+
+    def __iter__(self) -> Iterator[BufferedData]:
+        return iter(self.storage)
+
+    def __copy__(self) -> "ColumnarBuffer":
+        buffer = type(self).__new__(type(self))
+        buffer.__dict__.update(self.__dict__)
+        buffer._middleware = []
+        return buffer
@@ -1,4 +1,5 @@
 import os
+import bisect
 import itertools
 import random
 import uuid
@@ -15,19 +16,23 @@ from ding.torch_utils import get_null_data
 class BufferIndex():
     """
     Overview:
-        Save index string and offset in key value pair.
+        Save index string and its push id in key value pair, the offset of the index in the storage is \
+        the push id minus the id of the oldest record and the number of deleted records between them.
+        The deleted ids are kept in a sorted list, so appending, deleting and getting are all O(log N) \
+        instead of rebuilding the whole index.
     """
 
     def __init__(self, maxlen: int, *args, **kwargs):
         self.maxlen = maxlen
         self.__map = OrderedDict(*args, **kwargs)
-        self._last_key = next(reversed(self.__map)) if len(self) > 0 else None
-        self._cumlen = len(self.__map)
+        # The push ids of deleted records, which are newer than the oldest record in the index.
+        self._deleted = []
+        self._next_id = next(reversed(self.__map.values())) + 1 if len(self) > 0 else 0
 
     def get(self, key: str) -> int:
         value = self.__map[key]
-        value = value % self._cumlen + min(0, (self.maxlen - self._cumlen))
-        return value
+        oldest = next(iter(self.__map.values()))
+        return value - oldest - bisect.bisect_left(self._deleted, value)
 
     def __len__(self) -> int:
         return len(self.__map)
@@ -35,17 +40,175 @@ class BufferIndex():
     def has(self, key: str) -> bool:
         return key in self.__map
 
+    def push_id(self, key: str) -> int:
+        """
+        Overview:
+            The push id of the index, which increases with the push order and never changes.
+        """
+        return self.__map[key]
+
     def append(self, key: str):
-        self.__map[key] = self.__map[self._last_key] + 1 if self._last_key else 0
-        self._last_key = key
-        self._cumlen += 1
+        self.__map[key] = self._next_id
+        self._next_id += 1
         if len(self) > self.maxlen:
             self.__map.popitem(last=False)
+            self._prune()
+
+    def delete(self, key: str):
+        value = self.__map.pop(key)
+        if len(self) == 0:
+            self._deleted = []
+        else:
+            bisect.insort(self._deleted, value)
+            self._prune()
 
     def clear(self):
         self.__map = OrderedDict()
-        self._last_key = None
-        self._cumlen = 0
+        self._deleted = []
+        self._next_id = 0
+
+    def __setstate__(self, state: dict):
+        # Compatible with the index saved by older versions, whose values are already continuous offsets.
+        self.__dict__.update(state)
+        if '_deleted' not in state:
+            self._deleted = []
+            self._next_id = next(reversed(self.__map.values())) + 1 if len(self) > 0 else 0
+
+    def _prune(self):
+        # Deleted ids older than the oldest record no longer affect the offset.
+        if len(self._deleted) > 0 and len(self) > 0:
+            oldest = next(iter(self.__map.values()))
+            if self._deleted[0] < oldest:
+                del self._deleted[:bisect.bisect_left(self._deleted, oldest)]
+
+
+class _Group():
+    """
+    Overview:
+        The records of one group in push order, with their push ids. Records are removed from the head when \
+        evicted, so the removed head is skipped by an offset and compacted later, which keeps random access O(1).
+    """
+    __slots__ = ['ids', 'records', 'head']
+
+    def __init__(self):
+        self.ids = []
+        self.records = []
+        self.head = 0
+
+    def __len__(self) -> int:
+        return len(self.records) - self.head
+
+    def slice(self, start: int, stop: int) -> List[BufferedData]:
+        return self.records[self.head + start:self.head + stop]
+
+    def append(self, push_id: int, record: BufferedData):
+        if len(self.ids) > 0 and push_id < self.ids[-1]:
+            # Records moved from other groups by update are inserted by push order.
+            pos = bisect.bisect_left(self.ids, push_id, lo=self.head)
+            self.ids.insert(pos, push_id)
+            self.records.insert(pos, record)
+        else:
+            self.ids.append(push_id)
+            self.records.append(record)
+
+    def popleft(self):
+        self.ids[self.head] = self.records[self.head] = None
+        self.head += 1
+        if self.head > 64 and self.head * 2 > len(self.records):
+            del self.ids[:self.head]
+            del self.records[:self.head]
+            self.head = 0
+
+    def remove(self, push_id: int):
+        pos = bisect.bisect_left(self.ids, push_id, lo=self.head)
+        if pos == self.head:
+            self.popleft()
+        else:
+            del self.ids[pos]
+            del self.records[pos]
+
+
+class GroupIndex():
+    """
+    Overview:
+        The index of the records grouped by a meta key, which is updated incrementally on push, eviction, update \
+        and deletion, so sampling groups and the contiguous sequences in them is O(batch size) rather than \
+        scanning the whole buffer.
+    """
+
+    def __init__(self):
+        self.groups = {}
+        # The group names in a list for uniform sampling, and the position of each name in it.
+        self.names = []
+        self.name_pos = {}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def get(self, name: Any) -> _Group:
+        return self.groups[name]
+
+    def append(self, name: Any, push_id: int, record: BufferedData):
+        group = self.groups.get(name)
+        if group is None:
+            group = self.groups[name] = _Group()
+            self.name_pos[name] = len(self.names)
+            self.names.append(name)
+        group.append(push_id, record)
+
+    def popleft(self, name: Any):
+        group = self.groups[name]
+        group.popleft()
+        if len(group) == 0:
+            self._remove_group(name)
+
+    def remove(self, name: Any, push_id: int):
+        group = self.groups[name]
+        group.remove(push_id)
+        if len(group) == 0:
+            self._remove_group(name)
+
+    def sample(self, size: int, replace: bool = False, min_len: int = 1) -> List[Any]:
+        """
+        Overview:
+            Sample the names of the groups which have at least ``min_len`` records uniformly.
+        Arguments:
+            - size (:obj:`int`): The number of groups to sample.
+            - replace (:obj:`bool`): Whether the same group can be sampled more than once.
+            - min_len (:obj:`int`): The minimum number of records of the sampled groups.
+        Returns:
+            - names (:obj:`List[Any]`): The sampled names, empty if no group has enough records.
+        """
+        names = self.names
+        if min_len > 1 and len(names) > 0:
+            # Rejection sampling is O(size) when most groups have enough records, \
+            # otherwise fallback to filtering the groups.
+            sampled, chosen = [], set()
+            for _ in range(4 * size + 32):
+                name = names[random.randrange(len(names))]
+                if len(self.groups[name]) < min_len or (not replace and name in chosen):
+                    continue
+                chosen.add(name)
+                sampled.append(name)
+                if len(sampled) == size:
+                    return sampled
+            names = [name for name in names if len(self.groups[name]) >= min_len]
+        if len(names) == 0:
+            return []
+        if replace:
+            return random.choices(names, k=size)
+        try:
+            return random.sample(names, k=size)
+        except ValueError:
+            raise ValueError("There are less than {} groups in buffer({} groups)".format(size, len(names)))
+
+    def _remove_group(self, name: Any):
+        del self.groups[name]
+        pos = self.name_pos.pop(name)
+        last = self.names.pop()
+        if pos < len(self.names):
+            self.names[pos] = last
+            self.name_pos[last] = pos
 
 
 class DequeBuffer(Buffer):
@@ -68,6 +231,8 @@ class DequeBuffer(Buffer):
         self.sliced = sliced
         # Meta index is a dict which uses deque as values
         self.meta_index = {}
+        # Group index of each meta key in meta index, created when sampling by the key for the first time
+        self.group_index = {}
 
     @apply_middleware("push")
     def push(self, data: Any, meta: Optional[dict] = None) -> BufferedData:
@@ -135,7 +300,13 @@ class DequeBuffer(Buffer):
 
         value_error = None
         sampled_data = []
-        if indices:
+        if indices and not sample_range:
+            # Locate each record by the index, rather than scanning the whole storage.
+            for index in indices:
+                if not self.indices.has(index):
+                    raise KeyError(index)
+            sampled_data = [self.storage[self.indices.get(index)] for index in indices]
+        elif indices:
             indices_set = set(indices)
             hashed_data = filter(lambda item: item.index in indices_set, storage)
             hashed_data = map(lambda item: (item.index, item), hashed_data)
@@ -187,7 +358,12 @@ class DequeBuffer(Buffer):
         if meta is not None:
             item.meta = meta
             for key in self.meta_index:
-                self.meta_index[key][i] = meta[key] if key in meta else None
+                value = meta[key] if key in meta else None
+                if key in self.group_index and value != self.meta_index[key][i]:
+                    push_id = self.indices.push_id(index)
+                    self.group_index[key].remove(self.meta_index[key][i], push_id)
+                    self.group_index[key].append(value, push_id, item)
+                self.meta_index[key][i] = value
         return True
 
     @apply_middleware("delete")
@@ -201,17 +377,20 @@ class DequeBuffer(Buffer):
         if isinstance(indices, str):
             indices = [indices]
         del_idx = []
-        for index in indices:
+        for index in set(indices):
             if self.indices.has(index):
-                del_idx.append(self.indices.get(index))
+                del_idx.append((self.indices.get(index), index))
         if len(del_idx) == 0:
             return
+        # Offsets must be calculated before any deletion, then delete from the newest one.
         del_idx = sorted(del_idx, reverse=True)
-        for idx in del_idx:
+        for idx, index in del_idx:
+            for key, group_index in self.group_index.items():
+                group_index.remove(self.meta_index[key][idx], self.indices.push_id(index))
+            self.indices.delete(index)
             del self.storage[idx]
-        remain_indices = [item.index for item in self.storage]
-        key_value_pairs = zip(remain_indices, range(len(indices)))
-        self.indices = BufferIndex(self.storage.maxlen, key_value_pairs)
+            for key in self.meta_index:
+                del self.meta_index[key][idx]
 
     def save_data(self, file_name: str):
         if not os.path.exists(os.path.dirname(file_name)):
@@ -228,6 +407,9 @@ class DequeBuffer(Buffer):
 
     def load_data(self, file_name: str):
         self.storage, self.indices, self.meta_index = hickle.load(file_name)
+        self.group_index = {}
+        for key in self.meta_index:
+            self._create_group_index(key)
 
     def count(self) -> int:
         """
@@ -236,6 +418,17 @@ class DequeBuffer(Buffer):
         """
         return len(self.storage)
 
+    def count_groups(self, groupby: str) -> int:
+        """
+        Overview:
+            The number of groups by the meta key ``groupby``, which is read from the group index.
+        """
+        if groupby not in self.meta_index:
+            self._create_index(groupby)
+        if groupby not in self.group_index:
+            self._create_group_index(groupby)
+        return len(self.group_index[groupby])
+
     def get(self, idx: int) -> BufferedData:
         """
         Overview:
@@ -252,17 +445,25 @@ class DequeBuffer(Buffer):
         self.storage.clear()
         self.indices.clear()
         self.meta_index = {}
+        self.group_index = {}
 
     def _push(self, data: Any, meta: Optional[dict] = None) -> BufferedData:
         index = uuid.uuid1().hex
         if meta is None:
             meta = {}
         buffered = BufferedData(data=data, index=index, meta=meta)
+        if len(self.storage) == self.storage.maxlen:
+            # The oldest record is evicted, which is also the oldest one in its group.
+            for key, group_index in self.group_index.items():
+                group_index.popleft(self.meta_index[key][0])
         self.storage.append(buffered)
         self.indices.append(index)
         # Add meta index
         for key in self.meta_index:
-            self.meta_index[key].append(meta[key] if key in meta else None)
+            value = meta[key] if key in meta else None
+            self.meta_index[key].append(value)
+            if key in self.group_index:
+                self.group_index[key].append(value, self.indices.push_id(index), buffered)
 
         return buffered
 
@@ -311,10 +512,33 @@ class DequeBuffer(Buffer):
             Sampling by `group` instead of records, the result will be a collection
             of lists with a length of `size`, but the length of each list may be different from other lists.
         """
-        if storage is None:
-            storage = self.storage
         if groupby not in self.meta_index:
             self._create_index(groupby)
+        if storage is not None and storage is not self.storage:
+            return self._sample_by_group_in_range(size, groupby, replace, unroll_len, storage, sliced)
+        if groupby not in self.group_index:
+            self._create_group_index(groupby)
+        group_index = self.group_index[groupby]
+
+        min_len = unroll_len if unroll_len and unroll_len > 1 else 1
+        sampled_groups = group_index.sample(size, replace=replace, min_len=min_len)
+
+        final_sampled_data = []
+        for group_name in sampled_groups:
+            group = group_index.get(group_name)
+            start, stop = self._unroll_range(len(group), unroll_len, sliced)
+            final_sampled_data.append(group.slice(start, stop))
+
+        return final_sampled_data
+
+    def _sample_by_group_in_range(
+            self, size: int, groupby: str, replace: bool, unroll_len: Optional[int], storage: List[BufferedData],
+            sliced: bool
+    ) -> List[List[BufferedData]]:
+        """
+        Overview:
+            Sampling by `group` in the records of ``sample_range``, which scans the records to group them.
+        """
 
         def filter_by_unroll_len():
             "Filter groups by unroll len, ensure count of items in each group is greater than unroll_len."
@@ -351,30 +575,39 @@ class DequeBuffer(Buffer):
         final_sampled_data = []
         for group in sampled_groups:
             seq_data = sampled_data[group]
-            # Filter records by unroll_len
-            if unroll_len:
-                # slice b unroll_len. If don’t do this, more likely obtain duplicate data, \
-                #  and the training will easily crash.
-                if sliced:
-                    start_indice = random.choice(range(max(1, len(seq_data))))
-                    start_indice = start_indice // unroll_len
-                    if start_indice == (len(seq_data) - 1) // unroll_len:
-                        seq_data = seq_data[-unroll_len:]
-                    else:
-                        seq_data = seq_data[start_indice * unroll_len:start_indice * unroll_len + unroll_len]
-                else:
-                    start_indice = random.choice(range(max(1, len(seq_data) - unroll_len)))
-                    seq_data = seq_data[start_indice:start_indice + unroll_len]
-
-            final_sampled_data.append(seq_data)
+            start, stop = self._unroll_range(len(seq_data), unroll_len, sliced)
+            final_sampled_data.append(seq_data[start:stop])
 
         return final_sampled_data
 
+    def _unroll_range(self, length: int, unroll_len: Optional[int], sliced: bool) -> Tuple[int, int]:
+        """
+        Overview:
+            Choose the range of records to sample in a group with ``length`` records.
+        """
+        if not unroll_len:
+            return 0, length
+        # slice b unroll_len. If don’t do this, more likely obtain duplicate data, \
+        #  and the training will easily crash.
+        if sliced:
+            start_indice = random.randrange(max(1, length))
+            start_indice = start_indice // unroll_len
+            if start_indice == (length - 1) // unroll_len:
+                return max(0, length - unroll_len), length
+            return start_indice * unroll_len, start_indice * unroll_len + unroll_len
+        start_indice = random.randrange(max(1, length - unroll_len))
+        return start_indice, start_indice + unroll_len
+
     def _create_index(self, meta_key: str):
         self.meta_index[meta_key] = deque(maxlen=self.storage.maxlen)
         for data in self.storage:
             self.meta_index[meta_key].append(data.meta[meta_key] if meta_key in data.meta else None)
 
+    def _create_group_index(self, meta_key: str):
+        group_index = self.group_index[meta_key] = GroupIndex()
+        for value, data in zip(self.meta_index[meta_key], self.storage):
+            group_index.append(value, self.indices.push_id(data.index), data)
+
     def __iter__(self) -> deque:
         return iter(self.storage)
 
@@ -382,5 +615,6 @@ class DequeBuffer(Buffer):
         buffer = type(self)(size=self.storage.maxlen)
         buffer.storage = self.storage
         buffer.meta_index = self.meta_index
+        buffer.group_index = self.group_index
         buffer.indices = self.indices
         return buffer
@@ -0,0 +1,313 @@
+import os
+import pickle
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+import torch
+from ding.data.buffer.columnar_buffer import ColumnarBuffer, ColumnarStorage, ColumnSpec
+
+
+def _numpy_dtype(spec: ColumnSpec) -> np.dtype:
+    if spec.kind == 'torch':
+        return torch.empty(0, dtype=spec.dtype).numpy().dtype
+    return np.dtype(spec.dtype)
+
+
+def _field_name(path: Tuple) -> str:
+    return '.'.join([str(k) for k in path]) if len(path) > 0 else '_data'
+
+
+class MemmapStorage(ColumnarStorage):
+    """
+    Overview:
+        A ``ColumnarStorage`` whose array columns are memory-mapped ``.npy`` files in ``path``, so that the data \
+        larger than RAM are paged in lazily by the OS when they are sampled.
+        The newest ``cache_size`` rows are also kept in RAM (write-through), sampling reads them from RAM and \
+        reads the others from the files.
+        Meta information and object fields can't be mapped, they are appended to a log file on every change, \
+        and compacted into a snapshot on ``flush``. Each record of the log is flushed to the OS once written, \
+        so the storage survives a crash of the process without ``flush``. Reopening a directory maps the files \
+        again and replays the log, instead of deserializing all of the data.
+    Interfaces:
+        ``__init__``, ``flush``, ``close``, ``state_dict``, ``load_state_dict``
+    """
+
+    def __init__(self, size: int, path: str, cache_size: int = 0) -> None:
+        """
+        Arguments:
+            - size (:obj:`int`): The number of rows of every column.
+            - path (:obj:`str`): The directory of the files, an existing storage will be reopened.
+            - cache_size (:obj:`int`): The number of newest rows kept in RAM.
+        """
+        self.path = path
+        self.cache_size = cache_size
+        self.cache_columns = {}
+        # Which slot the row in the cache belongs to.
+        self.cache_owner = np.full(max(cache_size, 1), -1, dtype=np.int64)
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._log = None
+        self._log_records = 0
+        self._appending = False
+        super().__init__(size)
+        os.makedirs(path, exist_ok=True)
+        self._state = self._open_array('_state', np.int64, (1, ))
+        if os.path.exists(self._file('schema.pkl')):
+            self._reopen()
+        else:
+            self.ids = self._open_array('_ids', np.int64, (size, ), fill=-1)
+            self._state[0] = 0
+            self._open_log('wb')
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _open_array(self, name: str, dtype: Any, shape: Tuple, fill: Optional[Any] = None) -> np.memmap:
+        file_name = self._file(name + '.npy')
+        if os.path.exists(file_name):
+            array = np.lib.format.open_memmap(file_name, mode='r+')
+            if array.shape != shape or array.dtype != dtype:
+                raise ValueError(
+                    "File {} has shape {} and dtype {}, which don't match {} and {}".format(
+                        file_name, array.shape, array.dtype, shape, dtype
+                    )
+                )
+        else:
+            array = np.lib.format.open_memmap(file_name, mode='w+', dtype=dtype, shape=shape)
+            if fill is not None:
+                array[:] = fill
+        return array
+
+    def _allocate(self, path: Tuple, spec: ColumnSpec) -> Any:
+        if spec.kind == 'object':
+            return super()._allocate(path, spec)
+        return self._open_array(_field_name(path), _numpy_dtype(spec), (self.size, *spec.shape))
+
+    def _learn_schema(self, data: Any) -> None:
+        super()._learn_schema(data)
+        self._create_cache()
+        self._save_schema()
+
+    def _save_schema(self) -> None:
+        with open(self._file('schema.pkl'), 'wb') as f:
+            pickle.dump({'structure': self.structure, 'specs': self.specs}, f)
+
+    def _promote(self, path: Tuple, dtype: np.dtype) -> None:
+        # Write the promoted column into a new file, which replaces the old one.
+        file_name = self._file(_field_name(path) + '.npy')
+        column = np.lib.format.open_memmap(file_name + '.tmp', mode='w+', dtype=dtype, shape=(self.size, ))
+        column[:] = self.columns[path]
+        column.flush()
+        os.replace(file_name + '.tmp', file_name)
+        self.columns[path] = column
+        if path in self.cache_columns:
+            self.cache_columns[path] = self.cache_columns[path].astype(dtype)
+        self.specs[path].dtype = dtype
+        self._save_schema()
+
+    def _create_cache(self) -> None:
+        if self.cache_size <= 0:
+            return
+        for path, spec in self.specs.items():
+            if spec.kind != 'object':
+                self.cache_columns[path] = np.zeros((self.cache_size, *spec.shape), dtype=_numpy_dtype(spec))
+
+    def write(self, slot: int, data: Any) -> None:
+        super().write(slot, data)
+        if self.cache_size > 0:
+            cache_slot = slot % self.cache_size
+            for path, column in self.cache_columns.items():
+                column[cache_slot] = self.columns[path][slot]
+            self.cache_owner[cache_slot] = slot
+        if not self._appending:
+            self._append_log(slot)
+
+    def append(self, data: Any, meta: dict) -> int:
+        # The appended slot is logged once after its id and meta are set.
+        self._appending = True
+        try:
+            index = super().append(data, meta)
+        finally:
+            self._appending = False
+        self._state[0] = self.next_id
+        self._append_log(index % self.size)
+        return index
+
+    def delete(self, slot: int) -> None:
+        super().delete(slot)
+        self._append_log(slot)
+
+    def set_meta(self, slot: int, meta: dict) -> None:
+        self.meta[slot] = meta
+        self._append_log(slot)
+
+    def gather(self, slots: np.ndarray) -> List[Any]:
+        slots = np.asarray(slots, dtype=np.int64)
+        if self.cache_size > 0:
+            # Which rows can be read from the cache, shared by all the columns.
+            self._hit = self.cache_owner[slots % self.cache_size] == slots
+            num_hits = int(self._hit.sum())
+            self.cache_hits += num_hits
+            self.cache_misses += len(slots) - num_hits
+        return super().gather(slots)
+
+    def _take(self, path: Tuple, slots: np.ndarray) -> Any:
+        spec = self.specs[path]
+        if spec.kind == 'object':
+            return super()._take(path, slots)
+        column = self.columns[path]
+        if self.cache_size > 0:
+            hit = self._hit
+            batch = np.empty((len(slots), *spec.shape), dtype=column.dtype)
+            batch[hit] = self.cache_columns[path][slots[hit] % self.cache_size]
+            batch[~hit] = column[slots[~hit]]
+        else:
+            batch = column[slots]
+        if spec.kind == 'torch':
+            return torch.from_numpy(batch).to(spec.device)
+        return batch
+
+    def _read_value(self, path: Tuple, slot: int) -> Any:
+        value = super()._read_value(path, slot)
+        if self.specs[path].kind == 'torch':
+            value = torch.as_tensor(np.asarray(value)).to(self.specs[path].device)
+        return value
+
+    def _open_log(self, mode: str) -> None:
+        if self._log is not None:
+            self._log.close()
+        self._log = open(self._file('meta.log'), mode)
+        self._log_records = 0
+
+    def _objects(self, slot: int) -> Dict[Tuple, Any]:
+        return {path: self.columns[path][slot] for path, spec in self.specs.items() if spec.kind == 'object'}
+
+    def _append_log(self, slot: int) -> None:
+        record = (slot, self.meta[slot], self._objects(slot) if self.ids[slot] >= 0 else None)
+        pickle.dump(record, self._log, protocol=pickle.HIGHEST_PROTOCOL)
+        self._log.flush()
+        self._log_records += 1
+        # Compact the log when it is much longer than the storage.
+        if self._log_records > 4 * self.size:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Overview:
+            Flush the mapped files, write the meta information and object fields into a snapshot \
+            and truncate the log.
+        """
+        for column in list(self.columns.values()) + [self.ids, self._state]:
+            if isinstance(column, np.memmap):
+                column.flush()
+        if not self.learned:
+            return
+        objects = {path: self.columns[path] for path, spec in self.specs.items() if spec.kind == 'object'}
+        snapshot = self._file('meta.snapshot')
+        with open(snapshot + '.tmp', 'wb') as f:
+            pickle.dump({'meta': self.meta, 'objects': objects}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(snapshot + '.tmp', snapshot)
+        self._open_log('wb')
+
+    def _reopen(self) -> None:
+        with open(self._file('schema.pkl'), 'rb') as f:
+            schema = pickle.load(f)
+        self.learned = True
+        self.structure, self.specs = schema['structure'], schema['specs']
+        self.ids = self._open_array('_ids', np.int64, (self.size, ))
+        for path, spec in self.specs.items():
+            self.columns[path] = self._allocate(path, spec)
+        self._create_cache()
+        if os.path.exists(self._file('meta.snapshot')):
+            with open(self._file('meta.snapshot'), 'rb') as f:
+                snapshot = pickle.load(f)
+            self.meta = snapshot['meta']
+            self.columns.update(snapshot['objects'])
+        if os.path.exists(self._file('meta.log')):
+            with open(self._file('meta.log'), 'rb') as f:
+                while True:
+                    try:
+                        slot, meta, objects = pickle.load(f)
+                    except (EOFError, pickle.UnpicklingError):
+                        # The tail may be broken if the process is killed while writing.
+                        break
+                    self.meta[slot] = meta
+                    for path, value in (objects or {}).items():
+                        self.columns[path][slot] = value
+        self.next_id = int(self._state[0])
+        self.valid_count = int((self.ids >= 0).sum())
+        # The ids are written in place, drop the meta of the slots that were deleted or never written.
+        for slot in np.nonzero(self.ids < 0)[0].tolist():
+            self.meta[slot] = None
+        self.flush()
+
+    def clear(self) -> None:
+        super().clear()
+        self._state[0] = 0
+        self.cache_owner[:] = -1
+        self.flush()
+
+    def close(self) -> None:
+        """
+        Overview:
+            Flush and close the log file, the storage can't be used after closing.
+        """
+        self.flush()
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    def state_dict(self) -> Dict[str, Any]:
+        """
+        Overview:
+            Flush the storage and return the location of its files, rather than copying the data.
+        """
+        self.flush()
+        return {'path': os.path.abspath(self.path), 'size': self.size}
+
+    def load_state_dict(self, state_dict: Dict[str, Any]) -> None:
+        """
+        Overview:
+            Close the storage and reopen the files in the location of ``state_dict``.
+        """
+        if state_dict['size'] != self.size:
+            raise ValueError(
+                "The storage in {} has size {}, which doesn't match {}".format(
+                    state_dict['path'], state_dict['size'], self.size
+                )
+            )
+        self.close()
+        self.__init__(self.size, state_dict['path'], cache_size=self.cache_size)
+
+
+class MemmapBuffer(ColumnarBuffer):
+    """
+    Overview:
+        A ``ColumnarBuffer`` backed by memory-mapped files, for the buffers larger than RAM. The buffer can be \
+        restarted by creating a new ``MemmapBuffer`` with the same ``path``, which maps the files again.
+        ``save_data`` only flushes the storage and records its path, ``load_data`` reopens the recorded path, \
+        see ``MemmapStorage.state_dict``.
+    """
+
+    def __init__(self, size: int, path: str, cache_size: int = 10000, sliced: bool = False) -> None:
+        """
+        Overview:
+            The initialization method of MemmapBuffer.
+        Arguments:
+            - size (:obj:`int`): The maximum number of objects that the buffer can hold.
+            - path (:obj:`str`): The directory of the mapped files.
+            - cache_size (:obj:`int`): The number of newest records kept in RAM.
+            - sliced (:obj:`bool`): The flag whether slice data by unroll_len when sample by group
+        """
+        self.path = path
+        self.cache_size = min(cache_size, size)
+        super().__init__(size=size, sliced=sliced)
+
+    def _create_storage(self, size: int) -> MemmapStorage:
+        return MemmapStorage(size, self.path, cache_size=self.cache_size)
+
+    def flush(self) -> None:
+        self.storage.flush()
+
+    def load_data(self, file_name: str):
+        super().load_data(file_name)
+        self.path = self.storage.path
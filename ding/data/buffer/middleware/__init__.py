@@ -5,3 +5,5 @@ from .priority import PriorityExperienceReplay
 from .padding import padding
 from .group_sample import group_sample
 from .sample_range_view import sample_range_view
+from .frame_deduplication import FrameDeduplication
+from .compression import Compression
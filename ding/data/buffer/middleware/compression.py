@@ -0,0 +1,284 @@
+from typing import Callable, Any, Iterable, List, Dict, Optional, Tuple, Union
+from collections import OrderedDict
+import copy
+from concurrent.futures import ThreadPoolExecutor
+import time
+import numpy as np
+import torch
+from ding.data.buffer.buffer import BufferedData
+from ding.data.buffer.middleware.frame_deduplication import _replace
+from ding.utils import get_data_compressor, get_data_decompressor
+from ding.utils.compression_helper import jpeg_data_compressor, jpeg_data_decompressor
+
+
+class CompressedField:
+    """
+    Overview:
+        The compressed value of one field, which is kept in the buffer instead of the raw value.
+    """
+    __slots__ = ['codec', 'payload', 'shape', 'is_torch']
+
+    def __init__(self, codec: str, payload: bytes, shape: Tuple[int, ...], is_torch: bool) -> None:
+        self.codec = codec
+        self.payload = payload
+        self.shape = shape
+        self.is_torch = is_torch
+
+    def __getstate__(self) -> Tuple:
+        return self.codec, self.payload, self.shape, self.is_torch
+
+    def __setstate__(self, state: Tuple) -> None:
+        self.codec, self.payload, self.shape, self.is_torch = state
+
+
+class Compression:
+    """
+    Overview:
+        The middleware that keeps the selected fields of data compressed in the buffer, with the codecs in \
+        ``ding.utils.compression_helper``. Fields are compressed on push, and decompressed on sample by a thread pool. \
+        Only the decompression of lz4 and zlib releases the GIL, the following ``pickle.loads`` holds it, so the \
+        speedup of threads is limited by the share of decompression in the decoding time.
+        The decoded fields of the recently pushed or sampled records can be cached uncompressed in a LRU cache, \
+        the pushed fields are cached as copies, so the data modified by the caller after push are not affected.
+        The compression ratio, decode latency and cache hit rate are reported by ``stats``.
+        The ``jpeg`` codec is lossy and only accepts ``uint8`` arrays in shape ``(H, W)`` (grayscale), \
+        ``(H, W, 3)`` (color) or ``(C, H, W)`` (stacked grayscale frames, each frame is encoded separately).
+    Interfaces:
+        ``__init__``, ``stats``, ``close``
+    """
+
+    def __init__(
+        self,
+        fields: Union[Iterable[str], Dict[str, str]] = ('obs', 'next_obs'),
+        codec: str = 'lz4',
+        num_workers: int = 4,
+        cache_size: int = 0,
+    ) -> None:
+        """
+        Arguments:
+            - fields (:obj:`Union[Iterable[str], Dict[str, str]]`): The fields to compress, or a dict which maps \
+                each field to its codec, e.g. ``{'obs': 'jpeg', 'next_obs': 'jpeg', 'logit': 'zlib'}``. \
+                The fields missing in data are skipped.
+            - codec (:obj:`str`): The codec of the fields without codec, one of ``['lz4', 'zlib', 'jpeg', 'none']``.
+            - num_workers (:obj:`int`): The number of decoding threads, decode in the sampling thread if it is 0.
+            - cache_size (:obj:`int`): The number of records whose decoded fields are cached, 0 means no cache.
+        """
+        if not isinstance(fields, dict):
+            fields = {k: codec for k in fields}
+        self.fields = fields
+        self.compressors = {
+            k: self._jpeg_compress if c == 'jpeg' else get_data_compressor(c)
+            for k, c in fields.items()
+        }
+        self.decompressors = {c: get_data_decompressor(c) for c in set(fields.values()) if c != 'jpeg'}
+        self.num_workers = num_workers
+        self.pool = ThreadPoolExecutor(num_workers, thread_name_prefix='buffer_decode') if num_workers > 0 else None
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self._reset_stats()
+
+    def _reset_stats(self) -> None:
+        self.raw_bytes = 0
+        self.compressed_bytes = 0
+        self.decode_time = 0.
+        self.decode_count = 0
+        self.sample_count = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def push(self, chain: Callable, data: Any, *args, **kwargs) -> BufferedData:
+        encoded = self._compress(data)
+        buffered = chain(encoded, *args, **kwargs)
+        if buffered is not None:
+            self._cache_put(
+                buffered.index, {k: self._cache_value(data[k], encoded[k])
+                                 for k in self.fields if k in data}
+            )
+            buffered = BufferedData(data=data, index=buffered.index, meta=buffered.meta)
+        return buffered
+
+    def sample(self, chain: Callable, *args, **kwargs) -> Union[List[BufferedData], List[List[BufferedData]]]:
+        sampled_data = chain(*args, **kwargs)
+        if len(sampled_data) > 0 and isinstance(sampled_data[0], list):
+            flat_data = [item for grouped_data in sampled_data for item in grouped_data]
+            flat_data = self._decompress(flat_data)
+            result, start = [], 0
+            for grouped_data in sampled_data:
+                result.append(flat_data[start:start + len(grouped_data)])
+                start += len(grouped_data)
+            return result
+        return self._decompress(sampled_data)
+
+    def update(
+            self,
+            chain: Callable,
+            index: Union[str, List[str]],
+            data: Any = None,
+            meta: Optional[Union[dict, List[dict]]] = None,
+            *args,
+            **kwargs
+    ) -> Union[bool, List[bool]]:
+        if data is None:
+            return chain(index, data, meta, *args, **kwargs)
+        if isinstance(index, (list, tuple)):
+            if meta is None:
+                meta = [None] * len(index)
+            return [self.update(chain, i, d, m, *args, **kwargs) for i, d, m in zip(index, data, meta)]
+        self.cache.pop(index, None)
+        return chain(index, self._compress(data), meta, *args, **kwargs)
+
+    def delete(self, chain: Callable, index: Union[str, Iterable[str]], *args, **kwargs) -> None:
+        indices = [index] if isinstance(index, (str, int, np.integer)) else index
+        for idx in indices:
+            self.cache.pop(idx, None)
+        return chain(index, *args, **kwargs)
+
+    def clear(self, chain: Callable) -> None:
+        self.cache.clear()
+        chain()
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Overview:
+            Return the statistics of compression, all the values are accumulated since the creation.
+        Returns:
+            - stats (:obj:`Dict[str, float]`): The statistics, including:
+                - compression_ratio: The raw size divided by the compressed size of the pushed fields.
+                - decode_ms_per_sample: The average decoding time of each ``sample`` call in milliseconds.
+                - decode_ms_per_field: The average decoding time of each field in milliseconds.
+                - cache_hit_rate: The ratio of the records found in the cache.
+        """
+        return {
+            'raw_bytes': self.raw_bytes,
+            'compressed_bytes': self.compressed_bytes,
+            'compression_ratio': self.raw_bytes / max(self.compressed_bytes, 1),
+            'decode_ms_per_sample': 1000 * self.decode_time / max(self.sample_count, 1),
+            'decode_ms_per_field': 1000 * self.decode_time / max(self.decode_count, 1),
+            'cache_hit_rate': self.cache_hits / max(self.cache_hits + self.cache_misses, 1),
+        }
+
+    def close(self) -> None:
+        """
+        Overview:
+            Shutdown the decoding threads.
+        """
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def _compress(self, data: Any) -> Any:
+        values = {}
+        for key, compressor in self.compressors.items():
+            if key not in data:
+                continue
+            value = data[key]
+            is_torch = isinstance(value, torch.Tensor)
+            raw = value.cpu().numpy() if is_torch else value
+            payload = compressor(raw)
+            if isinstance(raw, np.ndarray):
+                self.raw_bytes += raw.nbytes
+                if isinstance(payload, bytes):
+                    self.compressed_bytes += len(payload)
+                elif isinstance(payload, tuple):  # stacked jpeg frames
+                    self.compressed_bytes += sum(len(p) for p in payload)
+                else:
+                    self.compressed_bytes += raw.nbytes
+            values[key] = CompressedField(self.fields[key], payload, getattr(raw, 'shape', None), is_torch)
+        return _replace(data, values)
+
+    @staticmethod
+    def _jpeg_compress(value: Any) -> Union[bytes, Tuple[bytes, ...]]:
+        if not isinstance(value, np.ndarray) or value.dtype != np.uint8 or value.ndim not in [2, 3]:
+            raise ValueError(
+                "The jpeg codec only supports uint8 arrays in shape (H, W), (H, W, 3) or (C, H, W), got {}".format(
+                    '{} array in shape {}'.format(value.dtype, value.shape)
+                    if isinstance(value, np.ndarray) else type(value)
+                )
+            )
+        if value.ndim == 3 and value.shape[-1] != 3:
+            return tuple(jpeg_data_compressor(frame) for frame in value)
+        return jpeg_data_compressor(value)
+
+    @staticmethod
+    def _jpeg_decompress(payload: Union[bytes, Tuple[bytes, ...]], shape: Tuple[int, ...]) -> np.ndarray:
+        # The grayscale frames are decoded in shape (H, W, 1)
+        if isinstance(payload, tuple):
+            return np.stack([jpeg_data_decompressor(p, gray_scale=True)[..., 0] for p in payload])
+        if len(shape) == 2:
+            return jpeg_data_decompressor(payload, gray_scale=True)[..., 0]
+        return jpeg_data_decompressor(payload)
+
+    def _decode_field(self, field: CompressedField) -> Any:
+        if field.codec == 'jpeg':
+            value = self._jpeg_decompress(field.payload, field.shape)
+        else:
+            value = self.decompressors[field.codec](field.payload)
+        if field.is_torch:
+            value = torch.from_numpy(value)
+        return value
+
+    def _decode_fields(self, fields: List[CompressedField]) -> List[Any]:
+        return [self._decode_field(f) for f in fields]
+
+    def _decompress(self, sampled_data: List[BufferedData]) -> List[BufferedData]:
+        t_start = time.time()
+        decoded = [None] * len(sampled_data)
+        tasks = []
+        for i, item in enumerate(sampled_data):
+            if item.data is None:  # padded by other middleware
+                continue
+            cached = self.cache.get(item.index)
+            if cached is not None:
+                self.cache.move_to_end(item.index)
+                self.cache_hits += 1
+                decoded[i] = cached
+                continue
+            self.cache_misses += 1
+            decoded[i] = {}
+            for key in self.fields:
+                if key in item.data:
+                    tasks.append((i, key, item.data[key]))
+        fields = [t[2] for t in tasks]
+        if self.pool is not None and len(tasks) > 1:
+            # One chunk per worker, the overhead of a task is comparable to decoding a small field.
+            chunk = (len(fields) + self.num_workers - 1) // self.num_workers
+            chunks = [fields[i:i + chunk] for i in range(0, len(fields), chunk)]
+            values = sum(self.pool.map(self._decode_fields, chunks), [])
+        else:
+            values = self._decode_fields(fields)
+        for (i, key, _), value in zip(tasks, values):
+            decoded[i][key] = value
+        result = []
+        for item, values in zip(sampled_data, decoded):
+            if values is None:
+                result.append(item)
+                continue
+            self._cache_put(item.index, values)
+            result.append(BufferedData(data=_replace(item.data, values), index=item.index, meta=item.meta))
+        self.decode_time += time.time() - t_start
+        self.decode_count += len(tasks)
+        self.sample_count += 1
+        return result
+
+    def _cache_value(self, value: Any, field: CompressedField) -> Any:
+        if self.cache_size <= 0:
+            return None
+        if field.codec == 'jpeg':
+            # Cache the lossy result, so that the cache hits return the same value as the misses.
+            return self._decode_field(field)
+        if isinstance(value, torch.Tensor):
+            return value.clone()
+        return copy.deepcopy(value)
+
+    def _cache_put(self, index: Any, values: Dict[str, Any]) -> None:
+        if self.cache_size <= 0:
+            return
+        self.cache[index] = values
+        self.cache.move_to_end(index)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def __call__(self, action: str, chain: Callable, *args, **kwargs) -> Any:
+        if action in ["push", "sample", "update", "delete", "clear"]:
+            return getattr(self, action)(chain, *args, **kwargs)
+        return chain(*args, **kwargs)
@@ -0,0 +1,215 @@
+from typing import Callable, Any, Iterable, List, Dict, Optional, Tuple, Union, TYPE_CHECKING
+from collections import deque
+import copy
+import numpy as np
+import torch
+from ding.data.buffer.buffer import BufferedData
+if TYPE_CHECKING:
+    from ding.data.buffer.buffer import Buffer
+
+
+class FrameDeduplication:
+    """
+    Overview:
+        The middleware that stores each frame of the stacked observations only once, e.g. the ``obs`` and \
+        ``next_obs`` of ``FrameStackWrapper`` with shape ``(4, 84, 84)``, which share 7 of their 8 frames with \
+        the neighbouring transitions in the same episode.
+        On push, the frames (slices along the first dim) are stored in a frame store addressed by their content, \
+        and the stacked observations are replaced with the pointers to the frames, i.e. int64 arrays with shape \
+        ``(n_frames, )``. On sample, the stacked observations are rebuilt from the pointers.
+        Because the pointers always point to the equal frames, the repeated first frames after reset and \
+        the episode boundaries need no special handling.
+        Frames are reference counted and released when the transitions are deleted or evicted. The buffer is \
+        expected to evict its oldest records when it is full, the same as ``PriorityExperienceReplay``.
+    """
+
+    def __init__(self, buffer: 'Buffer', keys: Iterable[str] = ('obs', 'next_obs')) -> None:
+        """
+        Arguments:
+            - buffer (:obj:`Buffer`): The buffer to use frame deduplication.
+            - keys (:obj:`Iterable[str]`): The keys of the stacked observations in data, the missing ones are skipped.
+        """
+        self.buffer = buffer
+        self.keys = tuple(keys)
+        self._reset()
+
+    def _reset(self) -> None:
+        self.frames = {}
+        self.frame_refs = {}
+        # Map the hash of frame content to frame id, frames with conflicted hashes are stored but not indexed.
+        self.frame_by_hash = {}
+        self.frame_hash = {}
+        self.next_frame_id = 0
+        # The frame ids referred by each record, and the indices in push order (deleted ones are skipped lazily).
+        self.index_to_frames = {}
+        self.push_order = deque()
+
+    def push(self, chain: Callable, data: Any, meta: Optional[dict] = None, *args, **kwargs) -> BufferedData:
+        encoded, frame_ids = self._encode(data)
+        buffered = chain(encoded, meta, *args, **kwargs)
+        if buffered is None:  # rejected by the following middleware
+            self._release_frames(frame_ids)
+            return buffered
+        self.index_to_frames[buffered.index] = frame_ids
+        self.push_order.append(buffered.index)
+        # Release the frames of the records evicted by the buffer.
+        while len(self.index_to_frames) > self.buffer.count():
+            self._pop_oldest()
+        return BufferedData(data=data, index=buffered.index, meta=buffered.meta)
+
+    def sample(self, chain: Callable, *args, **kwargs) -> Union[List[BufferedData], List[List[BufferedData]]]:
+        sampled_data = chain(*args, **kwargs)
+        if len(sampled_data) > 0 and isinstance(sampled_data[0], list):
+            return [[self._decode(item) for item in grouped_data] for grouped_data in sampled_data]
+        return [self._decode(item) for item in sampled_data]
+
+    def update(
+            self,
+            chain: Callable,
+            index: Union[str, List[str]],
+            data: Any = None,
+            meta: Optional[Union[dict, List[dict]]] = None,
+            *args,
+            **kwargs
+    ) -> Union[bool, List[bool]]:
+        if data is None:
+            return chain(index, data, meta, *args, **kwargs)
+        if isinstance(index, (list, tuple)):
+            if meta is None:
+                meta = [None] * len(index)
+            return [self.update(chain, i, d, m, *args, **kwargs) for i, d, m in zip(index, data, meta)]
+        encoded, frame_ids = self._encode(data)
+        flag = chain(index, encoded, meta, *args, **kwargs)
+        if flag and index in self.index_to_frames:
+            self._release_frames(self.index_to_frames[index])
+            self.index_to_frames[index] = frame_ids
+        else:
+            self._release_frames(frame_ids)
+        return flag
+
+    def delete(self, chain: Callable, index: Union[str, Iterable[str]], *args, **kwargs) -> None:
+        indices = [index] if isinstance(index, (str, int, np.integer)) else index
+        for idx in indices:
+            frame_ids = self.index_to_frames.pop(idx, None)
+            if frame_ids is not None:
+                self._release_frames(frame_ids)
+        if len(self.push_order) > 2 * len(self.index_to_frames) + 16:
+            self.push_order = deque([i for i in self.push_order if i in self.index_to_frames])
+        return chain(index, *args, **kwargs)
+
+    def clear(self, chain: Callable) -> None:
+        self._reset()
+        chain()
+
+    def nbytes(self) -> int:
+        """
+        Overview:
+            The memory held by the stored frames.
+        """
+        total = 0
+        for frame in self.frames.values():
+            if isinstance(frame, torch.Tensor):
+                total += frame.element_size() * frame.nelement()
+            else:
+                total += frame.nbytes
+        return total
+
+    def _encode(self, data: Any) -> Tuple[Any, List[int]]:
+        values, frame_ids = {}, []
+        for key in self.keys:
+            if key not in data:
+                continue
+            stacked = data[key]
+            ids = [self._store_frame(frame) for frame in stacked]
+            frame_ids.extend(ids)
+            if isinstance(stacked, torch.Tensor):
+                values[key] = torch.as_tensor(ids, dtype=torch.int64)
+            else:
+                values[key] = np.array(ids, dtype=np.int64)
+        return _replace(data, values), frame_ids
+
+    def _decode(self, item: BufferedData) -> BufferedData:
+        if item.data is None:  # padded by other middleware
+            return item
+        values = {}
+        for key in self.keys:
+            if key not in item.data:
+                continue
+            pointers = item.data[key]
+            frames = [self.frames[i] for i in pointers.tolist()]
+            values[key] = torch.stack(frames) if isinstance(pointers, torch.Tensor) else np.stack(frames)
+        return BufferedData(data=_replace(item.data, values), index=item.index, meta=item.meta)
+
+    def _store_frame(self, frame: Union[torch.Tensor, np.ndarray]) -> int:
+        if isinstance(frame, torch.Tensor):
+            content = frame.detach().cpu().numpy().tobytes()
+        else:
+            content = np.ascontiguousarray(frame).tobytes()
+        frame_hash = hash((content, frame.shape, str(frame.dtype)))
+        frame_id = self.frame_by_hash.get(frame_hash)
+        if frame_id is not None and _equal(self.frames[frame_id], frame):
+            self.frame_refs[frame_id] += 1
+            return frame_id
+        frame_id = self.next_frame_id
+        self.next_frame_id += 1
+        # Copy the frame, otherwise the view holds the whole stacked observation.
+        self.frames[frame_id] = frame.clone() if isinstance(frame, torch.Tensor) else frame.copy()
+        self.frame_refs[frame_id] = 1
+        if frame_hash not in self.frame_by_hash:
+            self.frame_by_hash[frame_hash] = frame_id
+            self.frame_hash[frame_id] = frame_hash
+        return frame_id
+
+    def _release_frames(self, frame_ids: List[int]) -> None:
+        for frame_id in frame_ids:
+            self.frame_refs[frame_id] -= 1
+            if self.frame_refs[frame_id] == 0:
+                del self.frames[frame_id]
+                del self.frame_refs[frame_id]
+                frame_hash = self.frame_hash.pop(frame_id, None)
+                if frame_hash is not None:
+                    del self.frame_by_hash[frame_hash]
+
+    def _pop_oldest(self) -> None:
+        while True:
+            index = self.push_order.popleft()
+            frame_ids = self.index_to_frames.pop(index, None)
+            if frame_ids is not None:
+                self._release_frames(frame_ids)
+                return
+
+    def state_dict(self) -> Dict:
+        return {
+            'frames': self.frames,
+            'frame_refs': self.frame_refs,
+            'frame_by_hash': self.frame_by_hash,
+            'frame_hash': self.frame_hash,
+            'next_frame_id': self.next_frame_id,
+            'index_to_frames': self.index_to_frames,
+            'push_order': self.push_order,
+        }
+
+    def load_state_dict(self, _state_dict: Dict, deepcopy: bool = False) -> None:
+        for k, v in _state_dict.items():
+            if deepcopy:
+                setattr(self, '{}'.format(k), copy.deepcopy(v))
+            else:
+                setattr(self, '{}'.format(k), v)
+
+    def __call__(self, action: str, chain: Callable, *args, **kwargs) -> Any:
+        if action in ["push", "sample", "update", "delete", "clear"]:
+            return getattr(self, action)(chain, *args, **kwargs)
+        return chain(*args, **kwargs)
+
+
+def _equal(a: Union[torch.Tensor, np.ndarray], b: Union[torch.Tensor, np.ndarray]) -> bool:
+    if isinstance(a, torch.Tensor):
+        return torch.equal(a, b.to(a.device))
+    return np.array_equal(a, b)
+
+
+def _replace(data: Any, values: Dict[str, Any]) -> Any:
+    # Build a new container of the same type (dict, EasyDict or treetensor), the input data are not modified.
+    if len(values) == 0:
+        return data
+    return type(data)({k: values[k] if k in values else data[k] for k in data.keys()})
@@ -1,4 +1,5 @@
-from typing import Callable, Any, List, Dict, Optional, Union, TYPE_CHECKING
+from typing import Callable, Any, Iterable, List, Dict, Optional, Union, TYPE_CHECKING
+from collections import deque
 import copy
 import numpy as np
 import torch
@@ -12,6 +13,9 @@ class PriorityExperienceReplay:
     """
     Overview:
         The middleware that implements priority experience replay (PER).
+        Each record owns a leaf (slot) of the segment trees, the slots of deleted records are reused by \
+        the following pushes. The buffer is expected to evict its oldest records when it is full, \
+        the slots of evicted records are released by comparing the number of records with ``buffer.count()``.
     """
 
     def __init__(
@@ -35,7 +39,6 @@ class PriorityExperienceReplay:
         """
 
         self.buffer = buffer
-        self.buffer_idx = {}
         self.buffer_size = buffer.size
         self.IS_weight = IS_weight
         self.priority_power_factor = priority_power_factor
@@ -50,6 +53,16 @@ class PriorityExperienceReplay:
         if self.IS_weight:
             self.min_tree = MinSegmentTree(capacity)
             self.delta_anneal = (1 - self.IS_weight_power_factor) / self.IS_weight_anneal_train_iter
+        self._reset_slots()
+
+    def _reset_slots(self) -> None:
+        # buffer_idx maps slot to the index of record, index_to_slot is the reverse mapping.
+        self.buffer_idx = {}
+        self.index_to_slot = {}
+        # Indices in push order, deleted ones are skipped lazily.
+        self.push_order = deque()
+        self.free_slots = []
+        # Slots in [pivot, buffer_size) have never been used.
         self.pivot = 0
 
     def push(self, chain: Callable, data: Any, meta: Optional[dict] = None, *args, **kwargs) -> BufferedData:
@@ -61,25 +74,46 @@ class PriorityExperienceReplay:
         else:
             if 'priority' not in meta:
                 meta['priority'] = self.max_priority
-        meta['priority_idx'] = self.pivot
-        self._update_tree(meta['priority'], self.pivot)
+        slot = self._alloc_slot()
+        reclaim = slot is None
+        if reclaim:
+            # All the slots are in use, so the buffer is full and the oldest record will be evicted by this push.
+            # Its slot is reclaimed after the push succeeds, since the push may be rejected by the following middleware.
+            slot = self._oldest_slot()
+        meta['priority_idx'] = slot
         buffered = chain(data, meta=meta, *args, **kwargs)
+        if buffered is None:  # rejected by the following middleware
+            if not reclaim:
+                self._release_slots([slot])
+            return buffered
+        if reclaim:
+            self._pop_oldest()
+        self._update_tree(meta['priority'], slot)
         index = buffered.index
-        self.buffer_idx[self.pivot] = index
-        self.pivot = (self.pivot + 1) % self.buffer_size
+        self.buffer_idx[slot] = index
+        self.index_to_slot[index] = slot
+        self.push_order.append(index)
+        # Release the slots of the records evicted by the buffer.
+        while len(self.index_to_slot) > self.buffer.count():
+            self._release_slots([self._pop_oldest()])
         return buffered
 
-    def sample(self, chain: Callable, size: int, *args,
-               **kwargs) -> Union[List[BufferedData], List[List[BufferedData]]]:
-        # Divide [0, 1) into size intervals on average
-        intervals = np.array([i * 1.0 / size for i in range(size)])
-        # Uniformly sample within each interval
-        mass = intervals + np.random.uniform(size=(size, )) * 1. / size
-        # Rescale to [0, S), where S is the sum of all datas' priority (root value of sum tree)
-        mass *= self.sum_tree.reduce()
-        indices = [self.sum_tree.find_prefixsum_idx(m) for m in mass]
-        indices = [self.buffer_idx[i] for i in indices]
-        # Sample with indices
+    def sample(
+            self,
+            chain: Callable,
+            size: Optional[int] = None,
+            *args,
+            indices: Optional[List[str]] = None,
+            **kwargs
+    ) -> Union[List[BufferedData], List[List[BufferedData]]]:
+        if indices is None:
+            # Divide [0, 1) into size intervals on average, and uniformly sample within each interval
+            mass = (np.arange(size) + np.random.uniform(size=(size, ))) / size
+            # Rescale to [0, S), where S is the sum of all datas' priority (root value of sum tree)
+            mass *= self.sum_tree.reduce()
+            priority_idx = self.sum_tree.find_prefixsum_idx(mass)
+            indices = [self.buffer_idx[i] for i in priority_idx.tolist()]
+        # Sample with indices, the given indices are retrieved directly and only weighted
         data = chain(indices=indices, *args, **kwargs)
         if self.IS_weight:
             # Calculate max weight for normalizing IS
@@ -87,33 +121,53 @@ class PriorityExperienceReplay:
             p_min = self.min_tree.reduce() / sum_tree_root
             buffer_count = self.buffer.count()
             max_weight = (buffer_count * p_min) ** (-self.IS_weight_power_factor)
-            for i in range(len(data)):
-                meta = data[i].meta
-                priority_idx = meta['priority_idx']
-                p_sample = self.sum_tree[priority_idx] / sum_tree_root
-                weight = (buffer_count * p_sample) ** (-self.IS_weight_power_factor)
-                meta['priority_IS'] = weight / max_weight
-                data[i].data['priority_IS'] = torch.as_tensor([meta['priority_IS']]).float()  # for compability
+            priority_idx = np.array([d.meta['priority_idx'] for d in data], dtype=np.int64)
+            p_sample = self.sum_tree[priority_idx] / sum_tree_root
+            weights = (buffer_count * p_sample) ** (-self.IS_weight_power_factor) / max_weight
+            # One tensor for the whole batch, each data holds a view with shape (1, ) for compability
+            weights_tensor = torch.as_tensor(weights).float().unsqueeze(1).unbind(0)
+            for d, weight, weight_tensor in zip(data, weights.tolist(), weights_tensor):
+                d.meta['priority_IS'] = weight
+                d.data['priority_IS'] = weight_tensor
             self.IS_weight_power_factor = min(1.0, self.IS_weight_power_factor + self.delta_anneal)
         return data
 
-    def update(self, chain: Callable, index: str, data: Any, meta: Any, *args, **kwargs) -> None:
-        update_flag = chain(index, data, meta, *args, **kwargs)
-        if update_flag:  # when update succeed
-            assert meta is not None, "Please indicate dict-type meta in priority update"
-            new_priority, idx = meta['priority'], meta['priority_idx']
-            assert new_priority >= 0, "new_priority should greater than 0, but found {}".format(new_priority)
+    def update(
+            self, chain: Callable, index: Union[str, List[str]], data: Any, meta: Union[dict, List[dict]], *args,
+            **kwargs
+    ) -> Union[bool, List[bool]]:
+        """
+        Overview:
+            Update the priority of data. ``index`` and ``meta`` can also be lists, the following middleware and \
+            the buffer will still be updated one by one, but the priorities are written into the trees at once.
+        """
+        if isinstance(index, (list, tuple)):
+            if data is None:
+                data = [None] * len(index)
+            update_flags = [chain(i, d, m, *args, **kwargs) for i, d, m in zip(index, data, meta)]
+            meta = [m for m, flag in zip(meta, update_flags) if flag]
+        else:
+            update_flags = chain(index, data, meta, *args, **kwargs)
+            meta = [meta] if update_flags else []  # when update succeed
+        if len(meta) > 0:
+            assert all([m is not None for m in meta]), "Please indicate dict-type meta in priority update"
+            new_priority = np.array([m['priority'] for m in meta], dtype=np.float64)
+            idx = np.array([m['priority_idx'] for m in meta], dtype=np.int64)
+            assert (new_priority >= 0).all(), "new_priority should greater than 0, but found {}".format(new_priority)
             new_priority += 1e-5  # Add epsilon to avoid priority == 0
             self._update_tree(new_priority, idx)
-            self.max_priority = max(self.max_priority, new_priority)
-
-    def delete(self, chain: Callable, index: str, *args, **kwargs) -> None:
-        for item in self.buffer.storage:
-            meta = item.meta
-            priority_idx = meta['priority_idx']
-            self.sum_tree[priority_idx] = self.sum_tree.neutral_element
-            self.min_tree[priority_idx] = self.min_tree.neutral_element
-            self.buffer_idx.pop(priority_idx)
+            self.max_priority = max(self.max_priority, float(new_priority.max()))
+        return update_flags
+
+    def delete(self, chain: Callable, index: Union[str, Iterable[str]], *args, **kwargs) -> None:
+        indices = [index] if isinstance(index, (str, int, np.integer)) else index
+        slots = []
+        for idx in indices:
+            slot = self.index_to_slot.pop(idx, None)
+            if slot is not None:
+                self.buffer_idx.pop(slot)
+                slots.append(slot)
+        self._release_slots(slots)
         return chain(index, *args, **kwargs)
 
     def clear(self, chain: Callable) -> None:
@@ -122,11 +176,48 @@ class PriorityExperienceReplay:
         self.sum_tree = SumSegmentTree(capacity)
         if self.IS_weight:
             self.min_tree = MinSegmentTree(capacity)
-        self.buffer_idx = {}
-        self.pivot = 0
+        self._reset_slots()
         chain()
 
-    def _update_tree(self, priority: float, idx: int) -> None:
+    def _alloc_slot(self) -> Optional[int]:
+        """
+        Overview:
+            Allocate a free slot, returns None if all the slots are in use.
+        """
+        if len(self.free_slots) > 0:
+            return self.free_slots.pop()
+        if self.pivot < self.buffer_size:
+            self.pivot += 1
+            return self.pivot - 1
+        return None
+
+    def _oldest_slot(self) -> int:
+        # Skip the deleted records lazily, the oldest record is kept in push_order.
+        while self.push_order[0] not in self.index_to_slot:
+            self.push_order.popleft()
+        return self.index_to_slot[self.push_order[0]]
+
+    def _pop_oldest(self) -> int:
+        while True:
+            index = self.push_order.popleft()
+            slot = self.index_to_slot.pop(index, None)
+            if slot is not None:
+                self.buffer_idx.pop(slot)
+                return slot
+
+    def _release_slots(self, slots: List[int]) -> None:
+        if len(slots) == 0:
+            return
+        slots = np.array(slots, dtype=np.int64)
+        self.sum_tree[slots] = self.sum_tree.neutral_element
+        if self.IS_weight:
+            self.min_tree[slots] = self.min_tree.neutral_element
+        self.free_slots.extend(slots.tolist())
+        # Compact push_order when it is mostly made up of deleted records, to keep it O(buffer_size).
+        if len(self.push_order) > 2 * len(self.index_to_slot) + 16:
+            self.push_order = deque([i for i in self.push_order if i in self.index_to_slot])
+
+    def _update_tree(self, priority: Union[float, np.ndarray], idx: Union[int, np.ndarray]) -> None:
         weight = priority ** self.priority_power_factor
         self.sum_tree[idx] = weight
         if self.IS_weight:
@@ -136,9 +227,13 @@ class PriorityExperienceReplay:
         return {
             'max_priority': self.max_priority,
             'IS_weight_power_factor': self.IS_weight_power_factor,
-            'sumtree': self.sumtree,
-            'mintree': self.mintree,
+            'sum_tree': self.sum_tree,
+            'min_tree': self.min_tree if self.IS_weight else None,
             'buffer_idx': self.buffer_idx,
+            'index_to_slot': self.index_to_slot,
+            'push_order': self.push_order,
+            'free_slots': self.free_slots,
+            'pivot': self.pivot,
         }
 
     def load_state_dict(self, _state_dict: Dict, deepcopy: bool = False) -> None:
@@ -27,7 +27,8 @@ def use_time_check(buffer_: 'Buffer', max_use: int = float("inf")) -> Callable:
             return False
 
     def _check_use_count(sampled_data: List[BufferedData]):
-        delete_indices = [item.index for item in filter(_need_delete, sampled_data)]
+        # The same record may be sampled more than once, e.g. by PER.
+        delete_indices = list(set([item.index for item in filter(_need_delete, sampled_data)]))
         buffer_.delete(delete_indices)
         for index in delete_indices:
             del use_count[index]
@@ -0,0 +1,377 @@
+import itertools
+import math
+import threading
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from ditk import logging
+import numpy as np
+from ding.data.buffer import Buffer, apply_middleware, BufferedData
+from ding.data.buffer.deque_buffer import DequeBuffer
+from ding.data.buffer.middleware import PriorityExperienceReplay
+
+
+class ShardedBuffer(Buffer):
+    """
+    Overview:
+        A thread-safe buffer made up of ``num_shards`` independent shards, each shard is a buffer (``DequeBuffer`` \
+        by default) with its own lock and its own priority trees, so the producers pushing into different shards \
+        and the sampler don't wait for each other on a global lock.
+        The pushed data goes to the shards round-robin, so that a single producer fills the whole capacity, or \
+        into the shard decided by ``meta[shard_key]`` if ``shard_key`` is set, which keeps a group (e.g. an env) \
+        in one shard.
+        Sampling draws the number of records of each shard from a multinomial distribution in proportion to \
+        the mass of the shards, i.e. the sum of priority with PER, or the count of records (groups with \
+        ``groupby``) otherwise, then samples each shard under its own lock. With PER, the importance sampling \
+        weights are computed over all the shards.
+        The index of a record is made up of the shard id and the index in the shard.
+    """
+
+    def __init__(
+            self,
+            size: int,
+            num_shards: int = 4,
+            shard_fn: Optional[Callable[[int], Buffer]] = None,
+            shard_key: Optional[str] = None,
+            priority: bool = False,
+            IS_weight: bool = True,
+            priority_power_factor: float = 0.6,
+            IS_weight_power_factor: float = 0.4,
+            IS_weight_anneal_train_iter: int = int(1e5),
+    ) -> None:
+        """
+        Overview:
+            The initialization method of ShardedBuffer.
+        Arguments:
+            - size (:obj:`int`): The maximum number of objects that the buffer can hold, split evenly over shards.
+            - num_shards (:obj:`int`): The number of shards.
+            - shard_fn (:obj:`Optional[Callable[[int], Buffer]]`): The function to create a shard with the given \
+                size, default to ``DequeBuffer``.
+            - shard_key (:obj:`Optional[str]`): The key in meta to decide the shard of the pushed data.
+            - priority (:obj:`bool`): Whether to use ``PriorityExperienceReplay`` in each shard, \
+                the following arguments are the same as ``PriorityExperienceReplay``.
+        """
+        super().__init__(size=size)
+        self.num_shards = num_shards
+        self.shard_size = int(math.ceil(size / num_shards))
+        if shard_fn is None:
+            shard_fn = DequeBuffer
+        self.shard_key = shard_key
+        self.priority = priority
+        self.IS_weight = IS_weight
+        self.IS_weight_power_factor = IS_weight_power_factor
+        self.delta_anneal = (1 - IS_weight_power_factor) / IS_weight_anneal_train_iter
+        self.shards = []
+        self.locks = [threading.Lock() for _ in range(num_shards)]
+        self.priority_middleware = []
+        for _ in range(num_shards):
+            shard = shard_fn(self.shard_size)
+            if priority:
+                per = PriorityExperienceReplay(
+                    shard,
+                    IS_weight=IS_weight,
+                    priority_power_factor=priority_power_factor,
+                    IS_weight_power_factor=IS_weight_power_factor,
+                    IS_weight_anneal_train_iter=IS_weight_anneal_train_iter
+                )
+                shard.use(per)
+                self.priority_middleware.append(per)
+            self.shards.append(shard)
+        self._shard_counter = itertools.count()
+
+    @apply_middleware("push")
+    def push(self, data: Any, meta: Optional[dict] = None) -> BufferedData:
+        """
+        Overview:
+            Push data into the next shard in round-robin order, or the shard decided by ``meta[shard_key]``.
+        Arguments:
+            - data (:obj:`Any`): The input object which can be in any format.
+            - meta (:obj:`Optional[dict]`): A dict that helps describe data, such as\
+                category, label, priority, etc. Default to ``None``.
+        """
+        shard_id = self._choose_shard(meta)
+        with self.locks[shard_id]:
+            buffered = self.shards[shard_id].push(data, meta)
+        if buffered is None:
+            return buffered
+        return BufferedData(data=buffered.data, index=self._encode(shard_id, buffered.index), meta=buffered.meta)
+
+    @apply_middleware("sample")
+    def sample(
+            self,
+            size: Optional[int] = None,
+            indices: Optional[List[str]] = None,
+            replace: bool = False,
+            sample_range: Optional[slice] = None,
+            ignore_insufficient: bool = False,
+            groupby: Optional[str] = None,
+            unroll_len: Optional[int] = None
+    ) -> Union[List[BufferedData], List[List[BufferedData]]]:
+        """
+        Overview:
+            The method that randomly sample data from the buffer or retrieve certain data by indices. \
+            The arguments are the same as ``DequeBuffer.sample``, except that ``sample_range`` is applied \
+            in each shard, and the groups are sampled in each shard, so ``shard_key`` is required with ``groupby`` \
+            to keep each group (e.g. ``shard_key`` is the same as ``groupby``) in one shard.
+        Returns:
+            - sampled_data (Union[List[BufferedData], List[List[BufferedData]]]): The sampling result. \
+                The records from the same shard are adjacent, the order of shards is random.
+        """
+        assert size or indices, "One of size and indices must not be empty."
+        # Without shard_key, the records of a group are pushed into all the shards round-robin, and the sampled
+        # groups of each shard are broken.
+        assert not groupby or self.shard_key is not None, "Sampling by group requires shard_key to keep groups."
+        if (size and indices) and (size != len(indices)):
+            raise AssertionError("Size and indices length must be equal.")
+        if indices:
+            return self._sample_by_indices(indices)
+
+        counts = self._split_size(size, replace, groupby)
+        if counts is None:
+            if ignore_insufficient:
+                logging.warning(
+                    "Sample operation is ignored due to data insufficient, current buffer is {} while sample is {}".
+                    format(self.count(), size)
+                )
+                return []
+            raise ValueError("There are less than {} records/groups in buffer({})".format(size, self.count()))
+        sampled_data = []
+        for shard_id in np.random.permutation(self.num_shards).tolist():
+            if counts[shard_id] == 0:
+                continue
+            with self.locks[shard_id]:
+                shard_data = self.shards[shard_id].sample(
+                    size=counts[shard_id],
+                    replace=replace,
+                    sample_range=sample_range,
+                    ignore_insufficient=ignore_insufficient,
+                    groupby=groupby,
+                    unroll_len=unroll_len
+                )
+            sampled_data += self._wrap(shard_id, shard_data)
+        if self.priority and self.IS_weight:
+            self._reweight([item for item in self._flatten(sampled_data) if item.data is not None])
+        return sampled_data
+
+    @apply_middleware("update")
+    def update(
+            self,
+            index: Union[str, int, List],
+            data: Optional[Union[Any, List]] = None,
+            meta: Optional[Union[dict, List[dict]]] = None
+    ) -> Union[bool, List[bool]]:
+        """
+        Overview:
+            Update data and meta by index. ``index``, ``data`` and ``meta`` can also be lists, which are grouped \
+            by shards, and each shard is updated under its lock once.
+        Arguments:
+            - index (:obj:`Union[str, int, List]`): Index of data.
+            - data (:obj:`any`): Pure data, ``None`` means unchanged.
+            - meta (:obj:`dict`): Meta information, ``None`` means unchanged.
+        """
+        if not isinstance(index, (list, tuple)):
+            shard_id, shard_index = self._decode(index)
+            with self.locks[shard_id]:
+                return self.shards[shard_id].update(shard_index, data, meta)
+        if data is None:
+            data = [None] * len(index)
+        if meta is None:
+            meta = [None] * len(index)
+        flags = [False] * len(index)
+        for shard_id, positions in self._group_by_shard(index).items():
+            shard_indices = [self._decode(index[i])[1] for i in positions]
+            shard_data = [data[i] for i in positions]
+            shard_meta = [meta[i] for i in positions]
+            with self.locks[shard_id]:
+                if self.priority:
+                    # PER accepts lists and updates the trees at once.
+                    shard_flags = self.shards[shard_id].update(shard_indices, shard_data, shard_meta)
+                else:
+                    shard_flags = [
+                        self.shards[shard_id].update(*args) for args in zip(shard_indices, shard_data, shard_meta)
+                    ]
+            for i, flag in zip(positions, shard_flags):
+                flags[i] = flag
+        return flags
+
+    @apply_middleware("delete")
+    def delete(self, indices: Union[str, int, Iterable]) -> None:
+        """
+        Overview:
+            The method that delete the data and related meta information by specific indices.
+        Arguments:
+            - indices (Union[str, int, Iterable]): Where the data to be cleared in the buffer.
+        """
+        if isinstance(indices, (str, int, np.integer)):
+            indices = [indices]
+        indices = list(indices)
+        for shard_id, positions in self._group_by_shard(indices).items():
+            with self.locks[shard_id]:
+                self.shards[shard_id].delete([self._decode(indices[i])[1] for i in positions])
+
+    def save_data(self, file_name: str):
+        """
+        Overview:
+            Save the data of each shard into ``{file_name}.shard{i}``.
+        """
+        for i, (shard, lock) in enumerate(zip(self.shards, self.locks)):
+            with lock:
+                shard.save_data('{}.shard{}'.format(file_name, i))
+
+    def load_data(self, file_name: str):
+        for i, (shard, lock) in enumerate(zip(self.shards, self.locks)):
+            with lock:
+                shard.load_data('{}.shard{}'.format(file_name, i))
+
+    def count(self) -> int:
+        """
+        Overview:
+            The method that returns the current length of the buffer.
+        """
+        return sum([shard.count() for shard in self.shards])
+
+    def get(self, idx: int) -> BufferedData:
+        """
+        Overview:
+            The method that returns the BufferedData object given a specific index, the records are ordered \
+            by shards.
+        """
+        if idx < 0:
+            idx += self.count()
+        for shard_id, shard in enumerate(self.shards):
+            if idx < shard.count():
+                return self._wrap(shard_id, [shard.get(idx)])[0]
+            idx -= shard.count()
+        raise IndexError("buffer index out of range")
+
+    @apply_middleware("clear")
+    def clear(self) -> None:
+        """
+        Overview:
+            The method that clear all data, indices, and the meta information in the buffer.
+        """
+        for shard, lock in zip(self.shards, self.locks):
+            with lock:
+                shard.clear()
+
+    def _choose_shard(self, meta: Optional[dict]) -> int:
+        if self.shard_key is not None and meta is not None and self.shard_key in meta:
+            return hash(meta[self.shard_key]) % self.num_shards
+        # next() on itertools.count is atomic, so the concurrent producers still take turns on the shards.
+        return next(self._shard_counter) % self.num_shards
+
+    def _encode(self, shard_id: int, shard_index: Union[str, int]) -> Union[str, int]:
+        if isinstance(shard_index, str):
+            return '{}:{}'.format(shard_id, shard_index)
+        return int(shard_index) * self.num_shards + shard_id
+
+    def _decode(self, index: Union[str, int]) -> Tuple[int, Union[str, int]]:
+        if isinstance(index, str):
+            shard_id, shard_index = index.split(':', 1)
+            return int(shard_id), shard_index
+        shard_index, shard_id = divmod(int(index), self.num_shards)
+        return shard_id, shard_index
+
+    def _group_by_shard(self, indices: List) -> Dict[int, List[int]]:
+        groups = defaultdict(list)
+        for i, index in enumerate(indices):
+            groups[self._decode(index)[0]].append(i)
+        return groups
+
+    def _wrap(self, shard_id: int, shard_data: List) -> List:
+        result = []
+        for item in shard_data:
+            if isinstance(item, list):
+                result.append(self._wrap(shard_id, item))
+            elif item.index is None:  # padded by other middleware
+                result.append(item)
+            else:
+                result.append(BufferedData(data=item.data, index=self._encode(shard_id, item.index), meta=item.meta))
+        return result
+
+    def _flatten(self, sampled_data: List) -> Iterator[BufferedData]:
+        for item in sampled_data:
+            if isinstance(item, list):
+                yield from item
+            else:
+                yield item
+
+    def _sample_by_indices(self, indices: List) -> List[BufferedData]:
+        sampled_data = [None] * len(indices)
+        for shard_id, positions in self._group_by_shard(indices).items():
+            with self.locks[shard_id]:
+                shard_data = self.shards[shard_id].sample(indices=[self._decode(indices[i])[1] for i in positions])
+            for i, item in zip(positions, self._wrap(shard_id, shard_data)):
+                sampled_data[i] = item
+        if self.priority and self.IS_weight:
+            self._reweight(sampled_data)
+        return sampled_data
+
+    def _mass(self) -> np.ndarray:
+        # Read without locks, a slightly stale mass only changes the proportion of this sampling.
+        if self.priority:
+            return np.array([per.sum_tree.reduce() for per in self.priority_middleware], dtype=np.float64)
+        return np.array([shard.count() for shard in self.shards], dtype=np.float64)
+
+    def _split_size(self, size: int, replace: bool, groupby: Optional[str]) -> Optional[List[int]]:
+        if groupby:
+            # The groups are sampled uniformly in each shard, and each shard has at most all its groups to
+            # sample without replacement.
+            capacity = np.array([self._count_groups(shard_id, groupby) for shard_id in range(self.num_shards)])
+            mass = self._mass() if self.priority else capacity.astype(np.float64)
+        else:
+            capacity = np.array([shard.count() for shard in self.shards])
+            mass = self._mass()
+            # The records are sampled with replacement by PER
+            replace = replace or self.priority
+        if mass.sum() <= 0:
+            return None
+        counts = np.random.multinomial(size, mass / mass.sum())
+        if replace:
+            return counts.tolist()
+        # Without replacement, move the overflow of the small shards to the shards with spare records (groups).
+        if capacity.sum() < size:
+            return None
+        overflow = np.maximum(counts - capacity, 0).sum()
+        counts = np.minimum(counts, capacity)
+        for shard_id in np.random.permutation(self.num_shards).tolist():
+            if overflow == 0:
+                break
+            extra = min(overflow, capacity[shard_id] - counts[shard_id])
+            counts[shard_id] += extra
+            overflow -= extra
+        return counts.tolist()
+
+    def _count_groups(self, shard_id: int, groupby: str) -> int:
+        with self.locks[shard_id]:
+            return self.shards[shard_id].count_groups(groupby)
+
+    def _reweight(self, sampled_data: List[BufferedData]) -> None:
+        """
+        Overview:
+            Replace the IS weights computed by each shard with the ones over the whole buffer, i.e. \
+            ``(N * P(i)) ** -beta`` normalized by the max weight, where ``P(i)`` is the priority divided by \
+            the sum of priority of all shards.
+        """
+        if len(sampled_data) == 0:
+            return
+        min_weight = min([per.min_tree.reduce() for per in self.priority_middleware])
+        weights = np.empty(len(sampled_data), dtype=np.float64)
+        for i, item in enumerate(sampled_data):
+            shard_id, _ = self._decode(item.index)
+            weights[i] = self.priority_middleware[shard_id].sum_tree[item.meta['priority_idx']]
+        # N and the sum of priority are cancelled out by the normalization.
+        weights = (weights / min_weight) ** (-self.IS_weight_power_factor)
+        for item, weight in zip(sampled_data, weights.tolist()):
+            item.meta['priority_IS'] = weight
+            item.data['priority_IS'] = item.data['priority_IS'].new_full(item.data['priority_IS'].shape, weight)
+        self.IS_weight_power_factor = min(1.0, self.IS_weight_power_factor + self.delta_anneal)
+
+    def __iter__(self) -> Iterator[BufferedData]:
+        for shard_id, shard in enumerate(self.shards):
+            yield from self._wrap(shard_id, list(shard))
+
+    def __copy__(self) -> "ShardedBuffer":
+        buffer = type(self).__new__(type(self))
+        buffer.__dict__.update(self.__dict__)
+        buffer._middleware = []
+        return buffer
@@ -0,0 +1,46 @@
+import os
+import json
+import tempfile
+import pytest
+
+from ding.data.buffer.benchmark import main, compare
+
+
+@pytest.mark.unittest
+def test_benchmark(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        monkeypatch.chdir(tmpdir)
+        output = 'result.json'
+        args = ['--sizes', '200', '--iterations', '3', '--batch-size', '8', '--unroll-len', '4', '--output', output]
+        assert main(args + ['--buffers', 'deque', 'deque+priority', 'deque+frame_deduplication', 'advanced']) == 0
+        # The logs of legacy buffers are not left in the working directory
+        assert os.listdir(tmpdir) == ['result.json']
+        with open(output) as f:
+            report = json.load(f)
+        assert report['meta']['args']['sizes'] == [200]
+        results = {(r['buffer'], r['payload']): r for r in report['results']}
+        # Frame deduplication only runs with image payload.
+        assert len(results) == 7
+        assert ('deque+frame_deduplication', 'vector') not in results
+        assert results[('deque', 'vector')]['priority_update_ms'] is None
+        assert results[('deque+priority', 'vector')]['priority_update_ms']['p50'] > 0
+        assert results[('deque+priority', 'vector')]['group_sample_ms'] is None
+        assert results[('advanced', 'image')]['sample_ms']['p99'] > 0
+        for r in results.values():
+            assert r['push_per_second'] > 0
+            assert r['memory_bytes_per_transition'] > 0
+        assert results[('deque+frame_deduplication', 'image')]['memory_bytes_per_transition'] < \
+            results[('deque', 'image')]['memory_bytes_per_transition']
+
+        # Compare with a slower run.
+        slower = json.loads(json.dumps(report))
+        for r in slower['results']:
+            r['push_per_second'] /= 2
+        diffs = compare(report, slower, threshold=0.1)
+        assert all(d['regression'] for d in diffs if d['metric'] == 'push_per_second')
+        assert not any(d['regression'] for d in diffs if d['metric'] != 'push_per_second')
+        slower_file = os.path.join(tmpdir, 'slower.json')
+        with open(slower_file, 'w') as f:
+            json.dump(slower, f)
+        assert main(['--compare', output, slower_file]) == 1
+        assert main(['--compare', output, output]) == 0
@@ -1,10 +1,12 @@
 import os
 import pytest
 import time
+import itertools
 import random
 import functools
 import tempfile
 from typing import Callable
+from collections import deque
 from ding.data.buffer import DequeBuffer
 from ding.data.buffer.buffer import BufferedData
 from torch.utils.data import DataLoader
@@ -350,3 +352,54 @@ def test_slice_unroll_len_in_group():
         assert isinstance(result, BufferedData), "Not continuous"
         # Ensure data after sliced start from correct index
         assert grouped_data[0].data in start_index
+
+
+@pytest.mark.unittest
+def test_push_sample_delete_stress():
+    maxlen = 20000
+    buf = DequeBuffer(size=maxlen)
+    buf.meta_index = {"label": deque(maxlen=maxlen)}
+    count = 0
+    for step in range(50):
+        for _ in range(random.randint(500, 2000)):
+            buf.push(count, {"label": count})
+            count += 1
+        sampled = buf.sample(min(512, buf.count()))
+        buf.delete([item.index for item in sampled[:random.randint(0, len(sampled))]])
+        # The index should always point to the right record.
+        for item in buf.sample(min(64, buf.count())):
+            assert buf.storage[buf.indices.get(item.index)].index == item.index
+        assert len(buf.indices) == len(buf.storage) == len(buf.meta_index["label"])
+        assert all([a.data == b for a, b in zip(itertools.islice(buf.storage, 100), buf.meta_index["label"])])
+    assert buf.count() <= maxlen
+    for i in random.sample(range(buf.count()), 100):
+        assert buf.indices.get(buf.storage[i].index) == i
+
+
+@pytest.mark.unittest
+def test_group_index_stress():
+    maxlen = 2000
+    buf = DequeBuffer(size=maxlen)
+    buf.sample(1, groupby="env", replace=True, ignore_insufficient=True)
+    count = 0
+    for step in range(30):
+        for _ in range(random.randint(100, 500)):
+            buf.push(count, {"env": random.randint(0, 7)})
+            count += 1
+        sampled = buf.sample(min(64, buf.count()))
+        buf.delete([item.index for item in sampled[:random.randint(0, len(sampled))]])
+        for item in sampled[:8]:
+            buf.update(item.index, meta={"env": random.randint(0, 7)})
+        # The group index should be the same as grouping the whole buffer in order.
+        expected = {}
+        for item in buf.storage:
+            expected.setdefault(item.meta["env"], []).append(item.data)
+        group_index = buf.group_index["env"]
+        assert sorted(group_index.names) == sorted(expected.keys())
+        for env_id, data in expected.items():
+            group = group_index.get(env_id)
+            assert [item.data for item in group.slice(0, len(group))] == data
+        for grouped_data in buf.sample(4, groupby="env", unroll_len=3, replace=True):
+            assert len(grouped_data) == 3
+            assert len(set(item.meta["env"] for item in grouped_data)) == 1
+            assert grouped_data[0].data < grouped_data[1].data < grouped_data[2].data
@@ -1,12 +1,15 @@
 import sys
+import threading
+import time
 import timeit
+import tracemalloc
 import torch
 import random
 import pytest
 import numpy as np
 
-from ding.data.buffer import DequeBuffer
-from ding.data.buffer.middleware import clone_object, PriorityExperienceReplay
+from ding.data.buffer import DequeBuffer, ColumnarBuffer, ShardedBuffer
+from ding.data.buffer.middleware import clone_object, PriorityExperienceReplay, FrameDeduplication, Compression
 
 # test different buffer size, eg: 1000, 10000, 100000;
 size_list = [1000, 10000]
@@ -14,12 +17,14 @@ size_list = [1000, 10000]
 data_dim_list = [32, 128]
 # repeat times.
 repeats = 100
+# storage backends to compare.
+buffer_class_dict = {'deque': DequeBuffer, 'columnar': ColumnarBuffer}
 
 
 class BufferBenchmark:
 
-    def __init__(self, buffer_size, data_dim, buffer_type='base') -> None:
-        self._buffer = DequeBuffer(size=buffer_size)
+    def __init__(self, buffer_size, data_dim, buffer_type='base', storage='deque') -> None:
+        self._buffer = buffer_class_dict[storage](size=buffer_size)
         self._meta = dict()
         if buffer_type == "clone":
             self._buffer.use(clone_object())
@@ -60,15 +65,16 @@ def get_mean_std(res):
 
 
 @pytest.mark.benchmark
+@pytest.mark.parametrize('storage', ['deque', 'columnar'])
 @pytest.mark.parametrize('buffer_type', ['base', 'clone', 'priority'])
-def test_benchmark(buffer_type):
+def test_benchmark(buffer_type, storage):
     for size in size_list:
         for dim in data_dim_list:
             assert size >= 128, "size is too small, please set an int no less than 128!"
 
-            buffer_test = BufferBenchmark(size, dim, buffer_type)
+            buffer_test = BufferBenchmark(size, dim, buffer_type, storage)
 
-            print("exp-buffer_{}_{}-data_{:.2f}_KB".format(buffer_type, size, buffer_test.data_storage()))
+            print("exp-{}_buffer_{}_{}-data_{:.2f}_KB".format(storage, buffer_type, size, buffer_test.data_storage()))
 
             # test pushing
             mean, std = get_mean_std(timeit.repeat(buffer_test.push_op, number=repeats))
@@ -93,3 +99,222 @@ def test_benchmark(buffer_type):
                 print("Groupby Sample Test:  mean {:.4f} s, std {:.4f} s".format(mean, std))
 
             print("=" * 100)
+
+
+def get_transition(obs_shape):
+    return {
+        'obs': np.random.randint(0, 255, size=obs_shape, dtype=np.uint8),
+        'next_obs': np.random.randint(0, 255, size=obs_shape, dtype=np.uint8),
+        'action': np.random.randint(0, 6, size=(1, )),
+        'reward': np.random.rand(1).astype(np.float32),
+        'done': False,
+    }
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize('storage', ['deque', 'columnar'])
+def test_storage_memory_benchmark(storage):
+    # Memory is traced by tracemalloc, so the payloads are numpy arrays (torch allocations are invisible to it).
+    for size in size_list:
+        for obs_shape in [(4, ), (4, 84, 84)]:
+            tracemalloc.start()
+            buffer_ = buffer_class_dict[storage](size=size)
+            for _ in range(size):
+                buffer_.push(get_transition(obs_shape))
+            memory, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            payload = sum([v.nbytes for v in get_transition(obs_shape).values() if isinstance(v, np.ndarray)])
+            print(
+                "exp-{}_buffer_{}-obs_{}: {:.2f} MB, {:.1f} bytes per transition, payload {} bytes".format(
+                    storage, size, obs_shape, memory / 1024 ** 2, memory / size, payload
+                )
+            )
+            mean, std = get_mean_std(timeit.repeat(lambda: buffer_.sample(128), number=repeats))
+            print("Sample Test:  mean {:.4f} s, std {:.4f} s".format(mean, std))
+            print("=" * 100)
+
+
+def get_stacked_transitions(num, episode_len=100, n_frames=4):
+    # Consecutive transitions of FrameStackWrapper, which share the frames with their neighbours.
+    transitions = []
+    while len(transitions) < num:
+        frames = np.random.randint(0, 255, size=(episode_len + n_frames, 84, 84), dtype=np.uint8)
+        for i in range(min(episode_len, num - len(transitions))):
+            transitions.append(
+                {
+                    'obs': frames[i:i + n_frames],
+                    'next_obs': frames[i + 1:i + 1 + n_frames],
+                    'action': np.random.randint(0, 6, size=(1, )),
+                    'done': i == episode_len - 1,
+                }
+            )
+    return transitions
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize('storage', ['deque', 'columnar'])
+def test_frame_deduplication_memory_benchmark(storage):
+    size = 2000
+    transitions = get_stacked_transitions(size)
+    memory = {}
+    for dedup in [False, True]:
+        tracemalloc.start()
+        buffer_ = buffer_class_dict[storage](size=size)
+        if dedup:
+            buffer_.use(FrameDeduplication(buffer_))
+        for t in transitions:
+            # Copy the stacked frames like the observations returned by the env.
+            buffer_.push({k: v.copy() if isinstance(v, np.ndarray) else v for k, v in t.items()})
+        memory[dedup], _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        mean, std = get_mean_std(timeit.repeat(lambda: buffer_.sample(128), number=repeats // 10))
+        print(
+            "exp-{}_dedup_{}: {:.2f} MB, sample 128 mean {:.4f} s, std {:.4f} s".format(
+                storage, dedup, memory[dedup] / 1024 ** 2, mean, std
+            )
+        )
+    print("Memory reduction: {:.1f}x".format(memory[False] / memory[True]))
+    assert memory[False] / memory[True] > 6
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize('num_workers', [0, 4])
+def test_compression_benchmark(num_workers):
+    size = 2000
+    # Pixel observations are mostly flat background with a few moving objects.
+    obs = np.zeros((size, 4, 84, 84), dtype=np.uint8)
+    for i in range(size):
+        x, y = np.random.randint(0, 76, size=2)
+        obs[i, :, x:x + 8, y:y + 8] = np.random.randint(0, 255, size=(4, 8, 8))
+    for codec in ['lz4', 'zlib']:
+        buffer_ = DequeBuffer(size=size)
+        compression = Compression(fields={'obs': codec, 'next_obs': codec}, num_workers=num_workers)
+        buffer_.use(compression)
+        for i in range(size):
+            buffer_.push({'obs': obs[i], 'next_obs': obs[i], 'reward': 1.})
+        mean, std = get_mean_std(timeit.repeat(lambda: buffer_.sample(128), number=repeats // 10))
+        stats = compression.stats()
+        print(
+            "exp-{}_workers_{}: ratio {:.1f}, decode {:.3f} ms per sample, sample 128 mean {:.4f} s, std {:.4f} s".
+            format(codec, num_workers, stats['compression_ratio'], stats['decode_ms_per_sample'], mean, std)
+        )
+        compression.close()
+
+
+class GlobalLockBuffer:
+    # DequeBuffer with PER behind one lock, the same as AdvancedReplayBuffer.
+
+    def __init__(self, size):
+        self.buffer = DequeBuffer(size=size)
+        self.buffer.use(PriorityExperienceReplay(self.buffer))
+        self.lock = threading.Lock()
+
+    def push(self, *args, **kwargs):
+        with self.lock:
+            return self.buffer.push(*args, **kwargs)
+
+    def sample(self, *args, **kwargs):
+        with self.lock:
+            return self.buffer.sample(*args, **kwargs)
+
+    def update(self, *args, **kwargs):
+        with self.lock:
+            return self.buffer.update(*args, **kwargs)
+
+    def count(self):
+        return self.buffer.count()
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize('num_producers', [1, 4, 16])
+def test_contention_benchmark(num_producers):
+    size, num_pushes, duration = 100000, 20000, 0.0
+    data = {'obs': np.zeros((4, ), dtype=np.float32), 'reward': 1.}
+    buffers = {
+        'global_lock': lambda: GlobalLockBuffer(size),
+        'sharded_4': lambda: ShardedBuffer(size, num_shards=4, priority=True),
+        'sharded_16': lambda: ShardedBuffer(size, num_shards=16, priority=True),
+    }
+    for name, buffer_fn in buffers.items():
+        buffer_ = buffer_fn()
+        for _ in range(1000):
+            buffer_.push(data, {'priority': 1.0})
+        stop = threading.Event()
+        sample_count = [0]
+
+        def producer():
+            for _ in range(num_pushes // num_producers):
+                buffer_.push(data, {'priority': 1.0})
+
+        def learner():
+            while not stop.is_set():
+                sampled = buffer_.sample(64)
+                buffer_.update([d.index for d in sampled], None, [d.meta for d in sampled])
+                sample_count[0] += 1
+
+        producers = [threading.Thread(target=producer) for _ in range(num_producers)]
+        sampler = threading.Thread(target=learner)
+        start = time.time()
+        sampler.start()
+        for t in producers:
+            t.start()
+        for t in producers:
+            t.join()
+        duration = time.time() - start
+        stop.set()
+        sampler.join()
+        print(
+            "exp-{}_producers_{}: {:.0f} pushes/s, {:.0f} samples/s".format(
+                name, num_producers, num_pushes / duration, sample_count[0] / duration
+            )
+        )
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize('buffer_type', ['base', 'priority'])
+def test_delete_benchmark(buffer_type):
+    # Interleave push/sample/delete, the cost of delete should not grow with buffer size.
+    for size in [int(1e5), int(1e6)]:
+        buffer_ = DequeBuffer(size=size)
+        if buffer_type == 'priority':
+            buffer_.use(PriorityExperienceReplay(buffer_))
+        for i in range(size):
+            buffer_.push({'data': i}, meta={})
+        delete_time = []
+        for _ in range(repeats):
+            indices = [item.index for item in buffer_.sample(128)]
+            start = timeit.default_timer()
+            buffer_.delete(indices)
+            delete_time.append(timeit.default_timer() - start)
+            for i in range(128):
+                buffer_.push({'data': i}, meta={})
+        print(
+            "exp-buffer_{}_{}: delete 128 records mean {:.4f} ms, std {:.4f} ms".format(
+                buffer_type, size,
+                np.mean(delete_time) * 1000,
+                np.std(delete_time) * 1000
+            )
+        )
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize('size', [10000, 100000, 1000000])
+def test_group_sample_benchmark(size):
+    # Sequence sampling like R2D2, sample_range forces grouping by scanning the records in range.
+    buffer = DequeBuffer(size=size)
+    for i in range(size):
+        buffer.push(i, {'env': i % 8})
+    # Build the group index, which is O(size) only once.
+    buffer.sample(32, groupby='env', unroll_len=40, replace=True)
+    for name, kwargs in [('scan', {'sample_range': slice(0, size)}), ('group index', {})]:
+        number = 3 if name == 'scan' else 100
+        cost = timeit.timeit(
+            lambda: buffer.sample(32, groupby='env', unroll_len=40, replace=True, **kwargs), number=number
+        )
+        print("Group sample of size {}, {}: {:.4f} ms".format(size, name, cost * 1000 / number))
+    # Keep sampling while the buffer is evicting records.
+    start = time.time()
+    for i in range(1000):
+        buffer.push(i, {'env': i % 8})
+        buffer.sample(32, groupby='env', unroll_len=40, replace=True)
+    print("Push and group sample of size {}: {:.4f} ms".format(size, (time.time() - start) * 1000 / 1000))
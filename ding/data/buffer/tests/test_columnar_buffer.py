@@ -0,0 +1,236 @@
+import os
+import pytest
+import random
+import functools
+import tempfile
+import numpy as np
+import torch
+import treetensor.torch as ttorch
+from easydict import EasyDict
+from ding.data.buffer import ColumnarBuffer
+from ding.data.buffer.buffer import BufferedData
+from ding.data.buffer.middleware import use_time_check, staleness_check, PriorityExperienceReplay, group_sample
+from ding.data.buffer.middleware.padding import padding
+
+
+def get_transition(i: int = 0):
+    return {
+        'obs': torch.full((4, ), float(i)),
+        'action': np.array([i]),
+        'reward': float(i),
+        'done': False,
+        'info': {
+            'step': i,
+            'name': 'xxx'
+        },
+    }
+
+
+@pytest.mark.unittest
+def test_naive_push_sample():
+    buffer = ColumnarBuffer(size=10)
+    for i in range(20):
+        buffer.push(get_transition(i))
+    assert buffer.count() == 10
+    data = buffer.sample(10)
+    assert sorted([item.data['reward'] for item in data]) == list(range(10, 20))
+    for item in data:
+        assert isinstance(item.index, int)
+        assert item.data['obs'].shape == (4, )
+        assert item.data['obs'][0] == item.data['reward'] == item.data['action'][0] == item.data['info']['step']
+        assert item.data['info']['name'] == 'xxx'
+    assert [item.data['reward'] for item in buffer] == list(range(10, 20))
+    assert buffer.get(0).data['reward'] == 10
+    assert buffer.storage.nbytes() > 0
+
+    # Sampled data don't share memory with the buffer
+    data[0].data['obs'] += 100
+    assert all([item.data['obs'][0] < 100 for item in buffer.sample(10)])
+
+    buffer.clear()
+    assert buffer.count() == 0
+    for i in range(5):
+        buffer.push(get_transition(i))
+    assert len(buffer.sample(10, replace=True)) == 10
+    with pytest.raises(ValueError):
+        buffer.sample(6)
+    assert len(buffer.sample(6, ignore_insufficient=True)) == 0
+    sampled_data = buffer.sample(2, sample_range=slice(3, 5))
+    assert all([item.data['reward'] >= 3 for item in sampled_data])
+
+
+@pytest.mark.unittest
+def test_schema():
+    buffer = ColumnarBuffer(size=4)
+    for i in range(3):
+        buffer.push(i)
+    assert sorted([item.data for item in buffer.sample(3)]) == [0, 1, 2]
+
+    buffer = ColumnarBuffer(size=4)
+    buffer.push(ttorch.as_tensor({'obs': torch.randn(3), 'done': False}))
+    item = buffer.sample(1)[0]
+    assert isinstance(item.data, ttorch.Tensor)
+    assert item.data.obs.shape == (3, )
+
+    buffer = ColumnarBuffer(size=4)
+    buffer.push(EasyDict(get_transition()))
+    assert isinstance(buffer.sample(1)[0].data, EasyDict)
+    with pytest.raises(ValueError):
+        buffer.push({'obs': torch.randn(4)})
+    with pytest.raises(ValueError):
+        buffer.push(EasyDict(get_transition(), obs=torch.randn(5)))
+
+    # The rejected data doesn't overwrite any field of the oldest item in the full ring
+    buffer = ColumnarBuffer(size=2)
+    buffer.push(get_transition(0))
+    buffer.push(get_transition(1))
+    with pytest.raises(ValueError):
+        buffer.push(dict(get_transition(2), action=np.array([2, 2])))
+    with pytest.raises(ValueError):
+        buffer.push(dict(get_transition(2), obs=torch.full((4, ), 2), action=np.array([2.5])))
+    item = buffer.get(0)
+    assert torch.equal(item.data['obs'], torch.zeros(4)) and item.data['action'].tolist() == [0]
+    assert item.data['reward'] == 0. and item.data['info']['step'] == 0
+
+    # The python scalars are not truncated by the type of the first pushed data
+    buffer = ColumnarBuffer(size=4)
+    buffer.push({'reward': 1, 'done': False})
+    buffer.push({'reward': 0.5, 'done': True})
+    assert [item.data['reward'] for item in buffer] == [1.0, 0.5]
+    assert [item.data['done'] for item in buffer] == [False, True]
+
+
+@pytest.mark.unittest
+def test_update_and_delete():
+    buffer = ColumnarBuffer(size=10)
+    indices = [buffer.push(get_transition(i), {'label': i}).index for i in range(10)]
+    assert buffer.update(indices[0], get_transition(100), {'label': 100})
+    item = buffer.sample(indices=[indices[0]])[0]
+    assert item.data['reward'] == 100 and item.meta['label'] == 100
+    assert not buffer.update(-1, None, {})
+
+    buffer.delete(indices[:3])
+    assert buffer.count() == 7
+    assert not buffer.update(indices[0], None, {})
+    with pytest.raises(KeyError):
+        buffer.sample(indices=indices[:1])
+    assert len(buffer.sample(7)) == 7
+    assert [item.meta['label'] for item in buffer] == list(range(3, 10))
+    # Overwritten data is no longer visible
+    buffer.push(get_transition(10))
+    assert buffer.count() == 8
+    assert [item.data['reward'] for item in buffer][-1] == 10
+
+
+@pytest.mark.unittest
+def test_independence():
+    buffer = ColumnarBuffer(size=1)
+    buffered = buffer.push({'key': torch.zeros(1)}, {'label': 0})
+    sampled_data = buffer.sample(indices=[buffered.index, buffered.index])
+    assert len(sampled_data) == 2
+    sampled_data[0].data['key'][0] = 1
+    sampled_data[0].meta['label'] = 1
+    assert sampled_data[1].data['key'][0] == 0
+    assert sampled_data[1].meta['label'] == 0
+
+
+@pytest.mark.unittest
+def test_load_and_save():
+    buffer = ColumnarBuffer(size=10)
+    for i in range(15):
+        buffer.push(get_transition(i), {'label': i})
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        test_file = os.path.join(tmpdirname, "data.hkl")
+        buffer.save_data(test_file)
+        buffer_new = ColumnarBuffer(size=10)
+        buffer_new.load_data(test_file)
+        assert buffer_new.count() == 10
+        assert [item.meta['label'] for item in buffer_new] == list(range(5, 15))
+        assert all([item.data['reward'] >= 5 for item in buffer_new.sample(10)])
+
+
+@pytest.mark.unittest
+def test_buffer_view():
+    buf1 = ColumnarBuffer(size=10)
+    buf1.push(get_transition())
+    buf2 = buf1.view().use(use_time_check(buf1, max_use=1))
+    buf2.push(get_transition())
+    assert len(buf1._middleware) == 0
+    assert buf1.count() == 2
+    buf2.sample(2)
+    assert buf1.count() == 0
+
+
+@pytest.mark.unittest
+def test_unroll_len_in_group():
+    for sliced in [False, True]:
+        buffer = ColumnarBuffer(size=100, sliced=sliced)
+        for i in range(10):
+            for env_id in list("ABC"):
+                buffer.push(i, {"env": env_id})
+
+        sampled_data = buffer.sample(3, groupby="env", unroll_len=4)
+        assert len(sampled_data) == 3
+        for grouped_data in sampled_data:
+            assert len(grouped_data) == 4
+            env_ids = set(map(lambda sample: sample.meta["env"], grouped_data))
+            assert len(env_ids) == 1
+            result = functools.reduce(lambda a, b: a and a.data + 1 == b.data and b, grouped_data)
+            assert isinstance(result, BufferedData), "Not continuous"
+        with pytest.raises(ValueError):
+            buffer.sample(4, groupby="env", unroll_len=4)
+        assert len(buffer.sample(4, groupby="env", unroll_len=4, replace=True)) == 4
+
+
+@pytest.mark.unittest
+def test_middleware():
+    # use_time_check
+    buffer = ColumnarBuffer(size=10)
+    buffer.use(use_time_check(buffer, max_use=2))
+    for i in range(6):
+        buffer.push(get_transition(i))
+    for _ in range(2):
+        assert len(buffer.sample(size=6)) == 6
+    with pytest.raises(ValueError):
+        buffer.sample(size=1)
+
+    # staleness_check
+    buffer = ColumnarBuffer(size=10)
+    buffer.use(staleness_check(buffer, max_staleness=10))
+    for i in range(6):
+        buffer.push(get_transition(i), meta={'train_iter_data_collected': 0})
+    assert len(buffer.sample(size=6, train_iter_sample_data=10)) == 6
+    for i in range(2):
+        buffer.push(get_transition(i), meta={'train_iter_data_collected': 5})
+    with pytest.raises(ValueError):
+        buffer.sample(size=6, train_iter_sample_data=11)
+    assert buffer.count() == 2
+
+    # group_sample
+    buffer = ColumnarBuffer(size=10)
+    buffer.use(padding(policy="none")).use(group_sample(size_in_group=5))
+    for i in range(4):
+        buffer.push(i, {"episode": 0})
+    for i in range(6):
+        buffer.push(i, {"episode": 1})
+    for grouped_data in buffer.sample(2, groupby="episode"):
+        assert len(grouped_data) == 5
+
+
+@pytest.mark.unittest
+def test_priority():
+    N = 5
+    buffer = ColumnarBuffer(size=10)
+    buffer.use(PriorityExperienceReplay(buffer, IS_weight=True))
+    for i in range(N + N):
+        buffer.push(get_transition(i), meta={'priority': 2.0})
+    data = buffer.sample(size=N + N)
+    for item in data:
+        assert set(item.meta.keys()).issuperset(set(['priority', 'priority_idx', 'priority_IS']))
+        assert 'priority_IS' in item.data
+        item.meta['priority'] = 3.0
+        buffer.update(item.index, None, item.meta)
+    data = buffer.sample(size=1)
+    assert data[0].meta['priority'] == 3.0
+    buffer.clear()
+    assert buffer.count() == 0
@@ -0,0 +1,109 @@
+import os
+import pytest
+import tempfile
+import numpy as np
+import torch
+from ding.data.buffer import MemmapBuffer
+from ding.data.buffer.middleware import PriorityExperienceReplay
+
+
+def get_transition(i: int = 0):
+    return {
+        'obs': torch.full((4, ), float(i)),
+        'action': np.array([i]),
+        'reward': float(i),
+        'done': False,
+        'info': {
+            'step': i,
+            'name': 'xxx'
+        },
+    }
+
+
+@pytest.mark.unittest
+def test_naive_push_sample():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        buffer = MemmapBuffer(size=10, path=tmpdirname, cache_size=4)
+        for i in range(20):
+            buffer.push(get_transition(i))
+        assert buffer.count() == 10
+        assert os.path.exists(os.path.join(tmpdirname, 'obs.npy'))
+        data = buffer.sample(10)
+        assert sorted([item.data['reward'] for item in data]) == list(range(10, 20))
+        for item in data:
+            assert isinstance(item.data['obs'], torch.Tensor)
+            assert item.data['obs'][0] == item.data['reward'] == item.data['action'][0] == item.data['info']['step']
+            assert item.data['info']['name'] == 'xxx'
+        # The newest 4 records are read from RAM.
+        assert buffer.storage.cache_hits == 4 and buffer.storage.cache_misses == 6
+        assert [item.data['reward'] for item in buffer] == list(range(10, 20))
+        buffer.storage.close()
+
+
+@pytest.mark.unittest
+def test_reopen():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        buffer = MemmapBuffer(size=10, path=tmpdirname, cache_size=0)
+        indices = [buffer.push(get_transition(i), {'label': i}).index for i in range(15)]
+        buffer.update(indices[-1], get_transition(100), {'label': 100})
+        buffer.delete(indices[-2])
+        # The process is killed without flushing, only the log is left. Keep the crashed buffer alive, so that
+        # its file is not flushed on garbage collection.
+        crashed = buffer  # noqa
+
+        buffer = MemmapBuffer(size=10, path=tmpdirname, cache_size=0)
+        assert buffer.count() == 9
+        assert [item.meta['label'] for item in buffer] == list(range(5, 13)) + [100]
+        assert buffer.sample(indices=[indices[-1]])[0].data['reward'] == 100
+        assert buffer.push(get_transition(15)).index == 15
+        buffer.storage.close()
+
+        with pytest.raises(ValueError):
+            MemmapBuffer(size=20, path=tmpdirname)
+
+
+@pytest.mark.unittest
+def test_promote():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        buffer = MemmapBuffer(size=10, path=tmpdirname, cache_size=2)
+        buffer.push({'reward': 1, 'obs': np.zeros(2)})
+        buffer.push({'reward': 0.5, 'obs': np.zeros(2)})
+        assert [item.data['reward'] for item in buffer] == [1.0, 0.5]
+        # The cached rows are promoted too
+        assert sorted([item.data['reward'] for item in buffer.sample(2)]) == [0.5, 1.0]
+        assert buffer.storage.cache_hits == 2
+        buffer.storage.close()
+        # The promoted dtype is kept after reopening
+        buffer = MemmapBuffer(size=10, path=tmpdirname, cache_size=2)
+        assert [item.data['reward'] for item in buffer] == [1.0, 0.5]
+        buffer.storage.close()
+
+
+@pytest.mark.unittest
+def test_load_and_save():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        buffer = MemmapBuffer(size=10, path=os.path.join(tmpdirname, 'a'))
+        for i in range(15):
+            buffer.push(get_transition(i), {'label': i})
+        test_file = os.path.join(tmpdirname, "data.hkl")
+        buffer.save_data(test_file)
+        buffer_new = MemmapBuffer(size=10, path=os.path.join(tmpdirname, 'b'))
+        buffer_new.load_data(test_file)
+        assert buffer_new.count() == 10
+        assert [item.meta['label'] for item in buffer_new] == list(range(5, 15))
+
+
+@pytest.mark.unittest
+def test_priority():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        buffer = MemmapBuffer(size=10, path=tmpdirname)
+        buffer.use(PriorityExperienceReplay(buffer, IS_weight=True))
+        for i in range(20):
+            buffer.push(get_transition(i), meta={'priority': 2.0})
+        data = buffer.sample(size=10)
+        for item in data:
+            item.meta['priority'] = 3.0
+        buffer.update([item.index for item in data], None, [item.meta for item in data])
+        assert all([item.meta['priority'] == 3.0 for item in buffer.sample(size=10)])
+        buffer.clear()
+        assert buffer.count() == 0
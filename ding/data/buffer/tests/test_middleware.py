@@ -1,8 +1,11 @@
+import random
 import pytest
+import numpy as np
 import torch
-from ding.data.buffer import DequeBuffer
+import treetensor.torch as ttorch
+from ding.data.buffer import DequeBuffer, ColumnarBuffer
 from ding.data.buffer.middleware import clone_object, use_time_check, staleness_check, sample_range_view
-from ding.data.buffer.middleware import PriorityExperienceReplay, group_sample
+from ding.data.buffer.middleware import PriorityExperienceReplay, group_sample, FrameDeduplication, Compression
 from ding.data.buffer.middleware.padding import padding
 
 
@@ -110,6 +113,27 @@ def test_priority():
     assert buffer.count() == 0
 
 
+@pytest.mark.unittest
+def test_priority_batch_update():
+    N = 8
+    buffer = DequeBuffer(size=N)
+    per = PriorityExperienceReplay(buffer, IS_weight=True)
+    buffer.use(per)
+    for _ in range(N):
+        buffer.push(get_data(), meta={'priority': 1.0})
+    data = buffer.sample(size=N)
+    assert all([item.data['priority_IS'].shape == (1, ) for item in data])
+    index = [item.index for item in data] + ['invalidindex']
+    meta = [item.meta for item in data] + [{'priority': 100.0, 'priority_idx': 0}]
+    for i, m in enumerate(meta[:-1]):
+        m['priority'] = float(m['priority_idx'] + 1)
+    flags = buffer.update(index, None, meta)
+    assert flags == [True] * N + [False]
+    assert per.max_priority == pytest.approx(N, abs=1e-3)
+    assert per.sum_tree.reduce() == pytest.approx(sum([(i + 1 + 1e-5) ** 0.6 for i in range(N)]))
+    assert per.min_tree.reduce() == pytest.approx((1 + 1e-5) ** 0.6)
+
+
 @pytest.mark.unittest
 def test_priority_from_collector():
     N = 5
@@ -208,3 +232,216 @@ def test_sample_range_view():
     for _ in range(10):
         sampled_data = buffer2.sample(1)
         assert sampled_data[0].data['data'] == 'z'
+
+
+@pytest.mark.unittest
+@pytest.mark.parametrize('buffer_cls', [DequeBuffer, ColumnarBuffer])
+def test_priority_delete_stress(buffer_cls):
+    size = 1000
+    buffer = buffer_cls(size=size)
+    per = PriorityExperienceReplay(buffer, IS_weight=True, priority_power_factor=1.)
+    buffer.use(use_time_check(buffer, max_use=3)).use(per)
+    for step in range(200):
+        for _ in range(random.randint(0, 50)):
+            buffer.push(get_data(), meta={'priority': random.random() + 0.1})
+        if buffer.count() >= 64:
+            data = buffer.sample(size=64)
+            for item in data:
+                item.meta['priority'] = random.random() + 0.1
+            buffer.update([item.index for item in data], None, [item.meta for item in data])
+            buffer.delete([item.index for item in data[:random.randint(0, 8)]])
+        # Each record in buffer owns exactly one slot of the trees.
+        live = list(buffer.storage)
+        assert len(per.index_to_slot) == len(live) == buffer.count()
+        slots = [item.meta['priority_idx'] for item in live]
+        assert len(set(slots)) == len(slots)
+        assert all([per.buffer_idx[slot] == item.index for slot, item in zip(slots, live)])
+        assert per.sum_tree.reduce() == pytest.approx(sum([per.sum_tree[slot] for slot in slots]))
+        assert len(per.push_order) <= 2 * len(per.index_to_slot) + 16
+
+
+@pytest.mark.unittest
+def test_priority_delete_int_index():
+    buffer = ColumnarBuffer(size=8)
+    per = PriorityExperienceReplay(buffer, IS_weight=True)
+    buffer.use(per)
+    indices = [buffer.push({'x': np.array([i])}).index for i in range(3)]
+    buffer.delete(indices[0])
+    assert buffer.count() == 2
+    assert sorted(per.index_to_slot.keys()) == sorted(indices[1:])
+
+
+@pytest.mark.unittest
+def test_priority_rejected_push():
+
+    def reject(action, chain, *args, **kwargs):
+        if action == 'push' and args[0].get('reject'):
+            return None
+        return chain(*args, **kwargs)
+
+    buffer = DequeBuffer(size=4)
+    per = PriorityExperienceReplay(buffer, IS_weight=True)
+    buffer.use(per).use(reject)
+    for i in range(4):
+        buffer.push({'data': i}, meta={'priority': i + 1.})
+    sum_priority = per.sum_tree.reduce()
+    # The rejected push of the full buffer keeps the slot of the oldest record
+    assert buffer.push({'reject': True}) is None
+    assert buffer.count() == len(per.index_to_slot) == 4
+    assert all([per.buffer_idx[item.meta['priority_idx']] == item.index for item in buffer.storage])
+    assert per.sum_tree.reduce() == pytest.approx(sum_priority)
+    buffer.push({'data': 4})
+    assert [item.data['data'] for item in buffer.storage] == [1, 2, 3, 4]
+    assert all([per.buffer_idx[item.meta['priority_idx']] == item.index for item in buffer.storage])
+    assert len(per.index_to_slot) == 4
+
+
+def get_stacked_episode(episode_len: int, n_frames: int = 4, seed: int = 0):
+    # Transitions with stacked frames like FrameStackWrapper, the first frame is repeated after reset.
+    frames = torch.randint(
+        0, 255, (episode_len + 1, 3, 3), dtype=torch.uint8, generator=torch.Generator().manual_seed(seed)
+    )
+    padded = torch.cat([frames[:1].repeat(n_frames - 1, 1, 1), frames])
+    return [
+        {
+            'obs': padded[i:i + n_frames],
+            'next_obs': padded[i + 1:i + 1 + n_frames],
+            'reward': float(i),
+            'done': i == episode_len - 1,
+            'episode': seed
+        } for i in range(episode_len)
+    ]
+
+
+@pytest.mark.unittest
+@pytest.mark.parametrize('buffer_cls', [DequeBuffer, ColumnarBuffer])
+def test_frame_deduplication(buffer_cls):
+    buffer = buffer_cls(size=100)
+    dedup = FrameDeduplication(buffer)
+    buffer.use(dedup)
+    episodes = [get_stacked_episode(10, seed=i) for i in range(3)]
+    for transition in sum(episodes, []):
+        buffered = buffer.push(transition, {'episode': transition['episode']})
+        assert buffered.data['obs'].shape == (4, 3, 3)
+    # Each frame is stored once
+    assert len(dedup.frames) == 3 * 11
+    for item in buffer.sample(30):
+        transition = episodes[item.data['episode']][int(item.data['reward'])]
+        assert item.data['obs'].equal(transition['obs'])
+        assert item.data['next_obs'].equal(transition['next_obs'])
+    # Grouped samples are rebuilt too
+    for grouped_data in buffer.sample(2, groupby='episode'):
+        for item in grouped_data:
+            assert item.data['obs'].shape == (4, 3, 3)
+
+    # Frames of the deleted and evicted records are released
+    buffer.delete([item.index for item in buffer.sample(10)])
+    assert buffer.count() == 20
+    for transition in sum([get_stacked_episode(10, seed=i + 3) for i in range(10)], []):
+        buffer.push(transition)
+    assert buffer.count() == 100
+    assert len(dedup.frames) == 10 * 11
+    assert len(dedup.index_to_frames) == 100
+    for item in buffer.sample(100):
+        assert item.data['obs'][1:].equal(item.data['next_obs'][:-1])
+    buffer.clear()
+    assert len(dedup.frames) == 0
+
+
+@pytest.mark.unittest
+def test_frame_deduplication_with_priority():
+    buffer = DequeBuffer(size=10)
+    buffer.use(PriorityExperienceReplay(buffer, IS_weight=True)).use(FrameDeduplication(buffer, keys=['obs']))
+    for transition in get_stacked_episode(10):
+        buffer.push(ttorch.as_tensor(transition))
+    for item in buffer.sample(4):
+        assert isinstance(item.data['obs'], torch.Tensor)
+        assert item.data['obs'].shape == (4, 3, 3)
+        assert 'priority_IS' in item.data
+        assert isinstance(item.data['next_obs'], torch.Tensor)
+    data = {'obs': np.zeros((4, 3, 3), dtype=np.uint8)}
+    buffer = DequeBuffer(size=10)
+    buffer.use(FrameDeduplication(buffer))
+    buffered = buffer.push(data)
+    assert buffer.update(buffered.index, {'obs': np.ones((4, 3, 3), dtype=np.uint8)})
+    assert buffer.sample(1)[0].data['obs'].sum() == 36
+
+
+@pytest.mark.unittest
+@pytest.mark.parametrize('buffer_cls', [DequeBuffer, ColumnarBuffer])
+def test_compression(buffer_cls):
+    buffer = buffer_cls(size=10)
+    compression = Compression(fields={'obs': 'lz4', 'next_obs': 'zlib'}, num_workers=2)
+    buffer.use(compression)
+    for i in range(20):
+        obs = torch.full((4, 32, 32), i, dtype=torch.uint8)
+        buffered = buffer.push({'obs': obs, 'next_obs': obs.numpy() + 1, 'reward': float(i)}, {'env': i % 2})
+        assert buffered.data['obs'] is obs
+    for item in buffer.sample(10):
+        assert isinstance(item.data['obs'], torch.Tensor) and isinstance(item.data['next_obs'], np.ndarray)
+        assert (item.data['obs'] == item.data['reward']).all()
+        assert (item.data['next_obs'] == item.data['reward'] + 1).all()
+    for grouped_data in buffer.sample(2, groupby='env'):
+        for item in grouped_data:
+            assert item.data['obs'].shape == (4, 32, 32)
+    stats = compression.stats()
+    assert stats['compression_ratio'] > 3
+    assert stats['decode_ms_per_sample'] > 0
+    assert stats['cache_hit_rate'] == 0
+
+    index = buffer.sample(1)[0].index
+    assert buffer.update(index, {'obs': torch.zeros(4, 32, 32, dtype=torch.uint8), 'next_obs': None, 'reward': -1.})
+    item = buffer.sample(indices=[index])[0]
+    assert item.data['obs'].sum() == 0 and item.data['next_obs'] is None
+    compression.close()
+
+
+@pytest.mark.unittest
+def test_compression_cache():
+    buffer = DequeBuffer(size=10)
+    compression = Compression(fields=['obs'], num_workers=0, cache_size=4)
+    buffer.use(compression)
+    indices = [buffer.push({'obs': np.full((8, 8), i)}).index for i in range(10)]
+    # The newest 4 records are cached
+    data = buffer.sample(indices=indices[-4:])
+    assert compression.cache_hits == 4 and compression.cache_misses == 0
+    assert [item.data['obs'][0, 0] for item in data] == list(range(6, 10))
+    buffer.sample(indices=indices[:2])
+    assert compression.cache_misses == 2
+    assert list(compression.cache.keys()) == indices[8:] + indices[:2]
+    buffer.delete(indices[0])
+    assert indices[0] not in compression.cache
+    buffer.clear()
+    assert len(compression.cache) == 0
+
+    # The cache is not affected by the modification of pushed data
+    data = {'obs': np.zeros((8, 8))}
+    index = buffer.push(data).index
+    data['obs'][:] = 1
+    assert (buffer.sample(indices=[index])[0].data['obs'] == 0).all()
+    assert compression.cache_hits == 5
+
+
+@pytest.mark.unittest
+@pytest.mark.parametrize('shape', [(84, 84), (84, 84, 3), (4, 84, 84)])
+def test_compression_jpeg(shape):
+    pytest.importorskip('cv2')
+    buffer = DequeBuffer(size=10)
+    compression = Compression(fields={'obs': 'jpeg', 'next_obs': 'jpeg'}, num_workers=2, cache_size=2)
+    buffer.use(compression)
+    # Smooth images, so that the lossy jpeg codec nearly restores them
+    obs = np.zeros(shape, dtype=np.uint8)
+    if shape[-1] == 3:
+        obs[:] = np.arange(84, dtype=np.uint8)[:, None, None]
+    else:
+        obs[:] = np.arange(84, dtype=np.uint8)[:, None]
+    for i in range(4):
+        buffer.push({'obs': obs, 'next_obs': torch.from_numpy(obs)})
+    for item in buffer.sample(4):
+        assert item.data['obs'].shape == shape and item.data['obs'].dtype == np.uint8
+        assert isinstance(item.data['next_obs'], torch.Tensor) and item.data['next_obs'].shape == shape
+        assert np.abs(item.data['obs'].astype(np.int16) - obs).max() <= 4
+    assert compression.stats()['compression_ratio'] > 1
+    with pytest.raises(ValueError):
+        buffer.push({'obs': obs.astype(np.float32)})
+    compression.close()
@@ -0,0 +1,155 @@
+import threading
+import pytest
+import numpy as np
+import torch
+from ding.data.buffer import ShardedBuffer, ColumnarBuffer
+
+
+@pytest.mark.unittest
+def test_naive_push_sample():
+    buffer = ShardedBuffer(size=40, num_shards=4, shard_key='env')
+    for i in range(100):
+        buffer.push(i, {'env': i % 4})
+    assert buffer.count() == 40
+    assert [shard.count() for shard in buffer.shards] == [10] * 4
+    data = buffer.sample(40)
+    assert sorted([item.data for item in data]) == list(range(60, 100))
+    with pytest.raises(ValueError):
+        buffer.sample(41)
+    assert len(buffer.sample(41, ignore_insufficient=True)) == 0
+    assert len(buffer.sample(100, replace=True)) == 100
+
+    # Indices
+    indices = [item.index for item in data[:10]]
+    assert [item.data for item in buffer.sample(indices=indices)] == [item.data for item in data[:10]]
+    assert buffer.update(indices[0], -1, {'env': 0, 'label': 1})
+    assert buffer.sample(indices=indices[:1])[0].data == -1
+    assert buffer.update(indices[:2], None, [{'label': 2}, {'label': 3}]) == [True, True]
+    assert [item.meta['label'] for item in buffer.sample(indices=indices[:2])] == [2, 3]
+    buffer.delete(indices)
+    assert buffer.count() == 30
+    assert not buffer.update(indices[0], 0)
+    assert len(list(buffer)) == 30
+    assert buffer.get(-1).index in [item.index for item in buffer]
+
+    # Groupby
+    for grouped_data in buffer.sample(4, groupby='env', replace=True):
+        assert len(set([item.meta['env'] for item in grouped_data])) == 1
+    buffer.clear()
+    assert buffer.count() == 0
+
+    # Integer indices of ColumnarBuffer
+    buffer = ShardedBuffer(size=40, num_shards=3, shard_fn=ColumnarBuffer)
+    indices = [buffer.push({'x': np.array([i])}).index for i in range(10)]
+    assert [item.data['x'][0] for item in buffer.sample(indices=indices)] == list(range(10))
+
+
+@pytest.mark.unittest
+def test_single_producer():
+    # A single producer fills the whole capacity, and the oldest records are evicted first.
+    buffer = ShardedBuffer(size=1000, num_shards=4)
+    for i in range(1200):
+        buffer.push(i)
+    assert buffer.count() == 1000
+    assert [shard.count() for shard in buffer.shards] == [250] * 4
+    assert sorted([item.data for item in buffer]) == list(range(200, 1200))
+
+
+@pytest.mark.unittest
+@pytest.mark.parametrize('shard_fn', [None, ColumnarBuffer])
+def test_sample_all_groups(shard_fn):
+    # The groups are unevenly distributed over the shards, the shards are never asked for more groups than they have
+    buffer = ShardedBuffer(size=200, num_shards=4, shard_fn=shard_fn, shard_key='env')
+    for env in range(8):
+        for i in range(20 if env == 0 else 1):
+            buffer.push({'x': np.array([i])}, {'env': env})
+    assert sum([shard.count_groups('env') for shard in buffer.shards]) == 8
+    for _ in range(20):
+        sampled_data = buffer.sample(8, groupby='env')
+        assert sorted([grouped_data[0].meta['env'] for grouped_data in sampled_data]) == list(range(8))
+    with pytest.raises(ValueError):
+        buffer.sample(9, groupby='env')
+
+
+@pytest.mark.unittest
+def test_sample_contiguous_group():
+    buffer = ShardedBuffer(size=200, num_shards=4, shard_key='env')
+    for i in range(50):
+        buffer.push(i, {'env': 0})
+    for _ in range(10):
+        sampled_data = buffer.sample(1, groupby='env', unroll_len=8)
+        data = [item.data for item in sampled_data[0]]
+        assert data == list(range(data[0], data[0] + 8))
+    # The trajectory is split over the shards without shard_key
+    buffer = ShardedBuffer(size=200, num_shards=4)
+    for i in range(50):
+        buffer.push(i, {'env': 0})
+    with pytest.raises(AssertionError):
+        buffer.sample(1, groupby='env', unroll_len=8)
+
+
+@pytest.mark.unittest
+def test_priority():
+    buffer = ShardedBuffer(size=64, num_shards=4, shard_key='env', priority=True)
+    for i in range(64):
+        # The priorities of shard 0 are much higher than the others
+        buffer.push({'obs': torch.randn(2)}, {'env': i % 4, 'priority': 100.0 if i % 4 == 0 else 1.0})
+    data = buffer.sample(256)
+    assert len(data) == 256
+    assert sum([item.meta['env'] == 0 for item in data]) > 128
+    # IS weights are computed over all the shards
+    for item in data:
+        expected = 1.0 if item.meta['env'] != 0 else (100.0 / 1.0) ** (-0.6 * 0.4)
+        assert abs(item.meta['priority_IS'] - expected) < 1e-3
+        assert abs(item.data['priority_IS'].item() - expected) < 1e-3
+    for item in data:
+        item.meta['priority'] = 1.0
+    buffer.update([item.index for item in data], None, [item.meta for item in data])
+    data = buffer.sample(256)
+    assert sum([item.meta['env'] == 0 for item in data]) < 128
+
+
+@pytest.mark.unittest
+def test_priority_sample_by_indices():
+    buffer = ShardedBuffer(size=64, num_shards=4, shard_key='env', priority=True)
+    for i in range(64):
+        buffer.push({'obs': torch.randn(2)}, {'env': i % 4, 'priority': 100.0 if i % 4 == 0 else 1.0})
+    sampled = buffer.sample(16)
+    data = buffer.sample(indices=[item.index for item in sampled])
+    assert [item.index for item in data] == [item.index for item in sampled]
+    for old, new in zip(sampled, data):
+        assert torch.equal(old.data['obs'], new.data['obs'])
+        expected = 1.0 if new.meta['env'] != 0 else (100.0 / 1.0) ** (-0.6 * 0.4)
+        assert abs(new.meta['priority_IS'] - expected) < 1e-3
+        assert abs(new.data['priority_IS'].item() - expected) < 1e-3
+
+
+@pytest.mark.unittest
+def test_concurrent_push_sample():
+    buffer = ShardedBuffer(size=1000, num_shards=4, priority=True)
+    errors = []
+
+    def producer(n):
+        try:
+            for i in range(n):
+                buffer.push({'obs': torch.zeros(2)}, {'priority': 1.0})
+        except Exception as e:
+            errors.append(e)
+
+    def learner():
+        try:
+            for _ in range(100):
+                if buffer.count() >= 32:
+                    data = buffer.sample(32)
+                    buffer.update([item.index for item in data], None, [item.meta for item in data])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=producer, args=(500, )) for _ in range(8)] + [threading.Thread(target=learner)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(errors) == 0, errors
+    assert buffer.count() == 1000
+    assert all([shard.count() == 250 for shard in buffer.shards])
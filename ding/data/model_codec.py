@@ -0,0 +1,161 @@
+from threading import Lock
+from typing import Any, Dict, Optional, Tuple, Union
+import torch
+
+QUANTIZE_DTYPES = {"fp16": torch.float16, "bf16": torch.bfloat16}
+
+
+def _quantize(delta: torch.Tensor, quantize: Optional[str]) -> Union[torch.Tensor, Tuple[torch.Tensor, float]]:
+    if quantize is None:
+        return delta
+    elif quantize == "int8":
+        # Symmetric per-tensor quantization
+        scale = delta.abs().max().item() / 127
+        if scale == 0:
+            scale = 1.
+        return (delta / scale).round_().clamp_(-127, 127).to(torch.int8), scale
+    else:
+        return delta.to(QUANTIZE_DTYPES[quantize])
+
+
+def _dequantize(value: Union[torch.Tensor, Tuple[torch.Tensor, float]], dtype: torch.dtype) -> torch.Tensor:
+    if isinstance(value, tuple):
+        value, scale = value
+        return value.to(dtype) * scale
+    return value.to(dtype)
+
+
+class ModelEncoder:
+    """
+    Overview:
+        Encode the state dict of model into the messages of keyframe or delta, which are decoded by \
+        ``ModelDecoder``. The keyframe includes all the tensors in their original precision, and the delta only \
+        includes the difference of the changed floating point tensors since the previous message, which can be \
+        quantized to reduce the network overhead. The encoder tracks the state reconstructed by the decoders, \
+        so the quantization error is corrected by the following deltas rather than accumulated.
+    Interfaces:
+        ``__init__``, ``encode``, ``request_keyframe``
+    Property:
+        ``version``
+    """
+
+    def __init__(self, quantize: Optional[str] = None, keyframe_interval: int = 100) -> None:
+        """
+        Overview:
+            Initialize the encoder.
+        Arguments:
+            - quantize (:obj:`Optional[str]`): The quantization of delta, i.e. None (no quantization), fp16, bf16 \
+                and int8 (symmetric per-tensor quantization).
+            - keyframe_interval (:obj:`int`): Send a keyframe every ``keyframe_interval`` messages.
+        """
+        assert quantize is None or quantize == "int8" or quantize in QUANTIZE_DTYPES, \
+            "Unknown quantization: {}".format(quantize)
+        assert keyframe_interval > 0
+        self._quantize = quantize
+        self._keyframe_interval = keyframe_interval
+        self._version = -1
+        self._keyframe_version = -1
+        self._reference: Optional[Dict[str, torch.Tensor]] = None
+        # The keyframe may be requested by other threads (e.g. the event loop) while encoding
+        self._keyframe_lock = Lock()
+        self._keyframe_requested = False
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def request_keyframe(self) -> None:
+        """
+        Overview:
+            Send a keyframe in the next message, e.g. some decoders miss the previous messages. It's safe to be \
+            called from other threads.
+        """
+        with self._keyframe_lock:
+            self._keyframe_requested = True
+
+    def encode(self, state_dict: Dict[str, torch.Tensor]) -> Dict[str, Any]:
+        """
+        Overview:
+            Encode the state dict into a message.
+        Arguments:
+            - state_dict (:obj:`Dict[str, torch.Tensor]`): The state dict of model.
+        Returns:
+            - msg (:obj:`Dict[str, Any]`): The message with ``version``, ``base`` (the version that the delta is \
+                based on, None for keyframe), ``tensors`` (the tensors to replace) and ``deltas`` (the possibly \
+                quantized differences to add).
+        """
+        with self._keyframe_lock:
+            keyframe_requested, self._keyframe_requested = self._keyframe_requested, False
+        self._version += 1
+        state_dict = {k: v.detach().cpu() for k, v in state_dict.items()}
+        keyframe_requested = keyframe_requested or self._reference is None
+        if keyframe_requested or self._version - self._keyframe_version >= self._keyframe_interval:
+            self._keyframe_version = self._version
+            self._reference = {k: v.clone() for k, v in state_dict.items()}
+            return {"version": self._version, "base": None, "tensors": self._reference, "deltas": {}}
+
+        tensors, deltas, reference = {}, {}, dict(self._reference)
+        for k, v in state_dict.items():
+            ref = reference.get(k)
+            if ref is None or ref.shape != v.shape or ref.dtype != v.dtype or not v.is_floating_point():
+                # The new, reshaped and non floating point tensors are sent as they are if changed
+                if ref is None or not torch.equal(v, ref):
+                    tensors[k] = reference[k] = v.clone()
+            else:
+                delta = v - ref
+                if not delta.any():
+                    continue
+                deltas[k] = _quantize(delta, self._quantize)
+                # Reconstruct the tensor in the same way as decoder, don't update reference in place, since it's
+                # shared with the previous messages.
+                reference[k] = ref + _dequantize(deltas[k], ref.dtype)
+        self._reference = reference
+        return {"version": self._version, "base": self._version - 1, "tensors": tensors, "deltas": deltas}
+
+
+class ModelDecoder:
+    """
+    Overview:
+        Decode the messages from ``ModelEncoder`` into state dict. The decoder detects the gap of versions, \
+        i.e. some messages are missed, then it can't decode the deltas until a keyframe is received. The messages \
+        not newer than the current version are ignored. The decoder is not thread safe, the caller should \
+        decode the messages one by one.
+    Interfaces:
+        ``__init__``, ``decode``
+    Property:
+        ``version``
+    """
+
+    def __init__(self) -> None:
+        self._version = -1
+        self._state: Optional[Dict[str, torch.Tensor]] = None
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def decode(self, msg: Dict[str, Any]) -> Optional[Dict[str, torch.Tensor]]:
+        """
+        Overview:
+            Decode the message.
+        Arguments:
+            - msg (:obj:`Dict[str, Any]`): The message from encoder.
+        Returns:
+            - state_dict (:obj:`Optional[Dict[str, torch.Tensor]]`): The decoded state dict, None if the message \
+                is stale, or it is a delta which is not based on the current version, then a keyframe is \
+                required. The returned tensors will not be modified by the following messages.
+        """
+        if msg["version"] <= self._version:
+            return None
+        elif msg["base"] is None:
+            state = dict(msg["tensors"])
+        elif self._state is not None and msg["base"] == self._version:
+            state = dict(self._state)
+            state.update(msg["tensors"])
+            for k, v in msg["deltas"].items():
+                state[k] = state[k] + _dequantize(v, state[k].dtype)
+        else:
+            return None
+        self._state = state
+        self._version = msg["version"]
+        return state
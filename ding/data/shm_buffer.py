@@ -1,5 +1,5 @@
 from typing import Any, Optional, Union, Tuple, Dict
-from multiprocessing import Array
+from multiprocessing import Array, get_context
 import ctypes
 import numpy as np
 import torch
@@ -30,7 +30,8 @@ class ShmBuffer():
             dtype: Union[type, np.dtype],
             shape: Tuple[int],
             copy_on_get: bool = True,
-            ctype: Optional[type] = None
+            ctype: Optional[type] = None,
+            context: Optional[str] = None
     ) -> None:
         """
         Overview:
@@ -40,10 +41,13 @@ class ShmBuffer():
             - shape (:obj:`Tuple[int]`): The shape of the data to limit the size of the buffer.
             - copy_on_get (:obj:`bool`): Whether to copy data when calling get method.
             - ctype (:obj:`Optional[type]`): Origin class type, e.g. np.ndarray, torch.Tensor.
+            - context (:obj:`Optional[str]`): The multiprocessing context of the buffer, e.g. 'spawn', None means \
+                the default context.
         """
         if isinstance(dtype, np.dtype):  # it is type of gym.spaces.dtype
             dtype = dtype.type
-        self.buffer = Array(_NTYPE_TO_CTYPE[dtype], int(np.prod(shape)))
+        array_fn = Array if context is None else get_context(context).Array
+        self.buffer = array_fn(_NTYPE_TO_CTYPE[dtype], int(np.prod(shape)))
         self.dtype = dtype
         self.shape = shape
         self.copy_on_get = copy_on_get
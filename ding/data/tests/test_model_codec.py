@@ -0,0 +1,105 @@
+import pytest
+import torch
+from ding.data.model_codec import ModelEncoder, ModelDecoder
+
+
+class MockModel(torch.nn.Module):
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.fc = torch.nn.Linear(16, 8)
+        self.bn = torch.nn.BatchNorm1d(8)
+        self.frozen = torch.nn.Linear(8, 4)
+
+
+def train(model: torch.nn.Module) -> None:
+    with torch.no_grad():
+        model.fc.weight.add_(torch.randn_like(model.fc.weight) * 1e-2)
+        model.fc.bias.add_(torch.randn_like(model.fc.bias) * 1e-2)
+        model.bn.num_batches_tracked += 1
+
+
+@pytest.mark.unittest
+@pytest.mark.parametrize('quantize', [None, 'fp16', 'bf16', 'int8'])
+def test_model_codec(quantize):
+    torch.manual_seed(0)
+    model = MockModel()
+    encoder = ModelEncoder(quantize=quantize, keyframe_interval=10)
+    decoder = ModelDecoder()
+    msg = encoder.encode(model.state_dict())
+    assert msg["base"] is None and msg["version"] == 0
+    state_dict = decoder.decode(msg)
+    for k, v in model.state_dict().items():
+        assert torch.equal(state_dict[k], v)
+
+    for i in range(1, 25):
+        train(model)
+        msg = encoder.encode(model.state_dict())
+        last_state_dict = state_dict
+        state_dict = decoder.decode(msg)
+        assert decoder.version == encoder.version == i
+        if i % 10 == 0:
+            assert msg["base"] is None
+            continue
+        assert msg["base"] == i - 1
+        # Only the changed tensors are sent
+        assert set(msg["deltas"].keys()) == {"fc.weight", "fc.bias"}
+        assert set(msg["tensors"].keys()) == {"bn.num_batches_tracked"}
+        assert torch.equal(state_dict["frozen.weight"], model.frozen.weight)
+        assert state_dict["bn.num_batches_tracked"] == i
+        # The previous state dict is not modified
+        assert last_state_dict["bn.num_batches_tracked"] == i - 1
+        # The quantization error is not accumulated, the error of fp16 is about 1e-3 of the ~1e-2 deltas
+        atol = {None: 1e-6, 'fp16': 1e-4, 'bf16': 1e-3, 'int8': 1e-3}[quantize]
+        assert torch.allclose(state_dict["fc.weight"], model.fc.weight, atol=atol)
+        if quantize == 'int8':
+            assert msg["deltas"]["fc.weight"][0].dtype == torch.int8
+
+
+@pytest.mark.unittest
+def test_model_codec_resync():
+    torch.manual_seed(0)
+    model = MockModel()
+    encoder = ModelEncoder(quantize='fp16')
+    decoder = ModelDecoder()
+    encoder.encode(model.state_dict())
+    train(model)
+    # The decoder missed the keyframe
+    assert decoder.decode(encoder.encode(model.state_dict())) is None
+    encoder.request_keyframe()
+    train(model)
+    msg = encoder.encode(model.state_dict())
+    assert msg["base"] is None
+    assert decoder.decode(msg) is not None
+    train(model)
+    encoder.encode(model.state_dict())
+    train(model)
+    # The decoder missed a delta
+    assert decoder.decode(encoder.encode(model.state_dict())) is None
+    assert decoder.version == 2
+
+
+@pytest.mark.unittest
+def test_model_codec_stale():
+    torch.manual_seed(0)
+    model = MockModel()
+    encoder = ModelEncoder(quantize='fp16')
+    decoder = ModelDecoder()
+    keyframe = encoder.encode(model.state_dict())
+    train(model)
+    delta = encoder.encode(model.state_dict())
+    assert decoder.decode(keyframe) is not None
+    state_dict = decoder.decode(delta)
+    assert decoder.version == 1
+    # The late keyframe doesn't move the decoder backwards
+    assert decoder.decode(keyframe) is None
+    assert decoder.decode(delta) is None
+    assert decoder.version == 1
+    encoder.request_keyframe()
+    train(model)
+    msg = encoder.encode(model.state_dict())
+    assert msg["base"] is None
+    # The request is consumed by the keyframe
+    train(model)
+    assert encoder.encode(model.state_dict())["base"] == 2
+    assert decoder.decode(msg)["bn.num_batches_tracked"] == state_dict["bn.num_batches_tracked"] + 1
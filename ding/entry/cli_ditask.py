@@ -51,13 +51,14 @@ CONTEXT_SETTINGS = dict(help_option_names=['-h', '--help'])
 @click.option("--node-ids", type=str, help="Candidate node ids.")
 @click.option(
     "--topology",
-    type=click.Choice(["alone", "mesh", "star"]),
+    type=click.Choice(["alone", "mesh", "star", "tree", "chain"]),
     default="alone",
     help="Network topology, default: alone."
 )
+@click.option("--tree-degree", type=int, default=2, help="The max number of children of each node in tree topology.")
 @click.option("--platform-spec", type=str, help="Platform specific configure.")
 @click.option("--platform", type=str, help="Platform type: slurm, k8s.")
-@click.option("--mq-type", type=str, default="nng", help="Class type of message queue, i.e. nng, redis.")
+@click.option("--mq-type", type=str, default="nng", help="Class type of message queue, i.e. nng, redis, shm.")
 @click.option("--redis-host", type=str, help="Redis host.")
 @click.option("--redis-port", type=int, help="Redis port.")
 @click.option("-m", "--main", type=str, help="Main function of entry module.")
@@ -107,6 +108,7 @@ def _cli_ditask(
     redis_host: str,
     redis_port: int,
     startup_interval: int,
+    tree_degree: int = 2,
     local_rank: int = 0,
     platform: str = None,
     platform_spec: str = None,
@@ -157,5 +159,6 @@ def _cli_ditask(
         mq_type=mq_type,
         redis_host=redis_host,
         redis_port=redis_port,
-        startup_interval=startup_interval
+        startup_interval=startup_interval,
+        tree_degree=tree_degree
     )(main_func)
@@ -21,6 +21,7 @@ class SlurmParser():
         self.ports = int(kwargs.get("ports") or 15151)
         self.parallel_workers = kwargs.get("parallel_workers") or 1
         self.topology = kwargs.get("topology") or "alone"
+        self.tree_degree = kwargs.get("tree_degree") or 2
 
     def parse(self) -> dict:
         procid = int(os.environ["SLURM_PROCID"])
@@ -86,6 +87,11 @@ class SlurmParser():
             elif self.topology == "star":
                 head_task = self._get_task(0)
                 attach_to = self._get_attach_to_from_task(head_task)
+            elif self.topology in ("tree", "chain"):
+                # Attach to the root worker of the parent task
+                degree = self.tree_degree if self.topology == "tree" else 1
+                parent_task = self._get_task((procid - 1) // degree)
+                attach_to = self._get_attach_to_from_task(parent_task)[:1]
             else:
                 attach_to = []
 
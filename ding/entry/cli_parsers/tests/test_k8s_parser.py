@@ -69,6 +69,12 @@ def test_k8s_parser():
         "tcp://SH-1:50515," +\
         "tcp://SH-2:50515"
 
+    # Tree and chain topology
+    all_args = k8s_parser(None, topology="tree", mq_type="nng")
+    assert all_args["attach_to"] == "tcp://SH-1:50515"
+    all_args = k8s_parser(None, topology="chain", mq_type="nng")
+    assert all_args["attach_to"] == "tcp://SH-2:50515"
+
     # With multiple parallel workers
     all_args = k8s_parser(None, topology="mesh", parallel_workers=2)
     assert all_args["address"] == "SH-3"
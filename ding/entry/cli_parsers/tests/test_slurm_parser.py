@@ -74,6 +74,12 @@ def test_slurm_parser():
         "tcp://SH-IDC1-10-5-38-190:15152," +\
         "tcp://SH-IDC1-10-5-38-190:15153"
 
+    # Test tree and chain topology
+    all_args = slurm_parser(None, topology="tree", mq_type="nng")
+    assert all_args["attach_to"] == "tcp://SH-IDC1-10-5-38-190:15152"
+    all_args = slurm_parser(None, topology="chain", mq_type="nng")
+    assert all_args["attach_to"] == "tcp://SH-IDC1-10-5-38-190:15153"
+
     # Test _parse_node_list
     sp = SlurmParser(platform_spec)
     os.environ["SLURM_NODELIST"] = 'SH-IDC1-10-5-[38-40]'
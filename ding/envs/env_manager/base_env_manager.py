@@ -12,6 +12,8 @@ import treetensor.numpy as tnp
 from ding.utils import ENV_MANAGER_REGISTRY, import_module, one_time_warning, make_key_as_identifier, WatchDog, \
     remove_illegal_item
 from ding.envs import BaseEnv, BaseEnvTimestep
+from ding.envs.env_wrappers.vec_env_wrappers import create_vec_env_wrapper
+from .env_stats import EnvManagerStats
 
 global space_log_flag
 space_log_flag = True
@@ -104,6 +106,9 @@ class BaseEnvManager(object):
         reset_timeout=None,
         # (float) The interval waiting time for automatically retry mechanism, defaults to 0.1.
         retry_waiting_time=0.1,
+        # (list) The configs of the vectorized env wrappers (e.g. ``dict(type='vec_obs_norm')``), which are applied \
+        # by the env manager on the stacked observations of all the sub-environments, defaults to [].
+        vec_env_wrapper=[],
     )
 
     def __init__(
@@ -158,6 +163,10 @@ class BaseEnvManager(object):
         self._step_timeout = self._cfg.step_timeout
         self._reset_timeout = self._cfg.reset_timeout
         self._retry_waiting_time = self._cfg.retry_waiting_time
+        self._vec_env_wrapper = create_vec_env_wrapper(
+            self._cfg.get('vec_env_wrapper', []), self._observation_space, self._env_num
+        )
+        self._stats = EnvManagerStats(self._env_num)
 
     @property
     def env_num(self) -> int:
@@ -187,6 +196,8 @@ class BaseEnvManager(object):
         Returns:
             - observation_space (:obj:`gym.spaces.Space`): The observation space of sub-environment.
         """
+        if self._vec_env_wrapper is not None:
+            return self._vec_env_wrapper.observation_space
         return self._observation_space
 
     @property
@@ -226,7 +237,7 @@ class BaseEnvManager(object):
             >>> timesteps = env_manager.step(action)
         """
         active_env = [i for i, s in self._env_states.items() if s == EnvState.RUN]
-        return {i: self._ready_obs[i] for i in active_env}
+        return self._wrap_ready_obs({i: self._ready_obs[i] for i in active_env})
 
     @property
     def ready_obs_id(self) -> List[int]:
@@ -368,10 +379,18 @@ class BaseEnvManager(object):
             for env_id in reset_param:
                 self._reset_param[env_id] = reset_param[env_id]
             env_range = reset_param.keys()
+        reset_env_ids = []
         for env_id in env_range:
             if self._env_replay_path is not None and self._env_states[env_id] == EnvState.RUN:
                 logging.warning("please don't reset a unfinished env when you enable save replay, we just skip it")
                 continue
+            reset_env_ids.append(env_id)
+        if self._vec_env_wrapper is not None:
+            self._vec_env_wrapper.clear(reset_env_ids)
+        self._reset_envs(reset_env_ids)
+
+    def _reset_envs(self, env_ids: List[int]) -> None:
+        for env_id in env_ids:
             self._reset(env_id)
 
     def _reset(self, env_id: int) -> None:
@@ -389,7 +408,9 @@ class BaseEnvManager(object):
         for _ in range(self._max_retry):
             try:
                 self._env_states[env_id] = EnvState.RESET
+                start_time = time.time()
                 obs = reset_fn()
+                self._stats.record('reset', env_id, time.time() - start_time)
                 self._ready_obs[env_id] = obs
                 self._env_states[env_id] = EnvState.RUN
                 return
@@ -399,6 +420,7 @@ class BaseEnvManager(object):
                     err_env.close()
                     self._envs[env_id] = self._env_fn[env_id]()
                 exceptions.append(e)
+                self._stats.record_retry(env_id)
                 time.sleep(self._retry_waiting_time)
                 continue
 
@@ -437,19 +459,45 @@ class BaseEnvManager(object):
         self._check_closed()
         timesteps = {}
         for env_id, act in actions.items():
-            timesteps[env_id] = self._step(env_id, act)
-            if timesteps[env_id].done:
-                self._env_episode_count[env_id] += 1
-                if self._env_episode_count[env_id] < self._episode_num:
-                    if self._auto_reset:
-                        self._reset(env_id)
-                    else:
-                        self._env_states[env_id] = EnvState.NEED_RESET
+            timesteps[env_id] = self._step_and_update(env_id, act)
+        return self._wrap_timesteps(timesteps)
+
+    def _wrap_ready_obs(self, ready_obs: Dict[int, Any]) -> Dict[int, Any]:
+        """
+        Overview:
+            Apply the vectorized env wrappers on the ready observations, the reset observations are wrapped at once.
+        """
+        if self._vec_env_wrapper is None:
+            return ready_obs
+        return self._vec_env_wrapper.ready_obs(ready_obs)
+
+    def _wrap_timesteps(self, timesteps: Dict[int, BaseEnvTimestep]) -> Dict[int, BaseEnvTimestep]:
+        """
+        Overview:
+            Apply the vectorized env wrappers on the stacked observations and rewards of the timesteps.
+        """
+        if self._vec_env_wrapper is None:
+            return timesteps
+        return self._vec_env_wrapper.step(timesteps, reset_done=self._cfg.get('reset_inplace', False))
+
+    def _step_and_update(self, env_id: int, act: Any) -> BaseEnvTimestep:
+        """
+        Overview:
+            Step an env and update its state, ready obs and episode count, the env is reset if done and auto_reset.
+        """
+        timestep = self._step(env_id, act)
+        if timestep.done:
+            self._env_episode_count[env_id] += 1
+            if self._env_episode_count[env_id] < self._episode_num:
+                if self._auto_reset:
+                    self._reset(env_id)
                 else:
-                    self._env_states[env_id] = EnvState.DONE
+                    self._env_states[env_id] = EnvState.NEED_RESET
             else:
-                self._ready_obs[env_id] = timesteps[env_id].obs
-        return timesteps
+                self._env_states[env_id] = EnvState.DONE
+        else:
+            self._ready_obs[env_id] = timestep.obs
+        return timestep
 
     def _step(self, env_id: int, act: Any) -> BaseEnvTimestep:
 
@@ -460,9 +508,13 @@ class BaseEnvManager(object):
         exceptions = []
         for _ in range(self._max_retry):
             try:
-                return step_fn()
+                start_time = time.time()
+                timestep = step_fn()
+                self._stats.record('step', env_id, time.time() - start_time)
+                return timestep
             except BaseException as e:
                 exceptions.append(e)
+                self._stats.record_retry(env_id)
         self._env_states[env_id] = EnvState.ERROR
         logging.error("Env {} step has exceeded max retries({})".format(env_id, self._max_retry))
         runtime_error = RuntimeError(
@@ -473,6 +525,51 @@ class BaseEnvManager(object):
         runtime_error.__traceback__ = exceptions[-1].__traceback__
         raise runtime_error
 
+    def stats(self, per_env: bool = True) -> Dict[str, Any]:
+        """
+        Overview:
+            Get the latency and throughput statistics of env manager since it is created (or ``reset_stats``), \
+            which helps to find out whether the collection is slowed down by env compute, IPC, waiting, resets or \
+            some straggler envs.
+        Arguments:
+            - per_env (:obj:`bool`): Whether to include the statistics of each env.
+        Returns:
+            - stats (:obj:`Dict[str, Any]`): The structured statistics, refer to ``EnvManagerStats.summary`` for \
+                the details.
+        Example:
+            >>> stats = env_manager.stats()
+            >>> print(stats['step']['p90'], stats['wait_time'], stats['stragglers'])
+        """
+        self._update_stats()
+        return self._stats.summary(per_env)
+
+    def log_stats(self, tb_logger: 'SummaryWriter', step: int, prefix: str = 'env_manager') -> None:  # noqa
+        """
+        Overview:
+            Write the statistics of env manager into tensorboard.
+        Arguments:
+            - tb_logger (:obj:`SummaryWriter`): The tensorboard writer.
+            - step (:obj:`int`): The global step, such as env step.
+            - prefix (:obj:`str`): The prefix of the tags.
+        """
+        self._update_stats()
+        self._stats.log(tb_logger, step, prefix)
+
+    def reset_stats(self) -> None:
+        """
+        Overview:
+            Clear the statistics of env manager.
+        """
+        self._stats.reset()
+
+    def _update_stats(self) -> None:
+        """
+        Overview:
+            Collect the statistics that are not recorded in the main process before they are read, such as the \
+            statistics of worker subprocesses. Subclasses can override it.
+        """
+        pass
+
     def seed(self, seed: Union[Dict[int, int], List[int], int], dynamic_seed: bool = None) -> None:
         """
         Overview:
@@ -606,7 +703,7 @@ class BaseEnvManagerV2(BaseEnvManager):
             >>> timesteps = env_manager.step(action)
         """
         active_env = [i for i, s in self._env_states.items() if s == EnvState.RUN]
-        obs = [self._ready_obs[i] for i in active_env]
+        obs = list(self._wrap_ready_obs({i: self._ready_obs[i] for i in active_env}).values())
         if isinstance(obs[0], dict):  # transform each element to treenumpy array
             obs = [tnp.array(o) for o in obs]
         return tnp.stack(obs)
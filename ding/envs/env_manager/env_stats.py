@@ -0,0 +1,312 @@
+from typing import Dict, List, Optional, Sequence, Any
+from bisect import bisect_right
+import numpy as np
+
+# The bucket edges (seconds) of time histogram, from 10us to 10s.
+DEFAULT_TIME_BINS = (1e-5, 3e-5, 1e-4, 3e-4, 1e-3, 3e-3, 1e-2, 3e-2, 0.1, 0.3, 1., 3., 10.)
+
+
+def _accumulate(stats: Dict[str, List], kind: str, value: float, count: int) -> None:
+    stat = stats.get(kind)
+    if stat is None:
+        stats[kind] = [value, count]
+    else:
+        stat[0] += value
+        stat[1] += count
+
+
+def _total_summary(stats: Dict[str, List]) -> Dict[str, Dict[str, float]]:
+    return {
+        kind: {
+            'total': total,
+            'count': count,
+            'mean': total / count if count > 0 else 0.
+        }
+        for kind, (total, count) in stats.items()
+    }
+
+
+class TimeHistogram:
+    """
+    Overview:
+        The histogram of time with fixed bucket edges, which only costs a bisect and some additions for each value, \
+        so that it can be updated in each env step.
+    Interfaces:
+        ``__init__``, ``add``, ``merge``, ``quantile``, ``summary``
+    """
+    __slots__ = ['bins', 'bucket', 'count', 'total', 'total_square', 'max']
+
+    def __init__(self, bins: Sequence[float] = DEFAULT_TIME_BINS) -> None:
+        """
+        Overview:
+            Initialize the histogram.
+        Arguments:
+            - bins (:obj:`Sequence[float]`): The ascending bucket edges, the i-th bucket counts the values in \
+                [bins[i - 1], bins[i]), and the last bucket counts the values larger than the last edge.
+        """
+        self.bins = bins
+        self.bucket = [0 for _ in range(len(bins) + 1)]
+        self.count = 0
+        self.total = 0.
+        self.total_square = 0.
+        self.max = 0.
+
+    def add(self, value: float) -> None:
+        self.bucket[bisect_right(self.bins, value)] += 1
+        self.count += 1
+        self.total += value
+        self.total_square += value * value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: 'TimeHistogram') -> 'TimeHistogram':
+        """
+        Overview:
+            Merge the other histogram with the same bucket edges into this one.
+        """
+        for i, c in enumerate(other.bucket):
+            self.bucket[i] += c
+        self.count += other.count
+        self.total += other.total
+        self.total_square += other.total_square
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count > 0 else 0.
+
+    def quantile(self, q: float) -> float:
+        """
+        Overview:
+            Get the approximate quantile, i.e. the upper edge of the bucket where the quantile is in, which is no \
+            larger than the max value.
+        """
+        if self.count == 0:
+            return 0.
+        target, acc = q * self.count, 0
+        for i, c in enumerate(self.bucket):
+            acc += c
+            if acc >= target and c > 0:
+                return min(self.bins[i], self.max) if i < len(self.bins) else self.max
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            'count': self.count,
+            'mean': self.mean,
+            'max': self.max,
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'p99': self.quantile(0.99),
+            'total': self.total,
+        }
+
+
+class EnvManagerStats:
+    """
+    Overview:
+        The latency and throughput statistics of env manager, including the per-env time histograms (e.g. \
+        ``step``, ``reset`` and ``step_latency``), the time of IPC (e.g. ``serialize``, ``deserialize`` and \
+        ``shm_copy``), the accumulated time of the other operations (e.g. ``launch``, ``renew`` and ``worker_step``), \
+        the time that the main process waits for the envs, the retry count of each env and the straggler ranking. \
+        The env managers record the values in their hot path, so all the records are O(1).
+    Interfaces:
+        ``__init__``, ``reset``, ``record``, ``record_ipc``, ``set_ipc``, ``record_total``, ``set_total``, \
+        ``record_wait``, ``record_retry``, ``stragglers``, ``summary``, ``scalars``, ``log``
+    Property:
+        ``wait_time``
+
+    .. note::
+        The meaning of each histogram depends on what the env manager can measure: ``step`` and ``reset`` are the \
+        time of ``env.step`` and ``env.reset`` where they are executed (measured in the worker for subprocess env \
+        managers), and ``step_latency`` is the time from sending the action to the timestep being ready in the main \
+        process, which includes the IPC and queueing time.
+    """
+    hist_names = ['step', 'reset', 'step_latency']
+
+    def __init__(self, env_num: int, bins: Sequence[float] = DEFAULT_TIME_BINS) -> None:
+        """
+        Overview:
+            Initialize the statistics.
+        Arguments:
+            - env_num (:obj:`int`): The number of envs.
+            - bins (:obj:`Sequence[float]`): The bucket edges (seconds) of time histograms.
+        """
+        self._env_num = env_num
+        self._bins = bins
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Overview:
+            Clear all the statistics.
+        """
+        self._env_hist = {name: [TimeHistogram(self._bins) for _ in range(self._env_num)] for name in self.hist_names}
+        self._ipc = {}
+        self._totals = {}
+        self._wait_time = 0.
+        self._retry_count = [0 for _ in range(self._env_num)]
+
+    def record(self, name: str, env_id: int, value: float) -> None:
+        """
+        Overview:
+            Record a time value into the histogram ``name`` of the env.
+        """
+        self._env_hist[name][env_id].add(value)
+
+    def record_ipc(self, kind: str, value: float, count: int = 1) -> None:
+        """
+        Overview:
+            Accumulate the time of an IPC operation, such as ``serialize``, ``deserialize`` and ``shm_copy``.
+        """
+        _accumulate(self._ipc, kind, value, count)
+
+    def set_ipc(self, kind: str, total: float, count: int) -> None:
+        """
+        Overview:
+            Set the accumulated time of an IPC operation, which is accumulated by other processes (e.g. the \
+            serialization in env worker subprocesses).
+        """
+        self._ipc[kind] = [total, count]
+
+    def record_total(self, kind: str, value: float, count: int = 1) -> None:
+        """
+        Overview:
+            Accumulate the time of an operation which is not recorded per env step, such as ``launch`` (including \
+            the first reset) and ``renew`` (from renewing an env worker to the env being ready again).
+        """
+        _accumulate(self._totals, kind, value, count)
+
+    def set_total(self, kind: str, total: float, count: int) -> None:
+        """
+        Overview:
+            Set the accumulated time of an operation, which is accumulated by other processes (e.g. ``worker_step``, \
+            the time of ``env.step`` in env worker subprocesses).
+        """
+        self._totals[kind] = [total, count]
+
+    def record_wait(self, value: float) -> None:
+        self._wait_time += value
+
+    def record_retry(self, env_id: int) -> None:
+        self._retry_count[env_id] += 1
+
+    @property
+    def wait_time(self) -> float:
+        return self._wait_time
+
+    def stragglers(self, top_k: Optional[int] = None, name: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Overview:
+            Rank the envs by the mean time from slow to fast, which helps to find the straggler envs.
+        Arguments:
+            - top_k (:obj:`Optional[int]`): The number of returned envs, None means all the envs.
+            - name (:obj:`Optional[str]`): The histogram used to rank, the default is ``step`` if it is \
+                recorded, otherwise ``step_latency`` (e.g. the envs are stepped in other processes without timing).
+        Returns:
+            - stragglers (:obj:`List[Dict[str, Any]]`): The ranking of the envs with data, each item includes \
+                ``env_id``, ``mean``, ``max``, ``count`` and ``ratio``, i.e. the mean divided by the median of the \
+                mean of all the envs.
+        """
+        if name is None:
+            name = 'step' if any([h.count > 0 for h in self._env_hist['step']]) else 'step_latency'
+        hists = [(env_id, h) for env_id, h in enumerate(self._env_hist[name]) if h.count > 0]
+        if len(hists) == 0:
+            return []
+        median = float(np.median([h.mean for _, h in hists]))
+        hists.sort(key=lambda x: x[1].mean, reverse=True)
+        return [
+            {
+                'env_id': env_id,
+                'mean': h.mean,
+                'max': h.max,
+                'count': h.count,
+                'ratio': h.mean / median if median > 0 else 1.,
+            } for env_id, h in hists[:top_k]
+        ]
+
+    def _merged_hist(self, name: str) -> TimeHistogram:
+        hist = TimeHistogram(self._bins)
+        for h in self._env_hist[name]:
+            hist.merge(h)
+        return hist
+
+    def summary(self, per_env: bool = True, top_k: int = 3) -> Dict[str, Any]:
+        """
+        Overview:
+            Get the structured statistics.
+        Arguments:
+            - per_env (:obj:`bool`): Whether to include the statistics of each env.
+            - top_k (:obj:`int`): The number of envs in straggler ranking.
+        Returns:
+            - summary (:obj:`Dict[str, Any]`): The statistics with ``step``, ``reset`` and ``step_latency`` \
+                histogram summaries of all the envs, ``ipc`` ({kind: {total, count, mean}}), ``totals`` (the same \
+                format as ``ipc``), ``wait_time``, ``retry_count``, ``stragglers``, and ``envs`` ({env_id: the \
+                histograms and retry count}) if per_env.
+        """
+        summary = {name: self._merged_hist(name).summary() for name in self.hist_names}
+        summary['ipc'] = _total_summary(self._ipc)
+        summary['totals'] = _total_summary(self._totals)
+        summary['wait_time'] = self._wait_time
+        summary['retry_count'] = sum(self._retry_count)
+        summary['stragglers'] = self.stragglers(top_k)
+        if per_env:
+            summary['envs'] = {
+                env_id: dict(
+                    {name: self._env_hist[name][env_id].summary()
+                     for name in self.hist_names},
+                    retry_count=self._retry_count[env_id]
+                )
+                for env_id in range(self._env_num)
+            }
+        return summary
+
+    def scalars(self) -> Dict[str, float]:
+        """
+        Overview:
+            Get the flat scalar statistics, which are used for logging.
+        """
+        scalars = {}
+        for name in self.hist_names:
+            hist = self._merged_hist(name)
+            if hist.count > 0:
+                scalars['{}_time_mean'.format(name)] = hist.mean
+                scalars['{}_time_p90'.format(name)] = hist.quantile(0.9)
+                scalars['{}_time_max'.format(name)] = hist.max
+        for kind, (total, count) in list(self._ipc.items()) + list(self._totals.items()):
+            scalars['{}_time'.format(kind)] = total
+        scalars['wait_time'] = self._wait_time
+        scalars['retry_count'] = sum(self._retry_count)
+        stragglers = self.stragglers(1)
+        if len(stragglers) > 0:
+            scalars['straggler_ratio'] = stragglers[0]['ratio']
+        return scalars
+
+    def log(self, tb_logger: 'SummaryWriter', step: int, prefix: str = 'env_manager') -> None:  # noqa
+        """
+        Overview:
+            Write the scalar statistics and the time histograms of all the envs into tensorboard.
+        Arguments:
+            - tb_logger (:obj:`SummaryWriter`): The tensorboard writer, e.g. the ``tb_logger`` of collector or \
+                ``DistributedWriter`` in ``ding.framework``.
+            - step (:obj:`int`): The global step, such as env step.
+            - prefix (:obj:`str`): The prefix of the tags.
+        """
+        for k, v in self.scalars().items():
+            tb_logger.add_scalar('{}/{}'.format(prefix, k), v, step)
+        for name in self.hist_names:
+            hist = self._merged_hist(name)
+            if hist.count == 0:
+                continue
+            tb_logger.add_histogram_raw(
+                '{}/{}_time'.format(prefix, name),
+                min=0.,
+                max=hist.max,
+                num=hist.count,
+                sum=hist.total,
+                sum_squares=hist.total_square,
+                bucket_limits=list(self._bins) + [max(hist.max, self._bins[-1])],
+                bucket_counts=hist.bucket,
+                global_step=step
+            )
@@ -9,6 +9,7 @@ from ding.framework.supervisor import ChildType, RecvPayload, SendPayload
 from ding.utils import make_key_as_identifier
 from ditk import logging
 from ding.data import ShmBufferContainer
+from .env_stats import EnvManagerStats
 import enum
 import treetensor.numpy as tnp
 import numbers
@@ -121,6 +122,7 @@ class EnvSupervisor(Supervisor):
         self._env_replay_path = None
         self._episode_num = episode_num
         self._init_states()
+        self._stats = EnvManagerStats(self.env_num)
 
     def _init_states(self):
         self._env_seed = {}
@@ -184,9 +186,11 @@ class EnvSupervisor(Supervisor):
             return
 
         # Wait for all steps returns
+        start_time = time()
         recv_payloads = self.recv_all(
             send_payloads, ignore_err=True, callback=self._recv_callback, timeout=self._step_timeout
         )
+        self._stats.record_wait(time() - start_time)
         return [payload.data for payload in recv_payloads]
 
     def recv(self, ignore_err: bool = False) -> RecvPayload:
@@ -201,7 +205,11 @@ class EnvSupervisor(Supervisor):
         """
         self._detect_timeout()
         try:
-            payload = super().recv(ignore_err=True, timeout=0.1)
+            start_time = time()
+            try:
+                payload = super().recv(ignore_err=True, timeout=0.1)
+            finally:
+                self._stats.record_wait(time() - start_time)
             payload = self._recv_callback(payload=payload)
             if payload.err:
                 return self.recv(ignore_err=ignore_err)
@@ -323,7 +331,9 @@ class EnvSupervisor(Supervisor):
         if not block:
             return
 
+        start_time = time()
         self.recv_all(send_payloads, ignore_err=True, callback=self._recv_callback, timeout=self._reset_timeout)
+        self._stats.record_wait(time() - start_time)
 
     def _recv_callback(
             self, payload: RecvPayload, remain_payloads: Optional[Dict[str, SendPayload]] = None
@@ -338,6 +348,7 @@ class EnvSupervisor(Supervisor):
                 until remain_payloads be cleared, you can append new payload into remain_payloads to call this \
                 callback recursively.
         """
+        self._record_latency(payload=payload)
         self._set_shared_obs(payload=payload)
         self.change_state(payload=payload)
         if payload.method == "reset":
@@ -346,13 +357,30 @@ class EnvSupervisor(Supervisor):
             return self._recv_step_callback(payload=payload, remain_payloads=remain_payloads)
         return payload
 
+    def _record_latency(self, payload: RecvPayload):
+        """
+        Overview:
+            Record the time from sending the request to receiving the result, which is the ``step_latency`` of \
+            step and the ``reset`` time (including the IPC) of reset.
+        """
+        if payload.err is not None or payload.method not in ("step", "reset"):
+            return
+        send_time = self._last_called[payload.proc_id][payload.method]
+        if send_time != math.inf:
+            name = "step_latency" if payload.method == "step" else "reset"
+            self._stats.record(name, payload.proc_id, time() - send_time)
+
     def _set_shared_obs(self, payload: RecvPayload):
         if self._obs_buffers is None:
             return
+        start_time = time()
         if payload.method == "reset" and payload.err is None:
             payload.data = self._obs_buffers[payload.proc_id].get()
         elif payload.method == "step" and payload.err is None:
             payload.data._replace(obs=self._obs_buffers[payload.proc_id].get())
+        else:
+            return
+        self._stats.record_ipc("shm_copy", time() - start_time)
 
     def _recv_reset_callback(
             self, payload: RecvPayload, remain_payloads: Optional[Dict[str, SendPayload]] = None
@@ -363,6 +391,7 @@ class EnvSupervisor(Supervisor):
         env_id = payload.proc_id
         if payload.err:
             self._retry_times[env_id] += 1
+            self._stats.record_retry(env_id)
             if self._retry_times[env_id] > self._max_try - 1:
                 self.shutdown(5)
                 raise RuntimeError(
@@ -389,6 +418,7 @@ class EnvSupervisor(Supervisor):
         if remain_payloads is None:
             remain_payloads = {}
         if payload.err:
+            self._stats.record_retry(payload.proc_id)
             send_payloads = self._reset(payload.proc_id)
             for p in send_payloads:
                 remain_payloads[p.req_id] = p
@@ -476,8 +506,35 @@ class EnvSupervisor(Supervisor):
                 self._env_states[payload.proc_id] = EnvState.DONE
 
     def send(self, payload: SendPayload) -> None:
-        self._last_called[payload.proc_id][payload.method] = time()
-        return super().send(payload)
+        send_time = self._last_called[payload.proc_id][payload.method] = time()
+        ret = super().send(payload)
+        self._stats.record_ipc("serialize", time() - send_time)
+        return ret
+
+    def stats(self, per_env: bool = True) -> Dict[str, Any]:
+        """
+        Overview:
+            Get the latency and throughput statistics of envs, refer to ``BaseEnvManager.stats`` for the details.
+        Arguments:
+            - per_env (:obj:`bool`): Whether to include the statistics of each env.
+        Returns:
+            - stats (:obj:`Dict[str, Any]`): The structured statistics.
+        """
+        return self._stats.summary(per_env)
+
+    def log_stats(self, tb_logger: 'SummaryWriter', step: int, prefix: str = 'env_manager') -> None:  # noqa
+        """
+        Overview:
+            Write the statistics of envs into tensorboard.
+        Arguments:
+            - tb_logger (:obj:`SummaryWriter`): The tensorboard writer.
+            - step (:obj:`int`): The global step, such as env step.
+            - prefix (:obj:`str`): The prefix of the tags.
+        """
+        self._stats.log(tb_logger, step, prefix)
+
+    def reset_stats(self) -> None:
+        self._stats.reset()
 
     def seed(self, seed: Union[Dict[int, int], List[int], int], dynamic_seed: Optional[bool] = None) -> None:
         """
@@ -1,4 +1,5 @@
 import gym
+import time
 from easydict import EasyDict
 from copy import deepcopy
 import numpy as np
@@ -15,6 +16,7 @@ except ImportError:
 from ding.envs import BaseEnvTimestep
 from ding.utils import ENV_MANAGER_REGISTRY, deep_merge_dicts
 from ding.torch_utils import to_ndarray
+from .env_stats import EnvManagerStats
 
 
 @ENV_MANAGER_REGISTRY.register('env_pool')
@@ -48,6 +50,8 @@ class PoolEnvManager:
         self._ready_obs = {}
         self._closed = True
         self._seed = None
+        self._send_time = np.zeros(self._env_num)
+        self._stats = EnvManagerStats(self._env_num)
 
     def launch(self) -> None:
         assert self._closed, "Please first close the env manager"
@@ -72,14 +76,19 @@ class PoolEnvManager:
 
     def reset(self) -> None:
         self._ready_obs = {}
+        start_time = time.time()
         self._envs.async_reset()
         while True:
             obs, _, _, info = self._envs.recv()
             env_id = info['env_id']
+            now = time.time()
+            for i in env_id:
+                self._stats.record('reset', i, now - start_time)
             obs = obs.astype(np.float32)
             self._ready_obs = deep_merge_dicts({i: o for i, o in zip(env_id, obs)}, self._ready_obs)
             if len(self._ready_obs) == self._env_num:
                 break
+        self._stats.record_wait(time.time() - start_time)
         self._eval_episode_return = [0. for _ in range(self._env_num)]
 
     def step(self, action: dict) -> Dict[int, namedtuple]:
@@ -87,12 +96,19 @@ class PoolEnvManager:
         action = np.array(list(action.values()))
         if len(action.shape) == 2:
             action = action.squeeze(1)
+        send_time = time.time()
+        self._send_time[env_id] = send_time
         self._envs.send(action, env_id)
 
         obs, rew, done, info = self._envs.recv()
+        now = time.time()
+        self._stats.record_wait(now - send_time)
         obs = obs.astype(np.float32)
         rew = rew.astype(np.float32)
         env_id = info['env_id']
+        # envpool steps the envs in C++ threads, so only the latency from sending the action is measured
+        for i, latency in zip(env_id, now - self._send_time[env_id]):
+            self._stats.record('step_latency', i, latency)
         timesteps = {}
         self._ready_obs = {}
         for i in range(len(env_id)):
@@ -117,6 +133,23 @@ class PoolEnvManager:
         self._seed = seed
         logging.warning("envpool doesn't support dynamic_seed in different episode")
 
+    def stats(self, per_env: bool = True) -> Dict[str, Any]:
+        """
+        Overview:
+            Get the latency and throughput statistics of envs, refer to ``BaseEnvManager.stats`` for the details.
+        """
+        return self._stats.summary(per_env)
+
+    def log_stats(self, tb_logger: 'SummaryWriter', step: int, prefix: str = 'env_manager') -> None:  # noqa
+        """
+        Overview:
+            Write the statistics of envs into tensorboard.
+        """
+        self._stats.log(tb_logger, step, prefix)
+
+    def reset_stats(self) -> None:
+        self._stats.reset()
+
     @property
     def env_num(self) -> int:
         return self._env_num
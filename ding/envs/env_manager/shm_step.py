@@ -0,0 +1,262 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from multiprocessing import get_context
+from multiprocessing.connection import Connection
+import numpy as np
+
+from ding.data import ShmBuffer
+from ding.envs.env import BaseEnvTimestep
+
+# The kinds of values, the python scalars are restored with their original types.
+_KIND_NONE, _KIND_NDARRAY, _KIND_NP_SCALAR, _KIND_BOOL, _KIND_INT, _KIND_FLOAT = range(6)
+_MAX_NDIM = 4
+# Each field has a header (kind, dtype char, ndim, shape) of int64 and a data region.
+_HEADER_LEN = 3 + _MAX_NDIM
+# Control of each slot: whether the action is sent by pipe, whether the timestep is sent by pipe.
+_CONTROL_LEN = 2
+_ACTION_VIA_PIPE, _RESULT_VIA_PIPE = range(_CONTROL_LEN)
+# Sequence counters of each env: the number of requested steps and the number of finished steps.
+_REQUEST, _RESPONSE = range(2)
+
+
+class ShmStepSlot:
+    """
+    Overview:
+        The preallocated shared memory of one env for the step protocol of ``AsyncSubprocessEnvManager``. The action, \
+        reward, done and a fixed set of info keys are written into the slot instead of being pickled through the \
+        pipe, and the step is signaled by the per-env sequence counters and semaphores.
+        The values which can't be put into the slot, e.g. the actions in other types, the info with other keys, and \
+        the exceptions, are still sent by pipe, which is marked in the control of slot.
+        Only numpy arrays (at most 4 dims), numpy scalars and python bool/int/float are supported in the slot.
+    Interfaces:
+        ``__init__``, ``renew``, ``put_action``, ``request``, ``get_result``, ``attach``, ``wait_request``, \
+        ``get_action``, ``put_result``, ``complete``
+    """
+
+    def __init__(
+            self,
+            env_id: int,
+            seq: ShmBuffer,
+            step_done: Any,
+            info_keys: Iterable[str] = (),
+            field_nbytes: int = 256,
+            context: str = 'fork',
+    ) -> None:
+        """
+        Arguments:
+            - env_id (:obj:`int`): The env id, i.e. the row of ``seq``.
+            - seq (:obj:`ShmBuffer`): The int64 sequence counters of all the envs with shape ``(env_num, 2)``.
+            - step_done (:obj:`Semaphore`): The semaphore shared by all the envs, released when a step is finished.
+            - info_keys (:obj:`Iterable[str]`): The info keys which are put into the slot.
+            - field_nbytes (:obj:`int`): The max bytes of each field.
+            - context (:obj:`str`): The multiprocessing context.
+        """
+        self.env_id = env_id
+        self.info_keys = tuple(info_keys)
+        self._seq = seq
+        self._step_done = step_done
+        self._context = context
+        self._fields = ['action', 'reward', 'done'] + ['info.' + k for k in self.info_keys]
+        data_nbytes = (field_nbytes + 7) // 8 * 8
+        self._field_nbytes = data_nbytes
+        nbytes = 8 * _CONTROL_LEN + len(self._fields) * (8 * _HEADER_LEN + data_nbytes)
+        self._buffer = ShmBuffer(np.uint8, (nbytes, ), copy_on_get=False)
+        self._request = get_context(context).Semaphore(0)
+        self._views = None
+        self._handled = 0
+
+    def __getstate__(self) -> Dict:
+        state = self.__dict__.copy()
+        state['_views'] = None
+        return state
+
+    def _get_views(self) -> Tuple[np.ndarray, np.ndarray, Dict[str, Tuple[np.ndarray, np.ndarray]]]:
+        # The views are created in each process after the shared memory is mapped.
+        if self._views is None:
+            buffer = self._buffer.get()
+            control = buffer[:8 * _CONTROL_LEN].view(np.int64)
+            fields, offset = {}, 8 * _CONTROL_LEN
+            for name in self._fields:
+                header = buffer[offset:offset + 8 * _HEADER_LEN].view(np.int64)
+                offset += 8 * _HEADER_LEN
+                fields[name] = (header, buffer[offset:offset + self._field_nbytes])
+                offset += self._field_nbytes
+            self._views = (self._seq.get(), control, fields)
+        return self._views
+
+    def signal(self) -> None:
+        """
+        Overview:
+            Wake up the worker, which is called after sending a command by pipe.
+        """
+        self._request.release()
+
+    # Methods used in the env manager.
+    def renew(self) -> None:
+        """
+        Overview:
+            Prepare the slot for a new worker subprocess, the unfinished step of the old worker is dropped.
+        """
+        seq, _, _ = self._get_views()
+        seq[self.env_id, _RESPONSE] = seq[self.env_id, _REQUEST]
+        self._request = get_context(self._context).Semaphore(0)
+
+    def put_action(self, action: Any) -> bool:
+        """
+        Overview:
+            Put the action into the slot, return False if the action should be sent by pipe.
+        """
+        _, _, fields = self._get_views()
+        return _encode(action, *fields['action'])
+
+    def request(self, action_via_pipe: bool = False) -> None:
+        """
+        Overview:
+            Request the worker to step, the action is either put into the slot or sent by pipe in advance.
+        """
+        seq, control, _ = self._get_views()
+        control[_ACTION_VIA_PIPE] = action_via_pipe
+        seq[self.env_id, _REQUEST] += 1
+        self._request.release()
+
+    def get_result(self) -> Optional[BaseEnvTimestep]:
+        """
+        Overview:
+            Get the timestep of the finished step without obs, return None if the result should be received by pipe.
+        """
+        _, control, fields = self._get_views()
+        if control[_RESULT_VIA_PIPE]:
+            return None
+        info = {}
+        for key in self.info_keys:
+            header, data = fields['info.' + key]
+            if header[0] != _KIND_NONE:
+                info[key] = _decode(header, data)
+        return BaseEnvTimestep(None, _decode(*fields['reward']), _decode(*fields['done']), info)
+
+    # Methods used in the worker subprocess.
+    def attach(self) -> None:
+        """
+        Overview:
+            Start to handle the requests in the worker subprocess, the requests before are ignored.
+        """
+        seq, _, _ = self._get_views()
+        self._handled = int(seq[self.env_id, _REQUEST])
+
+    def wait_request(self, timeout: Optional[float] = None) -> Optional[bool]:
+        """
+        Overview:
+            Wait for the next request, return True for step and False for the command sent by pipe, \
+            or None if timeout.
+        """
+        if not self._request.acquire(timeout=timeout):
+            return None
+        seq, _, _ = self._get_views()
+        return int(seq[self.env_id, _REQUEST]) != self._handled
+
+    def get_action(self) -> Tuple[bool, Any]:
+        """
+        Overview:
+            Get whether the action is sent by pipe, and the action in the slot.
+        """
+        _, control, fields = self._get_views()
+        if control[_ACTION_VIA_PIPE]:
+            return True, None
+        return False, _decode(*fields['action'])
+
+    def put_result(self, timestep: Optional[BaseEnvTimestep]) -> bool:
+        """
+        Overview:
+            Put the reward, done and info of timestep into the slot, return False if the timestep should be sent by \
+            pipe. The timestep is None if the step raises exception.
+        """
+        _, control, fields = self._get_views()
+        ok = timestep is not None and type(timestep.info) is dict \
+            and all(k in self.info_keys for k in timestep.info.keys()) \
+            and _encode(timestep.reward, *fields['reward']) and _encode(timestep.done, *fields['done'])
+        if ok:
+            for key in self.info_keys:
+                header, data = fields['info.' + key]
+                if key not in timestep.info:
+                    header[0] = _KIND_NONE
+                elif not _encode(timestep.info[key], header, data):
+                    ok = False
+                    break
+        control[_RESULT_VIA_PIPE] = not ok
+        return ok
+
+    def complete(self) -> None:
+        """
+        Overview:
+            Mark the step as finished and notify the env manager.
+        """
+        seq, _, _ = self._get_views()
+        self._handled = int(seq[self.env_id, _REQUEST])
+        seq[self.env_id, _RESPONSE] = self._handled
+        self._step_done.release()
+
+
+class ShmStepConnection:
+    """
+    Overview:
+        The pipe connection which wakes up the worker after each ``send``, since the worker in shared memory step \
+        mode waits for the semaphore of slot rather than the pipe.
+    """
+
+    def __init__(self, conn: Connection, slot: ShmStepSlot) -> None:
+        self.conn = conn
+        self.slot = slot
+
+    def send(self, obj: Any) -> None:
+        self.conn.send(obj)
+        self.slot.signal()
+
+    def __getattr__(self, key: str) -> Any:
+        return getattr(self.conn, key)
+
+
+def finished_steps(seq: ShmBuffer, env_ids: List[int]) -> List[int]:
+    """
+    Overview:
+        Return the envs in ``env_ids`` whose requested steps are all finished.
+    """
+    counters = seq.get()[env_ids]
+    return [env_ids[i] for i in np.nonzero(counters[:, _RESPONSE] == counters[:, _REQUEST])[0]]
+
+
+def _encode(value: Any, header: np.ndarray, data: np.ndarray) -> bool:
+    if isinstance(value, np.ndarray):
+        kind = _KIND_NDARRAY
+    elif isinstance(value, np.generic):
+        kind = _KIND_NP_SCALAR
+    elif isinstance(value, bool):
+        kind = _KIND_BOOL
+    elif isinstance(value, int):
+        kind = _KIND_INT
+    elif isinstance(value, float):
+        kind = _KIND_FLOAT
+    else:
+        return False
+    array = np.asarray(value)
+    if array.dtype.kind not in 'biuf' or array.ndim > _MAX_NDIM or array.nbytes > data.nbytes:
+        return False
+    if kind == _KIND_INT and array.dtype != np.int64:  # out of int64 range
+        return False
+    header[0], header[1], header[2] = kind, ord(array.dtype.char), array.ndim
+    header[3:3 + array.ndim] = array.shape
+    data[:array.nbytes] = np.ascontiguousarray(array).view(np.uint8).reshape(-1)
+    return True
+
+
+def _decode(header: np.ndarray, data: np.ndarray) -> Any:
+    kind, dtype, ndim = int(header[0]), np.dtype(chr(header[1])), int(header[2])
+    shape = tuple(int(s) for s in header[3:3 + ndim])
+    array = data[:dtype.itemsize * int(np.prod(shape))].view(dtype).reshape(shape).copy()
+    if kind == _KIND_NDARRAY:
+        return array
+    elif kind == _KIND_NP_SCALAR:
+        return array[()]
+    elif kind == _KIND_BOOL:
+        return bool(array)
+    elif kind == _KIND_INT:
+        return int(array)
+    return float(array)
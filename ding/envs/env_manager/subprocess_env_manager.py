@@ -1,8 +1,10 @@
 from typing import Any, Union, List, Tuple, Dict, Callable, Optional
 from multiprocessing import connection, get_context
-from collections import namedtuple
+from collections import namedtuple, deque
 from ditk import logging
+import os
 import platform
+import threading
 import time
 import copy
 import gymnasium
@@ -20,6 +22,12 @@ from ding.envs.env import BaseEnvTimestep
 from ding.utils import PropagatingThread, LockContextType, LockContext, ENV_MANAGER_REGISTRY, make_key_as_identifier, \
     remove_illegal_item, CloudPickleWrapper
 from .base_env_manager import BaseEnvManager, EnvState, timeout_wrapper
+from .shm_step import ShmStepSlot, ShmStepConnection, finished_steps
+
+# The layout of the time stats buffer of each env, which is written by the worker subprocess.
+WORKER_STATS_FIELDS = (
+    'step_total', 'step_count', 'step_last', 'reset_total', 'reset_count', 'reset_last', 'send_total', 'send_count'
+)
 
 
 def is_abnormal_timestep(timestep: namedtuple) -> bool:
@@ -57,6 +65,21 @@ class AsyncSubprocessEnvManager(BaseEnvManager):
         step_wait_timeout=0.01,
         connect_timeout=60,
         reset_inplace=False,
+        # (bool) Whether to transfer the action, reward, done and info of ``step`` by shared memory slots instead of \
+        # pickling them through pipe, which requires ``shared_memory=True``. The values in other types and the info \
+        # with other keys are still pickled through pipe.
+        shared_memory_step=False,
+        # (list) The info keys transferred by shared memory in ``shared_memory_step`` mode.
+        shared_memory_step_info_keys=['eval_episode_return'],
+        # (int) The number of envs hosted by each worker subprocess. Each env still has its own pipe and obs buffer, \
+        # so the ``reset``, ``auto_reset`` and retry of each env are the same as one env per subprocess.
+        envs_per_worker=1,
+        # (int) The number of pre-started standby worker subprocesses. When an env subprocess is renewed (e.g. \
+        # ``retry_type='renew'``), a standby worker, which has finished the process start and imports, is handed \
+        # over to create the env instead of starting a new subprocess, and another standby worker is started.
+        standby_worker_num=0,
+        # (list) The configs of the vectorized env wrappers applied on the stacked observations.
+        vec_env_wrapper=[],
     )
 
     def __init__(
@@ -83,7 +106,8 @@ class AsyncSubprocessEnvManager(BaseEnvManager):
         self._wait_num = self._cfg.wait_num
         self._step_wait_timeout = self._cfg.step_wait_timeout
 
-        self._lock = LockContext(LockContextType.THREAD_LOCK)
+        # notified when the env states are changed by the reset threads or the env manager is closed
+        self._state_cond = threading.Condition()
         self._connect_timeout = self._cfg.connect_timeout
         self._async_args = {
             'step': {
@@ -94,6 +118,19 @@ class AsyncSubprocessEnvManager(BaseEnvManager):
         self._reset_inplace = self._cfg.reset_inplace
         if not self._auto_reset:
             assert not self._reset_inplace, "reset_inplace is unavailable when auto_reset=False."
+        self._shared_memory_step = self._cfg.get('shared_memory_step', False)
+        if self._shared_memory_step:
+            assert self._shared_memory, "shared_memory_step requires shared_memory=True."
+        self._envs_per_worker = self._cfg.get('envs_per_worker', 1)
+        assert self._envs_per_worker >= 1, self._envs_per_worker
+        if self._envs_per_worker > 1:
+            assert not self._shared_memory_step, "shared_memory_step is unavailable when envs_per_worker > 1."
+            self._worker_lock = LockContext(LockContextType.THREAD_LOCK)
+        self._standby_worker_num = self._cfg.get('standby_worker_num', 0)
+        if self._standby_worker_num > 0:
+            assert self._envs_per_worker == 1 and not self._shared_memory_step, \
+                "standby workers are unavailable when envs_per_worker > 1 or shared_memory_step=True."
+            self._standby_lock = LockContext(LockContextType.THREAD_LOCK)
 
     def _create_state(self) -> None:
         r"""
@@ -120,17 +157,58 @@ class AsyncSubprocessEnvManager(BaseEnvManager):
             }
         else:
             self._obs_buffers = {env_id: None for env_id in range(self.env_num)}
+        if self._shared_memory_step:
+            self._step_seq = ShmBuffer(np.int64, (self.env_num, 2), copy_on_get=False)
+            self._step_done = get_context(self._context).Semaphore(0)
+            # The number of acquired ``_step_done`` minus the number of finished steps found.
+            self._step_done_credit = 0
+            self._step_slots = {
+                env_id: ShmStepSlot(
+                    env_id,
+                    self._step_seq,
+                    self._step_done,
+                    self._cfg.get('shared_memory_step_info_keys', []),
+                    context=self._context
+                )
+                for env_id in range(self.env_num)
+            }
+        else:
+            self._step_slots = {env_id: None for env_id in range(self.env_num)}
+        # The time stats of each env in worker subprocess, refer to ``WORKER_STATS_FIELDS`` for the layout.
+        self._env_step_times = {
+            env_id: ShmBuffer(np.float64, (len(WORKER_STATS_FIELDS), ), copy_on_get=False, context=self._context)
+            for env_id in range(self.env_num)
+        }
+        self._step_send_time = {env_id: 0. for env_id in range(self.env_num)}
         self._pipe_parents, self._pipe_children = {}, {}
         self._subprocesses = {}
-        for env_id in range(self.env_num):
-            self._create_env_subprocess(env_id)
+        self._standby_workers = deque()
+        if self._envs_per_worker > 1:
+            self._worker_envs = [
+                list(range(i, min(i + self._envs_per_worker, self.env_num)))
+                for i in range(0, self.env_num, self._envs_per_worker)
+            ]
+            self._env_worker = {env_id: w for w, env_ids in enumerate(self._worker_envs) for env_id in env_ids}
+            self._worker_controls = {}
+            for worker_id in range(len(self._worker_envs)):
+                self._create_worker_subprocess(worker_id)
+        else:
+            for env_id in range(self.env_num):
+                self._create_env_subprocess(env_id)
         self._waiting_env = {'step': set()}
         self._closed = False
 
     def _create_env_subprocess(self, env_id):
+        if self._envs_per_worker > 1:
+            self._renew_env_in_worker(env_id)
+            return
+        if len(self._standby_workers) > 0 and self._attach_standby_worker(env_id):
+            return
         # start a new one
         ctx = get_context(self._context)
         self._pipe_parents[env_id], self._pipe_children[env_id] = ctx.Pipe()
+        if self._step_slots[env_id] is not None:
+            self._step_slots[env_id].renew()
         self._subprocesses[env_id] = ctx.Process(
             # target=self.worker_fn,
             target=self.worker_fn_robust,
@@ -143,23 +221,212 @@ class AsyncSubprocessEnvManager(BaseEnvManager):
                 self._reset_timeout,
                 self._step_timeout,
                 self._reset_inplace,
+                self._step_slots[env_id],
+                self._env_step_times[env_id],
             ),
             daemon=True,
             name='subprocess_env_manager{}_{}'.format(env_id, time.time())
         )
         self._subprocesses[env_id].start()
         self._pipe_children[env_id].close()
+        if self._step_slots[env_id] is not None:
+            # The worker waits for the semaphore of slot, so each command sent by pipe should signal it.
+            self._pipe_parents[env_id] = ShmStepConnection(self._pipe_parents[env_id], self._step_slots[env_id])
         self._env_states[env_id] = EnvState.INIT
 
         if self._env_replay_path is not None:
             self._pipe_parents[env_id].send(['enable_save_replay', [self._env_replay_path[env_id]], {}])
             self._pipe_parents[env_id].recv()
 
+    def _create_standby_worker(self) -> None:
+        """
+        Overview:
+            Start a standby worker subprocess, which sends a message when it is ready and waits for the ``attach`` \
+            command to create the env of the given env_id. All the env resources are passed when it starts, since \
+            the shared memory can't be sent by pipe.
+        """
+        ctx = get_context(self._context)
+        parent, child = ctx.Pipe()
+        subprocess = ctx.Process(
+            target=self.worker_fn_standby,
+            args=(
+                parent,
+                child,
+                [CloudPickleWrapper(fn) for fn in self._env_fn],
+                self._obs_buffers,
+                self.method_name_list,
+                self._reset_timeout,
+                self._step_timeout,
+                self._reset_inplace,
+                self._env_step_times,
+            ),
+            daemon=True,
+            name='subprocess_env_manager_standby_{}'.format(time.time())
+        )
+        subprocess.start()
+        child.close()
+        self._standby_workers.append((subprocess, parent))
+
+    def _attach_standby_worker(self, env_id: int) -> bool:
+        """
+        Overview:
+            Hand over a live standby worker (the ready one first) to the env and start a new standby worker.
+        Returns:
+            - attached (:obj:`bool`): Whether a standby worker is attached, False if all of them are dead.
+        """
+        with self._standby_lock:
+            ready = [w for w in self._standby_workers if w[1].poll()]
+            if len(ready) > 0:
+                self._standby_workers.remove(ready[0])
+                self._standby_workers.appendleft(ready[0])
+            while len(self._standby_workers) > 0:
+                subprocess, parent = self._standby_workers.popleft()
+                if not subprocess.is_alive():
+                    parent.close()
+                    continue
+                try:
+                    # wait for the ready message, so that the data left in the pipe is cleared
+                    if not parent.poll(self._connect_timeout):
+                        raise ConnectionError("standby worker start timeout")
+                    parent.recv()
+                    parent.send(['attach', env_id, None])
+                except (EOFError, OSError):
+                    parent.close()
+                    subprocess.terminate()
+                    continue
+                self._pipe_parents[env_id] = parent
+                self._subprocesses[env_id] = subprocess
+                self._env_states[env_id] = EnvState.INIT
+                self._create_standby_worker()
+                break
+            else:
+                return False
+        if self._env_replay_path is not None:
+            self._pipe_parents[env_id].send(['enable_save_replay', [self._env_replay_path[env_id]], {}])
+            self._pipe_parents[env_id].recv()
+        return True
+
+    def _create_worker_subprocess(self, worker_id: int) -> None:
+        """
+        Overview:
+            Start a worker subprocess hosting the envs of ``worker_id``, each env has its own pipe.
+        """
+        ctx = get_context(self._context)
+        env_ids = self._worker_envs[worker_id]
+        pipes = {}
+        for env_id in env_ids:
+            self._pipe_parents[env_id], self._pipe_children[env_id] = ctx.Pipe()
+            pipes[env_id] = (self._pipe_parents[env_id], self._pipe_children[env_id])
+        control_parent, control_child = ctx.Pipe()
+        subprocess = ctx.Process(
+            target=self.worker_fn_group,
+            args=(
+                control_parent,
+                control_child,
+                pipes,
+                {env_id: CloudPickleWrapper(self._env_fn[env_id])
+                 for env_id in env_ids},
+                {env_id: self._obs_buffers[env_id]
+                 for env_id in env_ids},
+                self.method_name_list,
+                self._reset_timeout,
+                self._step_timeout,
+                self._reset_inplace,
+                {env_id: self._env_step_times[env_id]
+                 for env_id in env_ids},
+            ),
+            daemon=True,
+            name='subprocess_env_manager_worker{}_{}'.format(worker_id, time.time())
+        )
+        subprocess.start()
+        control_child.close()
+        self._worker_controls[worker_id] = control_parent
+        for env_id in env_ids:
+            self._pipe_children[env_id].close()
+            self._subprocesses[env_id] = subprocess
+            self._env_states[env_id] = EnvState.INIT
+            if self._env_replay_path is not None:
+                self._pipe_parents[env_id].send(['enable_save_replay', [self._env_replay_path[env_id]], {}])
+                self._pipe_parents[env_id].recv()
+
+    def _renew_env_in_worker(self, env_id: int) -> None:
+        """
+        Overview:
+            Recreate an env in its worker subprocess with a new pipe, while the other envs in the worker keep \
+            running. If the worker is dead or doesn't respond, the whole worker is restarted, and its other running \
+            envs are reset.
+        """
+        worker_id = self._env_worker[env_id]
+        with self._worker_lock:
+            control = self._worker_controls[worker_id]
+            if self._subprocesses[env_id].is_alive():
+                parent, child = get_context(self._context).Pipe()
+                try:
+                    control.send(['renew', env_id, child])
+                    renewed = control.poll(self._connect_timeout)
+                    ret = control.recv() if renewed else None
+                except (EOFError, OSError):
+                    renewed, ret = False, None
+                child.close()
+                if renewed:
+                    self._check_data({env_id: ret}, close=False)
+                    self._pipe_parents[env_id] = parent
+                    self._env_states[env_id] = EnvState.INIT
+                    if self._env_replay_path is not None:
+                        parent.send(['enable_save_replay', [self._env_replay_path[env_id]], {}])
+                        parent.recv()
+                    return
+                parent.close()
+            # restart the whole worker
+            subprocess = self._subprocesses[env_id]
+            if subprocess.is_alive():
+                subprocess.terminate()
+            control.close()
+            others = [i for i in self._worker_envs[worker_id] if i != env_id]
+            for i in self._worker_envs[worker_id]:
+                self._pipe_parents[i].close()
+            prev_states = {i: self._env_states[i] for i in others}
+            self._create_worker_subprocess(worker_id)
+        for i in others:
+            self._waiting_env['step'].discard(i)
+            if prev_states[i] == EnvState.RUN:
+                self._env_states[i] = EnvState.RESET
+                reset_thread = PropagatingThread(target=self._reset, args=(i, ), name='regular_reset')
+                reset_thread.daemon = True
+                reset_thread.start()
+            else:
+                # the envs in reset retry with the new pipes by themselves
+                self._env_states[i] = prev_states[i]
+
+    def _renew_env_subprocess(self, env_id: int) -> None:
+        """
+        Overview:
+            Drop the pipe of an env and create the env again.
+        """
+        self._pipe_parents[env_id].close()
+        if self._envs_per_worker == 1 and self._subprocesses[env_id].is_alive():
+            self._subprocesses[env_id].terminate()
+        self._create_env_subprocess(env_id)
+
     @property
     def ready_env(self) -> List[int]:
         active_env = [i for i, s in self._env_states.items() if s == EnvState.RUN]
         return [i for i in active_env if i not in self._waiting_env['step']]
 
+    @property
+    def ready_obs_id(self) -> List[int]:
+        # the envs whose steps are still not finished are excluded, the same as ``ready_obs``
+        return self.ready_env
+
+    @property
+    def stepping_env(self) -> List[int]:
+        """
+        Overview:
+            The envs whose steps have been sent but not returned yet, which are returned in the next calls of \
+            ``step`` (e.g. ``step`` with empty actions).
+        """
+        return sorted(self._waiting_env['step'])
+
     @property
     def ready_obs(self) -> Dict[int, Any]:
         """
@@ -173,16 +440,38 @@ class AsyncSubprocessEnvManager(BaseEnvManager):
             >>>     obs_dict = env_manager.ready_obs
             >>>     actions_dict = {env_id: model.forward(obs) for env_id, obs in obs_dict.items())}
         """
+        self._wait_ready_env()
+        return self._wrap_ready_obs({i: self._ready_obs[i] for i in self.ready_env})
+
+    def _wait_ready_env(self) -> None:
+        """
+        Overview:
+            Block until any of the not done envs is ready to step. The envs whose steps are in flight are not ready, \
+            ``step`` ensures that they are not the only envs in state RUN.
+        """
         no_done_env_idx = [i for i, s in self._env_states.items() if s != EnvState.DONE]
-        sleep_count = 0
-        while not any([self._env_states[i] == EnvState.RUN for i in no_done_env_idx]):
-            if sleep_count != 0 and sleep_count % 10000 == 0:
-                logging.warning(
-                    'VEC_ENV_MANAGER: all the not done envs are resetting, sleep {} times'.format(sleep_count)
-                )
-            time.sleep(0.001)
-            sleep_count += 1
-        return {i: self._ready_obs[i] for i in self.ready_env}
+        self._wait_env_states(
+            lambda: any(
+                [
+                    self._env_states[i] == EnvState.RUN and i not in self._waiting_env['step']
+                    for i in no_done_env_idx
+                ]
+            ), 'all the not done envs are resetting'
+        )
+
+    def _wait_env_states(self, condition: Callable[[], bool], msg: str) -> None:
+        """
+        Overview:
+            Block until ``condition`` of env states is satisfied. The condition is checked again each time the \
+            reset threads change the env states, rather than polling with sleep.
+        """
+        start_time = time.time()
+        with self._state_cond:
+            while not condition():
+                self._check_closed()
+                if not self._state_cond.wait(timeout=10.):
+                    logging.warning('VEC_ENV_MANAGER: {}, wait {:.1f}s'.format(msg, time.time() - start_time))
+        self._stats.record_wait(time.time() - start_time)
 
     @property
     def ready_imgs(self, render_mode: Optional[str] = 'rgb_array') -> Dict[int, Any]:
@@ -211,8 +500,13 @@ class AsyncSubprocessEnvManager(BaseEnvManager):
         assert self._closed, "please first close the env manager"
         if reset_param is not None:
             assert len(reset_param) == len(self._env_fn)
+        start_time = time.time()
         self._create_state()
         self.reset(reset_param)
+        self._stats.record_total('launch', time.time() - start_time)
+        # start the standby workers after the envs are ready, which doesn't slow down the launch
+        for _ in range(self._standby_worker_num):
+            self._create_standby_worker()
 
     def reset(self, reset_param: Optional[Dict] = None) -> None:
         """
@@ -234,17 +528,20 @@ class AsyncSubprocessEnvManager(BaseEnvManager):
         # clear previous info
         for env_id in reset_env_list:
             if env_id in self._waiting_env['step']:
-                self._pipe_parents[env_id].recv()
+                if self._shared_memory_step:
+                    self._wait_step([env_id], 1, None)
+                    if self._step_slots[env_id].get_result() is None:
+                        self._pipe_parents[env_id].recv()
+                else:
+                    self._pipe_parents[env_id].recv()
                 self._waiting_env['step'].remove(env_id)
 
-        sleep_count = 0
-        while any([self._env_states[i] == EnvState.RESET for i in reset_env_list]):
-            if sleep_count != 0 and sleep_count % 10000 == 0:
-                logging.warning(
-                    'VEC_ENV_MANAGER: not all the envs finish resetting, sleep {} times'.format(sleep_count)
-                )
-            time.sleep(0.001)
-            sleep_count += 1
+        self._wait_env_states(
+            lambda: not any([self._env_states[i] == EnvState.RESET for i in reset_env_list]),
+            'not all the envs finish resetting'
+        )
+        if self._vec_env_wrapper is not None:
+            self._vec_env_wrapper.clear(reset_env_list)
 
         # reset env
         reset_thread_list = []
@@ -295,23 +592,32 @@ class AsyncSubprocessEnvManager(BaseEnvManager):
             if self._shared_memory:
                 obs = self._obs_buffers[env_id].get()
             # it is necessary to add lock for the updates of env_state
-            with self._lock:
-                self._env_states[env_id] = EnvState.RUN
+            with self._state_cond:
+                self._stats.record('reset', env_id, float(self._env_step_times[env_id].get()[5]))
                 self._ready_obs[env_id] = obs
+                self._env_states[env_id] = EnvState.RUN
+                self._state_cond.notify_all()
 
         exceptions = []
+        renew_time = None
         for _ in range(self._max_retry):
             try:
                 reset_fn()
+                if renew_time is not None:
+                    # the failover latency from renewing the env subprocess to the env being ready again
+                    with self._state_cond:
+                        self._stats.record_total('renew', time.time() - renew_time)
                 return
             except BaseException as e:
                 logging.info("subprocess exception traceback: \n" + traceback.format_exc())
+                with self._state_cond:
+                    self._stats.record_retry(env_id)
                 if self._retry_type == 'renew' or isinstance(e, pickle.UnpicklingError):
-                    self._pipe_parents[env_id].close()
-                    if self._subprocesses[env_id].is_alive():
-                        self._subprocesses[env_id].terminate()
-                    self._create_env_subprocess(env_id)
+                    renew_time = time.time()
+                    self._renew_env_subprocess(env_id)
                 exceptions.append(e)
+                with self._state_cond:  # the env state may be set as ERROR
+                    self._state_cond.notify_all()
                 time.sleep(self._retry_waiting_time)
 
         logging.error("Env {} reset has exceeded max retries({})".format(env_id, self._max_retry))
@@ -357,7 +663,7 @@ class AsyncSubprocessEnvManager(BaseEnvManager):
                    )
 
         for env_id, act in actions.items():
-            self._pipe_parents[env_id].send(['step', [act], None])
+            self._send_step(env_id, act)
 
         timesteps = {}
         step_args = self._async_args['step']
@@ -366,26 +672,15 @@ class AsyncSubprocessEnvManager(BaseEnvManager):
         ready_env_ids = []
         cur_rest_env_ids = copy.deepcopy(rest_env_ids)
         while True:
-            rest_conn = [self._pipe_parents[env_id] for env_id in cur_rest_env_ids]
-            ready_conn, ready_ids = AsyncSubprocessEnvManager.wait(rest_conn, min(wait_num, len(rest_conn)), timeout)
-            cur_ready_env_ids = [cur_rest_env_ids[env_id] for env_id in ready_ids]
-            assert len(cur_ready_env_ids) == len(ready_conn)
-            # timesteps.update({env_id: p.recv() for env_id, p in zip(cur_ready_env_ids, ready_conn)})
-            for env_id, p in zip(cur_ready_env_ids, ready_conn):
-                try:
-                    timesteps.update({env_id: p.recv()})
-                except pickle.UnpicklingError as e:
-                    timestep = BaseEnvTimestep(None, None, None, {'abnormal': True})
-                    timesteps.update({env_id: timestep})
-                    self._pipe_parents[env_id].close()
-                    if self._subprocesses[env_id].is_alive():
-                        self._subprocesses[env_id].terminate()
-                    self._create_env_subprocess(env_id)
+            cur_ready_env_ids = self._wait_step(cur_rest_env_ids, min(wait_num, len(cur_rest_env_ids)), timeout)
+            for env_id in cur_ready_env_ids:
+                timesteps[env_id] = self._recv_step(env_id)
             self._check_data(timesteps)
             ready_env_ids += cur_ready_env_ids
+            all_ready = len(cur_ready_env_ids) == len(cur_rest_env_ids)
             cur_rest_env_ids = list(set(cur_rest_env_ids).difference(set(cur_ready_env_ids)))
             # At least one not done env timestep, or all envs' steps are finished
-            if any([not t.done for t in timesteps.values()]) or len(ready_conn) == len(rest_conn):
+            if any([not t.done for t in timesteps.values()]) or all_ready:
                 break
         self._waiting_env['step']: set
         for env_id in rest_env_ids:
@@ -396,8 +691,7 @@ class AsyncSubprocessEnvManager(BaseEnvManager):
                 self._waiting_env['step'].add(env_id)
 
         if self._shared_memory:
-            for i, (env_id, timestep) in enumerate(timesteps.items()):
-                timesteps[env_id] = timestep._replace(obs=self._obs_buffers[env_id].get())
+            self._fill_shared_obs(timesteps)
 
         for env_id, timestep in timesteps.items():
             if is_abnormal_timestep(timestep):
@@ -423,7 +717,103 @@ class AsyncSubprocessEnvManager(BaseEnvManager):
                     self._env_states[env_id] = EnvState.DONE
             else:
                 self._ready_obs[env_id] = timestep.obs
-        return timesteps
+        return self._wrap_timesteps(timesteps)
+
+    def _send_step(self, env_id: int, act: Any) -> None:
+        """
+        Overview:
+            Send the step command of an env, the action is put into the shared memory slot if possible.
+        """
+        send_time = self._step_send_time[env_id] = time.time()
+        slot = self._step_slots[env_id]
+        if slot is None:
+            # it is necessary to set kwargs as None for saving cost of serialization in some env like cartpole,
+            # and step method never uses kwargs in known envs.
+            self._pipe_parents[env_id].send(['step', [act], None])
+        elif slot.put_action(act):
+            slot.request()
+        else:
+            self._pipe_parents[env_id].conn.send(['step', [act], None])
+            slot.request(action_via_pipe=True)
+        self._stats.record_ipc('serialize', time.time() - send_time)
+
+    def _wait_step(self, env_ids: List[int], wait_num: int, timeout: Optional[float]) -> List[int]:
+        """
+        Overview:
+            Wait for the step results of envs, with the same semantics as ``wait``.
+        """
+        start_time = time.time()
+        if not self._shared_memory_step:
+            rest_conn = [self._pipe_parents[env_id] for env_id in env_ids]
+            _, ready_ids = AsyncSubprocessEnvManager.wait(rest_conn, wait_num, timeout)
+            ready_env_ids = [env_ids[i] for i in ready_ids]
+            self._update_step_latency(ready_env_ids, start_time)
+            return ready_env_ids
+        rest_env_ids = list(env_ids)
+        ready_env_ids = []
+        while len(rest_env_ids) > 0:
+            wait_timeout = timeout if timeout else 1.
+            if len(ready_env_ids) >= wait_num and timeout:
+                wait_timeout = timeout - (time.time() - start_time)
+                if wait_timeout <= 0:
+                    break
+            finished = finished_steps(self._step_seq, rest_env_ids)
+            if len(finished) > 0:
+                # Each finished step releases ``_step_done`` once, acquire them to keep the counts aligned.
+                self._step_done_credit -= len(finished)
+                while self._step_done_credit < 0:
+                    self._step_done.acquire()
+                    self._step_done_credit += 1
+                ready_env_ids += finished
+                rest_env_ids = [env_id for env_id in rest_env_ids if env_id not in finished]
+                continue
+            if self._step_done.acquire(timeout=wait_timeout):
+                self._step_done_credit += 1
+            else:
+                # The dead workers never finish the step, receive from their pipes to raise the error.
+                dead = [env_id for env_id in rest_env_ids if not self._subprocesses[env_id].is_alive()]
+                ready_env_ids += dead
+                rest_env_ids = [env_id for env_id in rest_env_ids if env_id not in dead]
+        self._update_step_latency(ready_env_ids, start_time)
+        return ready_env_ids
+
+    def _update_step_latency(self, ready_env_ids: List[int], start_time: float) -> None:
+        now = time.time()
+        self._stats.record_wait(now - start_time)
+        for env_id in ready_env_ids:
+            self._stats.record('step_latency', env_id, now - self._step_send_time[env_id])
+
+    def _recv_step(self, env_id: int) -> namedtuple:
+        """
+        Overview:
+            Receive the step result of an env whose step is finished, the obs is in the obs buffer.
+        """
+        recv_time = time.time()
+        timestep = None
+        if self._step_slots[env_id] is not None and self._subprocesses[env_id].is_alive():
+            timestep = self._step_slots[env_id].get_result()
+        if timestep is None:
+            try:
+                timestep = self._pipe_parents[env_id].recv()
+            except pickle.UnpicklingError as e:
+                self._stats.record_retry(env_id)
+                self._renew_env_subprocess(env_id)
+                return BaseEnvTimestep(None, None, None, {'abnormal': True})
+        self._stats.record_ipc('deserialize', time.time() - recv_time)
+        if not isinstance(timestep, BaseException):
+            # the time of ``env.step`` of this timestep, which is written by the worker before sending the result
+            self._stats.record('step', env_id, float(self._env_step_times[env_id].get()[2]))
+        return timestep
+
+    def _fill_shared_obs(self, timesteps: Dict[int, namedtuple]) -> None:
+        """
+        Overview:
+            Replace the obs of timesteps with the obs in the shared memory buffers.
+        """
+        start_time = time.time()
+        for env_id, timestep in timesteps.items():
+            timesteps[env_id] = timestep._replace(obs=self._obs_buffers[env_id].get())
+        self._stats.record_ipc('shm_copy', time.time() - start_time, len(timesteps))
 
     # This method must be staticmethod, otherwise there will be some resource conflicts(e.g. port or file)
     # Env must be created in worker, which is a trick of avoiding env pickle errors.
@@ -505,19 +895,199 @@ class AsyncSubprocessEnvManager(BaseEnvManager):
             reset_timeout=None,
             step_timeout=None,
             reset_inplace=False,
+            step_slot=None,
+            step_time=None,
     ) -> None:
         """
         Overview:
             A more robust version of subprocess's target function to run. Used by default.
+            If ``step_slot`` is not None, the worker waits for the semaphore of slot, and the step is done with the \
+            action and result in the slot, while the other commands are still received from pipe.
         """
         torch.set_num_threads(1)
         env_fn = env_fn_wrapper.data
         env = env_fn()
         parent.close()
+        ppid = os.getppid()
+        if step_slot is not None:
+            step_slot.attach()
+        step_fn, reset_fn = AsyncSubprocessEnvManager._worker_env_fns(
+            env, obs_buffer, reset_timeout, step_timeout, reset_inplace, step_time
+        )
+        stats_view = None if step_time is None else step_time.get()
+
+        while True:
+            if step_slot is not None:
+                request = step_slot.wait_request(timeout=1.)
+                if request is None:
+                    if os.getppid() != ppid:  # the env manager process has exited
+                        child.close()
+                        break
+                    continue
+                if request:
+                    action_via_pipe, action = step_slot.get_action()
+                    try:
+                        if action_via_pipe:
+                            _, args, _ = child.recv()
+                            action = args[0]
+                        timestep = step_fn(action)
+                    except BaseException as e:
+                        logging.warning("subprocess exception traceback: \n" + traceback.format_exc())
+                        timestep = e.__class__(
+                            '\nEnv Process Exception:\n' + ''.join(traceback.format_tb(e.__traceback__)) + repr(e)
+                        )
+                    send_time = time.time()
+                    if not step_slot.put_result(None if isinstance(timestep, BaseException) else timestep):
+                        child.send(timestep)
+                    if stats_view is not None:
+                        stats_view[6] += time.time() - send_time
+                        stats_view[7] += 1
+                    step_slot.complete()
+                    continue
+            try:
+                cmd, args, kwargs = child.recv()
+            except EOFError:  # for the case when the pipe has been closed
+                child.close()
+                break
+            AsyncSubprocessEnvManager._worker_execute(
+                env, child, cmd, args, kwargs, step_fn, reset_fn, method_name_list, stats_view
+            )
+            if cmd == 'close':
+                child.close()
+                break
+
+    @staticmethod
+    def worker_fn_standby(
+            parent,
+            child,
+            env_fn_wrappers,
+            obs_buffers,
+            method_name_list,
+            reset_timeout=None,
+            step_timeout=None,
+            reset_inplace=False,
+            step_times=None,
+    ) -> None:
+        """
+        Overview:
+            The target function of the standby worker subprocess. The worker sends a message when it is ready and \
+            waits for the ``attach`` command with the env_id, then creates the env and runs as ``worker_fn_robust``.
+        """
+        parent.close()
+        try:
+            child.send(None)
+            cmd, env_id, _ = child.recv()
+        except (EOFError, OSError):  # the env manager has been closed
+            child.close()
+            return
+        assert cmd == 'attach', cmd
+        AsyncSubprocessEnvManager.worker_fn_robust(
+            parent, child, env_fn_wrappers[env_id], obs_buffers[env_id], method_name_list, reset_timeout, step_timeout,
+            reset_inplace, None, step_times[env_id]
+        )
+
+    @staticmethod
+    def worker_fn_group(
+            control_parent,
+            control_child,
+            pipes,
+            env_fn_wrappers,
+            obs_buffers,
+            method_name_list,
+            reset_timeout=None,
+            step_timeout=None,
+            reset_inplace=False,
+            step_times=None,
+    ) -> None:
+        """
+        Overview:
+            The target function of the worker subprocess hosting multiple envs in ``envs_per_worker`` mode. The \
+            worker waits for the pipes of all its envs, and executes the ready commands (e.g. the steps sent to \
+            all the envs at once) one by one in a loop. The ``renew`` command from ``control_child`` recreates an env \
+            with a new pipe.
+        """
+        torch.set_num_threads(1)
+        control_parent.close()
+        envs, conns, fns = {}, {}, {}
+
+        def create_env(env_id, conn):
+            envs[env_id] = env_fn_wrappers[env_id].data()
+            conns[env_id] = conn
+            fns[env_id] = AsyncSubprocessEnvManager._worker_env_fns(
+                envs[env_id], obs_buffers[env_id], reset_timeout, step_timeout, reset_inplace,
+                None if step_times is None else step_times[env_id]
+            )
+
+        for env_id, (parent, child) in pipes.items():
+            parent.close()
+            create_env(env_id, child)
+
+        while len(conns) > 0:
+            conn_env = {conn: env_id for env_id, conn in conns.items()}
+            for conn in connection.wait(list(conn_env.keys()) + [control_child]):
+                if conn is control_child:
+                    try:
+                        cmd, env_id, new_conn = control_child.recv()
+                    except EOFError:  # the env manager has been closed
+                        for c in conns.values():
+                            c.close()
+                        return
+                    assert cmd == 'renew', cmd
+                    if env_id in conns:
+                        conns.pop(env_id).close()
+                    try:
+                        envs[env_id].close()
+                    except BaseException:
+                        pass
+                    try:
+                        create_env(env_id, new_conn)
+                        control_child.send(None)
+                    except BaseException as e:
+                        logging.warning("subprocess exception traceback: \n" + traceback.format_exc())
+                        new_conn.close()
+                        control_child.send(
+                            e.__class__(
+                                '\nEnv Process Exception:\n' + ''.join(traceback.format_tb(e.__traceback__)) + repr(e)
+                            )
+                        )
+                    continue
+                env_id = conn_env[conn]
+                if conns.get(env_id) is not conn:  # renewed in this loop
+                    continue
+                try:
+                    cmd, args, kwargs = conn.recv()
+                except EOFError:  # for the case when the pipe has been closed
+                    conns.pop(env_id).close()
+                    continue
+                step_fn, reset_fn = fns[env_id]
+                AsyncSubprocessEnvManager._worker_execute(
+                    envs[env_id], conn, cmd, args, kwargs, step_fn, reset_fn, method_name_list,
+                    None if step_times is None else step_times[env_id].get()
+                )
+                if cmd == 'close':
+                    conns.pop(env_id).close()
+        control_child.close()
+
+    @staticmethod
+    def _worker_env_fns(
+            env, obs_buffer, reset_timeout=None, step_timeout=None, reset_inplace=False, step_time=None
+    ) -> Tuple:
+        """
+        Overview:
+            Create the ``step`` and ``reset`` functions of an env in worker subprocess, the obs is filled into \
+            ``obs_buffer`` if it is not None, and the time of ``env.step`` is accumulated into ``step_time``.
+        """
+        step_time_view = None if step_time is None else step_time.get()
 
         @timeout_wrapper(timeout=step_timeout)
         def step_fn(*args, **kwargs):
+            start_time = time.time()
             timestep = env.step(*args, **kwargs)
+            if step_time_view is not None:
+                duration = time.time() - start_time
+                step_time_view[0] += duration
+                step_time_view[1] += 1
+                step_time_view[2] = duration
             if is_abnormal_timestep(timestep):
                 ret = timestep
             else:
@@ -533,7 +1103,13 @@ class AsyncSubprocessEnvManager(BaseEnvManager):
         @timeout_wrapper(timeout=reset_timeout)
         def reset_fn(*args, **kwargs):
             try:
+                start_time = time.time()
                 ret = env.reset(*args, **kwargs)
+                if step_time_view is not None:
+                    duration = time.time() - start_time
+                    step_time_view[3] += duration
+                    step_time_view[4] += 1
+                    step_time_view[5] = duration
                 if obs_buffer is not None:
                     obs_buffer.fill(ret)
                     ret = None
@@ -543,43 +1119,63 @@ class AsyncSubprocessEnvManager(BaseEnvManager):
                 env.close()
                 raise e
 
-        while True:
-            try:
-                cmd, args, kwargs = child.recv()
-            except EOFError:  # for the case when the pipe has been closed
-                child.close()
-                break
-            try:
-                if cmd == 'getattr':
-                    ret = getattr(env, args[0])
-                elif cmd in method_name_list:
-                    if cmd == 'step':
-                        ret = step_fn(*args)
-                    elif cmd == 'reset':
-                        if kwargs is None:
-                            kwargs = {}
-                        ret = reset_fn(*args, **kwargs)
-                    elif cmd == 'render':
-                        from ding.utils import render
-                        ret = render(env, **kwargs)
-                    elif args is None and kwargs is None:
-                        ret = getattr(env, cmd)()
-                    else:
-                        ret = getattr(env, cmd)(*args, **kwargs)
+        return step_fn, reset_fn
+
+    @staticmethod
+    def _worker_execute(env, conn, cmd, args, kwargs, step_fn, reset_fn, method_name_list, stats_view=None) -> None:
+        """
+        Overview:
+            Execute a command of env in worker subprocess and send the result (or the exception) by ``conn``, the \
+            time of sending the results of ``step`` and ``reset`` is accumulated into ``stats_view`` if it is not None.
+        """
+        try:
+            if cmd == 'getattr':
+                ret = getattr(env, args[0])
+            elif cmd in method_name_list:
+                if cmd == 'step':
+                    ret = step_fn(*args)
+                elif cmd == 'reset':
+                    if kwargs is None:
+                        kwargs = {}
+                    ret = reset_fn(*args, **kwargs)
+                elif cmd == 'render':
+                    from ding.utils import render
+                    ret = render(env, **kwargs)
+                elif args is None and kwargs is None:
+                    ret = getattr(env, cmd)()
                 else:
-                    raise KeyError("not support env cmd: {}".format(cmd))
-                child.send(ret)
-            except BaseException as e:
-                logging.debug("Sub env '{}' error when executing {}".format(str(env), cmd))
-                # when there are some errors in env, worker_fn will send the errors to env manager
-                # directly send error to another process will lose the stack trace, so we create a new Exception
-                logging.warning("subprocess exception traceback: \n" + traceback.format_exc())
-                child.send(
-                    e.__class__('\nEnv Process Exception:\n' + ''.join(traceback.format_tb(e.__traceback__)) + repr(e))
-                )
-            if cmd == 'close':
-                child.close()
-                break
+                    ret = getattr(env, cmd)(*args, **kwargs)
+            else:
+                raise KeyError("not support env cmd: {}".format(cmd))
+            if stats_view is not None and (cmd == 'step' or cmd == 'reset'):
+                send_time = time.time()
+                conn.send(ret)
+                stats_view[6] += time.time() - send_time
+                stats_view[7] += 1
+            else:
+                conn.send(ret)
+        except BaseException as e:
+            logging.debug("Sub env '{}' error when executing {}".format(str(env), cmd))
+            # when there are some errors in env, worker_fn will send the errors to env manager
+            # directly send error to another process will lose the stack trace, so we create a new Exception
+            logging.warning("subprocess exception traceback: \n" + traceback.format_exc())
+            conn.send(
+                e.__class__('\nEnv Process Exception:\n' + ''.join(traceback.format_tb(e.__traceback__)) + repr(e))
+            )
+
+    def _update_stats(self) -> None:
+        if not hasattr(self, '_env_step_times'):  # not launched
+            return
+        worker_stats = sum([b.get() for b in self._env_step_times.values()])
+        # The total time of ``env.step`` in worker subprocesses, which includes the steps not received yet.
+        self._stats.set_total('worker_step', float(worker_stats[0]), int(worker_stats[1]))
+        # The time of sending step and reset results in worker subprocesses, which includes serialization.
+        self._stats.set_ipc('worker_serialize', float(worker_stats[6]), int(worker_stats[7]))
+
+    def reset_stats(self) -> None:
+        super().reset_stats()
+        for b in getattr(self, '_env_step_times', {}).values():
+            b.get()[[0, 1, 6, 7]] = 0
 
     def _check_data(self, data: Dict, close: bool = True) -> None:
         exceptions = []
@@ -630,7 +1226,9 @@ class AsyncSubprocessEnvManager(BaseEnvManager):
         """
         if self._closed:
             return
-        self._closed = True
+        with self._state_cond:
+            self._closed = True
+            self._state_cond.notify_all()
         for _, p in self._pipe_parents.items():
             p.send(['close', None, None])
         for env_id, p in self._pipe_parents.items():
@@ -646,6 +1244,13 @@ class AsyncSubprocessEnvManager(BaseEnvManager):
             p.terminate()
         for _, p in self._pipe_parents.items():
             p.close()
+        if self._envs_per_worker > 1:
+            for _, p in self._worker_controls.items():
+                p.close()
+        while len(self._standby_workers) > 0:
+            subprocess, parent = self._standby_workers.popleft()
+            subprocess.terminate()
+            parent.close()
 
     @staticmethod
     def wait(rest_conn: list, wait_num: int, timeout: Optional[float] = None) -> Tuple[list, list]:
@@ -664,10 +1269,12 @@ class AsyncSubprocessEnvManager(BaseEnvManager):
         ready_conn = set()
         start_time = time.time()
         while len(rest_conn_set) > 0:
+            wait_timeout = timeout
             if len(ready_conn) >= wait_num and timeout:
-                if (time.time() - start_time) >= timeout:
+                wait_timeout = timeout - (time.time() - start_time)
+                if wait_timeout <= 0:
                     break
-            finish_conn = set(connection.wait(rest_conn_set, timeout=timeout))
+            finish_conn = set(connection.wait(rest_conn_set, timeout=wait_timeout))
             ready_conn = ready_conn.union(finish_conn)
             rest_conn_set = rest_conn_set.difference(finish_conn)
         ready_ids = [rest_conn.index(c) for c in ready_conn]
@@ -692,8 +1299,59 @@ class SyncSubprocessEnvManager(AsyncSubprocessEnvManager):
         step_wait_timeout=None,
         connect_timeout=60,
         reset_inplace=False,  # if reset_inplace=True in SyncSubprocessEnvManager, the interaction can be reproducible.
+        shared_memory_step=False,
+        shared_memory_step_info_keys=['eval_episode_return'],
+        envs_per_worker=1,
+        standby_worker_num=0,
+        vec_env_wrapper=[],
+        # (float) The time budget (seconds) of ``step``. If not None, ``step`` returns the timesteps which are ready \
+        # within the budget (at least one), and the late envs are returned in the next calls like the async one.
+        step_deadline=None,
+        # (int) The number of env groups. If larger than 1, the envs are split into groups which are stepped in turn \
+        # (double buffering), i.e. ``step`` sends the actions of the ready group and returns the timesteps of the \
+        # next group, so that one group steps while the policy infers the actions of another group.
+        env_group_num=1,
     )
 
+    def __init__(
+            self,
+            env_fn: List[Callable],
+            cfg: EasyDict = EasyDict({}),
+    ) -> None:
+        super().__init__(env_fn, cfg)
+        self._env_group_num = self._cfg.get('env_group_num', 1)
+        assert 1 <= self._env_group_num <= self._env_num, (self._env_group_num, self._env_num)
+        if self._env_group_num > 1:
+            assert self._cfg.get('step_deadline', None) is None, "step_deadline is unavailable with env groups."
+        self._env_groups = [g.tolist() for g in np.array_split(np.arange(self._env_num), self._env_group_num)]
+        self._ready_group = 0
+
+    def _create_state(self) -> None:
+        super()._create_state()
+        self._ready_group = 0
+
+    @property
+    def ready_env(self) -> List[int]:
+        ready_env = super().ready_env
+        if self._env_group_num > 1:
+            group = set(self._env_groups[self._ready_group])
+            ready_env = [i for i in ready_env if i in group]
+        return ready_env
+
+    def _wait_ready_env(self) -> None:
+        if self._env_group_num == 1:
+            return super()._wait_ready_env()
+        # skip the done groups, which only happens when there is no in-flight step
+        for _ in range(self._env_group_num):
+            if any([self._env_states[i] != EnvState.DONE for i in self._env_groups[self._ready_group]]):
+                break
+            self._ready_group = (self._ready_group + 1) % self._env_group_num
+        no_done_env_idx = [i for i in self._env_groups[self._ready_group] if self._env_states[i] != EnvState.DONE]
+        self._wait_env_states(
+            lambda: any([self._env_states[i] == EnvState.RUN for i in no_done_env_idx]),
+            'all the not done envs of the ready group are resetting'
+        )
+
     def step(self, actions: Dict[int, Any]) -> Dict[int, namedtuple]:
         """
         Overview:
@@ -711,7 +1369,11 @@ class SyncSubprocessEnvManager(AsyncSubprocessEnvManager):
 
         .. note::
 
-            - The env_id that appears in ``actions`` will also be returned in ``timesteps``.
+            - The env_id that appears in ``actions`` will also be returned in ``timesteps``, except that \
+                ``step_deadline`` is set, in which case the late envs are returned in the next calls.
+            - If ``env_group_num`` > 1, ``actions`` are the actions of the ready group (i.e. ``ready_obs``), and the \
+                returned ``timesteps`` are those of the next group, which may be empty in the first calls when the \
+                next group has not been stepped yet.
             - Each environment is run by a subprocess separately. Once an environment is done, it is reset immediately.
         """
         self._check_closed()
@@ -722,32 +1384,69 @@ class SyncSubprocessEnvManager(AsyncSubprocessEnvManager):
                         for env_id in env_ids}
                    )
         for env_id, act in actions.items():
-            # it is necessary to set kwargs as None for saving cost of serialization in some env like cartpole,
-            # and step method never uses kwargs in known envs.
-            self._pipe_parents[env_id].send(['step', [act], None])
+            self._send_step(env_id, act)
+        if self._env_group_num > 1:
+            return self._wrap_timesteps(self._step_group(env_ids))
 
         # ===     This part is different from async one.     ===
         # === Because operate in this way is more efficient. ===
+        step_deadline = self._cfg.get('step_deadline', None)
+        if step_deadline is None:
+            self._wait_step(env_ids, len(env_ids), None)
+            return self._wrap_timesteps(self._recv_timesteps(env_ids))
+        # ======================================================
+        return self._wrap_timesteps(self._step_until_deadline(env_ids, step_deadline))
+
+    def _step_until_deadline(self, env_ids: List[int], step_deadline: float) -> Dict[int, namedtuple]:
+        """
+        Overview:
+            Receive the steps which are finished within ``step_deadline``, together with the late steps of the \
+            previous calls. If all the received envs are resetting or done, keep waiting for the late steps until \
+            one of the received envs is ready to step or no step is in flight, so that ``ready_obs`` is not empty.
+        """
         timesteps = {}
-        ready_conn = [self._pipe_parents[env_id] for env_id in env_ids]
-        # timesteps.update({env_id: p.recv() for env_id, p in zip(env_ids, ready_conn)})
-        for env_id, p in zip(env_ids, ready_conn):
-            try:
-                timesteps.update({env_id: p.recv()})
-            except pickle.UnpicklingError as e:
-                timestep = BaseEnvTimestep(None, None, None, {'abnormal': True})
-                timesteps.update({env_id: timestep})
-                self._pipe_parents[env_id].close()
-                if self._subprocesses[env_id].is_alive():
-                    self._subprocesses[env_id].terminate()
-                self._create_env_subprocess(env_id)
+        rest_env_ids = list(set(env_ids).union(self._waiting_env['step']))
+        while True:
+            ready_env_ids = self._wait_step(rest_env_ids, 1, step_deadline)
+            rest_env_ids = [i for i in rest_env_ids if i not in ready_env_ids]
+            timesteps.update(self._recv_timesteps(ready_env_ids))
+            if any([self._env_states[i] == EnvState.RUN for i in timesteps]) or len(rest_env_ids) == 0:
+                break
+        self._waiting_env['step'] = set(rest_env_ids)
+        return timesteps
+
+    def _step_group(self, env_ids: List[int]) -> Dict[int, namedtuple]:
+        """
+        Overview:
+            Mark the stepping envs of the ready group as in flight, then turn to the next group and receive its \
+            in-flight steps. The done groups are skipped to avoid waiting for a group without any env to step.
+        """
+        self._waiting_env['step'].update(env_ids)
+        timesteps = {}
+        while True:
+            self._ready_group = (self._ready_group + 1) % self._env_group_num
+            group = self._env_groups[self._ready_group]
+            in_flight = [i for i in group if i in self._waiting_env['step']]
+            if len(in_flight) > 0:
+                self._wait_step(in_flight, len(in_flight), None)
+                self._waiting_env['step'].difference_update(in_flight)
+                timesteps.update(self._recv_timesteps(in_flight))
+            if any([self._env_states[i] != EnvState.DONE for i in group]) or len(self._waiting_env['step']) == 0:
+                return timesteps
+
+    def _recv_timesteps(self, ready_env_ids: List[int]) -> Dict[int, namedtuple]:
+        """
+        Overview:
+            Receive the timesteps of the envs whose steps are finished, and update the env states.
+        """
+        timesteps = {}
+        for env_id in ready_env_ids:
+            timesteps[env_id] = self._recv_step(env_id)
         self._check_data(timesteps)
-        # ======================================================
 
         if self._shared_memory:
             # TODO(nyz) optimize sync shm
-            for i, (env_id, timestep) in enumerate(timesteps.items()):
-                timesteps[env_id] = timestep._replace(obs=self._obs_buffers[env_id].get())
+            self._fill_shared_obs(timesteps)
         for env_id, timestep in timesteps.items():
             if is_abnormal_timestep(timestep):
                 self._env_states[env_id] = EnvState.ERROR
@@ -794,16 +1493,9 @@ class SubprocessEnvManagerV2(SyncSubprocessEnvManager):
             >>> action = model(obs)  # model input np obs and output np action
             >>> timesteps = env_manager.step(action)
         """
-        no_done_env_idx = [i for i, s in self._env_states.items() if s != EnvState.DONE]
-        sleep_count = 0
-        while not any([self._env_states[i] == EnvState.RUN for i in no_done_env_idx]):
-            if sleep_count != 0 and sleep_count % 10000 == 0:
-                logging.warning(
-                    'VEC_ENV_MANAGER: all the not done envs are resetting, sleep {} times'.format(sleep_count)
-                )
-            time.sleep(0.001)
-            sleep_count += 1
-        return tnp.stack([tnp.array(self._ready_obs[i]) for i in self.ready_env])
+        self._wait_ready_env()
+        ready_obs = self._wrap_ready_obs({i: self._ready_obs[i] for i in self.ready_env})
+        return tnp.stack([tnp.array(o) for o in ready_obs.values()])
 
     def step(self, actions: Union[List[tnp.ndarray], tnp.ndarray]) -> List[tnp.ndarray]:
         """
@@ -0,0 +1,232 @@
+import os
+import time
+import pytest
+import numpy as np
+import gym
+from easydict import EasyDict
+from functools import partial
+
+from ding.envs import BaseEnvTimestep
+from ding.utils import deep_merge_dicts
+from ..base_env_manager import BaseEnvManager
+from ..subprocess_env_manager import AsyncSubprocessEnvManager, SyncSubprocessEnvManager
+from ..thread_pool_env_manager import ThreadPoolEnvManager
+
+# CartPole-class env has a small vector obs, Atari-class env has a stacked image obs.
+obs_shape_dict = {'cartpole': ((4, ), np.float32), 'atari': ((4, 84, 84), np.uint8)}
+env_num = 8
+steps = 500
+
+
+class BenchmarkEnv:
+
+    def __init__(self, obs_shape, obs_dtype, episode_len=200):
+        self.episode_len = episode_len
+        self.observation_space = gym.spaces.Box(low=0, high=1, shape=obs_shape, dtype=obs_dtype)
+        self.action_space = gym.spaces.Discrete(2)
+        self.reward_space = gym.spaces.Box(low=0, high=1, shape=(1, ), dtype=np.float32)
+        self._obs = np.zeros(obs_shape, dtype=obs_dtype)
+
+    def reset(self):
+        self.count = 0
+        return self._obs
+
+    def step(self, action):
+        self.count += 1
+        done = self.count >= self.episode_len
+        info = {'eval_episode_return': float(self.count)} if done else {}
+        return BaseEnvTimestep(self._obs, np.array([1.], dtype=np.float32), done, info)
+
+    def seed(self, seed, dynamic_seed=False):
+        pass
+
+    def close(self):
+        pass
+
+
+class StepCostEnv(BenchmarkEnv):
+    """
+    Overview:
+        The cartpole-class env whose step costs some time in numpy (releasing the GIL), pure python or sleep.
+    """
+
+    def __init__(self, step_cost):
+        super().__init__(*obs_shape_dict['cartpole'])
+        self.step_cost = step_cost
+        self._mat = np.random.rand(256, 256)
+
+    def step(self, action):
+        if self.step_cost == 'numpy':
+            np.dot(self._mat, self._mat)
+        elif self.step_cost == 'python':
+            sum([i * i for i in range(20000)])
+        elif self.step_cost == 'sleep':
+            time.sleep(0.002)
+        return super().step(action)
+
+
+class SleepStepEnv(BenchmarkEnv):
+    """
+    Overview:
+        The cartpole-class env whose step costs the given time without CPU, e.g. waiting for a simulator.
+    """
+
+    def __init__(self, step_time):
+        super().__init__(*obs_shape_dict['cartpole'])
+        self.step_time = step_time
+
+    def step(self, action):
+        time.sleep(self.step_time)
+        return super().step(action)
+
+
+class FailoverEnv(BenchmarkEnv):
+    """
+    Overview:
+        The cartpole-class env whose reset fails once when the flag file exists.
+    """
+
+    def __init__(self, fail_flag):
+        super().__init__(*obs_shape_dict['cartpole'])
+        self.fail_flag = fail_flag
+
+    def reset(self):
+        if os.path.exists(self.fail_flag):
+            os.remove(self.fail_flag)
+            raise RuntimeError("reset error")
+        return super().reset()
+
+
+def steps_per_second(manager_cls, env_type, env_num=env_num, steps=steps, env_fn=None, **kwargs):
+    cfg = deep_merge_dicts(
+        manager_cls.default_config(), EasyDict(dict(shared_memory=True, episode_num=float('inf'), **kwargs))
+    )
+    if env_fn is None:
+        env_fn = partial(BenchmarkEnv, *obs_shape_dict[env_type])
+    env_manager = manager_cls([env_fn for _ in range(env_num)], cfg)
+    env_manager.launch()
+    count, start = 0, None
+    while count < steps * env_num:
+        obs = env_manager.ready_obs
+        timesteps = env_manager.step({i: np.int64(0) for i in obs})
+        if start is None:
+            start = time.time()
+        count += len(timesteps)
+    duration = time.time() - start
+    env_manager.close()
+    return count / duration
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize('env_type', list(obs_shape_dict.keys()))
+@pytest.mark.parametrize('manager_cls', [SyncSubprocessEnvManager, AsyncSubprocessEnvManager])
+def test_shared_memory_step_benchmark(manager_cls, env_type):
+    pipe = steps_per_second(manager_cls, env_type, shared_memory_step=False)
+    shm = steps_per_second(manager_cls, env_type, shared_memory_step=True)
+    print(
+        '{} {}: pipe step {:.0f} steps/s, shared memory step {:.0f} steps/s'.format(
+            manager_cls.__name__, env_type, pipe, shm
+        )
+    )
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize('env_type', list(obs_shape_dict.keys()))
+@pytest.mark.parametrize('manager_cls', [SyncSubprocessEnvManager, AsyncSubprocessEnvManager])
+def test_envs_per_worker_benchmark(manager_cls, env_type):
+    for envs_per_worker in [1, 4, 16]:
+        speed = steps_per_second(manager_cls, env_type, env_num=32, envs_per_worker=envs_per_worker)
+        print(
+            '{} {}: 32 envs, {} envs per worker {:.0f} steps/s'.format(
+                manager_cls.__name__, env_type, envs_per_worker, speed
+            )
+        )
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize('step_cost', ['numpy', 'python', 'sleep'])
+def test_thread_pool_benchmark(step_cost):
+    for manager_cls in [BaseEnvManager, ThreadPoolEnvManager, SyncSubprocessEnvManager]:
+        speed = steps_per_second(manager_cls, 'cartpole', steps=100, env_fn=partial(StepCostEnv, step_cost))
+        print('{} {} step: {:.0f} steps/s'.format(manager_cls.__name__, step_cost, speed))
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize('context', ['fork', 'spawn'])
+def test_standby_worker_benchmark(context, tmp_path):
+    fail_flag = str(tmp_path / 'fail')
+    for standby_worker_num in [0, 2]:
+        cfg = deep_merge_dicts(
+            AsyncSubprocessEnvManager.default_config(),
+            EasyDict(
+                dict(
+                    retry_type='renew',
+                    max_retry=2,
+                    retry_waiting_time=0.,
+                    standby_worker_num=standby_worker_num,
+                    context=context,
+                    # the shared memory buffers are created in the default fork context
+                    shared_memory=context == 'fork',
+                )
+            )
+        )
+        env_manager = AsyncSubprocessEnvManager([partial(FailoverEnv, fail_flag) for _ in range(env_num)], cfg)
+        env_manager.launch()
+        for i in range(5):
+            # the failures are usually sparse, so wait for the standby workers to be ready
+            while not all([parent.poll() for _, parent in env_manager._standby_workers]):
+                time.sleep(0.1)
+            open(fail_flag, 'w').close()
+            env_manager.reset({i % env_num: {}})
+        stats = env_manager.stats(per_env=False)['totals']
+        env_manager.close()
+        print(
+            '{} {} standby workers: launch {:.3f}s, failover latency {:.3f}s'.format(
+                context, standby_worker_num, stats['launch']['total'], stats['renew']['mean']
+            )
+        )
+
+
+class InferencePolicy:
+    """
+    Overview:
+        The policy whose forward costs some time per sample without CPU (like the inference on accelerator), which \
+        is used to measure the overlap of policy inference and env stepping.
+    """
+
+    def __init__(self, infer_time):
+        self.infer_time = infer_time
+
+    def forward(self, data, **kwargs):
+        time.sleep(self.infer_time * len(data))
+        return {i: {'action': np.int64(0)} for i in data}
+
+    def process_transition(self, obs, model_output, timestep):
+        return {'obs': obs, 'action': model_output['action'], 'reward': timestep.reward, 'done': timestep.done}
+
+    def reset(self, data_id=None):
+        pass
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize('step_time', [0.005, 0.02])
+def test_env_group_benchmark(step_time):
+    from ding.framework import task, OnlineRLContext
+    from ding.framework.middleware import StepCollector
+    from ..subprocess_env_manager import SubprocessEnvManagerV2
+    cfg = EasyDict(dict(seed=0, policy=dict(collect=dict(n_sample=env_num * 50, unroll_len=1))))
+    for env_group_num in [1, 2]:
+        env_cfg = deep_merge_dicts(
+            SubprocessEnvManagerV2.default_config(), EasyDict(dict(shared_memory=True, env_group_num=env_group_num))
+        )
+        env = SubprocessEnvManagerV2([partial(SleepStepEnv, step_time) for _ in range(env_num)], env_cfg)
+        ctx = OnlineRLContext()
+        with task.start():
+            # the inference of a full batch costs 16ms, which is comparable to the env step
+            collector = StepCollector(cfg, InferencePolicy(infer_time=0.002), env)
+            collector(ctx)  # warm up
+            start, env_step = time.time(), ctx.env_step
+            collector(ctx)
+            speed = (ctx.env_step - env_step) / (time.time() - start)
+        env.close()
+        print('{:.3f}s env step, {} env groups: {:.0f} env steps/s'.format(step_time, env_group_num, speed))
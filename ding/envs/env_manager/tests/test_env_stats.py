@@ -0,0 +1,154 @@
+import time
+import pytest
+import numpy as np
+import gym
+from easydict import EasyDict
+from functools import partial
+from unittest.mock import MagicMock
+
+from ding.envs import BaseEnvTimestep
+from ding.utils import deep_merge_dicts
+from ..env_stats import TimeHistogram, EnvManagerStats
+from ..base_env_manager import BaseEnvManager
+from ..subprocess_env_manager import SyncSubprocessEnvManager
+
+
+class SleepEnv(gym.Env):
+
+    def __init__(self, step_time, episode_len=5):
+        self.step_time = step_time
+        self.episode_len = episode_len
+        self.observation_space = gym.spaces.Box(low=0, high=1, shape=(4, ), dtype=np.float32)
+        self.action_space = gym.spaces.Discrete(2)
+        self.reward_space = gym.spaces.Box(low=0, high=1, shape=(1, ), dtype=np.float32)
+
+    def reset(self):
+        self.count = 0
+        return np.zeros(4, dtype=np.float32)
+
+    def step(self, action):
+        time.sleep(self.step_time)
+        self.count += 1
+        return BaseEnvTimestep(
+            np.full(4, self.count, dtype=np.float32), np.array([1.], dtype=np.float32), self.count >= self.episode_len,
+            {}
+        )
+
+    def seed(self, seed, dynamic_seed=False):
+        pass
+
+    def close(self):
+        pass
+
+
+def run(env_manager):
+    env_manager.launch()
+    while not env_manager.done:
+        env_manager.step({i: 0 for i in env_manager.ready_obs})
+    env_manager.close()
+
+
+@pytest.mark.unittest
+def test_time_histogram():
+    hist = TimeHistogram(bins=(1e-3, 1e-2, 0.1))
+    for v in [5e-4] * 8 + [5e-3, 0.5]:
+        hist.add(v)
+    assert hist.bucket == [8, 1, 0, 1]
+    assert hist.count == 10 and hist.max == 0.5
+    assert hist.mean == pytest.approx((8 * 5e-4 + 5e-3 + 0.5) / 10)
+    assert hist.quantile(0.5) == 1e-3
+    assert hist.quantile(0.9) == 1e-2
+    assert hist.quantile(1.) == 0.5
+    other = TimeHistogram(bins=(1e-3, 1e-2, 0.1))
+    other.add(0.05)
+    hist.merge(other)
+    assert hist.bucket == [8, 1, 1, 1] and hist.count == 11
+    assert set(hist.summary().keys()) == {'count', 'mean', 'max', 'p50', 'p90', 'p99', 'total'}
+    assert TimeHistogram().quantile(0.5) == 0.
+
+
+@pytest.mark.unittest
+def test_env_manager_stats():
+    stats = EnvManagerStats(4)
+    for env_id in range(4):
+        for _ in range(5):
+            stats.record('step', env_id, 0.01 * (5 if env_id == 2 else 1))
+    stats.record_ipc('serialize', 1e-4)
+    stats.record_ipc('serialize', 3e-4)
+    stats.set_ipc('worker_serialize', 0.1, 10)
+    stats.record_total('renew', 0.2)
+    stats.set_total('worker_step', 1., 20)
+    stats.record_wait(0.5)
+    stats.record_retry(3)
+    stragglers = stats.stragglers()
+    assert [s['env_id'] for s in stragglers][0] == 2
+    assert stragglers[0]['ratio'] == pytest.approx(5.)
+    summary = stats.summary(top_k=2)
+    assert summary['step']['count'] == 20
+    assert summary['reset']['count'] == 0
+    assert summary['ipc']['serialize'] == {'total': pytest.approx(4e-4), 'count': 2, 'mean': pytest.approx(2e-4)}
+    assert summary['totals']['renew'] == {'total': 0.2, 'count': 1, 'mean': 0.2}
+    assert summary['totals']['worker_step']['mean'] == pytest.approx(0.05)
+    assert summary['wait_time'] == 0.5 and summary['retry_count'] == 1
+    assert len(summary['stragglers']) == 2
+    assert summary['envs'][3]['retry_count'] == 1 and summary['envs'][2]['step']['count'] == 5
+
+    tb_logger = MagicMock()
+    stats.log(tb_logger, 100, prefix='collector_env')
+    tags = [c[0][0] for c in tb_logger.add_scalar.call_args_list]
+    assert 'collector_env/step_time_mean' in tags and 'collector_env/straggler_ratio' in tags
+    assert 'collector_env/serialize_time' in tags and 'collector_env/worker_serialize_time' in tags
+    assert 'collector_env/renew_time' in tags and 'collector_env/worker_step_time' in tags
+    # only the recorded histograms are written
+    assert tb_logger.add_histogram_raw.call_count == 1
+    kwargs = tb_logger.add_histogram_raw.call_args[1]
+    assert len(kwargs['bucket_limits']) == len(kwargs['bucket_counts']) and kwargs['num'] == 20
+
+    stats.reset()
+    assert stats.summary()['step']['count'] == 0 and stats.wait_time == 0. and stats.stragglers() == []
+
+
+@pytest.mark.unittest
+@pytest.mark.parametrize('manager_cls', [BaseEnvManager, SyncSubprocessEnvManager])
+def test_env_manager_stats_api(manager_cls):
+    env_num = 3
+    cfg = deep_merge_dicts(manager_cls.default_config(), EasyDict(dict(episode_num=2)))
+    # env 1 is the straggler
+    env_manager = manager_cls([partial(SleepEnv, 0.05 if i == 1 else 0.005) for i in range(env_num)], cfg)
+    run(env_manager)
+    stats = env_manager.stats()
+    assert stats['step']['count'] == env_num * 2 * 5
+    assert stats['reset']['count'] == env_num * 2
+    assert stats['retry_count'] == 0
+    assert stats['stragglers'][0]['env_id'] == 1
+    assert stats['envs'][1]['step']['mean'] >= 0.05
+    if manager_cls is SyncSubprocessEnvManager:
+        assert stats['step_latency']['count'] == env_num * 2 * 5
+        assert stats['wait_time'] > 0
+        assert {'serialize', 'deserialize', 'shm_copy', 'worker_serialize'}.issubset(stats['ipc'].keys())
+        assert stats['ipc']['worker_serialize']['count'] >= env_num * 2 * 6
+        assert stats['totals']['launch']['count'] == 1
+        assert stats['totals']['worker_step']['count'] == env_num * 2 * 5
+
+    tb_logger = MagicMock()
+    env_manager.log_stats(tb_logger, 10)
+    assert tb_logger.add_scalar.call_count > 0
+    env_manager.reset_stats()
+    assert env_manager.stats(per_env=False)['step']['count'] == 0
+
+
+@pytest.mark.unittest
+def test_base_env_manager_retry_stats(setup_base_manager_cfg):
+    env_fn = setup_base_manager_cfg.pop('env_fn')
+    env_manager = BaseEnvManager(env_fn, setup_base_manager_cfg)
+    env_manager._max_retry = 2
+    env_manager._retry_waiting_time = 0.
+    reset_param = {i: {'stat': 'stat_test'} for i in range(env_manager.env_num)}
+    env_manager.launch(reset_param=reset_param)
+    # env 0 dies in the second reset with error_once stat, and succeeds in retry
+    reset_param[0] = {'stat': 'error_once'}
+    env_manager.reset(reset_param)
+    env_manager.reset(reset_param)
+    stats = env_manager.stats()
+    assert stats['retry_count'] == 1 and stats['envs'][0]['retry_count'] == 1
+    env_manager.close()
@@ -0,0 +1,123 @@
+import pytest
+import numpy as np
+import gym
+from multiprocessing import get_context
+from easydict import EasyDict
+from functools import partial
+
+from ding.data import ShmBuffer
+from ding.envs import BaseEnvTimestep
+from ding.utils import deep_merge_dicts
+from ..base_env_manager import EnvState
+from ..subprocess_env_manager import AsyncSubprocessEnvManager, SyncSubprocessEnvManager
+from ..shm_step import ShmStepSlot, finished_steps
+
+
+class CountEnv:
+
+    def __init__(self, episode_len=5):
+        self.episode_len = episode_len
+        self.observation_space = gym.spaces.Box(low=-1, high=1, shape=(3, ), dtype=np.float32)
+        self.action_space = gym.spaces.Discrete(2)
+        self.reward_space = gym.spaces.Box(low=0, high=1, shape=(1, ), dtype=np.float32)
+
+    def reset(self):
+        self.count = 0
+        return np.zeros(3, dtype=np.float32)
+
+    def step(self, action):
+        if isinstance(action, str) and action == 'error':
+            raise RuntimeError("env error")
+        self.count += 1
+        obs = np.full(3, self.count, dtype=np.float32)
+        reward = np.array(action, dtype=np.float32).reshape(1)
+        done = self.count >= self.episode_len
+        if done:
+            info = {'eval_episode_return': float(self.count)}
+        elif self.count == 2:
+            info = {'irregular': 'pickled'}
+        else:
+            info = {}
+        return BaseEnvTimestep(obs, reward, done, info)
+
+    def seed(self, seed, dynamic_seed=False):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.mark.unittest
+def test_shm_step_slot():
+    seq = ShmBuffer(np.int64, (2, 2), copy_on_get=False)
+    step_done = get_context('fork').Semaphore(0)
+    slot = ShmStepSlot(1, seq, step_done, info_keys=['eval_episode_return', 'lives'], field_nbytes=64)
+    for action in [np.array([1, 2, 3]), np.int64(3), 2, 1.5, True, np.zeros((2, 3), dtype=np.float32)]:
+        assert slot.put_action(action)
+        slot.request()
+        assert slot.wait_request(timeout=1.)
+        via_pipe, decoded = slot.get_action()
+        assert not via_pipe
+        assert type(decoded) == type(action)
+        assert np.array_equal(decoded, action)
+        if isinstance(action, np.ndarray):
+            assert decoded.dtype == action.dtype
+    # Too large or unsupported actions are sent by pipe.
+    assert not slot.put_action(np.zeros(100))
+    assert not slot.put_action('error')
+    assert not slot.put_action({'a': 1})
+    assert not slot.put_action(2 ** 70)
+
+    assert finished_steps(seq, [0, 1]) == [0]
+    timestep = BaseEnvTimestep(None, np.array([1.]), False, {'lives': np.int32(3)})
+    assert slot.put_result(timestep)
+    slot.complete()
+    assert step_done.acquire(timeout=1.)
+    assert finished_steps(seq, [0, 1]) == [0, 1]
+    result = slot.get_result()
+    assert result.reward == np.array([1.]) and result.done is False
+    assert result.info == {'lives': 3} and isinstance(result.info['lives'], np.int32)
+    # Irregular info is sent by pipe.
+    assert not slot.put_result(BaseEnvTimestep(None, np.array([1.]), False, {'name': 'env'}))
+    assert slot.get_result() is None
+    assert not slot.put_result(None)
+
+
+@pytest.mark.unittest
+@pytest.mark.parametrize('manager_cls', [SyncSubprocessEnvManager, AsyncSubprocessEnvManager])
+def test_shared_memory_step(manager_cls):
+    env_num = 3
+    cfg = deep_merge_dicts(
+        manager_cls.default_config(), EasyDict(dict(shared_memory=True, shared_memory_step=True, episode_num=2))
+    )
+    env_manager = manager_cls([partial(CountEnv, episode_len=5 + i) for i in range(env_num)], cfg)
+    env_manager.launch()
+    episode_returns = {i: [] for i in range(env_num)}
+    while not env_manager.done:
+        obs = env_manager.ready_obs
+        timesteps = env_manager.step({i: np.int64(1) for i in obs})
+        for env_id, t in timesteps.items():
+            assert t.obs.shape == (3, )
+            assert isinstance(t.reward, np.ndarray) and t.reward.dtype == np.float32 and t.reward[0] == 1.
+            assert isinstance(t.done, bool)
+            if t.done:
+                episode_returns[env_id].append(t.info['eval_episode_return'])
+            elif t.obs[0] == 2:
+                assert t.info == {'irregular': 'pickled'}
+            else:
+                assert t.info == {}
+    assert episode_returns == {i: [5. + i, 5. + i] for i in range(env_num)}
+    assert all([env_manager._env_states[i] == EnvState.DONE for i in range(env_num)])
+    env_manager.close()
+
+    # The actions in other types are sent by pipe, and the exceptions are raised.
+    env_manager = manager_cls([partial(CountEnv, episode_len=100) for i in range(env_num)], cfg)
+    env_manager.launch()
+    timesteps = env_manager.step({i: [1] for i in env_manager.ready_obs})
+    assert all([t.reward[0] == 1. for t in timesteps.values()])
+    env_manager.reset()
+    while len(env_manager.ready_obs) < env_num:
+        pass
+    with pytest.raises(RuntimeError):
+        env_manager.step({0: 'error', 1: 1, 2: 1})
+    assert env_manager._closed
@@ -1,11 +1,48 @@
+import os
 import time
 import signal
 import pytest
 import torch
 import numpy as np
+import gym
+from easydict import EasyDict
+from functools import partial
 
+from ding.envs import BaseEnvTimestep
+from ding.utils import deep_merge_dicts
 from ..base_env_manager import EnvState
-from ..subprocess_env_manager import AsyncSubprocessEnvManager, SyncSubprocessEnvManager
+from ..subprocess_env_manager import AsyncSubprocessEnvManager, SyncSubprocessEnvManager, SubprocessEnvManagerV2
+
+
+class DelayEnv:
+
+    def __init__(self, delay, fail_flag=None, done=False, reset_delay=0.):
+        self.delay = delay
+        # each step finishes the episode if ``done``
+        self.done = done
+        self.reset_delay = reset_delay
+        # the reset fails once when the flag file exists
+        self.fail_flag = fail_flag
+        self.observation_space = gym.spaces.Box(low=0, high=1, shape=(2, ), dtype=np.float32)
+        self.action_space = gym.spaces.Discrete(2)
+        self.reward_space = gym.spaces.Box(low=0, high=1, shape=(1, ), dtype=np.float32)
+
+    def reset(self):
+        if self.fail_flag is not None and os.path.exists(self.fail_flag):
+            os.remove(self.fail_flag)
+            raise RuntimeError("reset error")
+        time.sleep(self.reset_delay)
+        return np.zeros(2, dtype=np.float32)
+
+    def step(self, action):
+        time.sleep(self.delay)
+        return BaseEnvTimestep(np.ones(2, dtype=np.float32), np.array([1.]), self.done, {})
+
+    def seed(self, seed, dynamic_seed=False):
+        pass
+
+    def close(self):
+        pass
 
 
 class TestSubprocessEnvManager:
@@ -218,3 +255,181 @@ class TestSubprocessEnvManager:
             for i in range(env_manager.env_num)
         )
         assert all(env_manager._env_states[i] == EnvState.DONE for i in range(env_manager.env_num))
+
+    @pytest.mark.unittest
+    @pytest.mark.parametrize('manager_type', ['async', 'sync'])
+    def test_envs_per_worker(self, setup_async_manager_cfg, setup_sync_manager_cfg, setup_model_type, manager_type):
+        if manager_type == 'async':
+            cfg, manager_cls = setup_async_manager_cfg, AsyncSubprocessEnvManager
+        else:
+            cfg, manager_cls = setup_sync_manager_cfg, SyncSubprocessEnvManager
+        env_fn = cfg.pop('env_fn')
+        env_fn.append(env_fn[-1])
+        cfg['envs_per_worker'] = 2
+        cfg['shared_memory'] = True
+        env_manager = manager_cls(env_fn, cfg)
+        model = setup_model_type()
+        env_manager.launch(reset_param={i: {'stat': 'stat_test'} for i in range(env_manager.env_num)})
+        assert len(set(env_manager._subprocesses.values())) == 2
+        assert env_manager._subprocesses[0] is env_manager._subprocesses[1]
+        assert len(set(env_manager.time_id)) == 4
+
+        # Test renew an env in worker
+        env_manager._retry_type = 'renew'
+        time_id = env_manager.time_id
+        worker = env_manager._subprocesses[0]
+        reset_param = {i: {'stat': 'stat_test'} for i in range(env_manager.env_num)}
+        reset_param[0] = {'stat': 'error_once'}
+        env_manager.reset(reset_param)
+        env_manager.reset(reset_param)
+        new_time_id = env_manager.time_id
+        assert new_time_id[0] != time_id[0] and new_time_id[1:] == time_id[1:]
+        assert env_manager._subprocesses[0] is worker and worker.is_alive()
+
+        # Test restart a dead worker, the other env in worker is reset
+        env_manager._subprocesses[2].terminate()
+        env_manager._subprocesses[2].join()
+        env_manager.reset({2: {'stat': 'stat_test'}})
+        while not len(env_manager.ready_obs) == env_manager.env_num:
+            time.sleep(0.1)
+        assert env_manager._subprocesses[2].is_alive() and env_manager._subprocesses[3] is env_manager._subprocesses[2]
+        assert env_manager.time_id[2] != new_time_id[2] and env_manager.time_id[3] != new_time_id[3]
+
+        # Test step
+        env_count = [0 for _ in range(env_manager.env_num)]
+        while not env_manager.done:
+            obs = env_manager.ready_obs
+            timestep = env_manager.step(model.forward(obs))
+            for k, t in timestep.items():
+                assert t.obs.shape == (3, )
+                if t.done:
+                    env_count[k] += 1
+        assert all([c == cfg.episode_num for c in env_count])
+        env_manager.close()
+        for p in set(env_manager._subprocesses.values()):
+            p.join(5)
+            assert not p.is_alive()
+
+    @pytest.mark.unittest
+    def test_time_stats(self, setup_async_manager_cfg, setup_model_type):
+        env_fn = setup_async_manager_cfg.pop('env_fn')
+        for fn in env_fn:
+            fn.keywords['cfg']['scale'] = 0.1
+        env_manager = AsyncSubprocessEnvManager(env_fn, setup_async_manager_cfg)
+        model = setup_model_type()
+        start_time = time.time()
+        env_manager.launch(reset_param={i: {'stat': 'stat_test'} for i in range(env_manager.env_num)})
+        while not env_manager.done:
+            obs = env_manager.ready_obs
+            env_manager.step(model.forward(obs))
+        duration = time.time() - start_time
+        stats = env_manager.stats(per_env=False)
+        worker_step = stats['totals']['worker_step']
+        assert worker_step['count'] == sum(env_manager._data_count)
+        # each step sleeps 0.05~0.1s in env
+        assert 0.05 * worker_step['count'] <= worker_step['total'] <= 0.2 * worker_step['count']
+        assert stats['totals']['launch']['count'] == 1
+        assert 0 < stats['wait_time'] < duration
+        env_manager.close()
+        # the waiting ``ready_obs`` is woken up when the env manager is closed
+        with pytest.raises(AssertionError):
+            env_manager.ready_obs
+
+    @pytest.mark.unittest
+    @pytest.mark.parametrize('shared_memory_step', [False, True])
+    def test_step_deadline(self, shared_memory_step):
+        cfg = deep_merge_dicts(
+            SyncSubprocessEnvManager.default_config(),
+            EasyDict(dict(step_deadline=0.2, shared_memory=True, shared_memory_step=shared_memory_step))
+        )
+        env_manager = SyncSubprocessEnvManager([partial(DelayEnv, delay=d) for d in [1., 0., 0.]], cfg)
+        env_manager.launch()
+        assert sorted(env_manager.ready_obs.keys()) == [0, 1, 2]
+        start_time = time.time()
+        timesteps = env_manager.step({i: 0 for i in range(3)})
+        assert time.time() - start_time < 0.8
+        # the straggler env 0 is carried into the next calls
+        assert sorted(timesteps.keys()) == [1, 2]
+        assert sorted(env_manager.ready_obs.keys()) == [1, 2]
+        assert env_manager.ready_obs_id == [1, 2]
+        assert env_manager.stepping_env == [0]
+        late_timesteps = {}
+        while 0 not in late_timesteps:
+            late_timesteps = env_manager.step({i: 0 for i in env_manager.ready_obs})
+        assert late_timesteps[0].obs.shape == (2, )
+        assert 0 not in env_manager.stepping_env
+        latency = {env_id: s['step_latency'] for env_id, s in env_manager.stats()['envs'].items()}
+        assert latency[0]['count'] == 1 and latency[0]['max'] >= 1.
+        assert latency[1]['max'] < latency[0]['max'] and latency[1]['count'] > 1
+        assert sorted(env_manager.ready_obs.keys()) == [0, 1, 2]
+        env_manager.close()
+
+    @pytest.mark.unittest
+    def test_step_deadline_all_done(self):
+        cfg = deep_merge_dicts(
+            SubprocessEnvManagerV2.default_config(), EasyDict(dict(step_deadline=0.2, shared_memory=True))
+        )
+        env_fn = [partial(DelayEnv, delay=1., reset_delay=0.5)] + \
+            [partial(DelayEnv, delay=0., done=True, reset_delay=0.5) for _ in range(2)]
+        env_manager = SubprocessEnvManagerV2(env_fn, cfg)
+        env_manager.launch()
+        assert env_manager.ready_obs.shape == (3, 2)
+        # the on-time envs 1 and 2 finish their episodes and are resetting, so the late env 0 is waited for
+        timesteps = env_manager.step([0] * 3)
+        assert sorted([int(t.env_id) for t in timesteps]) == [0, 1, 2]
+        assert env_manager.stepping_env == []
+        assert env_manager.ready_obs.shape[0] >= 1
+        env_manager.close()
+
+    @pytest.mark.unittest
+    @pytest.mark.parametrize('manager_cls', [AsyncSubprocessEnvManager, SyncSubprocessEnvManager])
+    def test_standby_worker(self, manager_cls, tmp_path):
+        cfg = deep_merge_dicts(
+            manager_cls.default_config(),
+            EasyDict(dict(retry_type='renew', max_retry=2, standby_worker_num=1, shared_memory=True))
+        )
+        fail_flag = str(tmp_path / 'fail')
+        env_manager = manager_cls([partial(DelayEnv, delay=0., fail_flag=fail_flag) for _ in range(2)], cfg)
+        env_manager.launch()
+        assert env_manager.stats(per_env=False)['totals']['launch']['total'] > 0
+        standby_pid = env_manager._standby_workers[0][0].pid
+        old_pid = env_manager._subprocesses[0].pid
+        # the failed env is renewed by the standby worker, and a new standby worker is started
+        open(fail_flag, 'w').close()
+        env_manager.reset({0: {}})
+        assert env_manager._env_states[0] == EnvState.RUN
+        assert env_manager._subprocesses[0].pid == standby_pid != old_pid
+        assert len(env_manager._standby_workers) == 1 and env_manager._standby_workers[0][0].pid != standby_pid
+        renew = env_manager.stats(per_env=False)['totals']['renew']
+        assert renew['count'] == 1 and renew['total'] > 0
+        timesteps = env_manager.step({i: 0 for i in range(2)})
+        assert all([t.obs.shape == (2, ) for t in timesteps.values()])
+        standby = env_manager._standby_workers[0][0]
+        env_manager.close()
+        standby.join(timeout=5)
+        assert not standby.is_alive()
+
+    @pytest.mark.unittest
+    def test_env_group(self):
+        cfg = deep_merge_dicts(
+            SyncSubprocessEnvManager.default_config(), EasyDict(dict(env_group_num=2, shared_memory=True))
+        )
+        env_manager = SyncSubprocessEnvManager([partial(DelayEnv, delay=0.) for _ in range(4)], cfg)
+        env_manager.launch()
+        # the first group is stepped while the actions of the second group are inferred
+        assert sorted(env_manager.ready_obs.keys()) == [0, 1]
+        assert env_manager.step({0: 0, 1: 0}) == {}
+        assert env_manager.stepping_env == [0, 1]
+        assert sorted(env_manager.ready_obs.keys()) == [2, 3]
+        for _ in range(3):
+            timesteps = env_manager.step({2: 0, 3: 0})
+            assert sorted(timesteps.keys()) == [0, 1] and env_manager.stepping_env == [2, 3]
+            assert all([t.obs.shape == (2, ) for t in timesteps.values()])
+            assert env_manager.ready_obs_id == [0, 1]
+            timesteps = env_manager.step({0: 0, 1: 0})
+            assert sorted(timesteps.keys()) == [2, 3] and env_manager.stepping_env == [0, 1]
+            assert env_manager.ready_obs_id == [2, 3]
+        # step with empty actions receives the in-flight steps
+        assert sorted(env_manager.step({}).keys()) == [0, 1]
+        assert env_manager.stepping_env == []
+        env_manager.close()
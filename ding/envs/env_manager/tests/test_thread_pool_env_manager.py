@@ -0,0 +1,82 @@
+import time
+import pytest
+import numpy as np
+
+from ..base_env_manager import EnvState
+from ..thread_pool_env_manager import ThreadPoolEnvManager, ThreadPoolEnvManagerV2
+
+
+@pytest.mark.unittest
+class TestThreadPoolEnvManager:
+
+    def test_naive(self, setup_fast_base_manager_cfg, setup_model_type):
+        env_fn = setup_fast_base_manager_cfg.pop('env_fn')
+        env_manager = ThreadPoolEnvManager(env_fn, setup_fast_base_manager_cfg)
+        model = setup_model_type()
+        env_manager.seed([314 for _ in range(env_manager.env_num)])
+        env_manager.launch(reset_param={i: {'stat': 'stat_test'} for i in range(env_manager.env_num)})
+        assert all([env_manager._env_states[env_id] == EnvState.RUN for env_id in range(env_manager.env_num)])
+        assert all([s == 314 for s in env_manager._seed])
+        # Test step, each env step sleeps 0.05~0.1s, which runs concurrently
+        step_count = 0
+        start_time = time.time()
+        while not env_manager.done:
+            obs = env_manager.ready_obs
+            action = model.forward(obs)
+            timestep = env_manager.step(action)
+            assert set(timestep.keys()) == set(action.keys())
+            step_count += 1
+        assert time.time() - start_time < 0.1 * step_count * 1.5
+        assert all([c == setup_fast_base_manager_cfg.episode_num for c in env_manager._env_episode_count.values()])
+        env_manager.close()
+        assert env_manager._closed
+        assert all([not env_manager._envs[env_id]._launched for env_id in range(env_manager.env_num)])
+        with pytest.raises(AssertionError):
+            env_manager.step([])
+
+    def test_error(self, setup_fast_base_manager_cfg):
+        env_fn = setup_fast_base_manager_cfg.pop('env_fn')
+        env_manager = ThreadPoolEnvManager(env_fn, setup_fast_base_manager_cfg)
+        # Test reset error
+        with pytest.raises(RuntimeError):
+            env_manager.launch(reset_param={i: {'stat': 'error'} for i in range(env_manager.env_num)})
+        assert env_manager._closed
+        reset_param = {i: {'stat': 'stat_test'} for i in range(env_manager.env_num)}
+        env_manager.launch(reset_param=reset_param)
+        assert not env_manager._closed
+        # Test reset error once
+        env_manager._retry_type = 'renew'
+        env_id_0 = env_manager.time_id[0]
+        reset_param[0] = {'stat': 'error_once'}
+        env_manager.reset(reset_param)
+        env_manager.reset(reset_param)
+        assert not env_manager._closed
+        assert env_manager.time_id[0] != env_id_0
+        # Test step error
+        action = {i: np.random.randn(4) for i in range(env_manager.env_num)}
+        action[0] = 'error'
+        with pytest.raises(RuntimeError):
+            env_manager.step(action)
+        assert env_manager._env_states[0] == EnvState.ERROR
+        assert all([env_manager._env_states[i] == EnvState.RUN for i in range(1, env_manager.env_num)])
+        env_manager.reset(reset_param)
+        assert len(env_manager.ready_obs) == 3
+        # Test step timeout, the timeout env can't be interrupted, so use a finite blocking action here
+        env_manager._step_timeout = 0.5
+        env_manager._reset_timeout = 0.5
+        action[0] = 'wait'
+        with pytest.raises(TimeoutError):
+            env_manager.step(action)
+        assert env_manager._env_states[0] == EnvState.ERROR
+        env_manager.close()
+
+    def test_v2(self, setup_fast_base_manager_cfg):
+        env_fn = setup_fast_base_manager_cfg.pop('env_fn')
+        env_manager = ThreadPoolEnvManagerV2(env_fn, setup_fast_base_manager_cfg)
+        env_manager.launch()
+        while not env_manager.done:
+            obs = env_manager.ready_obs
+            timestep = env_manager.step([np.random.randn(4) for _ in range(obs.shape[0])])
+            assert len(timestep) == obs.shape[0]
+            assert all([t.env_id.item() in range(env_manager.env_num) for t in timestep])
+        env_manager.close()
@@ -0,0 +1,162 @@
+import pytest
+import numpy as np
+import gym
+from easydict import EasyDict
+from functools import partial
+
+from ding.envs import BaseEnvTimestep, FrameStackWrapper, ScaledFloatFrameWrapper, RewardNormWrapper
+from ding.utils import deep_merge_dicts
+from ..base_env_manager import BaseEnvManager
+from ..subprocess_env_manager import AsyncSubprocessEnvManager, SyncSubprocessEnvManager
+
+
+class ImageEnv(gym.Env):
+
+    def __init__(self, env_id, episode_len=7):
+        self.env_id = env_id
+        self.episode_len = episode_len
+        self.observation_space = gym.spaces.Box(low=0, high=255, shape=(2, 6, 6), dtype=np.uint8)
+        self.action_space = gym.spaces.Discrete(2)
+        self.reward_space = gym.spaces.Box(low=0, high=10, shape=(1, ), dtype=np.float32)
+
+    def _obs(self):
+        return np.full((2, 6, 6), self.count * 7 + self.env_id * 3, dtype=np.uint8)
+
+    def reset(self):
+        self.count = 0
+        return self._obs()
+
+    def step(self, action):
+        self.count += 1
+        done = self.count >= self.episode_len + self.env_id
+        reward = np.array([self.count + self.env_id], dtype=np.float32)
+        return BaseEnvTimestep(self._obs(), reward, done, {})
+
+    def seed(self, seed, dynamic_seed=False):
+        pass
+
+    def close(self):
+        pass
+
+
+class TimestepWrapper(gym.Wrapper):
+
+    def reset(self):
+        return self.env.reset()
+
+    def step(self, action):
+        return BaseEnvTimestep(*self.env.step(action))
+
+
+def env_fn(env_id, wrap=False):
+    env = ImageEnv(env_id)
+    if wrap:
+        env = TimestepWrapper(FrameStackWrapper(ScaledFloatFrameWrapper(env), n_frames=3))
+    return env
+
+
+def run(env_manager):
+    # the sequences of each env, since the envs in reset may be absent in some steps of subprocess env manager
+    obs, timesteps = {i: [] for i in range(env_manager.env_num)}, {i: [] for i in range(env_manager.env_num)}
+    env_manager.launch()
+    while not env_manager.done:
+        ready_obs = env_manager.ready_obs
+        for i, o in ready_obs.items():
+            obs[i].append(o.copy())
+        for i, t in env_manager.step({i: 0 for i in ready_obs}).items():
+            timesteps[i].append(t)
+    env_manager.close()
+    return obs, timesteps
+
+
+@pytest.mark.unittest
+@pytest.mark.parametrize('manager_cls', [BaseEnvManager, SyncSubprocessEnvManager])
+def test_vec_env_wrapper_equivalence(manager_cls):
+    """
+    The vectorized wrappers in env manager get the same results as the wrappers in each env.
+    """
+    env_num = 3
+    cfg = deep_merge_dicts(manager_cls.default_config(), EasyDict(dict(episode_num=2)))
+    env_manager = manager_cls([partial(env_fn, i, wrap=True) for i in range(env_num)], cfg)
+    expected_obs, expected_timesteps = run(env_manager)
+
+    cfg.vec_env_wrapper = [
+        dict(type='vec_scaled_float_frame'),
+        dict(type='vec_frame_stack', kwargs=dict(n_frames=3)),
+    ]
+    env_manager = manager_cls([partial(env_fn, i) for i in range(env_num)], cfg)
+    assert env_manager.observation_space.shape == (3, 2, 6, 6)
+    assert env_manager.observation_space.dtype == np.float32
+    obs, timesteps = run(env_manager)
+    for i in range(env_num):
+        assert len(obs[i]) == len(expected_obs[i]) == len(timesteps[i]) == 2 * (7 + i)
+        for o, e in zip(obs[i], expected_obs[i]):
+            assert o.dtype == np.float32 and np.allclose(o, e)
+        for t, e in zip(timesteps[i], expected_timesteps[i]):
+            assert np.allclose(t.obs, e.obs)
+            assert t.reward == e.reward and t.done == e.done
+
+
+@pytest.mark.unittest
+@pytest.mark.parametrize('manager_cls', [BaseEnvManager, AsyncSubprocessEnvManager])
+def test_vec_norm_wrapper(manager_cls):
+    env_num = 3
+    cfg = deep_merge_dicts(
+        manager_cls.default_config(),
+        EasyDict(
+            dict(
+                episode_num=20,
+                vec_env_wrapper=[
+                    dict(type='vec_obs_norm'),
+                    dict(type='vec_reward_norm', kwargs=dict(reward_discount=0.9)),
+                ]
+            )
+        )
+    )
+    env_manager = manager_cls([partial(env_fn, i) for i in range(env_num)], cfg)
+    obs_norm, reward_norm = env_manager._vec_env_wrapper._wrappers
+    _, timesteps = run(env_manager)
+    step_count = sum([len(t) for t in timesteps.values()])
+    for t in sum(timesteps.values(), [])[-5:]:
+        assert t.obs.dtype == np.float64 and np.abs(t.obs).max() <= 3
+    # the statistics are maintained once across all the envs
+    assert obs_norm.data_count == reward_norm.data_count == step_count
+    assert obs_norm.rms._count == pytest.approx(step_count, abs=1e-3)
+    assert obs_norm.rms.mean.shape == (2, 6, 6)
+    # the rewards are normalized by the shared running std, which is the same as ``RewardNormWrapper`` in one env
+    reward_fn = RewardNormWrapper(ImageEnv(0), reward_discount=0.9)
+    reward_fn.rms = reward_norm.rms
+    reward_fn.data_count = reward_norm.data_count
+    assert reward_fn.reward(np.array([2.])) == pytest.approx(2. / reward_norm.rms.std[0])
+
+
+@pytest.mark.unittest
+def test_vec_warp_frame_wrapper():
+    pytest.importorskip('cv2')
+    from ding.envs import VecWarpFrameWrapper, WarpFrameWrapper
+    space = gym.spaces.Box(low=0, high=255, shape=(4, 100, 100), dtype=np.uint8)
+    wrapper = VecWarpFrameWrapper(space, 5, size=84)
+    obs = np.random.randint(0, 256, size=(5, 4, 100, 100), dtype=np.uint8)
+    warped = wrapper.reset(obs, list(range(5)))
+    assert warped.shape == (5, 4, 84, 84) and warped.dtype == np.uint8
+    single = WarpFrameWrapper(ImageEnv(0), size=84)
+    for i in range(5):
+        assert np.array_equal(warped[i], single.observation(obs[i]))
+
+
+@pytest.mark.unittest
+def test_vec_warp_frame_wrapper_rgb():
+    pytest.importorskip('cv2')
+    from ding.envs import VecWarpFrameWrapper, WarpFrameWrapper
+    space = gym.spaces.Box(low=0, high=255, shape=(100, 100, 3), dtype=np.uint8)
+    wrapper = VecWarpFrameWrapper(space, 6, size=84)
+    obs = np.random.randint(0, 256, size=(6, 100, 100, 3), dtype=np.uint8)
+    warped = wrapper.reset(obs, list(range(6)))
+    assert warped.shape == (6, 84, 84) and warped.dtype == np.uint8
+    env = ImageEnv(0)
+    env.observation_space = space
+    single = WarpFrameWrapper(env, size=84)
+    for i in range(6):
+        # the grayscale conversion may differ from ``cv2.cvtColor`` by one in rounding
+        diff = warped[i].astype(np.int16) - single.observation(obs[i]).astype(np.int16)
+        assert np.abs(diff).max() <= 1
@@ -0,0 +1,121 @@
+from typing import Any, Dict, List
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+import os
+import threading
+import time
+
+from ding.envs import BaseEnvTimestep
+from ding.utils import ENV_MANAGER_REGISTRY
+from .base_env_manager import BaseEnvManager, BaseEnvManagerV2, EnvState
+
+
+@ENV_MANAGER_REGISTRY.register('thread_pool')
+class ThreadPoolEnvManager(BaseEnvManager):
+    """
+    Overview:
+        The env manager which steps and resets the sub-environments concurrently on a bounded thread pool in the \
+        main process. It is suitable for the envs whose ``step`` mostly runs C code releasing the GIL (e.g. MuJoCo, \
+        Box2D and numpy-heavy simulators), which avoids the process and IPC costs of subprocess env managers, \
+        while the envs running python code mostly should still use subprocess env managers.
+        The ``ready_obs``, ``step``, ``reset`` and retry behaviours are the same as ``BaseEnvManager``.
+
+    .. note::
+        The WatchDog of ``step_timeout`` and ``reset_timeout`` only works in main thread, so the timeouts are \
+        checked by the env manager when waiting for the envs. The timeout envs can't be interrupted, so they are \
+        marked as error and a ``TimeoutError`` is raised.
+
+    Interfaces:
+        reset, step, seed, close, enable_save_replay, launch, default_config, reward_shaping, enable_save_figure
+    Properties:
+        env_num, env_ref, ready_obs, ready_obs_id, ready_imgs, done, closed, method_name_list, observation_space, \
+        action_space, reward_space
+    """
+
+    config = dict(
+        episode_num=float("inf"),
+        max_retry=1,
+        retry_type='reset',
+        auto_reset=True,
+        step_timeout=None,
+        reset_timeout=None,
+        retry_waiting_time=0.1,
+        # (int) The max number of threads, defaults to None, which means min(env_num, cpu_count + 4) as the default \
+        # of ``ThreadPoolExecutor``, since the envs are expected to release the GIL.
+        thread_num=None,
+        vec_env_wrapper=[],
+    )
+
+    def _create_state(self) -> None:
+        super()._create_state()
+        thread_num = self._cfg.get('thread_num', None)
+        if thread_num is None:
+            thread_num = min(self.env_num, (os.cpu_count() or 1) + 4)
+        self._thread_local = threading.local()
+        self._close_requested = False
+        self._pool = ThreadPoolExecutor(
+            max_workers=thread_num,
+            thread_name_prefix='thread_pool_env_manager',
+            initializer=setattr,
+            initargs=(self._thread_local, 'in_pool', True)
+        )
+
+    def _run(self, fn, env_ids: List[int], args: List[Any], timeout: float) -> List[Any]:
+        futures = [self._pool.submit(fn, env_id, *a) for env_id, a in zip(env_ids, args)]
+        start_time = time.time()
+        done, not_done = wait(futures, timeout=timeout, return_when=FIRST_EXCEPTION)
+        self._stats.record_wait(time.time() - start_time)
+        if len(not_done) > 0 and all([f.exception() is None for f in done]):
+            timeout_env = [env_id for env_id, f in zip(env_ids, futures) if f in not_done]
+            for env_id in timeout_env:
+                self._env_states[env_id] = EnvState.ERROR
+            raise TimeoutError("env {} exceeds the timeout {}s".format(timeout_env, timeout))
+        # wait for all the envs even if some of them fail, in order to leave the env manager in a consistent state
+        wait(futures)
+        if self._close_requested:
+            self.close()
+        return [f.result() for f in futures]
+
+    def _reset_envs(self, env_ids: List[int]) -> None:
+        self._run(self._reset, env_ids, [[] for _ in env_ids], self._reset_timeout)
+
+    def step(self, actions: Dict[int, Any]) -> Dict[int, BaseEnvTimestep]:
+        """
+        Overview:
+            Execute env step according to input actions concurrently, the done envs are reset in the same thread \
+            when ``self._auto_reset`` is True.
+        Arguments:
+            - actions (:obj:`Dict[int, Any]`): A dict of actions, key is the env_id, value is corresponding action.
+        Returns:
+            - timesteps (:obj:`Dict[int, BaseEnvTimestep]`): A dict of timesteps, key is the env_id.
+        """
+        self._check_closed()
+        env_ids = list(actions.keys())
+        timeout = None
+        if self._step_timeout is not None:
+            # the auto reset is executed after step in the same task
+            timeout = self._step_timeout + (self._reset_timeout or 0) if self._auto_reset else self._step_timeout
+        results = self._run(self._step_and_update, env_ids, [[actions[env_id]] for env_id in env_ids], timeout)
+        return self._wrap_timesteps({env_id: timestep for env_id, timestep in zip(env_ids, results)})
+
+    def close(self) -> None:
+        """
+        Overview:
+            Close the env manager, the thread pool and all the environment resources.
+        """
+        if self._closed:
+            return
+        if getattr(self._thread_local, 'in_pool', False):
+            # e.g. reset exceeds max retries in thread, the env manager is closed after all the envs finish
+            self._close_requested = True
+            return
+        self._pool.shutdown(wait=False)
+        super().close()
+
+
+@ENV_MANAGER_REGISTRY.register('thread_pool_v2')
+class ThreadPoolEnvManagerV2(BaseEnvManagerV2, ThreadPoolEnvManager):
+    """
+    Overview:
+        ThreadPoolEnvManager for new task pipeline and interfaces coupled with treetensor.
+    """
+    config = ThreadPoolEnvManager.config
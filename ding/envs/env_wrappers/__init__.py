@@ -1 +1,3 @@
 from .env_wrappers import *
+from .vec_env_wrappers import VecEnvWrapper, VecWarpFrameWrapper, VecScaledFloatFrameWrapper, VecFrameStackWrapper, \
+    VecObsNormWrapper, VecRewardNormWrapper, VecEnvWrapperChain, create_vec_env_wrapper
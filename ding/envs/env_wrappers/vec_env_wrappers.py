@@ -0,0 +1,509 @@
+"""
+The vectorized counterparts of some env wrappers, which are applied by the env manager on the stacked observations \
+of all the sub-environments (in shape ``(env_num, ...)``), rather than in each sub-environment on single observations.
+
+List of Vectorized Environment Wrappers:
+- VecWarpFrameWrapper: Resizes the frames of all the envs to 84x84 by a few batched cv2 calls.
+- VecScaledFloatFrameWrapper: Normalizes the observations of all the envs to a range of 0 to 1.
+- VecFrameStackWrapper: Stacks the latest 'n' frames of each env in a preallocated array.
+- VecObsNormWrapper: Normalizes the observations based on a running mean and std, which is shared by all the envs.
+- VecRewardNormWrapper: Normalizes the rewards based on a running std, which is shared by all the envs.
+"""
+
+import copy
+from typing import Any, Dict, List, Optional, Tuple
+
+import gym
+import numpy as np
+from easydict import EasyDict
+
+from ding.envs.env import BaseEnvTimestep
+from ding.utils import ENV_WRAPPER_REGISTRY, import_module
+from .env_wrappers import RunningMeanStd
+
+
+class VecEnvWrapper(object):
+    """
+    Overview:
+        The base class of the vectorized env wrappers. The observations and rewards are stacked in the first \
+        dimension, and ``env_ids`` are the env ids of the stacked data, which can be a subset of all the envs.
+    Interfaces:
+        __init__, reset, step, observation
+    Properties:
+        - observation_space (:obj:`gym.Space`): The observation space of a sub-environment after wrapping.
+    """
+
+    def __init__(self, observation_space: gym.Space, env_num: int) -> None:
+        """
+        Overview:
+            Initialize the wrapper.
+        Arguments:
+            - observation_space (:obj:`gym.Space`): The observation space of a sub-environment before wrapping.
+            - env_num (:obj:`int`): The number of sub-environments.
+        """
+        self.observation_space = observation_space
+        self.env_num = env_num
+
+    def reset(self, obs: np.ndarray, env_ids: List[int]) -> np.ndarray:
+        """
+        Overview:
+            Wrap the stacked observations of the envs which are just reset.
+        Arguments:
+            - obs (:obj:`np.ndarray`): The stacked observations.
+            - env_ids (:obj:`List[int]`): The env ids of the observations.
+        Returns:
+            - obs (:obj:`np.ndarray`): The wrapped observations.
+        """
+        return self.observation(obs)
+
+    def step(self, obs: np.ndarray, reward: np.ndarray, done: np.ndarray,
+             env_ids: List[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Overview:
+            Wrap the stacked observations and rewards returned by ``step``.
+        Arguments:
+            - obs (:obj:`np.ndarray`): The stacked observations.
+            - reward (:obj:`np.ndarray`): The stacked rewards.
+            - done (:obj:`np.ndarray`): The bool array of whether each episode is done.
+            - env_ids (:obj:`List[int]`): The env ids of the data.
+        Returns:
+            - obs (:obj:`np.ndarray`): The wrapped observations.
+            - reward (:obj:`np.ndarray`): The wrapped rewards.
+        """
+        return self.observation(obs), reward
+
+    def observation(self, obs: np.ndarray) -> np.ndarray:
+        """
+        Overview:
+            Transform the stacked observations, which is stateless.
+        Arguments:
+            - obs (:obj:`np.ndarray`): The stacked observations.
+        Returns:
+            - obs (:obj:`np.ndarray`): The transformed observations.
+        """
+        return obs
+
+
+@ENV_WRAPPER_REGISTRY.register('vec_warp_frame')
+class VecWarpFrameWrapper(VecEnvWrapper):
+    """
+    Overview:
+        The vectorized ``WarpFrameWrapper``, which resizes the frames to ``size x size``. The frames of all the envs \
+        are concatenated in the channel dimension and resized in chunks of ``max_channel`` frames, so that a batch \
+        of ``N`` frames costs ``ceil(N / 4)`` cv2 calls instead of ``N``.
+    Interfaces:
+        __init__, observation
+    """
+
+    # ``cv2.resize`` with ``INTER_AREA`` only accepts up to 4 channels when shrinking by a non-integer factor
+    max_channel = 4
+
+    def __init__(self, observation_space: gym.Space, env_num: int, size: int = 84) -> None:
+        """
+        Overview:
+            Initialize the wrapper.
+        Arguments:
+            - observation_space (:obj:`gym.Space`): The observation space of a sub-environment before wrapping.
+            - env_num (:obj:`int`): The number of sub-environments.
+            - size (:obj:`int`): The size to which the frames are to be resized. Default is 84.
+        """
+        super().__init__(observation_space, env_num)
+        self.size = size
+        # deal with the `channel_first` case, the same as ``WarpFrameWrapper``
+        self.channel_first = observation_space.shape[0] < 10
+        shape = (observation_space.shape[0], size, size) if self.channel_first else (size, size)
+        self.observation_space = gym.spaces.Box(
+            low=np.min(observation_space.low),
+            high=np.max(observation_space.high),
+            shape=shape,
+            dtype=observation_space.dtype
+        )
+
+    def observation(self, obs: np.ndarray) -> np.ndarray:
+        """
+        Overview:
+            Resize the stacked frames to the desired size.
+        Arguments:
+            - obs (:obj:`np.ndarray`): The stacked frames in shape ``(N, C, H, W)`` or ``(N, H, W, 3)``.
+        Returns:
+            - obs (:obj:`np.ndarray`): The resized frames in shape ``(N, C, size, size)`` or ``(N, size, size)``.
+        """
+        try:
+            import cv2
+        except ImportError:
+            from ditk import logging
+            import sys
+            logging.warning("Please install opencv-python first.")
+            sys.exit(1)
+        n = obs.shape[0]
+        if self.channel_first:
+            frames = obs.reshape(-1, *obs.shape[2:])
+        else:
+            gray_weight = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+            frames = np.dot(obs, gray_weight).round().astype(obs.dtype)
+        # (N', H, W) -> (H, W, N') to resize all the frames in one call
+        frames = frames.transpose(1, 2, 0)
+        resized = [
+            cv2.resize(frames[..., i:i + self.max_channel], (self.size, self.size), interpolation=cv2.INTER_AREA)
+            for i in range(0, frames.shape[-1], self.max_channel)
+        ]
+        resized = [r[..., None] if r.ndim == 2 else r for r in resized]
+        frames = np.concatenate(resized, axis=-1).transpose(2, 0, 1)
+        return frames.reshape(n, *self.observation_space.shape)
+
+
+@ENV_WRAPPER_REGISTRY.register('vec_scaled_float_frame')
+class VecScaledFloatFrameWrapper(VecEnvWrapper):
+    """
+    Overview:
+        The vectorized ``ScaledFloatFrameWrapper``, which normalizes the observations to between 0 and 1.
+    Interfaces:
+        __init__, observation
+    """
+
+    def __init__(self, observation_space: gym.Space, env_num: int) -> None:
+        """
+        Overview:
+            Initialize the wrapper, setting the scale and bias for normalization.
+        Arguments:
+            - observation_space (:obj:`gym.Space`): The observation space of a sub-environment before wrapping.
+            - env_num (:obj:`int`): The number of sub-environments.
+        """
+        super().__init__(observation_space, env_num)
+        low = np.min(observation_space.low)
+        high = np.max(observation_space.high)
+        self.bias = low
+        self.scale = high - low
+        self.observation_space = gym.spaces.Box(low=0., high=1., shape=observation_space.shape, dtype=np.float32)
+
+    def observation(self, obs: np.ndarray) -> np.ndarray:
+        """
+        Overview:
+            Scale the stacked observations to be within the range [0, 1].
+        Arguments:
+            - obs (:obj:`np.ndarray`): The stacked observations.
+        Returns:
+            - obs (:obj:`np.ndarray`): The scaled observations.
+        """
+        return ((obs - self.bias) / self.scale).astype('float32')
+
+
+@ENV_WRAPPER_REGISTRY.register('vec_frame_stack')
+class VecFrameStackWrapper(VecEnvWrapper):
+    """
+    Overview:
+        The vectorized ``FrameStackWrapper``, which stacks the latest n frames of each env. The frames of all the \
+        envs are stored in a preallocated array in shape ``(env_num, n_frames, ...)``.
+    Interfaces:
+        __init__, reset, step
+    """
+
+    def __init__(self, observation_space: gym.Space, env_num: int, n_frames: int = 4) -> None:
+        """
+        Overview:
+            Initialize the wrapper.
+        Arguments:
+            - observation_space (:obj:`gym.Space`): The observation space of a sub-environment before wrapping.
+            - env_num (:obj:`int`): The number of sub-environments.
+            - n_frames (:obj:`int`): The number of frames to stack.
+        """
+        super().__init__(observation_space, env_num)
+        self.n_frames = n_frames
+        shape = (n_frames, ) + observation_space.shape
+        self.observation_space = gym.spaces.Box(
+            low=np.min(observation_space.low),
+            high=np.max(observation_space.high),
+            shape=shape,
+            dtype=observation_space.dtype
+        )
+        self.frames = np.zeros((env_num, ) + shape, dtype=observation_space.dtype)
+
+    def reset(self, obs: np.ndarray, env_ids: List[int]) -> np.ndarray:
+        """
+        Overview:
+            Initialize the frames of the reset envs with their initial observations.
+        Arguments:
+            - obs (:obj:`np.ndarray`): The stacked initial observations.
+            - env_ids (:obj:`List[int]`): The env ids of the observations.
+        Returns:
+            - obs (:obj:`np.ndarray`): The stacked frames of the envs.
+        """
+        self.frames[env_ids] = obs[:, None]
+        return self.frames[env_ids]
+
+    def step(self, obs: np.ndarray, reward: np.ndarray, done: np.ndarray,
+             env_ids: List[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Overview:
+            Append the observations to the frames of the envs.
+        Arguments:
+            - obs (:obj:`np.ndarray`): The stacked observations.
+            - reward (:obj:`np.ndarray`): The stacked rewards.
+            - done (:obj:`np.ndarray`): The bool array of whether each episode is done.
+            - env_ids (:obj:`List[int]`): The env ids of the data.
+        Returns:
+            - obs (:obj:`np.ndarray`): The stacked frames of the envs.
+            - reward (:obj:`np.ndarray`): The original rewards.
+        """
+        frames = self.frames[env_ids]
+        frames[:, :-1] = frames[:, 1:]
+        frames[:, -1] = obs
+        self.frames[env_ids] = frames
+        return frames, reward
+
+
+@ENV_WRAPPER_REGISTRY.register('vec_obs_norm')
+class VecObsNormWrapper(VecEnvWrapper):
+    """
+    Overview:
+        The vectorized ``ObsNormWrapper``, which normalizes the observations according to the running mean and std. \
+        Different from ``ObsNormWrapper``, the statistics are shared by all the envs and not reset with the envs, \
+        so the observations of all the envs are normalized consistently.
+    Interfaces:
+        __init__, reset, step, observation
+    Properties:
+        - data_count (:obj:`int`): The count of the observations of all the envs observed so far.
+        - clip_range (:obj:`Tuple[int, int]`): The range to clip the normalized observation.
+        - rms (:obj:`RunningMeanStd`): The running mean and std of the observations.
+    """
+
+    def __init__(self, observation_space: gym.Space, env_num: int) -> None:
+        """
+        Overview:
+            Initialize the wrapper.
+        Arguments:
+            - observation_space (:obj:`gym.Space`): The observation space of a sub-environment before wrapping.
+            - env_num (:obj:`int`): The number of sub-environments.
+        """
+        super().__init__(observation_space, env_num)
+        self.data_count = 0
+        self.clip_range = (-3, 3)
+        self.rms = RunningMeanStd(shape=observation_space.shape)
+
+    def step(self, obs: np.ndarray, reward: np.ndarray, done: np.ndarray,
+             env_ids: List[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Overview:
+            Update the running mean and std with the stacked observations, and normalize them.
+        Arguments:
+            - obs (:obj:`np.ndarray`): The stacked observations.
+            - reward (:obj:`np.ndarray`): The stacked rewards.
+            - done (:obj:`np.ndarray`): The bool array of whether each episode is done.
+            - env_ids (:obj:`List[int]`): The env ids of the data.
+        Returns:
+            - obs (:obj:`np.ndarray`): The normalized observations.
+            - reward (:obj:`np.ndarray`): The original rewards.
+        """
+        self.data_count += obs.shape[0]
+        self.rms.update(obs)
+        return self.observation(obs), reward
+
+    def observation(self, obs: np.ndarray) -> np.ndarray:
+        """
+        Overview:
+            Normalize the observations using the current running mean and std. If less than 30 data points have \
+            been observed, return the original observations.
+        Arguments:
+            - obs (:obj:`np.ndarray`): The stacked observations.
+        Returns:
+            - obs (:obj:`np.ndarray`): The normalized observations.
+        """
+        if self.data_count > 30:
+            return np.clip((obs - self.rms.mean) / self.rms.std, self.clip_range[0], self.clip_range[1])
+        else:
+            return obs
+
+
+@ENV_WRAPPER_REGISTRY.register('vec_reward_norm')
+class VecRewardNormWrapper(VecEnvWrapper):
+    """
+    Overview:
+        The vectorized ``RewardNormWrapper``, which normalizes the rewards according to the running std of the \
+        discounted cumulative rewards. The statistics are shared by all the envs and not reset with the envs.
+    Interfaces:
+        __init__, reset, step
+    Properties:
+        - cum_reward (:obj:`numpy.ndarray`): The discounted cumulative reward of each env.
+        - reward_discount (:obj:`float`): The discount factor for reward.
+        - data_count (:obj:`int`): The count of the rewards of all the envs observed so far.
+        - rms (:obj:`RunningMeanStd`): The running mean and std of the discounted cumulative rewards.
+    """
+
+    def __init__(self, observation_space: gym.Space, env_num: int, reward_discount: float) -> None:
+        """
+        Overview:
+            Initialize the wrapper.
+        Arguments:
+            - observation_space (:obj:`gym.Space`): The observation space of a sub-environment before wrapping.
+            - env_num (:obj:`int`): The number of sub-environments.
+            - reward_discount (:obj:`float`): The discount factor for reward.
+        """
+        super().__init__(observation_space, env_num)
+        self.cum_reward = np.zeros((env_num, 1), 'float64')
+        self.reward_discount = reward_discount
+        self.data_count = 0
+        self.rms = RunningMeanStd(shape=(1, ))
+
+    def reset(self, obs: np.ndarray, env_ids: List[int]) -> np.ndarray:
+        """
+        Overview:
+            Clear the cumulative rewards of the reset envs.
+        Arguments:
+            - obs (:obj:`np.ndarray`): The stacked initial observations.
+            - env_ids (:obj:`List[int]`): The env ids of the observations.
+        Returns:
+            - obs (:obj:`np.ndarray`): The original observations.
+        """
+        self.cum_reward[env_ids] = 0.
+        return obs
+
+    def step(self, obs: np.ndarray, reward: np.ndarray, done: np.ndarray,
+             env_ids: List[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Overview:
+            Update the cumulative rewards and the running std, and normalize the rewards if ``data_count`` is more \
+            than 30.
+        Arguments:
+            - obs (:obj:`np.ndarray`): The stacked observations.
+            - reward (:obj:`np.ndarray`): The stacked rewards.
+            - done (:obj:`np.ndarray`): The bool array of whether each episode is done.
+            - env_ids (:obj:`List[int]`): The env ids of the data.
+        Returns:
+            - obs (:obj:`np.ndarray`): The original observations.
+            - reward (:obj:`np.ndarray`): The normalized rewards.
+        """
+        self.data_count += len(env_ids)
+        cum_reward = self.cum_reward[env_ids] * self.reward_discount + reward.reshape(len(env_ids), 1)
+        self.cum_reward[env_ids] = cum_reward
+        self.rms.update(cum_reward)
+        if self.data_count > 30:
+            reward = (reward / self.rms.std[0]).astype(reward.dtype)
+        return obs, reward
+
+
+class VecEnvWrapperChain(object):
+    """
+    Overview:
+        A chain of vectorized env wrappers used by the env manager. The stacked observations of the timesteps \
+        returned by ``step`` are wrapped at once, and the observations of the reset envs are found and wrapped \
+        when getting the ready observations. The wrapped observation of each env is cached, so that each raw \
+        observation is only wrapped once.
+    Interfaces:
+        __init__, step, ready_obs, clear
+    Properties:
+        - observation_space (:obj:`gym.Space`): The observation space of a sub-environment after wrapping.
+    """
+
+    def __init__(self, wrappers: List[VecEnvWrapper]) -> None:
+        """
+        Overview:
+            Initialize the chain.
+        Arguments:
+            - wrappers (:obj:`List[VecEnvWrapper]`): The wrappers applied in order.
+        """
+        self._wrappers = wrappers
+        # env_id -> (raw obs, wrapped obs)
+        self._cache = {}
+
+    @property
+    def observation_space(self) -> gym.Space:
+        return self._wrappers[-1].observation_space
+
+    def step(self, timesteps: Dict[int, BaseEnvTimestep], reset_done: bool = False) -> Dict[int, BaseEnvTimestep]:
+        """
+        Overview:
+            Wrap the stacked observations and rewards of the timesteps.
+        Arguments:
+            - timesteps (:obj:`Dict[int, BaseEnvTimestep]`): The timesteps returned by the env manager.
+            - reset_done (:obj:`bool`): Whether the observations of the done timesteps are the reset observations, \
+                e.g. ``reset_inplace=True`` in subprocess env managers.
+        Returns:
+            - timesteps (:obj:`Dict[int, BaseEnvTimestep]`): The wrapped timesteps.
+        """
+        # the abnormal timesteps without obs are skipped
+        env_ids = [env_id for env_id, t in timesteps.items() if t.obs is not None]
+        if len(env_ids) == 0:
+            return timesteps
+        raw_obs = np.stack([timesteps[i].obs for i in env_ids])
+        reward = np.stack([np.asarray(timesteps[i].reward) for i in env_ids])
+        done = np.array([bool(timesteps[i].done) for i in env_ids])
+        obs = raw_obs
+        for w in self._wrappers:
+            obs, reward = w.step(obs, reward, done, env_ids)
+        if reset_done and done.any():
+            reset_ids = [i for i, d in zip(env_ids, done) if d]
+            obs[done] = self._reset(raw_obs[done], reset_ids)
+        timesteps = copy.copy(timesteps)
+        for idx, env_id in enumerate(env_ids):
+            t = timesteps[env_id]
+            timesteps[env_id] = t._replace(obs=obs[idx], reward=reward[idx])
+            if t.done and not reset_done:
+                # the next obs is the reset obs
+                self._cache.pop(env_id, None)
+            else:
+                self._cache[env_id] = (t.obs, obs[idx])
+        return timesteps
+
+    def ready_obs(self, ready_obs: Dict[int, Any]) -> Dict[int, Any]:
+        """
+        Overview:
+            Get the wrapped ready observations, the observations of the reset envs are stacked and wrapped at once.
+        Arguments:
+            - ready_obs (:obj:`Dict[int, Any]`): The raw ready observations, key is the env_id.
+        Returns:
+            - ready_obs (:obj:`Dict[int, Any]`): The wrapped ready observations.
+        """
+        reset_ids = [
+            env_id for env_id, o in ready_obs.items()
+            if env_id not in self._cache or not any([o is c for c in self._cache[env_id]])
+        ]
+        if len(reset_ids) > 0:
+            obs = self._reset(np.stack([ready_obs[i] for i in reset_ids]), reset_ids)
+            for env_id, o in zip(reset_ids, obs):
+                self._cache[env_id] = (ready_obs[env_id], o)
+        return {env_id: self._cache[env_id][1] for env_id in ready_obs}
+
+    def clear(self, env_ids: Optional[List[int]] = None) -> None:
+        """
+        Overview:
+            Clear the cached observations of the envs which are going to be reset.
+        Arguments:
+            - env_ids (:obj:`Optional[List[int]]`): The env ids, None means all the envs.
+        """
+        if env_ids is None:
+            self._cache.clear()
+        else:
+            for env_id in env_ids:
+                self._cache.pop(env_id, None)
+
+    def _reset(self, obs: np.ndarray, env_ids: List[int]) -> np.ndarray:
+        for w in self._wrappers:
+            obs = w.reset(obs, env_ids)
+        return obs
+
+
+def create_vec_env_wrapper(vec_env_wrapper_cfg: List[EasyDict], observation_space: gym.Space,
+                           env_num: int) -> Optional[VecEnvWrapperChain]:
+    """
+    Overview:
+        Create the chain of vectorized env wrappers according to the configurations, which are in the same format \
+        as ``create_env_wrapper``, e.g. ``[dict(type='vec_obs_norm'), dict(type='vec_frame_stack', kwargs=dict( \
+        n_frames=4))]``.
+    Arguments:
+        - vec_env_wrapper_cfg (:obj:`List[EasyDict]`): The configurations of the wrappers.
+        - observation_space (:obj:`gym.Space`): The observation space of a sub-environment.
+        - env_num (:obj:`int`): The number of sub-environments.
+    Returns:
+        - chain (:obj:`Optional[VecEnvWrapperChain]`): The chain of wrappers, None if no wrapper is configured.
+    """
+    if vec_env_wrapper_cfg is None or len(vec_env_wrapper_cfg) == 0:
+        return None
+    wrappers = []
+    for cfg in vec_env_wrapper_cfg:
+        cfg = copy.deepcopy(cfg)
+        if 'import_names' in cfg:
+            import_module(cfg.pop('import_names'))
+        wrapper = ENV_WRAPPER_REGISTRY.build(cfg.pop('type'), observation_space, env_num, **cfg.get('kwargs', {}))
+        observation_space = wrapper.observation_space
+        wrappers.append(wrapper)
+    return VecEnvWrapperChain(wrappers)
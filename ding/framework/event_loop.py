@@ -115,9 +115,10 @@ class EventLoop:
 
     def stop(self) -> None:
         self._active = False
+        # Wait for the emitted events before removing the listeners
+        self._thread_pool.shutdown()
         self._listeners = defaultdict(list)
         self._exception = None
-        self._thread_pool.shutdown()
         if self._name in EventLoop.loops:
             del EventLoop.loops[self._name]
 
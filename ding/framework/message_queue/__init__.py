@@ -1,3 +1,5 @@
 from .mq import MQ
 from .redis import RedisMQ
 from .nng import NNGMQ
+from .shm import ShmMQ
+from .serializer import serialize, deserialize
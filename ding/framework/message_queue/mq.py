@@ -1,4 +1,4 @@
-from typing import Tuple
+from typing import List, Tuple, Union
 
 
 class MQ:
@@ -21,13 +21,14 @@ class MQ:
         """
         raise NotImplementedError
 
-    def publish(self, topic: str, data: bytes) -> None:
+    def publish(self, topic: str, data: Union[bytes, List[bytes]]) -> None:
         """
         Overview:
             Send data to mq.
         Arguments:
             - topic (:obj:`str`): Topic.
-            - data (:obj:`bytes`): Payload data.
+            - data (:obj:`Union[bytes, List[bytes]]`): Payload data, or a list of frames (any bytes-like objects) \
+                which will be received as a list, e.g. the frames from ``serialize``.
         """
         raise NotImplementedError
 
@@ -49,12 +50,13 @@ class MQ:
         """
         raise NotImplementedError
 
-    def recv(self) -> Tuple[str, bytes]:
+    def recv(self) -> Tuple[str, Union[bytes, List[memoryview]]]:
         """
         Overview:
             Wait for incoming message, this function will block the current thread.
         Returns:
-            - data (:obj:`Any`): The sent payload.
+            - data (:obj:`Any`): The sent payload, which is bytes or a list of writable memoryviews, \
+                depending on the published data.
         """
         raise NotImplementedError
 
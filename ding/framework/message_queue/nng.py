@@ -1,31 +1,56 @@
+import os
+import struct
 import pynng
 from ditk import logging
-from typing import List, Optional, Tuple
-from pynng import Bus0
+from itertools import count
+from threading import Lock
+from typing import Dict, List, Optional, Tuple, Union
+from pynng import Bus0, Message, ffi, lib
+from pynng.exceptions import check_err
 from time import sleep
 
 from ding.framework.message_queue.mq import MQ
+from ding.framework.message_queue.serializer import Frame, pack_frames, unpack_frames
 from ding.utils import MQ_REGISTRY
 
+# The origin and sequence number of relayed message
+_RELAY = struct.Struct("<8sQ")
+
 
 @MQ_REGISTRY.register("nng")
 class NNGMQ(MQ):
 
-    def __init__(self, listen_to: str, attach_to: Optional[List[str]] = None, **kwargs) -> None:
+    def __init__(self, listen_to: str, attach_to: Optional[List[str]] = None, relay: bool = False, **kwargs) -> None:
         """
         Overview:
             Connect distributed processes with nng
         Arguments:
             - listen_to (:obj:`Optional[List[str]]`): The node address to attach to.
             - attach_to (:obj:`Optional[List[str]]`): The node's addresses you want to attach to.
+            - relay (:obj:`bool`): Forward the received messages to the other peers, so that the messages are \
+                broadcast to all the nodes in a tree (or chain) network, where each node only connects to its \
+                parent and children. All the nodes in the network should enable relay. The duplicated messages \
+                are detected by the sequence numbers of their origins, which requires the messages of each \
+                origin to arrive in order. It holds only in a network without cycles, where a message travels \
+                along the single path between two nodes, and each pipe of nng keeps the order. The sender takes \
+                the sequence number and sends the message under one lock, so that the messages of concurrent \
+                publishers also leave in order. So relay only \
+                works with the ``tree`` and ``chain`` topologies of ``Parallel``, in a network with cycles \
+                (e.g. ``mesh``), a message arriving by a shorter path hides the earlier messages on the longer \
+                paths, which are dropped.
         """
         self.listen_to = listen_to
         self.attach_to = attach_to or []
         self._sock: Bus0 = None
         self._running = False
+        self._relay = relay
+        self._origin = os.urandom(8)
+        self._seq = count()
+        self._send_lock = Lock()  # Keep the order of sequence numbers on the wire
+        self._relay_seq: Dict[bytes, int] = {}
 
     def listen(self) -> None:
-        self._sock = sock = Bus0()
+        self._sock = sock = self._create_socket()
         sock.listen(self.listen_to)
         sleep(0.1)  # Wait for peers to bind
         for contact in self.attach_to:
@@ -33,11 +58,81 @@ class NNGMQ(MQ):
         logging.info("NNG listen on {}, attach to {}".format(self.listen_to, self.attach_to))
         self._running = True
 
-    def publish(self, topic: str, data: bytes) -> None:
+    def _create_socket(self) -> Bus0:
+        return Bus0()
+
+    def publish(self, topic: str, data: Union[bytes, List[Frame]]) -> None:
         if self._running:
-            topic += "::"
-            data = topic.encode() + data
-            self._sock.send(data)
+            chunks = self._encode(data)
+            with self._send_lock:
+                self._sock.send_msg(self._build_msg([self._prefix(topic)] + chunks))
+
+    def _prefix(self, topic: str) -> bytes:
+        """
+        Overview:
+            Build the topic and relay header of a new message, the caller should hold ``_send_lock`` until the \
+            message is sent, otherwise the messages may leave out of the order of their sequence numbers.
+        """
+        prefix = (topic + "::").encode()
+        if self._relay:
+            prefix += _RELAY.pack(self._origin, next(self._seq))
+        return prefix
+
+    def _should_relay(self, header: memoryview) -> bool:
+        """
+        Overview:
+            Check whether the message is new, the messages sent by self and the duplicated messages (i.e. the \
+            peers forward the messages back, since the bus sends messages to all the peers) are skipped. \
+            The messages of an origin are assumed to arrive in order, see ``relay`` in ``__init__``.
+        """
+        origin, seq = _RELAY.unpack_from(header)
+        if origin == self._origin or seq <= self._relay_seq.get(origin, -1):
+            return False
+        self._relay_seq[origin] = seq
+        return True
+
+    def _forward(self, header: memoryview, body: memoryview) -> None:
+        """
+        Overview:
+            Forward the received message to the peers.
+        Arguments:
+            - header (:obj:`memoryview`): The topic and the relay header of the message.
+            - body (:obj:`memoryview`): The kind byte and the payload.
+        """
+        self._sock.send_msg(self._build_msg([header, body]))
+
+    @staticmethod
+    def _encode(data: Union[bytes, List[Frame]]) -> List[Frame]:
+        # The kind byte before payload tells whether the payload is bytes or multiple frames.
+        if isinstance(data, (bytes, bytearray)):
+            return [b"\x00", data]
+        else:
+            return [b"\x01"] + pack_frames(data)
+
+    def _decode(self, kind: int, payload: memoryview, msg: Message) -> Optional[Union[bytes, List[memoryview]]]:
+        """
+        Overview:
+            Decode the payload of the kind, returns None if the message should be skipped.
+        """
+        if kind == 0:
+            return bytes(payload)
+        elif kind == 1:
+            return unpack_frames(payload)
+        logging.warning("Got message of unknown kind {} on node {}".format(kind, self.listen_to))
+
+    @staticmethod
+    def _build_msg(chunks: List[Frame]) -> Message:
+        """
+        Overview:
+            Copy the chunks into one nng message directly, rather than concatenating them into python bytes \
+            before nng copies the bytes again.
+        """
+        msg = Message(b"")
+        check_err(lib.nng_msg_reserve(msg._nng_msg, sum([memoryview(c).nbytes for c in chunks])))
+        for chunk in chunks:
+            buf = ffi.from_buffer(chunk)
+            check_err(lib.nng_msg_append(msg._nng_msg, buf, len(buf)))
+        return msg
 
     def subscribe(self, topic: str) -> None:
         return
@@ -45,16 +140,27 @@ class NNGMQ(MQ):
     def unsubscribe(self, topic: str) -> None:
         return
 
-    def recv(self) -> Tuple[str, bytes]:
+    def recv(self) -> Tuple[str, Union[bytes, List[memoryview]]]:
         while True:
             try:
                 if not self._running:
                     break
-                msg = self._sock.recv()
+                msg = self._sock.recv_msg()
+                # Copy the message body once into a writable buffer, the frames are the views of it.
+                data = memoryview(bytearray(msg._buffer))
                 # Use topic at the beginning of the message, so we don't need to call pickle.loads
                 # when the current process is not subscribed to the topic.
-                topic, payload = msg.split(b"::", maxsplit=1)
-                return topic.decode(), payload
+                sep = data.obj.index(b"::")
+                offset = sep + 2
+                if self._relay:
+                    if not self._should_relay(data[offset:offset + _RELAY.size]):
+                        continue
+                    offset += _RELAY.size
+                    # Forward before handling the message, so that each level of relay only adds one hop of latency
+                    self._forward(data[:offset], data[offset:])
+                payload = self._decode(data[offset], data[offset + 1:], msg)
+                if payload is not None:
+                    return bytes(data[:sep]).decode(), payload
             except pynng.Timeout:
                 logging.warning("Timeout on node {} when waiting for message from bus".format(self.listen_to))
             except pynng.Closed:
@@ -1,10 +1,11 @@
 import uuid
 from ditk import logging
 from time import sleep
-from typing import Tuple
+from typing import List, Tuple, Union
 
 import redis
 from ding.framework.message_queue.mq import MQ
+from ding.framework.message_queue.serializer import Frame, pack_frames, unpack_frames
 from ding.utils import MQ_REGISTRY
 
 
@@ -30,8 +31,12 @@ class RedisMQ(MQ):
         self._sub = client.pubsub()
         self._running = True
 
-    def publish(self, topic: str, data: bytes) -> None:
-        data = self._id + b"::" + data
+    def publish(self, topic: str, data: Union[bytes, List[Frame]]) -> None:
+        # The kind byte after node id tells whether the payload is bytes or multiple frames.
+        if isinstance(data, (bytes, bytearray)):
+            data = self._id + b"::\x00" + data
+        else:
+            data = b"".join([self._id + b"::\x01"] + pack_frames(data))
         self._client.publish(topic, data)
 
     def subscribe(self, topic: str) -> None:
@@ -40,7 +45,7 @@ class RedisMQ(MQ):
     def unsubscribe(self, topic: str) -> None:
         self._sub.unsubscribe(topic)
 
-    def recv(self) -> Tuple[str, bytes]:
+    def recv(self) -> Tuple[str, Union[bytes, List[memoryview]]]:
         while True:
             if not self._running:
                 raise RuntimeError("Redis MQ was not running!")
@@ -50,14 +55,16 @@ class RedisMQ(MQ):
                     sleep(0.001)
                     continue
                 topic = msg["channel"].decode()
-                data = msg["data"].split(b"::", maxsplit=1)
-                if len(data) != 2 or len(data[0]) != 32:
+                data = msg["data"]
+                if len(data) < 35 or data[32:34] != b"::":
                     logging.warn("Got invalid message from topic: {}".format(topic))
                     continue
-                node_id, data = data
-                if node_id == self._id:  # Discard message sent by self
+                if data[:32] == self._id:  # Discard message sent by self
                     continue
-                return topic, data
+                if data[34] == 0:
+                    return topic, data[35:]
+                # Copy the payload once into a writable buffer, the frames are the views of it.
+                return topic, unpack_frames(bytearray(memoryview(data)[35:]))
             except (OSError, AttributeError, Exception) as e:
                 logging.error("Meet exception when listening for new messages", e)
 
@@ -0,0 +1,127 @@
+import copyreg
+import pickle
+import struct
+from collections import ChainMap
+from io import BytesIO
+from typing import Any, List, Sequence, Union
+
+import numpy as np
+import torch
+
+Frame = Union[bytes, bytearray, memoryview]
+
+# The buffers smaller than this size are kept in the pickle stream, since the frame header costs more than the copy.
+MIN_OUT_OF_BAND_SIZE = 1024
+# Out-of-band buffers require pickle protocol 5 (python >= 3.8), otherwise all the data is in the pickle stream.
+OUT_OF_BAND = pickle.HIGHEST_PROTOCOL >= 5
+
+_HEADER = struct.Struct("<I")
+_FRAME_SIZE = struct.Struct("<Q")
+
+
+def _rebuild_tensor(array: np.ndarray, requires_grad: bool) -> torch.Tensor:
+    if not array.flags.writeable:
+        # The out-of-band buffers are read-only when the frames are bytes, copy them to avoid undefined behavior.
+        array = array.copy()
+    tensor = torch.from_numpy(array)
+    if requires_grad:
+        tensor.requires_grad_()
+    return tensor
+
+
+def _reduce_tensor(tensor: torch.Tensor) -> tuple:
+    # Only the dense cpu tensors can be viewed as numpy arrays, whose data will be pickled out-of-band.
+    if tensor.device.type == "cpu" and tensor.layout == torch.strided:
+        try:
+            return _rebuild_tensor, (tensor.detach().numpy(), tensor.requires_grad)
+        except (TypeError, RuntimeError):
+            # E.g. bfloat16, quantized and conjugate tensors
+            pass
+    return tensor.__reduce_ex__(pickle.HIGHEST_PROTOCOL)
+
+
+class _Pickler(pickle.Pickler):
+    # Only the exact type is looked up in dispatch table, so the subclasses like ``nn.Parameter`` keep their reduce.
+    dispatch_table = ChainMap({torch.Tensor: _reduce_tensor}, copyreg.dispatch_table)
+
+
+def serialize(obj: Any) -> List[Frame]:
+    """
+    Overview:
+        Serialize the object into frames with pickle protocol 5, the large contiguous buffers (e.g. numpy arrays \
+        and cpu tensors) are not copied into the pickle stream but returned as out-of-band frames, which refer to \
+        the memory of the original objects.
+    Arguments:
+        - obj (:obj:`Any`): The object to be serialized.
+    Returns:
+        - frames (:obj:`List[Frame]`): The pickle stream followed by the out-of-band buffers. The buffers are \
+            views of the original objects, so the objects should not be modified until the frames are sent.
+    """
+    if not OUT_OF_BAND:
+        return [pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)]
+    buffers = []
+
+    def buffer_callback(buf: 'pickle.PickleBuffer') -> bool:
+        raw = buf.raw()
+        if raw.nbytes < MIN_OUT_OF_BAND_SIZE:
+            return True  # Serialize in-band
+        buffers.append(raw)
+        return False
+
+    f = BytesIO()
+    _Pickler(f, protocol=5, buffer_callback=buffer_callback).dump(obj)
+    return [f.getbuffer()] + buffers
+
+
+def deserialize(frames: Sequence[Frame]) -> Any:
+    """
+    Overview:
+        Deserialize the object from frames generated by ``serialize``. The numpy arrays and tensors share the memory \
+        of the frames, and they are writable only if the frames are writable.
+    Arguments:
+        - frames (:obj:`Sequence[Frame]`): The pickle stream followed by the out-of-band buffers.
+    Returns:
+        - obj (:obj:`Any`): The deserialized object.
+    """
+    if len(frames) == 1:
+        return pickle.loads(frames[0])
+    return pickle.loads(frames[0], buffers=frames[1:])
+
+
+def pack_frames(frames: Sequence[Frame]) -> List[Frame]:
+    """
+    Overview:
+        Prepend the header of frame sizes, so that the frames can be sent as one message by concatenating them \
+        and recovered by ``unpack_frames``.
+    Arguments:
+        - frames (:obj:`Sequence[Frame]`): The frames.
+    Returns:
+        - chunks (:obj:`List[Frame]`): The header and the frames, which should be concatenated by the sender.
+    """
+    header = bytearray(_HEADER.pack(len(frames)))
+    for frame in frames:
+        header += _FRAME_SIZE.pack(memoryview(frame).nbytes)
+    return [header] + list(frames)
+
+
+def unpack_frames(data: Frame) -> List[memoryview]:
+    """
+    Overview:
+        Split the concatenated chunks of ``pack_frames`` into frames without copying.
+    Arguments:
+        - data (:obj:`Frame`): The concatenated data.
+    Returns:
+        - frames (:obj:`List[memoryview]`): The views of frames in data.
+    """
+    data = memoryview(data).cast("B")
+    n, = _HEADER.unpack_from(data)
+    offset = _HEADER.size
+    sizes = [_FRAME_SIZE.unpack_from(data, offset + i * _FRAME_SIZE.size)[0] for i in range(n)]
+    offset += n * _FRAME_SIZE.size
+    frames = []
+    for size in sizes:
+        frames.append(data[offset:offset + size])
+        offset += size
+    if offset != len(data):
+        raise ValueError("Invalid frames, expect {} bytes, got {} bytes".format(offset, len(data)))
+    return frames
@@ -0,0 +1,269 @@
+import os
+import struct
+import sys
+from ditk import logging
+from threading import Lock
+from typing import Dict, List, Optional, Set, Tuple, Union
+from pynng import Bus0, Message, Pipe
+
+from ding.framework.message_queue.nng import NNGMQ
+from ding.framework.message_queue.serializer import Frame
+from ding.utils import MQ_REGISTRY
+
+try:
+    from multiprocessing import resource_tracker, shared_memory
+except ImportError:
+    # Python 3.7
+    resource_tracker, shared_memory = None, None
+
+_CURSOR = struct.Struct("<Q")
+_NOTIFY = struct.Struct("<QQ")
+# The reserved bytes at the beginning of shared memory for the cursor
+_HEADER_SIZE = 64
+# The kinds of message, in addition to the bytes (0) and frames (1) kinds of nng message
+_KIND_NOTIFY = 2
+_KIND_HELLO = 3
+
+
+def _attach_shm(name: str) -> 'shared_memory.SharedMemory':
+    # The attached shared memory should not be registered in resource tracker, otherwise it may be unlinked when
+    # the process exits, see https://bugs.python.org/issue39959
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+class ShmRing:
+    """
+    Overview:
+        The ring buffer on shared memory with a single writer and multiple readers. The writer never waits for \
+        the readers, instead the readers check whether the data has been overwritten after reading it.
+    Interfaces:
+        ``__init__``, ``write``, ``read``, ``close``
+    Property:
+        ``name``, ``capacity``
+    """
+
+    def __init__(self, name: Optional[str] = None, size: int = 0) -> None:
+        """
+        Overview:
+            Create a new ring buffer if name is None, otherwise attach to the existing ring buffer.
+        Arguments:
+            - name (:obj:`Optional[str]`): The name of the shared memory to attach to.
+            - size (:obj:`int`): The size of the data area of the new ring buffer.
+        """
+        self._owner = name is None
+        if self._owner:
+            self._shm = shared_memory.SharedMemory(create=True, size=size + _HEADER_SIZE)
+        else:
+            self._shm = _attach_shm(name)
+        self._buf = self._shm.buf
+        self._capacity = self._shm.size - _HEADER_SIZE
+        self._cursor = 0
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    def write(self, chunks: List[Frame]) -> Optional[Tuple[int, int]]:
+        """
+        Overview:
+            Write the concatenated chunks into ring buffer, the data is always contiguous in the ring buffer.
+        Arguments:
+            - chunks (:obj:`List[Frame]`): The chunks to write.
+        Returns:
+            - position (:obj:`Optional[Tuple[int, int]]`): The monotonic position and the size of the data, \
+                None if the data is larger than the capacity.
+        """
+        chunks = [memoryview(c).cast("B") for c in chunks]
+        size = sum([c.nbytes for c in chunks])
+        if size > self._capacity:
+            return None
+        pos = self._cursor
+        offset = pos % self._capacity
+        if offset + size > self._capacity:
+            # Skip the tail of the ring buffer
+            pos += self._capacity - offset
+            offset = 0
+        # Reserve the area before writing, so that the readers of the overwritten data can detect it.
+        _CURSOR.pack_into(self._buf, 0, pos + size)
+        offset += _HEADER_SIZE
+        for c in chunks:
+            self._buf[offset:offset + c.nbytes] = c
+            offset += c.nbytes
+        self._cursor = pos + size
+        return pos, size
+
+    def read(self, pos: int, size: int) -> Optional[bytearray]:
+        """
+        Overview:
+            Copy the data out of ring buffer.
+        Arguments:
+            - pos (:obj:`int`): The position returned by ``write``.
+            - size (:obj:`int`): The size returned by ``write``.
+        Returns:
+            - data (:obj:`Optional[bytearray]`): The copied data, None if it has been overwritten by the writer.
+        """
+        offset = pos % self._capacity + _HEADER_SIZE
+        data = bytearray(self._buf[offset:offset + size])
+        reserved, = _CURSOR.unpack_from(self._buf, 0)
+        if reserved > pos + self._capacity:
+            return None
+        return data
+
+    def close(self) -> None:
+        self._buf = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+
+def _shm_free_size() -> int:
+    try:
+        stat = os.statvfs("/dev/shm")
+        return stat.f_bavail * stat.f_frsize
+    except OSError:
+        return 0
+
+
+@MQ_REGISTRY.register("shm")
+class ShmMQ(NNGMQ):
+    """
+    Overview:
+        The message queue for the nodes on the same host. The payload is written into the shared memory ring \
+        buffer of the publisher once, and only a notification of its position is sent to the subscribers via nng, \
+        so each subscriber gets the payload by one memcpy. The publisher falls back to send the whole payload via \
+        nng when any connected peer is not on the same host, or the payload is larger than the ring buffer.
+
+    .. note::
+        The nodes exchange the names of their ring buffers when they connect, and a peer is on the same host if \
+        its ring buffer can be attached. If a slow subscriber reads a payload after the publisher has written \
+        more than ``shm_size`` bytes since then, the payload is dropped with a warning, like the full queues of nng.
+    """
+
+    def __init__(
+            self, listen_to: str, attach_to: Optional[List[str]] = None, shm_size: int = 1 << 27, **kwargs
+    ) -> None:
+        """
+        Overview:
+            Connect distributed processes with shared memory and nng
+        Arguments:
+            - listen_to (:obj:`Optional[List[str]]`): The node address to attach to.
+            - attach_to (:obj:`Optional[List[str]]`): The node's addresses you want to attach to.
+            - shm_size (:obj:`int`): The size of the ring buffer of this node, which is limited to half of the \
+                free space of ``/dev/shm``.
+        """
+        super().__init__(listen_to, attach_to, **kwargs)
+        self._shm_size = int(shm_size)
+        self._ring: Optional[ShmRing] = None
+        self._write_lock = Lock()
+        self._peer_rings: Dict[str, ShmRing] = {}
+        self._local_pipes: Set[int] = set()
+
+    def _create_socket(self) -> Bus0:
+        sock = super()._create_socket()
+        if shared_memory is None:
+            logging.warning("Shared memory requires python >= 3.8, ShmMQ falls back to nng.")
+            return sock
+        size = min(self._shm_size, _shm_free_size() // 2)
+        if size <= 0:
+            logging.warning("No free space in /dev/shm, ShmMQ falls back to nng.")
+            return sock
+        self._ring = ShmRing(size=size)
+        sock.add_post_pipe_connect_cb(self._on_connect)
+        sock.add_post_pipe_remove_cb(self._on_remove)
+        return sock
+
+    def _on_connect(self, pipe: Pipe) -> None:
+        # The message is sent to all the peers on bus, which is harmless for the connected peers.
+        with self._send_lock:
+            hello = self._prefix("") + bytes([_KIND_HELLO]) + self._ring.name.encode()
+            pipe.send(hello)
+
+    def _on_remove(self, pipe: Pipe) -> None:
+        self._local_pipes.discard(pipe.id)
+
+    def _attach(self, name: str) -> Optional[ShmRing]:
+        ring = self._peer_rings.get(name)
+        if ring is None:
+            try:
+                ring = self._peer_rings[name] = ShmRing(name=name)
+            except (FileNotFoundError, OSError):
+                return None
+        return ring
+
+    def publish(self, topic: str, data: Union[bytes, List[Frame]]) -> None:
+        if not self._running:
+            return
+        if self._all_local():
+            chunks = self._encode(data)
+            with self._write_lock:
+                position = self._ring.write(chunks)
+            if position is not None:
+                with self._send_lock:
+                    notify = self._prefix(topic) + bytes([_KIND_NOTIFY]) + _NOTIFY.pack(*position)
+                    self._sock.send(notify + self._ring.name.encode())
+                return
+        super().publish(topic, data)
+
+    def _all_local(self) -> bool:
+        pipes = self._sock.pipes
+        return self._ring is not None and len(pipes) > 0 and all([p.id in self._local_pipes for p in pipes])
+
+    def _read_notify(self, payload: memoryview) -> Optional[bytearray]:
+        """
+        Overview:
+            Read the kind and payload of message in the ring buffer of the notification.
+        """
+        pos, size = _NOTIFY.unpack_from(payload)
+        ring = self._attach(bytes(payload[_NOTIFY.size:]).decode())
+        data = None if ring is None else ring.read(pos, size)
+        if data is None:
+            logging.warning("Drop the message which is overwritten or missing in shared memory.")
+        return data
+
+    def _forward(self, header: memoryview, body: memoryview) -> None:
+        kind = body[0]
+        if kind == _KIND_HELLO:
+            # The ring buffer is only attached by the directly connected peers
+            return
+        elif kind == _KIND_NOTIFY and not self._all_local():
+            # The remote peers can not read the ring buffer, forward the whole message instead
+            payload = self._read_notify(body[1:])
+            if payload is not None:
+                super()._forward(header, memoryview(payload))
+            return
+        super()._forward(header, body)
+
+    def _decode(self, kind: int, payload: memoryview, msg: Message) -> Optional[Union[bytes, List[memoryview]]]:
+        if kind == _KIND_HELLO:
+            if self._attach(bytes(payload).decode()) is not None and msg.pipe is not None:
+                self._local_pipes.add(msg.pipe.id)
+            return None
+        elif kind == _KIND_NOTIFY:
+            data = self._read_notify(payload)
+            if data is None:
+                return None
+            data = memoryview(data)
+            return super()._decode(data[0], data[1:], msg)
+        return super()._decode(kind, payload, msg)
+
+    def stop(self) -> None:
+        running = self._running
+        super().stop()
+        if running:
+            for ring in self._peer_rings.values():
+                ring.close()
+            self._peer_rings.clear()
+            if self._ring is not None:
+                self._ring.close()
+                self._ring = None
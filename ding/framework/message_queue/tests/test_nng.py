@@ -1,5 +1,6 @@
 from time import sleep
 import pytest
+from threading import Thread
 
 import multiprocessing as mp
 from ding.framework.message_queue.nng import NNGMQ
@@ -13,6 +14,7 @@ def nng_main(i):
         mq.listen()
         for _ in range(10):
             mq.publish("t", b"data")
+            mq.publish("frames", [b"a", memoryview(b"bc")])
             sleep(0.1)
     else:
         listen_to = "tcp://127.0.0.1:50516"
@@ -22,6 +24,9 @@ def nng_main(i):
         topic, msg = mq.recv()
         assert topic == "t"
         assert msg == b"data"
+        topic, msg = mq.recv()
+        assert topic == "frames"
+        assert [bytes(f) for f in msg] == [b"a", b"bc"]
 
 
 @pytest.mark.unittest
@@ -30,3 +35,78 @@ def test_nng():
     ctx = mp.get_context("spawn")
     with ctx.Pool(processes=2) as pool:
         pool.map(nng_main, range(2))
+
+
+def nng_relay_main(i):
+    # A chain of 0 <- 1 <- 2, the messages are relayed by node 1
+    listen_to = "tcp://127.0.0.1:5052{}".format(i)
+    attach_to = ["tcp://127.0.0.1:5052{}".format(i - 1)] if i > 0 else None
+    mq = NNGMQ(listen_to=listen_to, attach_to=attach_to, relay=True)
+    mq.listen()
+    sleep(0.5)
+    if i == 0:
+        mq.publish("down", b"data")
+        # Own message is not relayed back
+        topic, msg = mq.recv()
+        assert topic == "up" and [bytes(f) for f in msg] == [b"data2"]
+    elif i == 1:
+        assert mq.recv() == ("down", b"data")
+        topic, msg = mq.recv()
+        assert topic == "up" and [bytes(f) for f in msg] == [b"data2"]
+    else:
+        assert mq.recv() == ("down", b"data")
+        mq.publish("up", [b"data2"])
+        received = []
+        Thread(target=lambda: received.append(mq.recv()), daemon=True).start()
+        sleep(0.5)
+        assert received == []
+    sleep(0.5)
+    mq.stop()
+
+
+@pytest.mark.unittest
+@pytest.mark.execution_timeout(10)
+def test_nng_relay():
+    ctx = mp.get_context("spawn")
+    with ctx.Pool(processes=3) as pool:
+        pool.map(nng_relay_main, range(3))
+
+
+def nng_relay_threads_main(i):
+    # A chain of 0 <- 1 <- 2, node 0 publishes from several threads at once
+    listen_to = "tcp://127.0.0.1:5053{}".format(i)
+    attach_to = ["tcp://127.0.0.1:5053{}".format(i - 1)] if i > 0 else None
+    mq = NNGMQ(listen_to=listen_to, attach_to=attach_to, relay=True)
+    mq.listen()
+    sleep(0.5)
+    n_threads, n_msgs = 4, 25
+    if i == 0:
+
+        def publish(t):
+            for j in range(n_msgs):
+                mq.publish("t", "{}-{}".format(t, j).encode())
+                sleep(0.002)
+
+        threads = [Thread(target=publish, args=(t, )) for t in range(n_threads)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    else:
+        received = set()
+        for _ in range(n_threads * n_msgs):
+            topic, msg = mq.recv()
+            assert topic == "t"
+            received.add(msg)
+        # No message is dropped as an out-of-order duplicate by the relay node
+        assert received == {"{}-{}".format(t, j).encode() for t in range(n_threads) for j in range(n_msgs)}
+    sleep(0.5)
+    mq.stop()
+
+
+@pytest.mark.unittest
+@pytest.mark.execution_timeout(10)
+def test_nng_relay_threads():
+    ctx = mp.get_context("spawn")
+    with ctx.Pool(processes=3) as pool:
+        pool.map(nng_relay_threads_main, range(3))
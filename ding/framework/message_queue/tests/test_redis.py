@@ -25,7 +25,7 @@ def redis_main(i):
     class MockPubSub(Mock):
 
         def get_message(self, **kwargs):
-            return {"channel": b"t", "data": node_id0 + b"::data"}
+            return {"channel": b"t", "data": node_id0 + b"::\x00data"}
 
     with patch("redis.Redis", MockRedis):
         host = "127.0.0.1"
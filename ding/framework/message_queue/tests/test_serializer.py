@@ -0,0 +1,118 @@
+import pickle
+import time
+import pytest
+import numpy as np
+import torch
+import multiprocessing as mp
+
+from ding.framework.message_queue.serializer import serialize, deserialize, pack_frames, unpack_frames, \
+    OUT_OF_BAND
+from ding.framework.message_queue.nng import NNGMQ
+from ding.framework.message_queue.shm import ShmMQ
+
+
+@pytest.mark.unittest
+@pytest.mark.skipif(not OUT_OF_BAND, reason="out-of-band buffers require python >= 3.8")
+def test_serialize():
+    array = np.random.rand(64, 64).astype(np.float32)
+    tensor = torch.randn(32, 32)
+    grad_tensor = torch.randn(32, 32, requires_grad=True)
+    param = torch.nn.Parameter(torch.randn(32, 32))
+    bf16 = torch.randn(32, 32).to(torch.bfloat16)
+    data = {
+        "array": array,
+        "tensor": tensor,
+        "grad_tensor": grad_tensor,
+        "param": param,
+        "bf16": bf16,
+        "small": np.zeros(4),
+        "view": tensor[:, 1:],
+        "other": ["a", 1, None],
+    }
+    frames = serialize(data)
+    # The contiguous buffers larger than the threshold are out-of-band and share the memory, including the data of
+    # ``grad_tensor`` and ``param``
+    assert len(frames) == 5
+    assert np.shares_memory(np.frombuffer(frames[1], dtype=np.float32), array)
+    assert np.shares_memory(np.frombuffer(frames[2], dtype=np.float32), tensor.numpy())
+
+    # Writable frames are received by mq
+    frames = unpack_frames(bytearray(b"".join(pack_frames(frames))))
+    result = deserialize(frames)
+    assert np.array_equal(result["array"], array) and result["array"].flags.writeable
+    for k in ["tensor", "grad_tensor", "param", "bf16", "view"]:
+        assert isinstance(result[k], torch.nn.Parameter) == isinstance(data[k], torch.nn.Parameter)
+        assert torch.equal(result[k], data[k])
+        assert result[k].dtype == data[k].dtype and result[k].requires_grad == data[k].requires_grad
+    assert result["other"] == ["a", 1, None] and result["small"].shape == (4, )
+    # The received tensor is a view of the frame
+    result["tensor"] += 1
+    assert torch.equal(torch.from_numpy(np.frombuffer(frames[2], dtype=np.float32)).view(32, 32), result["tensor"])
+
+    # Read-only frames
+    result = deserialize([bytes(f) for f in serialize(data)])
+    assert torch.equal(result["tensor"], tensor) and torch.equal(result["view"], tensor[:, 1:])
+
+
+@pytest.mark.unittest
+def test_pack_frames():
+    frames = [b"abc", bytearray(b""), memoryview(np.arange(4, dtype=np.int64))]
+    data = b"".join(pack_frames(frames))
+    result = unpack_frames(data)
+    assert [bytes(f) for f in result] == [b"abc", b"", np.arange(4, dtype=np.int64).tobytes()]
+    with pytest.raises(ValueError):
+        unpack_frames(data + b"x")
+
+
+def emit_main(i, codec, mq_type, sizes, repeat, queue):
+    mq_cls = ShmMQ if mq_type == "shm" else NNGMQ
+    if i == 0:
+        mq = mq_cls(listen_to="tcp://127.0.0.1:50517")
+        mq.listen()
+        for _ in sizes:
+            for _ in range(repeat):
+                _, msg = mq.recv()
+                payload = pickle.loads(msg) if codec == "pickle" else deserialize(msg)
+            queue.put(time.time())
+    else:
+        mq = mq_cls(listen_to="tcp://127.0.0.1:50518", attach_to=["tcp://127.0.0.1:50517"], shm_size=1 << 30)
+        mq.listen()
+        time.sleep(0.5)
+        for size in sizes:
+            payload = {"a": (np.random.rand(size // 8), ), "k": {}}
+            queue.put(time.time())
+            for _ in range(repeat):
+                if codec == "pickle":
+                    mq.publish("t", pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL))
+                else:
+                    mq.publish("t", serialize(payload))
+            # Wait for the receiver, so that the messages of different sizes are not mixed
+            time.sleep(0.5 + size * repeat / 1e9)
+    mq.stop()
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize('codec,mq_type', [("pickle", "nng"), ("serialize", "nng"), ("serialize", "shm")])
+def test_emit_benchmark(codec, mq_type):
+    """
+    The throughput of emit payloads via mq, from serialization in the sender to deserialization in the receiver.
+    """
+    sizes = [1 << 10, 1 << 20, 100 << 20]
+    repeat = 10
+    ctx = mp.get_context("spawn")
+    recv_queue, send_queue = ctx.Queue(), ctx.Queue()
+    receiver = ctx.Process(target=emit_main, args=(0, codec, mq_type, sizes, repeat, recv_queue))
+    sender = ctx.Process(target=emit_main, args=(1, codec, mq_type, sizes, repeat, send_queue))
+    receiver.start()
+    sender.start()
+    for size in sizes:
+        start, end = send_queue.get(), recv_queue.get()
+        # The last message has been deserialized, though the sender may still sleep
+        duration = end - start
+        print(
+            "{} {}: size {}KB, {:.1f} msg/s, {:.1f} MB/s".format(
+                codec, mq_type, size >> 10, repeat / duration, size * repeat / duration / (1 << 20)
+            )
+        )
+    receiver.join()
+    sender.join()
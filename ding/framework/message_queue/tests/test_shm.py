@@ -0,0 +1,67 @@
+from time import sleep
+from threading import Thread
+import pytest
+import numpy as np
+
+import multiprocessing as mp
+from ding.framework.message_queue.shm import ShmRing, ShmMQ
+from ding.framework.message_queue.serializer import serialize, deserialize
+
+
+@pytest.mark.unittest
+def test_shm_ring():
+    ring = ShmRing(size=100)
+    reader = ShmRing(name=ring.name)
+    assert reader.capacity == ring.capacity == 100
+    assert ring.write([b"abc", memoryview(b"de")]) == (0, 5)
+    assert reader.read(0, 5) == bytearray(b"abcde")
+    # Skip the tail when the data can not be contiguous
+    assert ring.write([b"x" * 80]) == (5, 80)
+    assert ring.write([b"y" * 30]) == (100, 30)
+    assert reader.read(100, 30) == bytearray(b"y" * 30)
+    # The data of position 5 is overwritten
+    assert reader.read(5, 80) is None
+    assert ring.write([b"z" * 101]) is None
+    reader.close()
+    ring.close()
+
+
+def shm_main(i):
+    if i == 0:
+        mq = ShmMQ(listen_to="ipc:///tmp/ding_test_shm_0.ipc", shm_size=1 << 20)
+        mq.listen()
+        # The peers are found by the messages received in listener thread
+        Thread(target=mq.recv, daemon=True).start()
+        for _ in range(20):
+            if len(mq._local_pipes) > 0:
+                break
+            sleep(0.1)
+        assert len(mq._local_pipes) == 1
+        sleep(0.2)
+        mq.publish("t", b"data")
+        mq.publish("frames", serialize({"array": np.arange(1000)}))
+        # Larger than the ring buffer
+        mq.publish("large", serialize({"array": np.zeros(1 << 18)}))
+        sleep(1)
+    else:
+        mq = ShmMQ(listen_to="ipc:///tmp/ding_test_shm_1.ipc", attach_to=["ipc:///tmp/ding_test_shm_0.ipc"])
+        mq.listen()
+        topic, msg = mq.recv()
+        assert topic == "t"
+        assert msg == b"data"
+        topic, msg = mq.recv()
+        assert topic == "frames"
+        array = deserialize(msg)["array"]
+        assert np.array_equal(array, np.arange(1000)) and array.flags.writeable
+        topic, msg = mq.recv()
+        assert topic == "large"
+        assert deserialize(msg)["array"].shape == (1 << 18, )
+    mq.stop()
+
+
+@pytest.mark.unittest
+@pytest.mark.execution_timeout(10)
+def test_shm_mq():
+    ctx = mp.get_context("spawn")
+    with ctx.Pool(processes=2) as pool:
+        pool.map(shm_main, range(2))
@@ -23,7 +23,14 @@ class StepCollector:
             return task.void()
         return super(StepCollector, cls).__new__(cls)
 
-    def __init__(self, cfg: EasyDict, policy, env: BaseEnvManager, random_collect_size: int = 0) -> None:
+    def __init__(
+            self,
+            cfg: EasyDict,
+            policy,
+            env: BaseEnvManager,
+            random_collect_size: int = 0,
+            flush_env_step: bool = False
+    ) -> None:
         """
         Arguments:
             - cfg (:obj:`EasyDict`): Config.
@@ -32,11 +39,17 @@ class StepCollector:
                 its derivatives are supported.
             - random_collect_size (:obj:`int`): The count of samples that will be collected randomly, \
                 typically used in initial runs.
+            - flush_env_step (:obj:`bool`): Whether to receive the in-flight env steps (e.g. the steps of the \
+                other env groups with ``env_group_num`` > 1, or the late envs of async env manager) at the end of \
+                each collection, so that all the actions inferred by the current policy are collected in this \
+                iteration, which is recommended for on-policy algorithms. Otherwise the in-flight steps keep \
+                running across the collections and are returned in the next one.
         """
         self.cfg = cfg
         self.env = env
         self.policy = policy
         self.random_collect_size = random_collect_size
+        self.flush_env_step = flush_env_step
         self._transitions = TransitionList(self.env.env_num)
         self._inferencer = task.wrap(inferencer(cfg.seed, policy, env))
         self._rolloutor = task.wrap(rolloutor(policy, env, self._transitions))
@@ -63,10 +76,21 @@ class StepCollector:
             current_inferencer(ctx)
             self._rolloutor(ctx)
             if ctx.env_step - old >= target_size:
+                if self.flush_env_step:
+                    self._flush(ctx)
                 ctx.trajectories, ctx.trajectory_end_idx = self._transitions.to_trajectories()
                 self._transitions.clear()
                 break
 
+    def _flush(self, ctx: "OnlineRLContext") -> None:
+        """
+        Overview:
+            Step the env with empty actions to receive the timesteps of all the in-flight env steps.
+        """
+        ctx.obs, ctx.action, ctx.inference_output = [], [], {}
+        while len(getattr(self.env, 'stepping_env', [])) > 0:
+            self._rolloutor(ctx)
+
 
 class PPOFStepCollector:
     """
@@ -1,10 +1,12 @@
 import numpy as np
+from collections import deque
 from time import sleep, time
 from dataclasses import fields
-from typing import TYPE_CHECKING, List, Dict, Any, Optional, Union
+from threading import Lock
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Tuple, Union
 from ditk import logging
 from ding.framework import task
-from ding.data import StorageLoader, Storage, ModelLoader
+from ding.data import StorageLoader, Storage, ModelLoader, ModelEncoder, ModelDecoder
 if TYPE_CHECKING:
     from ding.framework.context import Context
     from torch.nn import Module
@@ -12,7 +14,13 @@ if TYPE_CHECKING:
 
 class ContextExchanger:
 
-    def __init__(self, skip_n_iter: int = 1, storage_loader: Optional[StorageLoader] = None) -> None:
+    def __init__(
+            self,
+            skip_n_iter: int = 1,
+            storage_loader: Optional[StorageLoader] = None,
+            max_in_flight: Optional[int] = None,
+            overflow_policy: str = "block"
+    ) -> None:
         """
         Overview:
             Exchange context between processes,
@@ -23,20 +31,51 @@ class ContextExchanger:
                 will not work on learner.
             - storage_loader (:obj:`Optional[StorageLoader]`): Turn data into storage class to reduce \
                 the network overhead.
+            - max_in_flight (:obj:`Optional[int]`): Enable the credit based flow control of collectors if not None. \
+                Each collector sends at most ``max_in_flight`` batches which are not consumed by learner yet, \
+                instead of waiting for the new context of learner in each iteration, so the queue of learner \
+                and the memory are bounded whatever the speed of nodes is.
+            - overflow_policy (:obj:`str`): What the collector does when it runs out of credits, \
+                ``block`` waits for the learner to consume the sent batches, \
+                ``drop_oldest`` keeps collecting and drops the oldest unsent batch when more than \
+                ``max_in_flight`` batches are waiting to be sent.
         """
         if not task.router.is_active:
             raise RuntimeError("ContextHandler should be used in parallel mode!")
+        assert max_in_flight is None or max_in_flight > 0, "max_in_flight should be positive"
+        assert overflow_policy in ("block", "drop_oldest"), "Unknown overflow policy: {}".format(overflow_policy)
         self._state = {}
         self._local_state = {}  # just save local state, not send to remote node
         if task.has_role(task.role.COLLECTOR):
             self._local_state['env_step'] = 0
             self._local_state['env_episode'] = 0
         self._event_name = "context_exchanger_{role}"
+        self._ack_event_name = "context_exchanger_ack"
+        self._ack_request_event_name = "context_exchanger_ack_request"
         self._skip_n_iter = skip_n_iter
         self._storage_loader = storage_loader
+        self._lock = Lock()
+        # Flow control, the batches of collector are numbered by sequence, and learner acknowledges the sequence
+        # of the latest consumed batch of each collector. The cumulative ack tolerates the lost messages, and a
+        # collector out of credits asks learner to send the latest ack again in case the last one is lost.
+        self._max_in_flight = max_in_flight
+        self._overflow_policy = overflow_policy
+        self._pending = deque()  # The batches of collector waiting for credits
+        self._sent_seq = 0
+        self._acked_seq = 0
+        self._recv_seq = {}  # The latest received sequence of each collector on learner
+        self._acked_recv_seq = {}
+        self._ack_request_interval = 1.
+        self._last_credit_change = time()  # The time of the latest send, ack or ack request
+        self._queue_depth = 0
+        self._stats = {"sent": 0, "dropped": 0, "blocked_time": 0., "received": 0, "last_merged": 0}
         for role in task.role:  # Only subscribe to other roles
             if not task.has_role(role):
                 task.on(self._event_name.format(role=role), self.put)
+        if max_in_flight is not None and task.has_role(task.role.COLLECTOR):
+            task.on(self._ack_event_name, self._on_ack)
+        if task.has_role(task.role.LEARNER):
+            task.on(self._ack_request_event_name, self._on_ack_request)
         if storage_loader:
             task.once("finish", lambda _: storage_loader.shutdown())
 
@@ -60,15 +99,109 @@ class ContextExchanger:
         yield
         payload = self.fetch(ctx)
         if payload:
-            if self._storage_loader and task.has_role(task.role.COLLECTOR):
-                payload = self._storage_loader.save(payload)
-            for role in task.roles:
-                task.emit(self._event_name.format(role=role), payload, only_remote=True)
+            if self._flow_control:
+                self._send_with_credit(payload)
+            else:
+                self._send(payload)
 
     def __del__(self):
         if self._storage_loader:
             self._storage_loader.shutdown()
 
+    @property
+    def _flow_control(self) -> bool:
+        return self._max_in_flight is not None and task.has_role(task.role.COLLECTOR)
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        """
+        Overview:
+            Get the metrics of flow control.
+        Returns:
+            - stats (:obj:`Dict[str, Union[int, float]]`): For collector, ``in_flight`` (the sent batches not \
+                consumed by learner), ``pending`` (the batches waiting for credits), ``sent``, ``dropped`` and \
+                ``blocked_time`` (the seconds waiting for credits). For learner, ``queue_depth`` (the received \
+                batches not merged into context yet), ``received`` and ``last_merged`` (the batches merged in the \
+                last iteration).
+        """
+        if task.has_role(task.role.COLLECTOR):
+            keys = ["sent", "dropped", "blocked_time"]
+            stats = {"in_flight": self._sent_seq - self._acked_seq, "pending": len(self._pending)}
+        else:
+            keys = ["received", "last_merged"]
+            stats = {"queue_depth": self._queue_depth}
+        stats.update({k: self._stats[k] for k in keys})
+        return stats
+
+    def _send(self, payload: Dict[str, Any]) -> None:
+        if self._storage_loader and task.has_role(task.role.COLLECTOR):
+            payload = self._storage_loader.save(payload)
+        for role in task.roles:
+            task.emit(self._event_name.format(role=role), payload, only_remote=True)
+
+    def _has_credit(self) -> bool:
+        return self._sent_seq - self._acked_seq < self._max_in_flight
+
+    def _send_with_credit(self, payload: Dict[str, Any]) -> None:
+        self._pending.append(payload)
+        if self._overflow_policy == "block":
+            start = last_warning = time()
+            while not self._has_credit() and not task.finish:
+                if time() - last_warning > 60:
+                    logging.warning(
+                        "Waiting for the credits of learner for {:.0f}s! Node id: {}".format(
+                            time() - start, task.router.node_id
+                        )
+                    )
+                    last_warning = time()
+                self._request_ack()
+                sleep(0.01)
+            self._stats["blocked_time"] += time() - start
+            # Never send more than max_in_flight batches, the batch is kept in pending if the task is finished
+            if self._has_credit():
+                self._send_pending()
+        else:
+            while len(self._pending) > 0 and self._has_credit():
+                self._send_pending()
+            while len(self._pending) > self._max_in_flight:
+                self._drop_oldest()
+            if not self._has_credit():
+                self._request_ack()
+
+    def _send_pending(self) -> None:
+        payload = self._pending.popleft()
+        self._sent_seq += 1
+        payload["flow_seq"] = (task.router.node_id, self._sent_seq)
+        self._last_credit_change = time()
+        self._send(payload)
+        self._stats["sent"] += 1
+
+    def _drop_oldest(self) -> None:
+        payload = self._pending.popleft()
+        # Keep the increments of counters, otherwise the env_step of learner will fall behind the collectors.
+        for key in ["env_step", "env_episode"]:
+            if key in payload and key in self._pending[0]:
+                self._pending[0][key] += payload[key]
+        self._stats["dropped"] += 1
+
+    def _request_ack(self) -> None:
+        # Without credits, the collector sends nothing to trigger a new ack, so ask for it when no ack arrives
+        # for a while, which happens when the ack is lost or learner is slow.
+        if time() - self._last_credit_change > self._ack_request_interval:
+            self._last_credit_change = time()
+            task.emit(self._ack_request_event_name, task.router.node_id, only_remote=True)
+
+    def _on_ack(self, acks: Dict[int, int]) -> None:
+        seq = acks.get(task.router.node_id)
+        if seq is not None:
+            self._acked_seq = max(self._acked_seq, seq)
+            self._last_credit_change = time()
+
+    def _on_ack_request(self, node_id: int) -> None:
+        with self._lock:
+            seq = self._acked_recv_seq.get(node_id)
+        if seq is not None:
+            task.emit(self._ack_event_name, {node_id: seq}, only_remote=True)
+
     def put(self, payload: Union[Dict, Storage]):
         """
         Overview:
@@ -77,12 +210,16 @@ class ContextExchanger:
         """
 
         def callback(payload: Dict):
-            for key, item in payload.items():
-                fn_name = "_put_{}".format(key)
-                if hasattr(self, fn_name):
-                    getattr(self, fn_name)(item)
-                else:
-                    logging.warning("Receive unexpected key ({}) in context exchanger".format(key))
+            with self._lock:
+                for key, item in payload.items():
+                    fn_name = "_put_{}".format(key)
+                    if hasattr(self, fn_name):
+                        getattr(self, fn_name)(item)
+                    else:
+                        logging.warning("Receive unexpected key ({}) in context exchanger".format(key))
+                if task.has_role(task.role.LEARNER):
+                    self._queue_depth += 1
+                    self._stats["received"] += 1
 
         if isinstance(payload, Storage):
             assert self._storage_loader is not None, "Storage loader is not defined when data is a storage object."
@@ -110,9 +247,9 @@ class ContextExchanger:
         if task.has_role(task.role.LEARNER):
             # Learner should always wait for trajs.
             # TODO: Automaticlly wait based on properties, not roles.
-            while len(self._state) == 0:
+            while len(self._state) == 0 and not task.finish:
                 sleep(0.01)
-        elif ctx.total_step >= self._skip_n_iter:
+        elif ctx.total_step >= self._skip_n_iter and not self._flow_control:
             start = time()
             while len(self._state) == 0:
                 if time() - start > 60:
@@ -120,13 +257,22 @@ class ContextExchanger:
                     break
                 sleep(0.01)
 
-        for k, v in self._state.items():
+        with self._lock:
+            state, self._state = self._state, {}
+            if task.has_role(task.role.LEARNER):
+                self._stats["last_merged"], self._queue_depth = self._queue_depth, 0
+            acks = {k: v for k, v in self._recv_seq.items() if self._acked_recv_seq.get(k) != v}
+            self._acked_recv_seq.update(acks)
+        if acks:
+            # Give the credits of merged batches back to collectors
+            task.emit(self._ack_event_name, acks, only_remote=True)
+
+        for k, v in state.items():
             if not task.has_role(task.role.COLLECTOR) and k.startswith('increment_'):
                 pure_k = k.split('increment_')[-1]
                 setattr(ctx, pure_k, getattr(ctx, pure_k) + v)
             else:
                 setattr(ctx, k, v)
-        self._state = {}
 
     # Handle each attibute of context
     def _put_trajectories(self, traj: List[Any]):
@@ -186,6 +332,12 @@ class ContextExchanger:
             self._local_state['env_episode'] = env_episode
             return increment_env_episode
 
+    def _put_flow_seq(self, flow_seq: Tuple[int, int]):
+        if not task.has_role(task.role.LEARNER):
+            return
+        node_id, seq = flow_seq
+        self._recv_seq[node_id] = max(self._recv_seq.get(node_id, 0), seq)
+
     def _put_train_iter(self, train_iter: int):
         if not task.has_role(task.role.LEARNER):
             self._state["train_iter"] = train_iter
@@ -195,9 +347,76 @@ class ContextExchanger:
             return train_iter
 
 
-class ModelExchanger:
+class ModelCodecMixin:
+    """
+    Overview:
+        The delta and quantized encoding of model for model exchangers. The sender encodes the state dict into \
+        keyframe or delta by ``ModelEncoder``, and the receivers decode it by ``ModelDecoder``. When a receiver \
+        misses some messages (e.g. it starts later than the sender), it requests a keyframe from the sender.
+    """
+
+    def _init_codec(
+            self, sender: bool, delta: bool, quantize: Optional[str], keyframe_interval: int,
+            model_loader: Optional[ModelLoader]
+    ) -> None:
+        assert delta or quantize is None, "Quantization is only applied to delta encoding."
+        assert not (delta and model_loader), "Delta encoding is not supported with model loader."
+        self._encoder, self._decoder = None, None
+        # The messages are received by the threads of event loop, decode them and update cache one by one
+        self._codec_lock = Lock()
+        self._resync_event_name = self._event_name + "_resync"
+        if not delta:
+            return
+        if sender:
+            self._encoder = ModelEncoder(quantize=quantize, keyframe_interval=keyframe_interval)
+            task.on(self._resync_event_name, self._encoder.request_keyframe)
+        else:
+            self._decoder = ModelDecoder()
+            # The request or the keyframe may be lost, so the keyframe is requested again after the interval
+            self._resync_interval = 1.
+            self._last_resync: Optional[float] = None  # The time of the latest request, None if not requested
+
+    def _encode_model(self) -> Dict[str, Any]:
+        state_dict = self._model.state_dict()
+        return self._encoder.encode(state_dict) if self._encoder else state_dict
 
-    def __init__(self, model: "Module", model_loader: Optional[ModelLoader] = None) -> None:
+    def _decode_model(self, state_dict: Union[object, Storage]) -> Optional[Union[object, Storage]]:
+        """
+        Overview:
+            Decode the received message, all the messages should be decoded in order even if they are not used, \
+            returns None if the message can not be decoded or is stale. The caller should hold ``_codec_lock``.
+        """
+        if self._decoder is None:
+            return state_dict
+        if state_dict["version"] <= self._decoder.version:
+            # A late message, e.g. an old keyframe arrives after the newer deltas
+            return None
+        state_dict = self._decoder.decode(state_dict)
+        if state_dict is None:
+            if self._last_resync is None:
+                logging.warning(
+                    "Missing model before version {} on node {}, request a keyframe.".format(
+                        self._decoder.version + 1, task.router.node_id
+                    )
+                )
+            if self._last_resync is None or time() - self._last_resync > self._resync_interval:
+                self._last_resync = time()
+                task.emit(self._resync_event_name, only_remote=True)
+        else:
+            self._last_resync = None
+        return state_dict
+
+
+class ModelExchanger(ModelCodecMixin):
+
+    def __init__(
+            self,
+            model: "Module",
+            model_loader: Optional[ModelLoader] = None,
+            delta: bool = False,
+            quantize: Optional[str] = None,
+            keyframe_interval: int = 100
+    ) -> None:
         """
         Overview:
             Exchange model between processes, only the learner will send the model,
@@ -206,19 +425,26 @@ class ModelExchanger:
         Arguments:
             - model (:obj:`torch.nn.Module`): Pytorch module.
             - model_loader (:obj:`ModelLoader`): Encode model in subprocess.
+            - delta (:obj:`bool`): Send the delta of model since the previous one, with periodical keyframes.
+            - quantize (:obj:`Optional[str]`): The quantization of delta, i.e. None, fp16, bf16 and int8.
+            - keyframe_interval (:obj:`int`): Send a full model every ``keyframe_interval`` times in delta mode.
         """
         self._model = model
         self._model_loader = model_loader
         self._event_name = "model_exchanger"
         self._state_dict_cache: Optional[Union[object, Storage]] = None
         self._is_learner = task.has_role(task.role.LEARNER)
+        self._init_codec(self._is_learner, delta, quantize, keyframe_interval, model_loader)
         if not self._is_learner:
             task.on(self._event_name, self._cache_state_dict)
         if model_loader:
             task.once("finish", lambda _: model_loader.shutdown())
 
     def _cache_state_dict(self, state_dict: Union[object, Storage]):
-        self._state_dict_cache = state_dict
+        with self._codec_lock:
+            state_dict = self._decode_model(state_dict)
+            if state_dict is not None:
+                self._state_dict_cache = state_dict
 
     def __new__(cls, *args, **kwargs):
         if not task.router.is_active:
@@ -279,7 +505,7 @@ class ModelExchanger:
         if self._model_loader:
             self._model_loader.save(self._send_callback)
         else:
-            task.emit(self._event_name, self._model.state_dict(), only_remote=True)
+            task.emit(self._event_name, self._encode_model(), only_remote=True)
 
     def _send_callback(self, storage: Storage):
         if task.running:
@@ -290,7 +516,7 @@ class ModelExchanger:
             self._model_loader.shutdown()
 
 
-class PeriodicalModelExchanger:
+class PeriodicalModelExchanger(ModelCodecMixin):
 
     def __init__(
             self,
@@ -300,7 +526,10 @@ class PeriodicalModelExchanger:
             delay_toleration: float = np.inf,
             stale_toleration: int = 1,
             event_name: str = "model_exchanger",
-            model_loader: Optional[ModelLoader] = None
+            model_loader: Optional[ModelLoader] = None,
+            delta: bool = False,
+            quantize: Optional[str] = None,
+            keyframe_interval: int = 100
     ) -> None:
         """
         Overview:
@@ -314,6 +543,9 @@ class PeriodicalModelExchanger:
             - stale_toleration (:obj:`int`): The permitted number of iterations for receiving model after being sent.
             - event_name (:obj:`str`): The event name for model exchange.
             - model_loader (:obj:`ModelLoader`): ModelLoader for this PeriodicalModelExchanger to use.
+            - delta (:obj:`bool`): Send the delta of model since the previous sent one, with periodical keyframes.
+            - quantize (:obj:`Optional[str]`): The quantization of delta, i.e. None, fp16, bf16 and int8.
+            - keyframe_interval (:obj:`int`): Send a full model every ``keyframe_interval`` times in delta mode.
         """
         self._model = model
         self._model_loader = model_loader
@@ -329,6 +561,7 @@ class PeriodicalModelExchanger:
         self._model_stale = stale_toleration
         self._delay_toleration = delay_toleration
         self._state_dict_cache: Optional[Union[object, Storage]] = None
+        self._init_codec(self._mode == "send", delta, quantize, keyframe_interval, model_loader)
 
         if self._mode == "receive":
             task.on(self._event_name, self._cache_state_dict)
@@ -336,10 +569,13 @@ class PeriodicalModelExchanger:
             task.once("finish", lambda _: model_loader.shutdown())
 
     def _cache_state_dict(self, msg: Dict[str, Any]):
-        if msg['id'] % self._period == 0:
-            self._state_dict_cache = msg['model']
-            self._id_counter = msg['id']
-            self._time = msg['time']
+        # The deltas should be decoded even if they are skipped by period
+        with self._codec_lock:
+            state_dict = self._decode_model(msg['model'])
+            if state_dict is not None and msg['id'] % self._period == 0:
+                self._state_dict_cache = state_dict
+                self._id_counter = msg['id']
+                self._time = msg['time']
 
     def __new__(cls, *args, **kwargs):
         return super(PeriodicalModelExchanger, cls).__new__(cls)
@@ -404,7 +640,7 @@ class PeriodicalModelExchanger:
         if self._model_loader:
             self._model_loader.save(self._send_callback)
         else:
-            task.emit(self._event_name, {'id': id, 'model': self._model.state_dict(), 'time': time()}, only_remote=True)
+            task.emit(self._event_name, {'id': id, 'model': self._encode_model(), 'time': time()}, only_remote=True)
 
     def _send_callback(self, storage: Storage):
         if task.running:
@@ -78,7 +78,10 @@ def inferencer(seed: int, policy: Policy, env: BaseEnvManager) -> Callable:
         obs = obs.to(dtype=ttorch.float32)
         # TODO mask necessary rollout
 
-        obs = {i: obs[i] for i in range(get_shape0(obs))}  # TBD
+        # The ready envs may be a part of all the envs (e.g. the late envs of partial batch step), so key obs by env_id.
+        ready_obs_id = env.ready_obs_id
+        assert len(ready_obs_id) == get_shape0(obs), (ready_obs_id, get_shape0(obs))
+        obs = {env_id: obs[i] for i, env_id in enumerate(ready_obs_id)}
         inference_output = policy.forward(obs, **ctx.collect_kwargs)
         ctx.action = [to_ndarray(v['action']) for v in inference_output.values()]  # TBD
         ctx.inference_output = inference_output
@@ -113,6 +116,8 @@ def rolloutor(
     total_train_sample_count = 0
     env_info = {env_id: {'time': 0., 'step': 0, 'train_sample': 0} for env_id in range(env.env_num)}
     episode_info = []
+    # The obs and inference output of each stepping env, whose timestep may be returned in the later calls.
+    env_obs, env_output = {}, {}
 
     def _rollout(ctx: "OnlineRLContext"):
         """
@@ -130,8 +135,13 @@ def rolloutor(
 
         nonlocal current_id, env_info, episode_info, timer, \
         total_episode_count, total_envstep_count, total_train_sample_count, last_train_iter
+        for i, env_id in enumerate(ctx.inference_output.keys()):
+            env_obs[env_id] = ctx.obs[i]
+            env_output[env_id] = ctx.inference_output[env_id]
         timesteps = env.step(ctx.action)
         ctx.env_step += len(timesteps)
+        if len(timesteps) == 0:  # e.g. the steps of env groups are still in flight
+            return
         timesteps = [t.tensor() for t in timesteps]
 
         collected_sample = 0
@@ -140,7 +150,8 @@ def rolloutor(
         interaction_duration = timer.value / len(timesteps)
         for i, timestep in enumerate(timesteps):
             with timer:
-                transition = policy.process_transition(ctx.obs[i], ctx.inference_output[i], timestep)
+                env_id = timestep.env_id.item()
+                transition = policy.process_transition(env_obs.pop(env_id), env_output.pop(env_id), timestep)
                 transition = ttorch.as_tensor(transition)
                 transition.collect_train_iter = ttorch.as_tensor([ctx.train_iter])
                 transition.env_data_id = ttorch.as_tensor([env_episode_id[timestep.env_id]])
@@ -1,9 +1,13 @@
 import os
-from typing import TYPE_CHECKING, Callable, List, Union, Tuple, Dict, Optional
+import time
+import threading
+from queue import Queue, Empty
+from typing import TYPE_CHECKING, Any, Callable, List, Union, Tuple, Dict, Optional
 from easydict import EasyDict
 from ditk import logging
 import numpy as np
 import torch
+import treetensor.torch as ttorch
 import tqdm
 from ding.data import Buffer, Dataset, DataLoader, offline_data_save_type
 from ding.data.buffer.middleware import PriorityExperienceReplay
@@ -92,6 +96,9 @@ def offpolicy_data_fetcher(
         cfg: EasyDict,
         buffer_: Union[Buffer, List[Tuple[Buffer, float]], Dict[str, Buffer]],
         data_shortage_warning: bool = False,
+        prefetch: int = 0,
+        collate_fn: Optional[Callable] = None,
+        pin_memory: bool = False,
 ) -> Callable:
     """
     Overview:
@@ -109,7 +116,21 @@ def offpolicy_data_fetcher(
             For each key-value pair of dict, batch_size of data will be sampled from the corresponding buffer \
             and assigned to the same key of `ctx.train_data`.
         - data_shortage_warning (:obj:`bool`): Whether to output warning when data shortage occurs in fetching.
+        - prefetch (:obj:`int`): The number of batches prepared in advance by a background thread, 0 means \
+            sampling in the learner step. With prefetch, the priority updates are also applied by the background \
+            thread, so a batch may be sampled before the priorities of the last few batches are updated.
+        - collate_fn (:obj:`Optional[Callable]`): The function to collate the sampled data in the background \
+            thread, e.g. ``ding.policy.default_collate_learn``, only used with prefetch.
+        - pin_memory (:obj:`bool`): Whether to pin the memory of the prefetched batches for faster copy to GPU.
     """
+    prefetcher = None
+    if prefetch > 0:
+        prefetcher = _OffpolicyPrefetcher(
+            lambda: _sample_train_data(cfg, buffer_), buffer_, prefetch, collate_fn, pin_memory
+            and torch.cuda.is_available()
+        )
+        if task.running:
+            task.once("finish", lambda _: prefetcher.close())
 
     def _fetch(ctx: "OnlineRLContext"):
         """
@@ -126,35 +147,15 @@ def offpolicy_data_fetcher(
                     `train_data` is of this type if the type of `buffer_` is Buffer or List.
                 ``Dict[str, List[Dict]]]`` type means a dict, in which the value of each key-value pair
                     is a list of data. `train_data` is of this type if the type of `buffer_` is Dict.
+            - info_for_logging (:obj:`Dict`): With prefetch, the time (second) waited for the prefetched batches \
+                and the time saved from the learner step are logged as `prefetch_wait_time` and `prefetch_saved_time`.
         """
         try:
-            unroll_len = cfg.policy.collect.unroll_len
-            if isinstance(buffer_, Buffer):
-                if unroll_len > 1:
-                    buffered_data = buffer_.sample(
-                        cfg.policy.learn.batch_size, groupby="env", unroll_len=unroll_len, replace=True
-                    )
-                    ctx.train_data = [[t.data for t in d] for d in buffered_data]  # B, unroll_len
-                else:
-                    buffered_data = buffer_.sample(cfg.policy.learn.batch_size)
-                    ctx.train_data = [d.data for d in buffered_data]
-            elif isinstance(buffer_, List):  # like sqil, r2d3
-                assert unroll_len == 1, "not support"
-                buffered_data = []
-                for buffer_elem, p in buffer_:
-                    data_elem = buffer_elem.sample(int(cfg.policy.learn.batch_size * p))
-                    assert data_elem is not None
-                    buffered_data.append(data_elem)
-                buffered_data = sum(buffered_data, [])
-                ctx.train_data = [d.data for d in buffered_data]
-            elif isinstance(buffer_, Dict):  # like ppg_offpolicy
-                assert unroll_len == 1, "not support"
-                buffered_data = {k: v.sample(cfg.policy.learn.batch_size) for k, v in buffer_.items()}
-                ctx.train_data = {k: [d.data for d in v] for k, v in buffered_data.items()}
+            if prefetcher is not None:
+                buffered_data, ctx.train_data = prefetcher.get()
+                ctx.info_for_logging.update(prefetcher.stats())
             else:
-                raise TypeError("not support buffer argument type: {}".format(type(buffer_)))
-
-            assert buffered_data is not None
+                buffered_data, ctx.train_data = _sample_train_data(cfg, buffer_)
         except (ValueError, AssertionError):
             if data_shortage_warning:
                 # You can modify data collect config to avoid this warning, e.g. increasing n_sample, n_episode.
@@ -168,7 +169,7 @@ def offpolicy_data_fetcher(
         yield
 
         if isinstance(buffer_, Buffer):
-            if any([isinstance(m, PriorityExperienceReplay) for m in buffer_._middleware]):
+            if _use_priority(buffer_):
                 index = [d.index for d in buffered_data]
                 meta = [d.meta for d in buffered_data]
                 # such as priority
@@ -176,13 +177,193 @@ def offpolicy_data_fetcher(
                     priority = ctx.train_output.pop()['priority']
                 else:
                     priority = ctx.train_output['priority']
-                for idx, m, p in zip(index, meta, priority):
-                    m['priority'] = p
-                    buffer_.update(index=idx, data=None, meta=m)
+                if prefetcher is not None:
+                    prefetcher.update(index, meta, priority)
+                else:
+                    _update_priority(buffer_, index, meta, priority)
 
     return _fetch
 
 
+def _sample_train_data(cfg: EasyDict, buffer_: Union[Buffer, List[Tuple[Buffer, float]], Dict[str, Buffer]]) -> Tuple:
+    unroll_len = cfg.policy.collect.unroll_len
+    if isinstance(buffer_, Buffer):
+        if unroll_len > 1:
+            buffered_data = buffer_.sample(
+                cfg.policy.learn.batch_size, groupby="env", unroll_len=unroll_len, replace=True
+            )
+            train_data = [[t.data for t in d] for d in buffered_data]  # B, unroll_len
+        else:
+            buffered_data = buffer_.sample(cfg.policy.learn.batch_size)
+            train_data = [d.data for d in buffered_data]
+    elif isinstance(buffer_, List):  # like sqil, r2d3
+        assert unroll_len == 1, "not support"
+        buffered_data = []
+        for buffer_elem, p in buffer_:
+            data_elem = buffer_elem.sample(int(cfg.policy.learn.batch_size * p))
+            assert data_elem is not None
+            buffered_data.append(data_elem)
+        buffered_data = sum(buffered_data, [])
+        train_data = [d.data for d in buffered_data]
+    elif isinstance(buffer_, Dict):  # like ppg_offpolicy
+        assert unroll_len == 1, "not support"
+        buffered_data = {k: v.sample(cfg.policy.learn.batch_size) for k, v in buffer_.items()}
+        train_data = {k: [d.data for d in v] for k, v in buffered_data.items()}
+    else:
+        raise TypeError("not support buffer argument type: {}".format(type(buffer_)))
+
+    assert buffered_data is not None
+    return buffered_data, train_data
+
+
+def _use_priority(buffer_: Buffer) -> bool:
+    # The buffers like ``ShardedBuffer`` apply PER inside each shard, and expose it by the ``priority`` attribute.
+    return getattr(buffer_, 'priority', False) is True or \
+        any([isinstance(m, PriorityExperienceReplay) for m in buffer_._middleware])
+
+
+def _update_priority(buffer_: Buffer, index: List, meta: List[Dict], priority: List) -> None:
+    for m, p in zip(meta, priority):
+        m['priority'] = p
+    # PriorityExperienceReplay updates the priorities of the whole batch at once
+    buffer_.update(index=index, data=None, meta=meta)
+
+
+def _pin_memory(item: Any) -> Any:
+    if isinstance(item, (torch.Tensor, ttorch.Tensor)):
+        return item.pin_memory()
+    elif isinstance(item, dict):
+        return type(item)({k: _pin_memory(v) for k, v in item.items()})
+    elif isinstance(item, (list, tuple)):
+        return type(item)([_pin_memory(v) for v in item])
+    return item
+
+
+class _OffpolicyPrefetcher:
+    """
+    Overview:
+        The background thread of ``offpolicy_data_fetcher``, which samples, collates and pins the batches in advance, \
+        and applies the priority updates before sampling. The buffer operations are serialized with the pushes \
+        from the main thread by a lock middleware inserted in front of the middleware of the buffers, which also \
+        wakes up the thread waiting for more data on push. ``close`` stops the thread and removes the middleware, \
+        it is called when the task finishes.
+    """
+
+    def __init__(
+            self, sample_fn: Callable, buffer_: Union[Buffer, List, Dict], prefetch: int,
+            collate_fn: Optional[Callable], pin_memory: bool
+    ) -> None:
+        self._sample_fn = sample_fn
+        self._buffer = buffer_
+        self._collate_fn = collate_fn
+        self._pin_memory = pin_memory
+        self._batches = Queue(maxsize=prefetch)
+        self._updates = Queue()
+        self._data_shortage = threading.Event()
+        self._closed = threading.Event()
+        self._lock = threading.RLock()
+        self._pushed = threading.Condition(self._lock)
+        self._error = None
+        if isinstance(buffer_, Buffer):
+            self._buffers = [buffer_]
+        elif isinstance(buffer_, List):
+            self._buffers = [b for b, _ in buffer_]
+        else:
+            self._buffers = list(buffer_.values())
+        for b in self._buffers:
+            b._middleware.insert(0, self._locked)
+        # Time spent on preparing the consumed batches, and time the learner waited for them.
+        self._prepare_time = 0.
+        self._wait_time = 0.
+        self._thread = threading.Thread(target=self._run, name='offpolicy_data_prefetcher', daemon=True)
+        self._thread.start()
+
+    def _locked(self, action: str, chain: Callable, *args, **kwargs) -> Any:
+        with self._lock:
+            result = chain(*args, **kwargs)
+            if action == "push":
+                self._pushed.notify_all()
+            return result
+
+    def _run(self) -> None:
+        try:
+            self._prefetch()
+        except Exception as e:
+            # Raise the error in the learner thread.
+            self._error = e
+
+    def _prefetch(self) -> None:
+        while not self._closed.is_set():
+            while not self._updates.empty():
+                _update_priority(self._buffer, *self._updates.get())
+            start = time.time()
+            # Hold the lock from sampling to waiting, so that no push is missed in between.
+            with self._pushed:
+                try:
+                    buffered_data, train_data = self._sample_fn()
+                except (ValueError, AssertionError):
+                    self._data_shortage.set()
+                    if not self._closed.is_set():
+                        self._pushed.wait()
+                    continue
+            self._data_shortage.clear()
+            if self._collate_fn is not None:
+                train_data = self._collate_fn(train_data)
+            if self._pin_memory:
+                train_data = _pin_memory(train_data)
+            self._batches.put((buffered_data, train_data, time.time() - start))
+
+    def get(self) -> Tuple:
+        """
+        Overview:
+            Get a prefetched batch, raise ``ValueError`` if no batch is ready because of data shortage.
+        """
+        start = time.time()
+        while True:
+            try:
+                buffered_data, train_data, prepare_time = self._batches.get(timeout=0.01)
+                break
+            except Empty:
+                if self._error is not None:
+                    raise self._error
+                if self._closed.is_set():
+                    raise RuntimeError("The prefetcher of offpolicy_data_fetcher is closed")
+                if self._data_shortage.is_set():
+                    raise ValueError("Replay buffer's data is not enough")
+        self._wait_time += time.time() - start
+        self._prepare_time += prepare_time
+        return buffered_data, train_data
+
+    def update(self, index: List, meta: List[Dict], priority: List) -> None:
+        self._updates.put((index, meta, priority))
+
+    def close(self) -> None:
+        """
+        Overview:
+            Stop the background thread and remove the lock middleware from the buffers.
+        """
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        with self._pushed:
+            self._pushed.notify_all()
+        # Unblock the thread waiting for a free slot, it checks the closed flag before preparing the next batch.
+        while True:
+            try:
+                self._batches.get_nowait()
+            except Empty:
+                break
+        self._thread.join()
+        for b in self._buffers:
+            b._middleware.remove(self._locked)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'prefetch_wait_time': self._wait_time,
+            'prefetch_saved_time': max(self._prepare_time - self._wait_time, 0.),
+        }
+
+
 def offline_data_fetcher_from_mem(cfg: EasyDict, dataset: Dataset) -> Callable:
 
     from threading import Thread
@@ -10,7 +10,7 @@ import wandb
 import pickle
 import treetensor.numpy as tnp
 from ding.framework import task
-from ding.envs import BaseEnvManagerV2
+from ding.envs import BaseEnvManager, BaseEnvManagerV2
 from ding.utils import DistributedWriter
 from ding.torch_utils import to_ndarray
 from ding.utils.default_helper import one_time_warning
@@ -126,6 +126,40 @@ def offline_logger(train_show_freq: int = 100) -> Callable:
     return _logger
 
 
+def env_stats_logger(env: BaseEnvManager, log_freq: int = 1000, prefix: str = 'env_manager') -> Callable:
+    """
+    Overview:
+        Create a tensorboard logger for the latency and throughput statistics of env manager, such as the step \
+        and reset time histograms, IPC time, wait time, retry count and straggler ratio.
+    Arguments:
+        - env (:obj:`BaseEnvManager`): The env manager with ``log_stats`` method, e.g. the env manager used in \
+            ``inferencer`` and ``rolloutor``.
+        - log_freq (:obj:`int`): Frequency of logging in env steps. Default is 1000.
+        - prefix (:obj:`str`): The prefix of the tags, which should be different for multiple collectors.
+    Returns:
+        - _logger (:obj:`Callable`): A logger function that takes an OnlineRLContext object as input.
+    Raises:
+        - RuntimeError: If writer is None.
+
+    Examples:
+        >>> task.use(env_stats_logger(collector_env, log_freq=1000))
+    """
+    if task.router.is_active and not task.has_role(task.role.COLLECTOR):
+        return task.void()
+    writer = DistributedWriter.get_instance()
+    if writer is None:
+        raise RuntimeError("logger writer is None, you should call `ding_init(cfg)` at the beginning of training.")
+    last_log_env_step = -log_freq
+
+    def _logger(ctx: "OnlineRLContext"):
+        nonlocal last_log_env_step
+        if ctx.env_step - last_log_env_step >= log_freq:
+            last_log_env_step = ctx.env_step
+            env.log_stats(writer, ctx.env_step, prefix)
+
+    return _logger
+
+
 # four utility functions for wandb logger
 def softmax(logit: np.ndarray) -> np.ndarray:
     v = np.exp(logit)
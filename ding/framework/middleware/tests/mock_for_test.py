@@ -83,6 +83,10 @@ class MockEnv(Mock):
             torch.ones(self.obs_dim),
         ])
 
+    @property
+    def ready_obs_id(self) -> List[int]:
+        return list(range(self.env_num))
+
     def seed(self, seed: Union[Dict[int, int], List[int], int], dynamic_seed: bool = None) -> None:
         return
 
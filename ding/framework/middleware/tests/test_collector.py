@@ -1,7 +1,13 @@
 import pytest
 import torch
 import copy
+import gym
+import numpy as np
+from easydict import EasyDict
+from functools import partial
 from unittest.mock import patch
+from ding.envs import BaseEnvTimestep, SubprocessEnvManagerV2
+from ding.utils import deep_merge_dicts
 from ding.framework import OnlineRLContext, task
 from ding.framework.middleware import TransitionList, inferencer, rolloutor
 from ding.framework.middleware import StepCollector, EpisodeCollector
@@ -82,3 +88,51 @@ def test_episode_collector():
             collector = EpisodeCollector(cfg, policy, env, random_collect_size=8)
             collector(ctx)
     assert len(ctx.episodes) == 16
+
+
+class CountEnv:
+
+    def __init__(self, episode_len=5):
+        self.episode_len = episode_len
+        self.observation_space = gym.spaces.Box(low=0, high=1, shape=(2, 2), dtype=np.float32)
+        self.action_space = gym.spaces.Discrete(2)
+        self.reward_space = gym.spaces.Box(low=0, high=1, shape=(1, ), dtype=np.float32)
+
+    def reset(self):
+        self.count = 0
+        return np.zeros((2, 2), dtype=np.float32)
+
+    def step(self, action):
+        self.count += 1
+        done = self.count >= self.episode_len
+        info = {'eval_episode_return': np.array([float(self.count)])} if done else {}
+        return BaseEnvTimestep(np.full((2, 2), self.count, dtype=np.float32), np.array([1.]), done, info)
+
+    def seed(self, seed, dynamic_seed=False):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.mark.unittest
+@pytest.mark.parametrize('flush_env_step', [False, True])
+def test_step_collector_env_group(flush_env_step):
+    cfg = copy.deepcopy(CONFIG)
+    ctx = OnlineRLContext()
+    env_cfg = deep_merge_dicts(SubprocessEnvManagerV2.default_config(), EasyDict(dict(env_group_num=2)))
+    env = SubprocessEnvManagerV2([partial(CountEnv) for _ in range(4)], env_cfg)
+    with task.start():
+        collector = StepCollector(cfg, MockPolicy(), env, flush_env_step=flush_env_step)
+        trajectory_count = 0
+        for _ in range(3):
+            collector(ctx)
+            trajectory_count += len(ctx.trajectories)
+            assert len(ctx.trajectories) >= cfg.policy.collect.n_sample and trajectory_count == ctx.env_step
+            if flush_env_step:
+                # all the steps of the actions inferred in this collection are collected
+                assert env.stepping_env == []
+            else:
+                # the other group keeps stepping across the collections
+                assert len(env.stepping_env) == 2
+    env.close()
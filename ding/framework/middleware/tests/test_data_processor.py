@@ -1,13 +1,14 @@
 import tempfile
 import pytest
 
-from ding.data.buffer import DequeBuffer
+from ding.data.buffer import DequeBuffer, ShardedBuffer
 
-from ding.framework import Context, OnlineRLContext, OfflineRLContext
+from ding.framework import Context, OnlineRLContext, OfflineRLContext, task
 from ding.framework.middleware.functional.data_processor import \
     data_pusher, offpolicy_data_fetcher, offline_data_fetcher, offline_data_saver, sqil_data_pusher, buffer_saver
 
 from ding.data.buffer.middleware import PriorityExperienceReplay
+from ding.policy import default_collate_learn
 
 from easydict import EasyDict
 from ding.data import Dataset
@@ -16,6 +17,8 @@ import torch
 import math
 import os
 import copy
+import time
+import threading
 
 from unittest.mock import patch
 
@@ -129,6 +132,87 @@ def test_offpolicy_data_fetcher():
     call_offpolicy_data_fetcher_type_int()
 
 
+@pytest.mark.unittest
+def test_offpolicy_data_fetcher_sharded_buffer():
+    cfg = EasyDict({'policy': {'learn': {'batch_size': 8}, 'collect': {'unroll_len': 1}}})
+    buffer = ShardedBuffer(size=16, num_shards=4, priority=True)
+    for i in range(16):
+        buffer.push({'obs': torch.full((2, ), i)})
+    assert all([d.meta['priority'] == 1.0 for d in buffer])
+    ctx = OnlineRLContext()
+    ctx.train_output = {'priority': [0.5 for _ in range(8)]}
+    func_generator = offpolicy_data_fetcher(cfg=cfg, buffer_=buffer)(ctx)
+    next(func_generator)
+    assert len(ctx.train_data) == 8
+    assert all(['priority_IS' in d for d in ctx.train_data])
+    with pytest.raises(StopIteration):
+        next(func_generator)
+    # The priorities of the sampled records (with replacement) are updated in their shards
+    n_updated = sum([d.meta['priority'] == 0.5 for d in buffer])
+    assert n_updated >= 1
+    mass = sum([per.sum_tree.reduce() for per in buffer.priority_middleware])
+    assert mass == pytest.approx(n_updated * 0.5 ** 0.6 + 16 - n_updated, rel=1e-4)
+
+
+@pytest.mark.unittest
+def test_offpolicy_data_fetcher_prefetch():
+    cfg = EasyDict({'policy': {'learn': {'batch_size': 4}, 'collect': {'unroll_len': 1}}})
+    buffer = DequeBuffer(size=20)
+    buffer.use(PriorityExperienceReplay(buffer=buffer))
+    ctx = OnlineRLContext()
+    fetcher = offpolicy_data_fetcher(cfg=cfg, buffer_=buffer, prefetch=2, collate_fn=default_collate_learn)
+
+    # Data shortage, the following middleware are skipped.
+    func_generator = fetcher(ctx)
+    with pytest.raises(StopIteration):
+        next(func_generator)
+
+    for i in range(20):
+        buffer.push({'obs': torch.full((2, ), i), 'action': torch.tensor([0]), 'reward': torch.tensor([1.])})
+    ctx = OnlineRLContext()
+    ctx.train_output = {'priority': [0.5 for _ in range(4)]}
+    func_generator = fetcher(ctx)
+    next(func_generator)
+    # The batch is collated in the background thread.
+    assert ctx.train_data['obs'].shape == (4, 2)
+    assert ctx.train_data['priority_IS'].shape == (4, )
+    assert 'prefetch_wait_time' in ctx.info_for_logging
+    assert 'prefetch_saved_time' in ctx.info_for_logging
+    with pytest.raises(StopIteration):
+        next(func_generator)
+
+    # The priority updates are applied by the background thread before the next sampling.
+    for _ in range(100):
+        if sum(d.meta['priority'] == 0.5 for d in buffer.storage) >= 1:
+            break
+        time.sleep(0.01)
+    assert sum(d.meta['priority'] == 0.5 for d in buffer.storage) >= 1
+
+
+@pytest.mark.unittest
+def test_offpolicy_data_fetcher_prefetch_close():
+    cfg = EasyDict({'policy': {'learn': {'batch_size': 4}, 'collect': {'unroll_len': 1}}})
+    buffer = DequeBuffer(size=20)
+
+    def prefetch_threads():
+        return [t for t in threading.enumerate() if t.name == 'offpolicy_data_prefetcher' and t.is_alive()]
+
+    n_threads = len(prefetch_threads())
+    with task.start():
+        fetcher = offpolicy_data_fetcher(cfg=cfg, buffer_=buffer, prefetch=2)
+        assert len(buffer._middleware) == 1
+        assert len(prefetch_threads()) == n_threads + 1
+        # The thread waits for the pushed data
+        for i in range(4):
+            buffer.push({'obs': i})
+        ctx = OnlineRLContext()
+        next(fetcher(ctx))
+        assert len(ctx.train_data) == 4
+    # The prefetcher is closed when the task finishes
+    assert len(buffer._middleware) == 0
+    assert len(prefetch_threads()) == n_threads
+
+
 @pytest.mark.unittest
 def test_offline_data_fetcher():
     cfg = EasyDict({'policy': {'learn': {'batch_size': 5}}})
@@ -1,5 +1,5 @@
 import shutil
-from time import sleep
+from time import sleep, time
 import pytest
 import numpy as np
 import tempfile
@@ -109,6 +109,155 @@ def test_context_exchanger_with_storage_loader():
     Parallel.runner(n_parallel_workers=2)(context_exchanger_with_storage_loader_main)
 
 
+def context_exchanger_flow_control_main(overflow_policy):
+    with task.start(ctx=OnlineRLContext()):
+        if task.router.node_id == 0:
+            task.add_role(task.role.LEARNER)
+        elif task.router.node_id == 1:
+            task.add_role(task.role.COLLECTOR)
+
+        exchanger = ContextExchanger(skip_n_iter=1, max_in_flight=2, overflow_policy=overflow_policy)
+        task.use(exchanger)
+
+        if task.has_role(task.role.LEARNER):
+
+            def learner_context(ctx: OnlineRLContext):
+                if not task.finish:
+                    # The queue of learner is bounded by the credits
+                    assert 0 < len(ctx.trajectories) <= 2 * 2
+                    assert 0 < exchanger.stats()["last_merged"] <= 2
+                yield
+                sleep(0.2)  # Slow learner
+                ctx.train_iter += 1
+
+            task.use(learner_context)
+            task.run(max_step=20)
+        elif task.has_role(task.role.COLLECTOR):
+
+            def collector_context(ctx: OnlineRLContext):
+                yield
+                ctx.trajectories = [np.random.rand(10, 10) for _ in range(2)]
+                ctx.env_step += 1
+
+            def check_stats(ctx: OnlineRLContext):
+                yield
+                stats = exchanger.stats()
+                assert stats["in_flight"] <= 2
+                assert stats["pending"] <= (0 if overflow_policy == "block" else 2)
+                if ctx.total_step == 19:
+                    if overflow_policy == "block":
+                        assert stats["blocked_time"] > 0
+                        assert stats["dropped"] == 0
+                    else:
+                        assert stats["dropped"] > 0
+                        assert stats["sent"] + stats["dropped"] + stats["pending"] == 19
+
+            task.use(check_stats)
+            task.use(collector_context)
+            task.run(max_step=20)
+
+
+@pytest.mark.tmp
+@pytest.mark.parametrize('overflow_policy', ['block', 'drop_oldest'])
+def test_context_exchanger_flow_control(overflow_policy):
+    Parallel.runner(n_parallel_workers=2)(context_exchanger_flow_control_main, overflow_policy)
+
+
+def context_exchanger_lost_ack_main():
+    with task.start(ctx=OnlineRLContext()):
+        if task.router.node_id == 0:
+            task.add_role(task.role.LEARNER)
+        elif task.router.node_id == 1:
+            task.add_role(task.role.COLLECTOR)
+
+        exchanger = ContextExchanger(skip_n_iter=1, max_in_flight=1, overflow_policy="block")
+        task.use(exchanger)
+
+        if task.has_role(task.role.LEARNER):
+
+            def learner_context(ctx: OnlineRLContext):
+                yield
+                ctx.train_iter += 1
+
+            task.use(learner_context)
+            task.run(max_step=10)
+        elif task.has_role(task.role.COLLECTOR):
+            # Drop the first ack, the collector asks for it again instead of waiting for the timeout
+            lost = []
+
+            def on_ack(acks):
+                if len(lost) == 0:
+                    lost.append(acks)
+                    return
+                exchanger._on_ack(acks)
+
+            task.off(exchanger._ack_event_name)
+            task.on(exchanger._ack_event_name, on_ack)
+
+            def collector_context(ctx: OnlineRLContext):
+                yield
+                ctx.trajectories = [np.random.rand(10, 10) for _ in range(2)]
+                ctx.env_step += 1
+
+            task.use(collector_context)
+            task.run(max_step=10)
+            assert len(lost) == 1
+            stats = exchanger.stats()
+            assert stats["sent"] == 10
+            assert 1 < stats["blocked_time"] < 10
+
+
+@pytest.mark.tmp
+def test_context_exchanger_lost_ack():
+    Parallel.runner(n_parallel_workers=2)(context_exchanger_lost_ack_main)
+
+
+def context_exchanger_no_ack_main():
+    with task.start(ctx=OnlineRLContext()):
+        if task.router.node_id == 0:
+            task.add_role(task.role.LEARNER)
+        elif task.router.node_id == 1:
+            task.add_role(task.role.COLLECTOR)
+
+        exchanger = ContextExchanger(skip_n_iter=1, max_in_flight=2, overflow_policy="block")
+        task.use(exchanger)
+
+        if task.has_role(task.role.LEARNER):
+
+            def learner_context(ctx: OnlineRLContext):
+                yield
+                sleep(0.2)
+                ctx.train_iter += 1
+
+            task.use(learner_context)
+            task.run(max_step=10)
+        elif task.has_role(task.role.COLLECTOR):
+            # The acks never arrive, the collector blocks until the learner finishes
+            task.off(exchanger._ack_event_name)
+
+            def collector_context(ctx: OnlineRLContext):
+                yield
+                ctx.trajectories = [np.random.rand(10, 10) for _ in range(2)]
+                ctx.env_step += 1
+
+            def check_stats(ctx: OnlineRLContext):
+                yield
+                assert exchanger.stats()["in_flight"] <= 2
+
+            task.use(check_stats)
+            task.use(collector_context)
+            task.run(max_step=10)
+            stats = exchanger.stats()
+            assert stats["sent"] == 2 and stats["in_flight"] == 2
+            assert stats["pending"] == 1
+            assert stats["blocked_time"] > 1
+
+
+@pytest.mark.tmp
+def test_context_exchanger_no_ack():
+    Parallel.runner(n_parallel_workers=2)(context_exchanger_no_ack_main)
+
+
 class MockPolicy:
 
     def __init__(self) -> None:
@@ -134,7 +283,7 @@ class MockPolicy:
             return self._model(X)
 
 
-def model_exchanger_main():
+def model_exchanger_main(**kwargs):
     with task.start(ctx=OnlineRLContext()):
         set_pkg_seed(0, use_cuda=False)
         policy = MockPolicy()
@@ -146,7 +295,7 @@ def model_exchanger_main():
         else:
             task.add_role(task.role.COLLECTOR)
 
-        task.use(ModelExchanger(policy._model))
+        task.use(ModelExchanger(policy._model, **kwargs))
 
         if task.has_role(task.role.LEARNER):
 
@@ -175,6 +324,68 @@ def test_model_exchanger():
     Parallel.runner(n_parallel_workers=2, startup_interval=0)(model_exchanger_main)
 
 
+@pytest.mark.tmp
+def test_model_exchanger_delta():
+    Parallel.runner(n_parallel_workers=2, startup_interval=0)(model_exchanger_main, delta=True, quantize="fp16")
+
+
+def model_exchanger_lost_resync_main():
+    with task.start(ctx=OnlineRLContext()):
+        set_pkg_seed(0, use_cuda=False)
+        policy = MockPolicy()
+        X = torch.rand(10)
+        y = torch.rand(10)
+
+        if task.router.node_id == 0:
+            task.add_role(task.role.LEARNER)
+        else:
+            task.add_role(task.role.COLLECTOR)
+
+        exchanger = ModelExchanger(policy._model, delta=True)
+
+        if task.has_role(task.role.LEARNER):
+            # Drop the first keyframe request, the collector requests again after the interval
+            requests = []
+
+            def on_resync():
+                requests.append(time())
+                if len(requests) > 1:
+                    exchanger._encoder.request_keyframe()
+
+            task.off(exchanger._resync_event_name)
+            task.on(exchanger._resync_event_name, on_resync)
+
+            def train(ctx):
+                policy.train(X, y)
+                sleep(0.3)
+
+            task.use(exchanger)
+            task.use(train)
+            task.run(12)
+            assert len(requests) >= 2
+        else:
+            # Drop the first model, so the following deltas can't be decoded
+            lost = []
+
+            def on_model(msg):
+                if len(lost) == 0:
+                    lost.append(msg)
+                    return
+                exchanger._cache_state_dict(msg)
+
+            task.off(exchanger._event_name)
+            task.on(exchanger._event_name, on_model)
+            task.use(lambda _: sleep(0.3))
+            task.run(12)
+            assert len(lost) == 1
+            assert exchanger._decoder.version > 0 and exchanger._state_dict_cache is not None
+
+
+@pytest.mark.tmp
+def test_model_exchanger_lost_resync():
+    Parallel.runner(n_parallel_workers=2, startup_interval=0)(model_exchanger_lost_resync_main)
+
+
 def model_exchanger_main_with_model_loader():
     with task.start(ctx=OnlineRLContext()):
         set_pkg_seed(0, use_cuda=False)
@@ -223,7 +434,7 @@ def test_model_exchanger_with_model_loader():
     Parallel.runner(n_parallel_workers=2, startup_interval=0)(model_exchanger_main_with_model_loader)
 
 
-def periodical_model_exchanger_main():
+def periodical_model_exchanger_main(**kwargs):
     with task.start(ctx=OnlineRLContext()):
         set_pkg_seed(0, use_cuda=False)
         policy = MockPolicy()
@@ -232,10 +443,10 @@ def periodical_model_exchanger_main():
 
         if task.router.node_id == 0:
             task.add_role(task.role.LEARNER)
-            task.use(PeriodicalModelExchanger(policy._model, mode="send", period=3))
+            task.use(PeriodicalModelExchanger(policy._model, mode="send", period=3, **kwargs))
         else:
             task.add_role(task.role.COLLECTOR)
-            task.use(PeriodicalModelExchanger(policy._model, mode="receive", period=1, stale_toleration=3))
+            task.use(PeriodicalModelExchanger(policy._model, mode="receive", period=1, stale_toleration=3, **kwargs))
 
         if task.has_role(task.role.LEARNER):
 
@@ -267,3 +478,10 @@ def periodical_model_exchanger_main():
 @pytest.mark.tmp
 def test_periodical_model_exchanger():
     Parallel.runner(n_parallel_workers=2, startup_interval=0)(periodical_model_exchanger_main)
+
+
+@pytest.mark.tmp
+def test_periodical_model_exchanger_delta():
+    Parallel.runner(
+        n_parallel_workers=2, startup_interval=0
+    )(periodical_model_exchanger_main, delta=True, quantize="int8")
@@ -14,6 +14,7 @@ from threading import Thread
 from ding.framework.event_loop import EventLoop
 from ding.utils.design_helper import SingletonMetaclass
 from ding.framework.message_queue import *
+from ding.framework.message_queue.serializer import serialize, deserialize
 from ding.utils.registry_factory import MQ_REGISTRY
 
 # Avoid ipc address conflict, random should always use random seed
@@ -75,14 +76,16 @@ class Parallel(metaclass=SingletonMetaclass):
             max_retries: int = float("inf"),
             redis_host: Optional[str] = None,
             redis_port: Optional[int] = None,
-            startup_interval: int = 1
+            startup_interval: int = 1,
+            tree_degree: int = 2
     ) -> Callable:
         """
         Overview:
             This method allows you to configure parallel parameters, and now you are still in the parent process.
         Arguments:
             - n_parallel_workers (:obj:`int`): Workers to spawn.
-            - mq_type (:obj:`str`): Embedded message queue type, i.e. nng, redis.
+            - mq_type (:obj:`str`): Embedded message queue type, i.e. nng, redis, shm (nng with shared memory \
+                for the nodes on the same host).
             - attach_to (:obj:`Optional[List[str]]`): The node's addresses you want to attach to.
             - protocol (:obj:`str`): Network protocol.
             - address (:obj:`Optional[str]`): Bind address, ip or file path.
@@ -91,6 +94,10 @@ class Parallel(metaclass=SingletonMetaclass):
                 `mesh` (default): fully connected between each other;
                 `star`: only connect to the first node;
                 `alone`: do not connect to any node, except the node attached to;
+                `tree`: connect to the parent in a k-ary tree whose root is the first node (the root connects to \
+                    the node attached to), and relay the messages along the tree, so that the egress of each node \
+                    is O(k) rather than O(n), at the cost of one extra hop of latency per level;
+                `chain`: the tree with only one child for each node.
             - labels (:obj:`Optional[Set[str]]`): Labels.
             - node_ids (:obj:`Optional[List[int]]`): Candidate node ids.
             - auto_recover (:obj:`bool`): Auto recover from uncaught exceptions from main.
@@ -98,12 +105,13 @@ class Parallel(metaclass=SingletonMetaclass):
             - redis_host (:obj:`str`): Redis server host.
             - redis_port (:obj:`int`): Redis server port.
             - startup_interval (:obj:`int`): Start up interval between each task.
+            - tree_degree (:obj:`int`): The max number of children of each node in `tree` topology.
         Returns:
             - _runner (:obj:`Callable`): The wrapper function for main.
         """
         all_args = locals()
         del all_args["cls"]
-        args_parsers = {"nng": cls._nng_args_parser, "redis": cls._redis_args_parser}
+        args_parsers = {"nng": cls._nng_args_parser, "redis": cls._redis_args_parser, "shm": cls._nng_args_parser}
 
         assert n_parallel_workers > 0, "Parallel worker number should bigger than 0"
 
@@ -140,6 +148,7 @@ class Parallel(metaclass=SingletonMetaclass):
             ports: Optional[Union[List[int], int]] = None,
             topology: str = "mesh",
             node_ids: Optional[Union[List[int], int]] = None,
+            tree_degree: int = 2,
             **kwargs
     ) -> Dict[str, dict]:
         attach_to = attach_to or []
@@ -160,6 +169,10 @@ class Parallel(metaclass=SingletonMetaclass):
                 return nodes[:min(1, i)] + attach_to
             elif topology == "alone":
                 return attach_to
+            elif topology in ("tree", "chain"):
+                # Only the root connects to the attached nodes, otherwise the network will contain cycles.
+                degree = tree_degree if topology == "tree" else 1
+                return [nodes[(i - 1) // degree]] if i > 0 else attach_to
             else:
                 raise ValueError("Unknown topology: {}".format(topology))
 
@@ -172,6 +185,7 @@ class Parallel(metaclass=SingletonMetaclass):
                 "listen_to": nodes[i],
                 "attach_to": topology_network(i),
                 "n_parallel_workers": n_parallel_workers,
+                "relay": topology in ("tree", "chain"),
             }
             runner_params.append(runner_kwargs)
 
@@ -337,26 +351,28 @@ now there are {} ports and {} workers".format(len(ports), n_workers)
         if self.is_active:
             payload = {"a": args, "k": kwargs}
             try:
-                data = pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+                # The large arrays and tensors are sent as out-of-band frames without copying into pickle stream.
+                data = serialize(payload)
             except AttributeError as e:
                 logging.error("Arguments are not pickable! Event: {}, Args: {}".format(event, args))
                 raise e
             self._mq.publish(event, data)
 
-    def _handle_message(self, topic: str, msg: bytes) -> None:
+    def _handle_message(self, topic: str, msg: Union[bytes, List[memoryview]]) -> None:
         """
         Overview:
             Recv and parse payload from other processes, and call local functions.
         Arguments:
             - topic (:obj:`str`): Recevied topic.
-            - msg (:obj:`bytes`): Recevied message.
+            - msg (:obj:`Union[bytes, List[memoryview]]`): Recevied message, the frames from ``serialize`` \
+                or the pickled bytes.
         """
         event = topic
         if not self._event_loop.listened(event):
             logging.debug("Event {} was not listened in parallel {}".format(event, self.node_id))
             return
         try:
-            payload = pickle.loads(msg)
+            payload = pickle.loads(msg) if isinstance(msg, bytes) else deserialize(msg)
         except Exception as e:
             logging.error("Error when unpacking message on node {}, msg: {}".format(self.node_id, e))
             return
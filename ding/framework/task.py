@@ -76,6 +76,7 @@ class Task:
     def __init__(self) -> None:
         self.router = Parallel()
         self._finish = False
+        self._running = False
 
     def start(
             self,
@@ -377,8 +378,7 @@ class Task:
         Overview:
             Stop and cleanup every thing in the runtime of task.
         """
-        if self.router.is_active:
-            self.emit("finish", True)
+        self.emit("finish", True)
         if self._thread_pool:
             self._thread_pool.shutdown()
         self._event_loop.stop()
@@ -28,6 +28,7 @@ def parallel_main():
 def test_parallel_run():
     Parallel.runner(n_parallel_workers=2, startup_interval=0.1)(parallel_main)
     Parallel.runner(n_parallel_workers=2, protocol="tcp", startup_interval=0.1)(parallel_main)
+    Parallel.runner(n_parallel_workers=2, mq_type="shm", startup_interval=0.1)(parallel_main)
 
 
 def uncaught_exception_main():
@@ -39,6 +40,37 @@ def uncaught_exception_main():
         time.sleep(0.2)
 
 
+def relay_main():
+    msg = defaultdict(list)
+    router = Parallel()
+    router.on("down", lambda node_id: msg["down"].append(node_id))
+    router.on("up", lambda node_id: msg["up"].append(node_id))
+    # Each node only connects to its parent and children
+    assert len(router._mq._sock.pipes) <= 3
+    time.sleep(0.7)
+    if router.node_id == 0:
+        router.emit("down", router.node_id)
+        for _ in range(30):
+            if len(msg["up"]) == 3:
+                break
+            time.sleep(0.03)
+        assert sorted(msg["up"]) == [1, 2, 3]
+    else:
+        for _ in range(30):
+            if len(msg["down"]) == 1:
+                break
+            time.sleep(0.03)
+        assert msg["down"] == [0]
+        router.emit("up", router.node_id)
+    time.sleep(0.7)
+
+
+@pytest.mark.tmp
+def test_parallel_relay():
+    Parallel.runner(n_parallel_workers=4, topology="tree", tree_degree=2, startup_interval=0.1)(relay_main)
+    Parallel.runner(n_parallel_workers=4, topology="chain", mq_type="shm", startup_interval=0.1)(relay_main)
+
+
 @pytest.mark.tmp
 def test_uncaught_exception():
     # Make one process crash, then the parent process will also crash and output the stack of the wrong process.
@@ -4,11 +4,13 @@ from collections import namedtuple
 from easydict import EasyDict
 
 import copy
+import numpy as np
 import torch
 
 from ding.model import create_model
 from ding.utils import import_module, allreduce, broadcast, get_rank, allreduce_async, synchronize, deep_merge_dicts, \
     POLICY_REGISTRY
+from .common_utils import batch_forward_wrapper, batch_process_transition_wrapper
 
 
 class Policy(ABC):
@@ -67,7 +69,10 @@ class Policy(ABC):
             'set_attribute',
             'state_dict',
             'load_state_dict',
-        ]
+            'forward_batch',
+            'process_transition_batch',
+        ],
+        defaults=(None, None)
     )
     eval_function = namedtuple(
         'eval_function', [
@@ -337,6 +342,8 @@ class Policy(ABC):
             self._set_attribute,
             self._state_dict_collect,
             self._load_state_dict_collect,
+            self._forward_collect_batch,
+            self._process_transition_batch,
         )
 
     @property
@@ -576,6 +583,41 @@ class Policy(ABC):
         """
         raise NotImplementedError
 
+    def _forward_collect_batch(self, data: Any, env_id: np.ndarray, **kwargs) -> Dict[str, Any]:
+        """
+        Overview:
+            The batch-style policy forward function of collect mode, which is used in the array-native collector \
+            (e.g. ``BatchSampleSerialCollector``) to avoid packing and unpacking the data of each env into dicts in \
+            every step. The default implementation falls back to ``self._forward_collect`` with the dict of each env \
+            data, and the policy can override it to forward the batch data directly.
+        Arguments:
+            - data (:obj:`Any`): The batch data of all the envs, whose first dim of each tensor is the batch size.
+            - env_id (:obj:`np.ndarray`): The env id of each item in the batch.
+        Returns:
+            - output (:obj:`Dict[str, Any]`): The batch output data of policy forward, including at least the action. \
+                Each value is either a batch tensor or a list with the output of each env, and the data of each env \
+                can be got by ``ding.policy.common_utils.get_batch_row``.
+        """
+        return batch_forward_wrapper(self._forward_collect)(data, env_id, **kwargs)
+
+    def _process_transition_batch(self, obs: Any, policy_output: Dict[str, Any],
+                                  timestep: namedtuple) -> Dict[str, Any]:
+        """
+        Overview:
+            The batch-style version of ``self._process_transition``, which packs the transitions of all the envs in \
+            the current step into one dict. The default implementation falls back to ``self._process_transition`` \
+            for each env, and the policy can override it to pack the batch data directly.
+        Arguments:
+            - obs (:obj:`Any`): The batch observation of the current timestep.
+            - policy_output (:obj:`Dict[str, Any]`): The batch output of ``self._forward_collect_batch``.
+            - timestep (:obj:`namedtuple`): The batch timestep, whose obs, reward and done are batch data and \
+                info is the list of info of each env.
+        Returns:
+            - transition (:obj:`Dict[str, Any]`): The batch transition data, the transition of each env can be got \
+                by ``ding.policy.common_utils.get_batch_row``.
+        """
+        return batch_process_transition_wrapper(self._process_transition)(obs, policy_output, timestep)
+
     @abstractmethod
     def _get_train_sample(self, transitions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
@@ -1,4 +1,5 @@
-from typing import List, Any, Dict, Callable
+from typing import List, Any, Dict, Callable, Union
+from collections import namedtuple
 import torch
 import numpy as np
 import treetensor.torch as ttorch
@@ -6,8 +7,24 @@ from ding.utils.data import default_collate
 from ding.torch_utils import to_tensor, to_ndarray, unsqueeze, squeeze
 
 
+def default_collate_learn(data: List[Any]) -> Dict[str, torch.Tensor]:
+    """
+    Overview:
+        Stack the list of training samples into a batch, which is the collate step of ``default_preprocess_learn``.
+    Arguments:
+        - data (:obj:`List[Any]`): The list of a training batch samples, each sample is a dict of PyTorch Tensor.
+    Returns:
+        - data (:obj:`Dict[str, torch.Tensor]`): The stacked batch data.
+    """
+    elem = data[0]
+    if isinstance(elem['action'], (np.ndarray, torch.Tensor)) and elem['action'].dtype in [np.int64, torch.int64]:
+        return default_collate(data, cat_1dim=True)  # for discrete action
+    else:
+        return default_collate(data, cat_1dim=False)  # for continuous action
+
+
 def default_preprocess_learn(
-        data: List[Any],
+        data: Union[List[Any], Dict[str, torch.Tensor]],
         use_priority_IS_weight: bool = False,
         use_priority: bool = False,
         use_nstep: bool = False,
@@ -18,7 +35,8 @@ def default_preprocess_learn(
         Default data pre-processing in policy's ``_forward_learn`` method, including stacking batch data, preprocess \
         ignore done, nstep and priority IS weight.
     Arguments:
-        - data (:obj:`List[Any]`): The list of a training batch samples, each sample is a dict of PyTorch Tensor.
+        - data (:obj:`List[Any]`): The list of a training batch samples, each sample is a dict of PyTorch Tensor, \
+            or the batch collated by ``default_collate_learn``.
         - use_priority_IS_weight (:obj:`bool`): Whether to use priority IS weight correction, if True, this function \
             will set the weight of each sample to the priority IS weight.
         - use_priority (:obj:`bool`): Whether to use priority, if True, this function will set the priority IS weight.
@@ -28,12 +46,9 @@ def default_preprocess_learn(
         - data (:obj:`Dict[str, torch.Tensor]`): The preprocessed dict data whose values can be directly used for \
             the following model forward and loss computation.
     """
-    # data preprocess
-    elem = data[0]
-    if isinstance(elem['action'], (np.ndarray, torch.Tensor)) and elem['action'].dtype in [np.int64, torch.int64]:
-        data = default_collate(data, cat_1dim=True)  # for discrete action
-    else:
-        data = default_collate(data, cat_1dim=False)  # for continuous action
+    # data preprocess, the data may be collated in advance, e.g. by the prefetching ``offpolicy_data_fetcher``
+    if isinstance(data, (list, tuple)):
+        data = default_collate_learn(data)
     if 'value' in data and data['value'].dim() == 2 and data['value'].shape[1] == 1:
         data['value'] = data['value'].squeeze(-1)
     if 'adv' in data and data['adv'].dim() == 2 and data['adv'].shape[1] == 1:
@@ -136,3 +151,108 @@ def single_env_forward_wrapper_ttorch(forward_fn: Callable, cuda: bool = True) -
         return action
 
     return _forward
+
+
+def get_batch_row(data: Any, index: int) -> Any:
+    """
+    Overview:
+        Get the data of one env from the batch data of all the envs, which is used in the batch-style collect \
+        interfaces of policy. It follows the same convention as ``default_decollate`` for tensor: the 1-dim tensor \
+        with shape (B, ) returns the tensor with shape (1, ) and the others remove the first dim. The numpy array \
+        (usually the stacked env data) is indexed directly and the 0-dim result is transformed into python scalar. \
+        The list and tuple contain the data of each env, and the other types (e.g. python scalar) are shared by all \
+        the envs.
+    Arguments:
+        - data (:obj:`Any`): The batch data, which can be the nested dict of the above types.
+        - index (:obj:`int`): The index of the env in the batch.
+    Returns:
+        - row (:obj:`Any`): The data of the corresponding env.
+    Examples:
+        >>> data = {'action': torch.tensor([0, 1]), 'logit': torch.randn(2, 3), 'done': np.array([False, True])}
+        >>> row = get_batch_row(data, 1)
+        >>> assert row['action'].shape == (1, ) and row['logit'].shape == (3, ) and row['done'] is True
+    """
+    if isinstance(data, torch.Tensor):
+        return data[index] if data.dim() > 1 else data[index:index + 1]
+    elif isinstance(data, np.ndarray):
+        row = data[index]
+        return row.item() if isinstance(row, np.generic) else row
+    elif isinstance(data, dict):
+        return {k: get_batch_row(v, index) for k, v in data.items()}
+    elif isinstance(data, (list, tuple)):
+        return data[index]
+    else:
+        return data
+
+
+def get_batch_rows(data: Any, batch_size: int) -> List[Any]:
+    """
+    Overview:
+        Split the batch data into the data list of each env, which is the same as calling ``get_batch_row`` for \
+        each index, but splits each field of the batch data only once.
+    Arguments:
+        - data (:obj:`Any`): The batch data, which can be the nested dict of tensor, numpy array, list and so on.
+        - batch_size (:obj:`int`): The batch size of the data.
+    Returns:
+        - rows (:obj:`List[Any]`): The data list of each env.
+    """
+    if isinstance(data, torch.Tensor):
+        return list(data.unbind(0)) if data.dim() > 1 else list(data.split(1))
+    elif isinstance(data, np.ndarray):
+        return list(data) if data.ndim > 1 else data.tolist()
+    elif isinstance(data, dict):
+        keys = list(data.keys())
+        return [dict(zip(keys, values)) for values in zip(*[get_batch_rows(data[k], batch_size) for k in keys])]
+    elif isinstance(data, (list, tuple)):
+        return list(data)
+    else:
+        return [data for _ in range(batch_size)]
+
+
+def batch_forward_wrapper(forward_fn: Callable) -> Callable:
+    """
+    Overview:
+        Wrap the dict-style collect forward function of policy into the batch-style one, whose input is the batch \
+        data of all the envs and output is the dict of policy output, and each value of the output is a list with \
+        the result of each env. This is the fallback for the policies without a native batch forward function.
+    Arguments:
+        - forward_fn (:obj:`Callable`): The original forward function of policy, whose input and output are dicts \
+            with env id as keys.
+    Returns:
+        - wrapped_forward_fn (:obj:`Callable`): The wrapped forward function of policy.
+    Examples:
+        >>> forward_fn = batch_forward_wrapper(policy.collect_mode.forward)
+        >>> output = forward_fn(torch.randn(4, 8), np.arange(4), eps=0.1)
+        >>> assert len(output['action']) == 4
+    """
+
+    def _forward(data: Any, env_id: np.ndarray, **kwargs) -> Dict[str, Any]:
+        env_id = env_id.tolist()
+        output = forward_fn({i: get_batch_row(data, j) for j, i in enumerate(env_id)}, **kwargs)
+        return {k: [output[i][k] for i in env_id] for k in output[env_id[0]].keys()}
+
+    return _forward
+
+
+def batch_process_transition_wrapper(process_fn: Callable) -> Callable:
+    """
+    Overview:
+        Wrap the process_transition function of policy, which packs the transition of one env, into the batch-style \
+        one, which packs the transitions of all the envs into one dict and each value of it is a list with the \
+        result of each env. This is the fallback for the policies without a native batch process_transition function.
+    Arguments:
+        - process_fn (:obj:`Callable`): The original process_transition function of policy.
+    Returns:
+        - wrapped_process_fn (:obj:`Callable`): The wrapped process_transition function of policy.
+    """
+
+    def _process(obs: Any, policy_output: Dict[str, Any], timestep: namedtuple) -> Dict[str, Any]:
+        transitions = [
+            process_fn(
+                get_batch_row(obs, i), get_batch_row(policy_output, i),
+                type(timestep)(**get_batch_row(timestep._asdict(), i))
+            ) for i in range(len(timestep.info))
+        ]
+        return {k: [t[k] for t in transitions] for k in transitions[0].keys()}
+
+    return _process
@@ -1,6 +1,7 @@
 from typing import List, Dict, Any, Tuple
 from collections import namedtuple
 import copy
+import numpy as np
 import torch
 
 from ding.torch_utils import Adam, to_device, ContrastiveLoss
@@ -392,6 +393,49 @@ class DQNPolicy(Policy):
         output = default_decollate(output)
         return {i: d for i, d in zip(data_id, output)}
 
+    def _forward_collect_batch(self, data: torch.Tensor, env_id: np.ndarray, eps: float) -> Dict[str, torch.Tensor]:
+        """
+        Overview:
+            The batch-style policy forward function of collect mode, which forwards the batch obs of all the envs \
+            directly without packing and unpacking the data of each env. The subclass which overrides \
+            ``self._forward_collect`` falls back to the default implementation of base class.
+        Arguments:
+            - data (:obj:`torch.Tensor`): The batch obs of all the envs.
+            - env_id (:obj:`np.ndarray`): The env id of each item in the batch.
+            - eps (:obj:`float`): The epsilon value for exploration.
+        Returns:
+            - output (:obj:`Dict[str, torch.Tensor]`): The batch output of policy forward, including action and logit.
+        """
+        if type(self)._forward_collect is not DQNPolicy._forward_collect:
+            return super()._forward_collect_batch(data, env_id, eps=eps)
+        if self._cuda:
+            data = to_device(data, self._device)
+        self._collect_model.eval()
+        with torch.no_grad():
+            output = self._collect_model.forward(data, eps=eps)
+        if self._cuda:
+            output = to_device(output, 'cpu')
+        return output
+
+    def _process_transition_batch(
+            self, obs: torch.Tensor, policy_output: Dict[str, torch.Tensor], timestep: namedtuple
+    ) -> Dict[str, torch.Tensor]:
+        """
+        Overview:
+            The batch-style version of ``self._process_transition``. Because the transition of DQN is packed field by \
+            field, the batch transition is packed in the same way. The subclass which overrides \
+            ``self._process_transition`` falls back to the default implementation of base class.
+        Arguments:
+            - obs (:obj:`torch.Tensor`): The batch obs of current timestep.
+            - policy_output (:obj:`Dict[str, torch.Tensor]`): The batch output of policy forward.
+            - timestep (:obj:`namedtuple`): The batch timestep returned by the envs.
+        Returns:
+            - transition (:obj:`Dict[str, torch.Tensor]`): The batch transition data of the current timestep.
+        """
+        if type(self)._process_transition is not DQNPolicy._process_transition:
+            return super()._process_transition_batch(obs, policy_output, timestep)
+        return self._process_transition(obs, policy_output, timestep)
+
     def _get_train_sample(self, transitions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
         Overview:
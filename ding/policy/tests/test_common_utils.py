@@ -1,10 +1,12 @@
 import unittest
+from collections import namedtuple
 import pytest
 import numpy as np
 import torch
 import treetensor.torch as ttorch
 
-from ding.policy.common_utils import default_preprocess_learn
+from ding.policy.common_utils import default_preprocess_learn, get_batch_row, get_batch_rows, batch_forward_wrapper, \
+    batch_process_transition_wrapper
 
 shape_test = [
     [2],
@@ -177,3 +179,52 @@ def test_default_preprocess_learn_nstep():
     assert data['reward'][0][0] == torch.tensor(1.0)
     assert data['reward'][1][0] == torch.tensor(2.0)
     assert data['reward'][2][0] == torch.tensor(0.0)
+
+
+@pytest.mark.unittest
+def test_get_batch_row():
+    data = {
+        'obs': {
+            'a': np.random.randn(3, 4),
+            'b': torch.randn(3, 2)
+        },
+        'action': torch.tensor([0, 1, 1]),
+        'done': np.array([False, True, False]),
+        'info': [{}, {
+            'x': 1
+        }, {}],
+        'collect_iter': 5,
+    }
+    rows = get_batch_rows(data, 3)
+    for i in range(3):
+        row = get_batch_row(data, i)
+        assert row['obs']['a'].shape == (4, ) and row['obs']['b'].shape == (2, )
+        # the same convention as default_decollate for 1-dim tensor
+        assert row['action'].shape == (1, ) and row['action'].item() == data['action'][i].item()
+        assert isinstance(row['done'], bool) and row['done'] == data['done'][i]
+        assert row['info'] is data['info'][i] and row['collect_iter'] == 5
+        assert np.array_equal(rows[i]['obs']['a'], row['obs']['a'])
+        assert torch.equal(rows[i]['obs']['b'], row['obs']['b']) and torch.equal(rows[i]['action'], row['action'])
+        assert rows[i]['done'] is row['done'] and rows[i]['info'] is row['info'] and rows[i]['collect_iter'] == 5
+
+
+@pytest.mark.unittest
+def test_batch_wrapper():
+
+    def forward(data, eps):
+        return {i: {'action': torch.tensor([int(d.sum() > 0)]), 'eps': eps} for i, d in data.items()}
+
+    def process_transition(obs, policy_output, timestep):
+        return {'obs': obs, 'action': policy_output['action'], 'reward': timestep.reward, 'done': timestep.done}
+
+    obs = torch.randn(4, 3)
+    output = batch_forward_wrapper(forward)(obs, np.array([3, 0, 2, 1]), eps=0.1)
+    assert len(output['action']) == 4 and output['eps'] == [0.1] * 4
+    assert all([output['action'][i].item() == int(obs[i].sum() > 0) for i in range(4)])
+    timestep = namedtuple('timestep',
+                          ['obs', 'reward', 'done', 'info'])(obs, np.ones((4, 1)), np.zeros(4, bool), [{}] * 4)
+    transition = batch_process_transition_wrapper(process_transition)(obs, output, timestep)
+    for i in range(4):
+        t = get_batch_row(transition, i)
+        assert torch.equal(t['obs'], obs[i]) and t['action'] is output['action'][i]
+        assert t['reward'].shape == (1, ) and t['done'] is False
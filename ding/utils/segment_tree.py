@@ -1,5 +1,5 @@
 from functools import partial, lru_cache
-from typing import Callable, Optional
+from typing import Callable, Optional, Union
 
 import numpy as np
 
@@ -34,11 +34,22 @@ def njit():
     return _njit
 
 
+def use_numba() -> bool:
+    """
+    Overview:
+        Whether the functions decorated by ``njit`` are really compiled by numba. If not, the batch operations of \
+        the segment tree will use the pure numpy implementation instead of the python loops.
+    """
+    return njit() is not partial
+
+
 class SegmentTree:
     """
     Overview:
         Segment tree data structure, implemented by the tree-like array. Only the leaf nodes are real value,
         non-leaf nodes are to do some operations on its left and right child.
+        ``__setitem__``, ``__getitem__`` and ``find_prefixsum_idx`` also accept an array of indices (values), \
+        which are processed in one vectorized call.
     Interfaces:
         ``__init__``, ``reduce``, ``__setitem__``, ``__getitem__``
     """
@@ -91,27 +102,44 @@ class SegmentTree:
         end += self.capacity
         return _reduce(self.value, start, end, self.neutral_element, self.operation)
 
-    def __setitem__(self, idx: int, val: float) -> None:
+    def __setitem__(self, idx: Union[int, np.ndarray], val: Union[float, np.ndarray]) -> None:
         """
         Overview:
             Set ``leaf[idx] = val``; Then update the related nodes.
         Arguments:
-            - idx (:obj:`int`): Leaf node index(relative index), should add ``capacity`` to change to absolute index.
-            - val (:obj:`float`): The value that will be assigned to ``leaf[idx]``.
+            - idx (:obj:`Union[int, np.ndarray]`): Leaf node index(relative index), should add ``capacity`` to \
+                change to absolute index. An array of indices will set all the leaves in one batch.
+            - val (:obj:`Union[float, np.ndarray]`): The value that will be assigned to ``leaf[idx]``.
         """
+        if isinstance(idx, (list, tuple, np.ndarray)):
+            idx = np.asarray(idx, dtype=np.int64)
+            if idx.size == 0:
+                return
+            assert (0 <= idx.min() and idx.max() < self.capacity), idx
+            val = np.broadcast_to(np.asarray(val, dtype=self.value.dtype), idx.shape)
+            if use_numba():
+                _setitem_batch(self.value, idx + self.capacity, np.ascontiguousarray(val), self.operation)
+            else:
+                _setitem_batch_numpy(self.value, idx + self.capacity, val, self.operation)
+            return
         assert (0 <= idx < self.capacity), idx
         # ``idx`` should add ``capacity`` to change to absolute index.
         _setitem(self.value, idx + self.capacity, val, self.operation)
 
-    def __getitem__(self, idx: int) -> float:
+    def __getitem__(self, idx: Union[int, np.ndarray]) -> Union[float, np.ndarray]:
         """
         Overview:
             Get ``leaf[idx]``
         Arguments:
-            - idx (:obj:`int`): Leaf node ``index(relative index)``, add ``capacity`` to change to absolute index.
+            - idx (:obj:`Union[int, np.ndarray]`): Leaf node ``index(relative index)``, add ``capacity`` to \
+                change to absolute index. An array of indices will get all the leaves in one batch.
         Returns:
-            - val (:obj:`float`): The value of ``leaf[idx]``
+            - val (:obj:`Union[float, np.ndarray]`): The value of ``leaf[idx]``
         """
+        if isinstance(idx, (list, tuple, np.ndarray)):
+            idx = np.asarray(idx, dtype=np.int64)
+            assert idx.size == 0 or (0 <= idx.min() and idx.max() < self.capacity)
+            return self.value[idx + self.capacity]
         assert (0 <= idx < self.capacity)
         return self.value[idx + self.capacity]
 
@@ -128,6 +156,10 @@ class SegmentTree:
             _setitem(d, 0, 3.0, 'sum')
             _reduce(d, 0, 1, 0.0, 'min')
             _find_prefixsum_idx(d, 1, 0.5, 0.0)
+        if use_numba():
+            idx = np.array([1], dtype=np.int64)
+            _setitem_batch(f64.copy(), idx, np.array([3.0]), 'sum')
+            _find_prefixsum_idx_batch(f64, 1, np.array([0.5]), 0.0)
 
 
 class SumSegmentTree(SegmentTree):
@@ -147,19 +179,29 @@ class SumSegmentTree(SegmentTree):
         """
         super(SumSegmentTree, self).__init__(capacity, operation='sum')
 
-    def find_prefixsum_idx(self, prefixsum: float, trust_caller: bool = True) -> int:
+    def find_prefixsum_idx(self,
+                           prefixsum: Union[float, np.ndarray],
+                           trust_caller: bool = True) -> Union[int, np.ndarray]:
         """
         Overview:
             Find the highest non-zero index i, sum_{j}leaf[j] <= ``prefixsum`` (where 0 <= j < i)
             and sum_{j}leaf[j] > ``prefixsum`` (where 0 <= j < i+1)
         Arguments:
-            - prefixsum (:obj:`float`): The target prefixsum.
+            - prefixsum (:obj:`Union[float, np.ndarray]`): The target prefixsum, an array of prefixsums will be \
+                searched in one batch.
             - trust_caller (:obj:`bool`): Whether to trust caller, which means whether to check whether \
                 this tree's sum is greater than the input ``prefixsum`` by calling ``reduce`` function.
                 Default set to True.
         Returns:
-            - idx (:obj:`int`): Eligible index.
+            - idx (:obj:`Union[int, np.ndarray]`): Eligible index, an int64 array for the batch input.
         """
+        if isinstance(prefixsum, (list, tuple, np.ndarray)):
+            prefixsum = np.asarray(prefixsum, dtype=np.float64)
+            if not trust_caller:
+                assert prefixsum.size == 0 or (0 <= prefixsum.min() and prefixsum.max() <= self.reduce() + 1e-5)
+            if use_numba():
+                return _find_prefixsum_idx_batch(self.value, self.capacity, prefixsum, self.neutral_element)
+            return _find_prefixsum_idx_batch_numpy(self.value, self.capacity, prefixsum, self.neutral_element)
         if not trust_caller:
             assert 0 <= prefixsum <= self.reduce() + 1e-5, prefixsum
         return _find_prefixsum_idx(self.value, self.capacity, prefixsum, self.neutral_element)
@@ -282,3 +324,88 @@ def _find_prefixsum_idx(tree: np.ndarray, capacity: int, prefixsum: float, neutr
             raise ValueError("All elements in tree are the neutral_element(0), can't find non-zero element")
     assert (tree[idx] != neutral_element)
     return idx - capacity
+
+
+@njit()
+def _setitem_batch(tree: np.ndarray, idx: np.ndarray, val: np.ndarray, operation: str) -> None:
+    """
+    Overview:
+        Set ``tree[idx[i]] = val[i]`` for each i, compiled by numba; Then update the related nodes.
+    Arguments:
+        - tree (:obj:`np.ndarray`): The tree array.
+        - idx (:obj:`np.ndarray`): The absolute indices of the leaf nodes.
+        - val (:obj:`np.ndarray`): The values that will be assigned to the leaves.
+        - operation (:obj:`str`): The operation function to construct the tree, e.g. sum, max, min, etc.
+    """
+    for i in range(len(idx)):
+        _setitem(tree, idx[i], val[i], operation)
+
+
+def _setitem_batch_numpy(tree: np.ndarray, idx: np.ndarray, val: np.ndarray, operation: str) -> None:
+    """
+    Overview:
+        Set ``tree[idx[i]] = val[i]`` for each i, then update the related nodes level by level, \
+        implemented by numpy. For duplicated indices, the last value is kept as the sequential version.
+    Arguments:
+        - tree (:obj:`np.ndarray`): The tree array.
+        - idx (:obj:`np.ndarray`): The absolute indices of the leaf nodes.
+        - val (:obj:`np.ndarray`): The values that will be assigned to the leaves.
+        - operation (:obj:`str`): The operation function to construct the tree, e.g. sum, max, min, etc.
+    """
+    tree[idx] = val
+    if operation == 'sum':
+        op = np.add
+    elif operation == 'min':
+        op = np.minimum
+    else:
+        raise ValueError("operation argument should be in min, sum, but got {}".format(operation))
+    # All the leaves are in the same level, so their ancestors are updated level by level.
+    idx = np.unique(idx >> 1)
+    while idx[0] >= 1:
+        tree[idx] = op(tree[2 * idx], tree[2 * idx + 1])
+        idx = np.unique(idx >> 1)
+
+
+@njit()
+def _find_prefixsum_idx_batch(
+        tree: np.ndarray, capacity: int, prefixsum: np.ndarray, neutral_element: float
+) -> np.ndarray:
+    """
+    Overview:
+        Batch version of ``_find_prefixsum_idx``, compiled by numba.
+    Arguments:
+        - tree (:obj:`np.ndarray`): The tree array.
+        - capacity (:obj:`int`): Capacity of the tree (the number of the leaf nodes).
+        - prefixsum (:obj:`np.ndarray`): The target prefixsums.
+        - neutral_element (:obj:`float`): The value of the neutral element.
+    """
+    result = np.empty(len(prefixsum), dtype=np.int64)
+    for i in range(len(prefixsum)):
+        result[i] = _find_prefixsum_idx(tree, capacity, prefixsum[i], neutral_element)
+    return result
+
+
+def _find_prefixsum_idx_batch_numpy(
+        tree: np.ndarray, capacity: int, prefixsum: np.ndarray, neutral_element: float
+) -> np.ndarray:
+    """
+    Overview:
+        Batch version of ``_find_prefixsum_idx``, all the prefixsums go down the tree together, \
+        implemented by numpy.
+    Arguments:
+        - tree (:obj:`np.ndarray`): The tree array.
+        - capacity (:obj:`int`): Capacity of the tree (the number of the leaf nodes).
+        - prefixsum (:obj:`np.ndarray`): The target prefixsums.
+        - neutral_element (:obj:`float`): The value of the neutral element.
+    """
+    prefixsum = prefixsum.copy()
+    idx = np.ones(len(prefixsum), dtype=np.int64)
+    while idx.size > 0 and idx[0] < capacity:
+        left = tree[2 * idx]
+        go_right = left <= prefixsum
+        prefixsum -= np.where(go_right, left, 0.)
+        idx = 2 * idx + go_right
+    # Special case: falls on the last neutral leaf, the same as ``_find_prefixsum_idx``
+    for i in np.nonzero(tree[idx] == neutral_element)[0]:
+        idx[i] = _find_prefixsum_idx(tree, capacity, tree[1], neutral_element) + capacity
+    return idx - capacity
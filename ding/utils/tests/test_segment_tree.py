@@ -1,9 +1,12 @@
+import time
 import numpy as np
 import pytest
 
 import ding
 ding.enable_numba = False  # noqa
 from ding.utils import SumSegmentTree, MinSegmentTree  # noqa
+from ding.utils.segment_tree import _setitem_batch, _setitem_batch_numpy, _find_prefixsum_idx_batch, \
+    _find_prefixsum_idx_batch_numpy  # noqa
 
 
 @pytest.mark.unittest
@@ -58,6 +61,34 @@ class TestSumSegmentTree:
         assert (tree.find_prefixsum_idx(0.8) == 6)
         assert (tree.find_prefixsum_idx(tree.reduce()) == 6)
 
+    def test_batch(self):
+        capacity = 64
+        elements = np.random.rand(capacity)
+        elements[np.random.rand(capacity) < 0.3] = 0.
+        tree = SumSegmentTree(capacity=capacity)
+        batch_tree = SumSegmentTree(capacity=capacity)
+        idx = np.random.permutation(capacity)
+        for i in idx:
+            tree[i] = elements[i]
+        batch_tree[idx] = elements[idx]
+        assert np.allclose(tree.value, batch_tree.value)
+        assert np.allclose(batch_tree[idx], elements[idx])
+
+        prefixsum = np.random.rand(128) * tree.reduce()
+        prefixsum[0] = tree.reduce()
+        expected = np.array([tree.find_prefixsum_idx(p) for p in prefixsum])
+        assert (batch_tree.find_prefixsum_idx(prefixsum) == expected).all()
+        with pytest.raises(AssertionError):
+            tree.find_prefixsum_idx(prefixsum + 1, trust_caller=False)
+
+        # Both numba(or python loop) and numpy implementations
+        for setitem, find in [(_setitem_batch, _find_prefixsum_idx_batch),
+                              (_setitem_batch_numpy, _find_prefixsum_idx_batch_numpy)]:
+            value = np.zeros(capacity * 2)
+            setitem(value, idx + capacity, elements[idx], 'sum')
+            assert np.allclose(value, tree.value)
+            assert (find(value, capacity, prefixsum, 0.) == expected).all()
+
 
 @pytest.mark.unittest
 class TestMinSegmentTree:
@@ -85,3 +116,46 @@ class TestMinSegmentTree:
         assert (tree.reduce(1, 3) == min(elements[1:3]))
         assert (tree.reduce(1, 2) == min(elements[1:2]))
         assert (tree.reduce(2, 3) == min(elements[2:3]))
+
+    def test_batch(self):
+        tree = MinSegmentTree(capacity=16)
+        batch_tree = MinSegmentTree(capacity=16)
+        elements = np.random.randn(16)
+        for idx, val in enumerate(elements):
+            tree[idx] = val
+        batch_tree[np.arange(16)] = elements
+        assert np.allclose(tree.value, batch_tree.value)
+        batch_tree[[3, 5]] = -100.
+        assert batch_tree.reduce() == -100.
+        assert (batch_tree[[3, 5]] == -100.).all()
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize('capacity', [int(1e5), int(1e6), int(1e7)])
+def test_batch_benchmark(capacity):
+    capacity = int(np.power(2, np.ceil(np.log2(capacity))))
+    tree = SumSegmentTree(capacity=capacity)
+    tree[np.arange(capacity)] = np.random.rand(capacity)
+    for batch_size in [512, 4096]:
+        idx = np.random.randint(0, capacity, size=batch_size)
+        val = np.random.rand(batch_size)
+        prefixsum = np.random.rand(batch_size) * tree.reduce()
+
+        def timeit(fn, repeats=10):
+            t = time.time()
+            for _ in range(repeats):
+                fn()
+            return (time.time() - t) / repeats * 1000
+
+        loop_set = timeit(lambda: [tree.__setitem__(i, v) for i, v in zip(idx, val)])
+        batch_set = timeit(lambda: tree.__setitem__(idx, val))
+        loop_find = timeit(lambda: [tree.find_prefixsum_idx(p) for p in prefixsum])
+        batch_find = timeit(lambda: tree.find_prefixsum_idx(prefixsum))
+        loop_get = timeit(lambda: [tree[i] for i in idx])
+        batch_get = timeit(lambda: tree[idx])
+        print(
+            "capacity {} batch {}: setitem {:.3f}ms -> {:.3f}ms, find_prefixsum_idx {:.3f}ms -> {:.3f}ms, "
+            "getitem {:.3f}ms -> {:.3f}ms".format(
+                capacity, batch_size, loop_set, batch_set, loop_find, batch_find, loop_get, batch_get
+            )
+        )
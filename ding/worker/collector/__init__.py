@@ -3,6 +3,7 @@ from .base_serial_collector import ISerialCollector, create_serial_collector, ge
     to_tensor_transitions
 
 from .sample_serial_collector import SampleSerialCollector
+from .batch_sample_serial_collector import BatchSampleSerialCollector
 from .episode_serial_collector import EpisodeSerialCollector
 from .battle_episode_serial_collector import BattleEpisodeSerialCollector
 from .battle_sample_serial_collector import BattleSampleSerialCollector
@@ -0,0 +1,373 @@
+from typing import Optional, Any, List, Dict
+from collections import namedtuple
+import numpy as np
+import torch
+
+from ding.envs import BaseEnvManager
+from ding.policy.common_utils import get_batch_row, get_batch_rows, batch_forward_wrapper, \
+    batch_process_transition_wrapper
+from ding.utils import SERIAL_COLLECTOR_REGISTRY, one_time_warning, allreduce_data
+from ding.torch_utils import to_tensor, to_ndarray
+from .base_serial_collector import to_tensor_transitions
+from .sample_serial_collector import SampleSerialCollector
+
+
+def stack_env_data(data: List[Any]) -> Any:
+    """
+    Overview:
+        Stack the data (e.g. obs, reward and done) returned by each env into the batch data, the numpy array, python \
+        scalar and torch tensor are stacked along the new first dim and the dict is stacked recursively. The other \
+        types (e.g. None or the data with different shape) are kept as the list of the data of each env.
+    Arguments:
+        - data (:obj:`List[Any]`): The data list of each env.
+    Returns:
+        - batch (:obj:`Any`): The stacked batch data, the data of each env can be got by ``get_batch_row``.
+    """
+    elem = data[0]
+    if isinstance(elem, dict):
+        return {k: stack_env_data([d[k] for d in data]) for k in elem.keys()}
+    elif isinstance(elem, torch.Tensor):
+        return torch.stack(data)
+    elif isinstance(elem, (np.ndarray, np.generic, bool, int, float)):
+        try:
+            return np.stack(data)
+        except ValueError:
+            return list(data)
+    else:
+        return list(data)
+
+
+def select_batch_rows(data: Any, rows: np.ndarray) -> Any:
+    """
+    Overview:
+        Select the rows of the batch data, the selected batch data follows the same convention of ``get_batch_row``.
+    Arguments:
+        - data (:obj:`Any`): The batch data.
+        - rows (:obj:`np.ndarray`): The indices of selected rows.
+    Returns:
+        - batch (:obj:`Any`): The selected batch data.
+    """
+    if isinstance(data, torch.Tensor):
+        return data[torch.as_tensor(rows, dtype=torch.long)]
+    elif isinstance(data, np.ndarray):
+        return data[rows]
+    elif isinstance(data, dict):
+        return {k: select_batch_rows(v, rows) for k, v in data.items()}
+    elif isinstance(data, (list, tuple)):
+        return [data[r] for r in rows]
+    else:
+        return data
+
+
+@SERIAL_COLLECTOR_REGISTRY.register('batch_sample')
+class BatchSampleSerialCollector(SampleSerialCollector):
+    """
+    Overview:
+        Array-native sample collector, which has the same interfaces and returns the same train samples as \
+        ``SampleSerialCollector``, but keeps the data of all the envs in one step as batch data from the obs to the \
+        transition. The obs of the ready envs are stacked only once, then the policy forward and transition packing \
+        are executed on the whole batch by ``forward_batch`` and ``process_transition_batch`` interfaces of the \
+        collect mode policy, and the trajectories are stored as the references to the batch transitions. The \
+        transition of each env is only sliced out when its trajectory is sent to ``get_train_sample``. The policy \
+        without batch interfaces (e.g. random policy) falls back to the dict-style ``forward`` and \
+        ``process_transition`` automatically.
+    Interfaces:
+        __init__, reset, reset_env, reset_policy, collect, close
+    Property:
+        envstep
+
+    .. note::
+        The policy obs input is always the batch tensor (the same as ``transform_obs=True`` in \
+        ``SampleSerialCollector``), and ``dreamer_command`` and ``ngu_command`` policies are not supported.
+    """
+
+    config = dict(deepcopy_obs=False, transform_obs=False, collect_print_freq=100)
+
+    def reset_policy(self, _policy: Optional[namedtuple] = None) -> None:
+        """
+        Overview:
+            Reset the policy. If the new policy doesn't have the batch-style collect interfaces, the dict-style \
+            interfaces are wrapped as the fallback.
+        Arguments:
+            - policy (:obj:`Optional[namedtuple]`): the api namedtuple of collect_mode policy
+        """
+        super().reset_policy(_policy)
+        if _policy is not None:
+            assert self._policy_cfg.type not in ['dreamer_command', 'ngu_command'], \
+                "BatchSampleSerialCollector doesn't support policy: {}".format(self._policy_cfg.type)
+            forward_batch = getattr(_policy, 'forward_batch', None)
+            process_transition_batch = getattr(_policy, 'process_transition_batch', None)
+            if forward_batch is None:
+                forward_batch = batch_forward_wrapper(_policy.forward)
+            if process_transition_batch is None:
+                process_transition_batch = batch_process_transition_wrapper(_policy.process_transition)
+            self._forward_batch = forward_batch
+            self._process_transition_batch = process_transition_batch
+
+    def reset(self, _policy: Optional[namedtuple] = None, _env: Optional[BaseEnvManager] = None) -> None:
+        """
+        Overview:
+            Reset the environment and policy, and the batch trajectory storage of the collector.
+        Arguments:
+            - policy (:obj:`Optional[namedtuple]`): the api namedtuple of collect_mode policy
+            - env (:obj:`Optional[BaseEnvManager]`): instance of the subclass of vectorized \
+                env_manager(BaseEnvManager)
+        """
+        if _env is not None:
+            self.reset_env(_env)
+        if _policy is not None:
+            self.reset_policy(_policy)
+
+        # the obs and policy output batch of the latest step of each env, which are indexed by _batch_of and _row_of
+        self._batch_pool = {}
+        self._batch_index = 0
+        self._batch_of = np.full(self._env_num, -1, dtype=np.int64)
+        self._row_of = np.full(self._env_num, -1, dtype=np.int64)
+        # the batch transitions of each step, {step_index: [row of each env (-1 means absent), transition, split rows,
+        # whether the rows are in tensor format]}
+        self._traj_steps = {}
+        self._step_index = 0
+        self._traj_start = np.zeros(self._env_num, dtype=np.int64)
+        self._traj_count = np.zeros(self._env_num, dtype=np.int64)
+        self._env_info = {
+            'time': np.zeros(self._env_num),
+            'step': np.zeros(self._env_num, dtype=np.int64),
+            'train_sample': np.zeros(self._env_num, dtype=np.int64),
+        }
+
+        self._episode_info = []
+        self._total_envstep_count = 0
+        self._total_episode_count = 0
+        self._total_train_sample_count = 0
+        self._total_duration = 0
+        self._last_train_iter = 0
+        self._end_flag = False
+
+    def _reset_stat(self, env_id: Any) -> None:
+        """
+        Overview:
+            Reset the collector's state of the envs, including the trajectory and env_info.
+        Arguments:
+            - env_id (:obj:`Any`): the id (or the array of ids) where we need to reset the collector's state
+        """
+        self._traj_start[env_id] = self._step_index
+        self._traj_count[env_id] = 0
+        self._batch_of[env_id] = -1
+        self._row_of[env_id] = -1
+        for v in self._env_info.values():
+            v[env_id] = 0
+
+    def _gather_step_input(self, env_id: np.ndarray) -> Any:
+        """
+        Overview:
+            Gather the obs and policy output batch for the envs in the timesteps. It is the rows of the latest batch \
+            in most cases, and the batch is rebuilt row by row only when the envs come from different batches, \
+            e.g. in async env manager.
+        """
+        batch_of = self._batch_of[env_id]
+        if (batch_of == batch_of[0]).all():
+            obs, policy_output = self._batch_pool[batch_of[0]]
+            rows = self._row_of[env_id]
+            if len(rows) != len(policy_output['action']) or (rows != np.arange(len(rows))).any():
+                obs, policy_output = select_batch_rows(obs, rows), select_batch_rows(policy_output, rows)
+            return obs, policy_output
+        rows = [(self._batch_pool[b], r) for b, r in zip(batch_of, self._row_of[env_id])]
+        obs = [get_batch_row(o, r) for (o, _), r in rows]
+        policy_output = {k: [get_batch_row(p[k], r) for (_, p), r in rows] for k in rows[0][0][1].keys()}
+        return obs, policy_output
+
+    def _pop_trajectory(self, env_id: int) -> List[Dict[str, Any]]:
+        """
+        Overview:
+            Slice out the transitions of the current trajectory of the env from the batch transitions and transform \
+            them into tensor format like ``to_tensor_transitions``. The batch transition of each step is converted \
+            into tensor and split into the transitions of all the envs in it only once, when it is firstly used by \
+            any trajectory.
+        """
+        transitions, tensor_ready = [], True
+        for index in range(self._traj_start[env_id], self._step_index + 1):
+            step = self._traj_steps[index]
+            row_of, transition, rows, ready = step
+            if row_of[env_id] < 0:
+                continue
+            if rows is None:
+                transition = {
+                    k: to_tensor(v) if isinstance(v, np.ndarray) and v.ndim > 1 else v
+                    for k, v in transition.items()
+                }
+                # the rows are already in tensor format if the fields are tensors or scalars
+                ready = all(
+                    [
+                        isinstance(v, (torch.Tensor, bool, int, float))
+                        or (isinstance(v, np.ndarray) and v.dtype.kind in 'biuf') for v in transition.values()
+                    ]
+                )
+                rows = get_batch_rows(transition, (row_of >= 0).sum())
+                step[2], step[3] = rows, ready
+            transitions.append(rows[row_of[env_id]])
+            tensor_ready = tensor_ready and ready
+        if not tensor_ready:
+            return to_tensor_transitions(transitions, not self._deepcopy_obs)
+        if not self._deepcopy_obs and 'next_obs' in transitions[0]:
+            # shallow copy next_obs, the same as ``to_tensor_transitions``
+            for i in range(len(transitions) - 1):
+                transitions[i]['next_obs'] = transitions[i + 1]['obs']
+        return transitions
+
+    def collect(
+            self,
+            n_sample: Optional[int] = None,
+            train_iter: int = 0,
+            drop_extra: bool = True,
+            random_collect: bool = False,
+            record_random_collect: bool = True,
+            policy_kwargs: Optional[dict] = None,
+            level_seeds: Optional[List] = None,
+    ) -> List[Any]:
+        """
+        Overview:
+            Collect `n_sample` data with policy_kwargs, which is already trained `train_iter` iterations.
+        Arguments:
+            - n_sample (:obj:`int`): The number of collecting data sample.
+            - train_iter (:obj:`int`): The number of training iteration when calling collect method.
+            - drop_extra (:obj:`bool`): Whether to drop extra return_data more than `n_sample`.
+            - record_random_collect (:obj:`bool`) :Whether to output logs of random collect.
+            - policy_kwargs (:obj:`dict`): The keyword args for policy forward.
+            - level_seeds (:obj:`dict`): Used in PLR, represents the seed of the environment that \
+                generate the data
+        Returns:
+            - return_data (:obj:`List`): A list containing training samples.
+        """
+        if n_sample is None:
+            if self._default_n_sample is None:
+                raise RuntimeError("Please specify collect n_sample")
+            else:
+                n_sample = self._default_n_sample
+        if n_sample % self._env_num != 0:
+            one_time_warning(
+                "Please make sure env_num is divisible by n_sample: {}/{}, ".format(n_sample, self._env_num) +
+                "which may cause convergence problems in a few algorithms"
+            )
+        if policy_kwargs is None:
+            policy_kwargs = {}
+        collected_sample = 0
+        collected_step = 0
+        collected_episode = 0
+        return_data = []
+
+        while collected_sample < n_sample:
+            with self._timer:
+                # Get current env obs and stack them into one batch.
+                obs = self._env.ready_obs
+                env_id = np.fromiter(obs.keys(), dtype=np.int64, count=len(obs))
+                obs = stack_env_data(list(obs.values()))
+                # Policy forward.
+                obs_tensor = to_tensor(obs, dtype=torch.float32) if self._transform_obs else to_tensor(obs)
+                policy_output = self._forward_batch(obs_tensor, env_id, **policy_kwargs)
+                self._batch_pool[self._batch_index] = (obs, policy_output)
+                self._batch_of[env_id] = self._batch_index
+                self._row_of[env_id] = np.arange(len(env_id))
+                self._batch_index += 1
+                # Interact with env.
+                action = policy_output['action']
+                if isinstance(action, torch.Tensor):
+                    # the action of each env keeps the batch dim for 1-dim action, the same as ``default_decollate``
+                    action = action.numpy()
+                    action = list(action) if action.ndim > 1 else list(action[:, None])
+                else:
+                    action = [to_ndarray(a) for a in action]
+                actions = dict(zip(env_id.tolist(), action))
+                timesteps = self._env.step(actions)
+
+                # Reset the envs with abnormal timestep and pack the batch transition of the others.
+                abnormal = [i for i, t in timesteps.items() if t.info.get('abnormal', False)]
+                for i in abnormal:
+                    # suppose there is no reset param, just reset this env
+                    self._env.reset({i: None})
+                    self._logger.info('Env{} returns a abnormal step, its info is {}'.format(i, timesteps[i].info))
+                if len(abnormal) > 0:
+                    self._policy.reset(abnormal)
+                    self._reset_stat(abnormal)
+                    timesteps = {i: t for i, t in timesteps.items() if i not in abnormal}
+                if len(timesteps) > 0:
+                    step_id = np.fromiter(timesteps.keys(), dtype=np.int64, count=len(timesteps))
+                    timestep_list = list(timesteps.values())
+                    timestep = type(timestep_list[0])._make(
+                        [
+                            stack_env_data(list(v)) if k != 'info' else list(v)
+                            for k, v in zip(timestep_list[0]._fields, zip(*timestep_list))
+                        ]
+                    )
+                    step_obs, step_policy_output = self._gather_step_input(step_id)
+                    transition = self._process_transition_batch(step_obs, step_policy_output, timestep)
+                    if level_seeds is not None:
+                        transition['seed'] = [level_seeds[i] for i in step_id.tolist()]
+                    # ``train_iter`` passed in from ``serial_entry``, indicates current collecting model's iteration.
+                    transition['collect_iter'] = train_iter
+                    row_of = np.full(self._env_num, -1, dtype=np.int64)
+                    row_of[step_id] = np.arange(len(step_id))
+                    self._traj_steps[self._step_index] = [row_of, transition, None, False]
+                    self._traj_count[step_id] += 1
+                    self._env_info['step'][step_id] += 1
+                    collected_step += len(step_id)
+
+                    done = np.asarray(timestep.done, dtype=bool).reshape(len(step_id))
+                    # Episode is done or the trajectory is full.
+                    for i in step_id[done | (self._traj_count[step_id] == self._traj_len)].tolist():
+                        transitions = self._pop_trajectory(i)
+                        train_sample = self._policy.get_train_sample(transitions)
+                        return_data.extend(train_sample)
+                        self._env_info['train_sample'][i] += len(train_sample)
+                        collected_sample += len(train_sample)
+                        self._traj_start[i] = self._step_index + 1
+                        self._traj_count[i] = 0
+
+            if len(timesteps) == 0:
+                continue
+            self._env_info['time'][step_id] += self._timer.value / len(step_id)
+            self._step_index += 1
+            # If env is done, record episode info and reset
+            done_id = step_id[done].tolist()
+            for j, i in zip(np.nonzero(done)[0].tolist(), done_id):
+                collected_episode += 1
+                info = {
+                    'reward': timestep.info[j]['eval_episode_return'],
+                    'time': self._env_info['time'][i],
+                    'step': self._env_info['step'][i],
+                    'train_sample': self._env_info['train_sample'][i],
+                }
+                self._episode_info.append(info)
+            if len(done_id) > 0:
+                # Env reset is done by env_manager automatically
+                self._policy.reset(done_id)
+                self._reset_stat(done_id)
+            # Release the batch data which are not referred by any env.
+            for index in [k for k in self._traj_steps.keys() if k < self._traj_start.min()]:
+                self._traj_steps.pop(index)
+            referred_batch = set(self._batch_of.tolist())
+            for index in [k for k in self._batch_pool.keys() if k not in referred_batch]:
+                self._batch_pool.pop(index)
+        collected_duration = sum([d['time'] for d in self._episode_info])
+        # reduce data when enables DDP
+        if self._world_size > 1:
+            collected_sample = allreduce_data(collected_sample, 'sum')
+            collected_step = allreduce_data(collected_step, 'sum')
+            collected_episode = allreduce_data(collected_episode, 'sum')
+            collected_duration = allreduce_data(collected_duration, 'sum')
+        self._total_envstep_count += collected_step
+        self._total_episode_count += collected_episode
+        self._total_duration += collected_duration
+        self._total_train_sample_count += collected_sample
+        # log
+        if record_random_collect:  # default is true, but when random collect, record_random_collect is False
+            self._output_log(train_iter)
+        else:
+            self._episode_info.clear()
+        # on-policy reset
+        if self._on_policy:
+            self._reset_stat(np.arange(self._env_num))
+
+        if drop_extra:
+            return return_data[:n_sample]
+        else:
+            return return_data
@@ -272,6 +272,8 @@ class SampleSerialCollector(ISerialCollector):
                 actions = to_ndarray(actions)
                 timesteps = self._env.step(actions)
 
+            if len(timesteps) == 0:  # e.g. the steps of env groups are still in flight
+                continue
             # TODO(nyz) this duration may be inaccurate in async env
             interaction_duration = self._timer.value / len(timesteps)
 
@@ -411,3 +413,8 @@ class SampleSerialCollector(ISerialCollector):
                 if k in ['total_envstep_count']:
                     continue
                 self._tb_logger.add_scalar('{}_step/'.format(self._instance_name) + k, v, self._total_envstep_count)
+            if hasattr(self._env, 'log_stats'):
+                # the latency and throughput statistics of env manager, e.g. step time, wait time and stragglers
+                self._env.log_stats(
+                    self._tb_logger, self._total_envstep_count, prefix='{}_env'.format(self._instance_name)
+                )
@@ -0,0 +1,128 @@
+import copy
+import time
+import pytest
+import gym
+import numpy as np
+import torch
+from easydict import EasyDict
+from ding.worker import SampleSerialCollector, BatchSampleSerialCollector
+from ding.envs import BaseEnvTimestep, BaseEnvManager, SyncSubprocessEnvManager, AsyncSubprocessEnvManager
+from ding.policy import DQNPolicy, get_random_policy
+from ding.model import DQN
+from dizoo.classic_control.cartpole.envs import CartPoleEnv
+
+
+@pytest.fixture(autouse=True)
+def chdir_tmp_path(tmp_path, monkeypatch):
+    # the collectors write logs into ./{exp_name}/log, keep them out of the working tree
+    monkeypatch.chdir(tmp_path)
+
+
+def build_collector(collector_cls, env_manager_type=BaseEnvManager, env_num=4, seed=0):
+    env = env_manager_type([lambda: CartPoleEnv({}) for _ in range(env_num)], env_manager_type.default_config())
+    env.seed(seed, dynamic_seed=False)
+    torch.manual_seed(seed)
+    model = DQN(obs_shape=4, action_shape=2)
+    policy = DQNPolicy(DQNPolicy.default_config(), model=model)
+    collector = collector_cls(collector_cls.default_config(), env, policy.collect_mode)
+    return collector, policy
+
+
+def assert_same_samples(samples, expected_samples):
+    assert len(samples) == len(expected_samples)
+    for s, e in zip(samples, expected_samples):
+        assert s.keys() == e.keys()
+        for k in e.keys():
+            if isinstance(e[k], torch.Tensor):
+                assert s[k].shape == e[k].shape and s[k].dtype == e[k].dtype
+                assert torch.equal(s[k], e[k]), k
+            else:
+                assert isinstance(s[k], type(e[k])) and s[k] == e[k], k
+
+
+@pytest.mark.unittest
+@pytest.mark.parametrize('native', [True, False])
+def test_batch_collect_equivalence(native):
+    expected_collector, _ = build_collector(SampleSerialCollector)
+    collector, _ = build_collector(BatchSampleSerialCollector)
+    if not native:
+        # the policy without batch interfaces falls back to the dict-style interfaces
+        collector.reset_policy(collector._policy._replace(forward_batch=None, process_transition_batch=None))
+    for i in range(3):
+        kwargs = dict(n_sample=100, train_iter=i, drop_extra=False, policy_kwargs={'eps': 0.})
+        expected_samples = expected_collector.collect(**kwargs)
+        samples = collector.collect(**kwargs)
+        assert_same_samples(samples, expected_samples)
+    assert collector.envstep == expected_collector.envstep
+    assert collector._total_episode_count == expected_collector._total_episode_count > 0
+    # the batch transitions which are not referred by any trajectory are released
+    assert len(collector._traj_steps) <= collector._traj_len
+    assert len(collector._batch_pool) == 1
+    expected_collector.close()
+    collector.close()
+
+
+@pytest.mark.unittest
+@pytest.mark.parametrize('env_manager_type', [SyncSubprocessEnvManager, AsyncSubprocessEnvManager])
+def test_batch_collect_subprocess(env_manager_type):
+    collector, policy = build_collector(BatchSampleSerialCollector, env_manager_type, env_num=4)
+    samples = collector.collect(n_sample=200, train_iter=0, policy_kwargs={'eps': 0.5})
+    assert len(samples) == 200
+    assert all([s['obs'].shape == (4, ) and s['action'].shape == (1, ) for s in samples])
+    # random collect with the random policy, which doesn't have batch interfaces
+    collector.reset_policy(get_random_policy(EasyDict(policy=policy.cfg), policy.collect_mode, collector._env))
+    samples = collector.collect(n_sample=200, train_iter=0, record_random_collect=False)
+    assert len(samples) == 200
+    collector.close()
+
+
+class ConstEnv(object):
+    """
+    The env whose step is almost free, so that the collect time is mainly the collector overhead.
+    """
+
+    def __init__(self, obs_dim=16, episode_len=50):
+        self._obs_dim = obs_dim
+        self._episode_len = episode_len
+        self.observation_space = gym.spaces.Box(low=-np.inf, high=np.inf, shape=(obs_dim, ), dtype=np.float32)
+        self.action_space = gym.spaces.Discrete(2)
+        self.reward_space = gym.spaces.Box(low=0, high=1, shape=(1, ), dtype=np.float32)
+
+    def reset(self):
+        self._count = 0
+        return np.zeros(self._obs_dim, dtype=np.float32)
+
+    def step(self, action):
+        self._count += 1
+        done = self._count >= self._episode_len
+        info = {'eval_episode_return': float(self._count)} if done else {}
+        obs = np.full(self._obs_dim, self._count, dtype=np.float32)
+        return BaseEnvTimestep(obs, np.array([1.], dtype=np.float32), done, info)
+
+    def seed(self, seed, dynamic_seed=False):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize('env_num', [8, 64, 256])
+def test_batch_collect_benchmark(env_num):
+    """
+    Compare the collector overhead (process time) per env step, the median of 5 runs.
+    """
+    result = {}
+    for collector_cls in [SampleSerialCollector, BatchSampleSerialCollector]:
+        env = BaseEnvManager([ConstEnv for _ in range(env_num)], BaseEnvManager.default_config())
+        policy = DQNPolicy(DQNPolicy.default_config(), model=DQN(obs_shape=16, action_shape=2))
+        collector = collector_cls(collector_cls.default_config(), env, policy.collect_mode)
+        collector.collect(n_sample=env_num * 4, policy_kwargs={'eps': 0.5})
+        cost = []
+        for _ in range(5):
+            t, collected_step = time.process_time(), collector.envstep
+            collector.collect(n_sample=env_num * 50, policy_kwargs={'eps': 0.5})
+            cost.append((time.process_time() - t) / (collector.envstep - collected_step) * 1e6)
+        result[collector_cls.__name__] = sorted(cost)[2]
+        collector.close()
+    print('env_num: {}, collector overhead per step(us): {}'.format(env_num, result))